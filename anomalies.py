@@ -0,0 +1,329 @@
+"""Anomalieerkennung beim Import mit gespeicherten Markierungen.
+
+Jeder importierte Messwert wird mit den vorangehenden Werten derselben Tabelle
+verglichen (gleitendes Fenster über zurückliegende Werte):
+    - hampel: Abstand zum gleitenden Median in Vielfachen der MAD (robust, Standard)
+    - zscore: Abstand zum gleitenden Mittelwert in Standardabweichungen
+
+Messwerte über der Schwelle werden mit ihrem Score in _anomalies gespeichert
+(Tabelle, Datum, Zeit, Index). Diagramme, Exporte und Statistiken schließen sie
+über einen Anti-Join auf diese Tabelle aus oder heben sie hervor, statt Ausreißer
+bei jeder Darstellung aus dem geladenen Ausschnitt neu zu bestimmen; die
+Markierungen hängen damit nicht mehr vom Zoom ab. Das Fenster des letzten
+Imports wird je Tabelle gespeichert, sodass auch chunkweise und fortlaufende
+Importe lückenlos geprüft werden.
+
+Parameter je Tabelle in _anomaly_settings (Standard: hampel, Fenster 51,
+Schwelle 3.5). Nach einer Änderung berechnet rescan die Markierungen der
+gesamten Tabelle neu (in der Oberfläche als Hintergrundauftrag).
+
+Start:
+    python anomalies.py --table csv1                                          # Markierungen anzeigen
+    python anomalies.py --table csv1 --method zscore --window 120 --threshold 4 --rescan
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database import bump_table_version
+
+ANOMALY_TABLE = '_anomalies'
+ANOMALY_SETTINGS_TABLE = '_anomaly_settings'
+ANOMALY_DETECTION = os.environ.get('ANOMALY_DETECTION', '1') == '1'
+METHODS = {
+    'hampel': "Hampel-Filter (Median/MAD)",
+    'zscore': "Gleitender z-Score (Mittelwert/σ)"
+}
+DEFAULT_SETTINGS = {'method': 'hampel', 'window_size': 51, 'threshold': 3.5, 'enabled': True}
+MAD_SCALE = 1.4826  # MAD → Standardabweichung bei normalverteilten Werten
+
+
+def ensure_anomaly_tables(conn):
+    """Legt die Tabellen für Markierungen und Parameter an"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ANOMALY_TABLE} (
+            table_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            index TEXT,
+            value DOUBLE PRECISION,
+            score DOUBLE PRECISION NOT NULL
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE INDEX IF NOT EXISTS {ANOMALY_TABLE}_lookup_idx
+        ON {ANOMALY_TABLE} (table_name, date, time)
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ANOMALY_SETTINGS_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            method TEXT NOT NULL,
+            window_size INTEGER NOT NULL,
+            threshold DOUBLE PRECISION NOT NULL,
+            enabled BOOLEAN NOT NULL,
+            tail TEXT
+        )
+    """))
+
+
+def load_settings(conn, table_name):
+    """Parameter einer Tabelle (Standardwerte, falls keine gespeichert sind) samt Fenster des letzten Imports"""
+    row = conn.execute(text(f"""
+        SELECT method, window_size, threshold, enabled, tail FROM {ANOMALY_SETTINGS_TABLE}
+        WHERE table_name = :table_name
+    """), {'table_name': table_name}).mappings().first()
+    if row is None:
+        return {**DEFAULT_SETTINGS, 'tail': None}
+    settings = dict(row)
+    settings['tail'] = json.loads(settings['tail']) if settings['tail'] else None
+    return settings
+
+
+def save_settings(engine, table_name, method, window_size, threshold, enabled=True):
+    """Speichert die Parameter einer Tabelle (wirksam für neue Importe und rescan)"""
+    if method not in METHODS:
+        raise ValueError(f"Unbekanntes Verfahren: '{method}'")
+    with engine.begin() as conn:
+        ensure_anomaly_tables(conn)
+        conn.execute(text(f"""
+            INSERT INTO {ANOMALY_SETTINGS_TABLE} (table_name, method, window_size, threshold, enabled)
+            VALUES (:table_name, :method, :window_size, :threshold, :enabled)
+            ON CONFLICT (table_name) DO UPDATE SET
+                method = excluded.method,
+                window_size = excluded.window_size,
+                threshold = excluded.threshold,
+                enabled = excluded.enabled
+        """), {'table_name': table_name, 'method': method, 'window_size': int(window_size),
+               'threshold': float(threshold), 'enabled': bool(enabled)})
+
+
+class AnomalyDetector:
+    """Gleitende Anomalieerkennung über eine fortlaufende Wertefolge (auch über Chunkgrenzen)"""
+
+    def __init__(self, method='hampel', window_size=51, threshold=3.5, tail=None):
+        if method not in METHODS:
+            raise ValueError(f"Unbekanntes Verfahren: '{method}'")
+        self.method = method
+        self.window_size = int(window_size)
+        self.threshold = float(threshold)
+        # Die letzten Werte (zwei Fenster: Lage und Streuung) aus vorherigen Chunks
+        self.tail = np.asarray(tail if tail is not None else [], dtype=float)
+
+    @classmethod
+    def for_table(cls, conn, table_name, resume=True):
+        """Detektor mit den Parametern einer Tabelle; None, wenn die Erkennung abgeschaltet ist"""
+        if not ANOMALY_DETECTION:
+            return None
+        ensure_anomaly_tables(conn)
+        settings = load_settings(conn, table_name)
+        if not settings['enabled']:
+            return None
+        return cls(settings['method'], settings['window_size'], settings['threshold'],
+                   settings['tail'] if resume else None)
+
+    def scores(self, values):
+        """Score je Wert (Abstand zur Lage der vorangehenden Werte in Streuungseinheiten)"""
+        history = len(self.tail)
+        series = pd.Series(np.concatenate([self.tail, np.asarray(values, dtype=float)]))
+        min_periods = max(self.window_size // 2, 3)
+        previous = series.shift(1).rolling(self.window_size, min_periods=min_periods)
+        if self.method == 'hampel':
+            deviation = (series - previous.median()).abs()
+            scale = MAD_SCALE * deviation.shift(1).rolling(self.window_size, min_periods=min_periods).median()
+        else:
+            deviation = (series - previous.mean()).abs()
+            scale = previous.std()
+        scores = deviation / scale.where(scale > 0)
+        self.tail = series.to_numpy()[-2 * self.window_size:]
+        return scores.to_numpy()[history:]
+
+    def flag(self, df):
+        """Markierte Zeilen eines Chunks (index, date, time, value, score)"""
+        values = pd.to_numeric(df['value'], errors='coerce').to_numpy(dtype=float)
+        scores = self.scores(values)
+        mask = np.nan_to_num(scores, nan=0.0) > self.threshold
+        flagged = df.loc[mask, ['index', 'date', 'time']].astype(str).reset_index(drop=True)
+        flagged['value'] = values[mask]
+        flagged['score'] = scores[mask]
+        return flagged
+
+    def save(self, conn, table_name):
+        """Speichert das Fenster für den nächsten Import in die Tabelle"""
+        conn.execute(text(f"""
+            INSERT INTO {ANOMALY_SETTINGS_TABLE} (table_name, method, window_size, threshold, enabled, tail)
+            VALUES (:table_name, :method, :window_size, :threshold, TRUE, :tail)
+            ON CONFLICT (table_name) DO UPDATE SET tail = excluded.tail
+        """), {'table_name': table_name, 'method': self.method, 'window_size': self.window_size,
+               'threshold': self.threshold, 'tail': json.dumps(self.tail.tolist())})
+
+
+def insert_flags(conn, table_name, flags):
+    """Speichert Markierungen in der Transaktion des Aufrufers"""
+    if flags.empty:
+        return
+    conn.execute(text(f"""
+        INSERT INTO {ANOMALY_TABLE} (table_name, date, time, index, value, score)
+        VALUES (:table_name, :date, :time, :index, :value, :score)
+    """), [{'table_name': table_name, **record} for record in flags.to_dict('records')])
+
+
+def record_anomalies(conn, table_name, df):
+    """Prüft neu eingefügte Messwerte und speichert Markierungen; liefert deren Anzahl"""
+    detector = AnomalyDetector.for_table(conn, table_name)
+    if detector is None or df.empty:
+        return 0
+    flags = detector.flag(df)
+    insert_flags(conn, table_name, flags)
+    detector.save(conn, table_name)
+    return len(flags)
+
+
+def clear_anomalies(conn, table_name, start_date=None, end_date=None, forget=False):
+    """Entfernt Markierungen einer Tabelle (optional eines Zeitraums); forget entfernt auch die Parameter"""
+    ensure_anomaly_tables(conn)
+    conditions = ["table_name = :table_name"]
+    if start_date:
+        conditions.append("date >= :start_date")
+    if end_date:
+        conditions.append("date <= :end_date")
+    params = {'table_name': table_name, 'start_date': start_date, 'end_date': end_date}
+    conn.execute(text(f"DELETE FROM {ANOMALY_TABLE} WHERE {' AND '.join(conditions)}"), params)
+    if forget:
+        conn.execute(text(f"DELETE FROM {ANOMALY_SETTINGS_TABLE} WHERE table_name = :table_name"), params)
+
+
+def exclusion_condition(alias):
+    """WHERE-Bedingung, die markierte Messwerte ausschließt (Anti-Join über den Index der Markierungen)"""
+    return f"""NOT EXISTS (
+        SELECT 1 FROM {ANOMALY_TABLE} a
+        WHERE a.table_name = :anomaly_table
+          AND a.date = {alias}.date
+          AND a.time = {alias}.time
+          AND a.index IS NOT DISTINCT FROM {alias}.index
+    )"""
+
+
+def drop_flagged(df, flags):
+    """Entfernt markierte Zeilen aus einem Frame mit index/date/time (z.B. archivierte Messwerte)"""
+    if flags.empty or df.empty:
+        return df
+    keys = ['index', 'date', 'time']
+    flagged = pd.MultiIndex.from_frame(flags[keys].astype(str))
+    return df[~pd.MultiIndex.from_frame(df[keys].astype(str)).isin(flagged)]
+
+
+def load_anomalies(conn, table_name, start_date=None, end_date=None):
+    """Markierungen eines Zeitraums (index, date, time, value, score) nach Zeit sortiert"""
+    conditions = ["table_name = :table_name"]
+    if start_date is not None:
+        conditions.append("date BETWEEN :start_date AND :end_date")
+    return pd.read_sql(text(f"""
+        SELECT index, date, time, value, score FROM {ANOMALY_TABLE}
+        WHERE {' AND '.join(conditions)}
+        ORDER BY date, time
+    """), conn, params={'table_name': table_name, 'start_date': start_date, 'end_date': end_date})
+
+
+def _latest_row(conn, table_name):
+    """Datum und Zeit des jüngsten Messwerts der Datenbanktabelle (None, wenn leer)"""
+    row = conn.execute(text(f"""
+        SELECT date, time FROM {table_name}
+        WHERE date IS NOT NULL AND time IS NOT NULL
+        ORDER BY date DESC, time DESC LIMIT 1
+    """)).first()
+    return (str(row[0]), str(row[1])) if row is not None else None
+
+
+def _until(chunk, bound):
+    """Zeilen eines Chunks bis einschließlich der Obergrenze (date, time)"""
+    if bound is None:
+        return chunk
+    date, time = chunk['date'].astype(str), chunk['time'].astype(str)
+    return chunk[(date < bound[0]) | ((date == bound[0]) & (time <= bound[1]))]
+
+
+def rescan(storage, table_name, progress=None):
+    """Berechnet die Markierungen einer Tabelle mit den aktuellen Parametern neu; liefert deren Anzahl
+
+    Die Tabelle wird ohne Sperre sortiert gestreamt, bis zum jüngsten Messwert
+    beim Start (Obergrenze). Unter Schreibsperre werden danach nur die
+    Markierungen bis zur Obergrenze ausgetauscht; was Importe währenddessen
+    angehängt und markiert haben, bleibt samt ihrem Fenster erhalten.
+    progress(gelesene Zeilen, Zeilen gesamt).
+    """
+    with storage.engine.begin() as conn:
+        ensure_anomaly_tables(conn)
+        settings = load_settings(conn, table_name)
+        bound = _latest_row(conn, table_name)
+    detector = AnomalyDetector(settings['method'], settings['window_size'], settings['threshold'])
+    total = storage.count_rows(table_name)
+    flags, rows = [], 0
+    end_date = bound[0] if bound is not None else None
+    for chunk in storage.iter_range(table_name, end_date=end_date, include_index=True):
+        chunk = _until(chunk, bound)
+        flags.append(detector.flag(chunk))
+        rows += len(chunk)
+        if progress is not None:
+            progress(rows, total)
+    flags = pd.concat(flags, ignore_index=True) if flags else pd.DataFrame()
+    with storage.write_transaction(table_name) as conn:
+        if bound is None:
+            clear_anomalies(conn, table_name)
+            newer = False
+        else:
+            params = {'table_name': table_name, 'date': bound[0], 'time': bound[1]}
+            conn.execute(text(f"""
+                DELETE FROM {ANOMALY_TABLE}
+                WHERE table_name = :table_name AND (date < :date OR (date = :date AND time <= :time))
+            """), params)
+            newer = conn.execute(text(f"""
+                SELECT 1 FROM {table_name}
+                WHERE date > :date OR (date = :date AND time > :time) LIMIT 1
+            """), params).first() is not None
+        insert_flags(conn, table_name, flags)
+        if not newer:
+            # Sonst hat der Import der neueren Zeilen sein Fenster bereits gespeichert
+            detector.save(conn, table_name)
+        bump_table_version(conn, table_name)
+    return len(flags)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Anomalie-Markierungen einer Messwerttabelle")
+    parser.add_argument('--table', required=True, help="Tabellenname")
+    parser.add_argument('--method', choices=list(METHODS), help="Verfahren")
+    parser.add_argument('--window', type=int, help="Fenster (Anzahl vorangehender Messwerte)")
+    parser.add_argument('--threshold', type=float, help="Schwelle (Score)")
+    parser.add_argument('--disable', action='store_true', help="Erkennung für die Tabelle abschalten")
+    parser.add_argument('--rescan', action='store_true', help="Markierungen neu berechnen")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    with storage.engine.begin() as conn:
+        ensure_anomaly_tables(conn)
+        settings = load_settings(conn, args.table)
+    if args.method or args.window or args.threshold or args.disable:
+        save_settings(
+            storage.engine, args.table,
+            args.method or settings['method'],
+            args.window or settings['window_size'],
+            args.threshold or settings['threshold'],
+            enabled=not args.disable
+        )
+    if args.rescan:
+        print(f"{rescan(storage, args.table):,} Messwerte markiert")
+    with storage.engine.connect() as conn:
+        flags = load_anomalies(conn, args.table)
+    print(f"{len(flags):,} markierte Messwerte")
+    if not flags.empty:
+        print(flags.sort_values('score', ascending=False).head(20).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
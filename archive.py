@@ -0,0 +1,299 @@
+"""Kalte Speicherebene: Auslagerung alter Messwerte in komprimierte Parquet-Dateien.
+
+Ein Archivlauf verschiebt pro Tabelle alle Messwerte, die älter als die
+konfigurierte Aufbewahrungsdauer sind, monatsweise nach
+ARCHIVE_DIR/<tabelle>/month=YYYY-MM/part-*.parquet (zstd, typisierte Spalten)
+und trägt jede Datei in _archive_manifest ein. Die Speicherschicht liest
+Zeiträume, die im Manifest verzeichnet sind, transparent aus beiden Ebenen.
+
+Start:
+    python archive.py                          # alle Tabellen nach ihren Richtlinien
+    python archive.py --table csv1 --older-than 90
+    python archive.py --set-policy csv1=90     # Aufbewahrung in der Datenbank (Tage)
+"""
+import argparse
+import os
+import shutil
+import uuid
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from database import bump_table_version, validate_table_name
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'data/archive')
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+ARCHIVE_MANIFEST_TABLE = '_archive_manifest'
+ARCHIVE_POLICY_TABLE = '_archive_policies'
+ARCHIVE_COMPRESSION = 'zstd'
+ARCHIVE_CHUNK_SIZE = 100_000
+
+
+def archive_schema():
+    """Spaltentypen der Archivdateien"""
+    import pyarrow as pa
+
+    return pa.schema([
+        ('index', pa.string()),
+        ('date', pa.date32()),
+        ('time', pa.string()),
+        ('value', pa.float64())
+    ])
+
+
+def ensure_archive_tables(conn):
+    """Legt Manifest- und Richtlinientabelle an"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_MANIFEST_TABLE} (
+            path TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            partition TEXT NOT NULL,
+            row_count BIGINT NOT NULL,
+            min_date TEXT NOT NULL,
+            max_date TEXT NOT NULL,
+            file_bytes BIGINT NOT NULL,
+            archived_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_POLICY_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            archive_after_days INTEGER NOT NULL
+        )
+    """))
+
+
+def set_archive_policy(engine, table_name, days):
+    """Speichert die Aufbewahrungsdauer (Tage in der Datenbank) einer Tabelle"""
+    validate_table_name(table_name)
+    with engine.begin() as conn:
+        ensure_archive_tables(conn)
+        conn.execute(text(f"""
+            INSERT INTO {ARCHIVE_POLICY_TABLE} (table_name, archive_after_days)
+            VALUES (:table_name, :days)
+            ON CONFLICT (table_name) DO UPDATE SET archive_after_days = excluded.archive_after_days
+        """), {'table_name': table_name, 'days': int(days)})
+
+
+def load_archive_policies(engine):
+    """Liefert die gespeicherten Aufbewahrungsdauern als Dict Tabelle → Tage"""
+    with engine.begin() as conn:
+        ensure_archive_tables(conn)
+        rows = conn.execute(text(f"SELECT table_name, archive_after_days FROM {ARCHIVE_POLICY_TABLE}"))
+        return {table_name: days for table_name, days in rows}
+
+
+def frame_to_archive(df):
+    """Wandelt einen Chunk der TEXT-Tabelle in eine typisierte Arrow-Tabelle um"""
+    import pyarrow as pa
+
+    return pa.Table.from_pandas(pd.DataFrame({
+        'index': df['index'].astype(str),
+        'date': pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce').dt.date,
+        'time': df['time'].astype(str),
+        'value': pd.to_numeric(df['value'], errors='coerce').astype('float64')
+    }), schema=archive_schema(), preserve_index=False)
+
+
+def month_bounds(month):
+    """Liefert erstes Datum des Monats und des Folgemonats als 'YYYY-MM-DD'"""
+    start = datetime.strptime(month, '%Y-%m').date()
+    following = (start + timedelta(days=32)).replace(day=1)
+    return start.strftime('%Y-%m-%d'), following.strftime('%Y-%m-%d')
+
+
+class ColdTier:
+    """Manifest-gestützter Zugriff auf archivierte Parquet-Partitionen"""
+
+    def __init__(self, engine, root=ARCHIVE_DIR):
+        self.engine = engine
+        self.root = root
+        with engine.begin() as conn:
+            ensure_archive_tables(conn)
+
+    def files(self, table_name, start_date=None, end_date=None):
+        """Manifest-Einträge einer Tabelle, die den Zeitraum überschneiden"""
+        with self.engine.connect() as conn:
+            return pd.read_sql(text(f"""
+                SELECT path, partition, row_count, min_date, max_date, file_bytes
+                FROM {ARCHIVE_MANIFEST_TABLE}
+                WHERE table_name = :table_name
+                  AND (CAST(:end_date AS TEXT) IS NULL OR min_date <= :end_date)
+                  AND (CAST(:start_date AS TEXT) IS NULL OR max_date >= :start_date)
+                ORDER BY min_date
+            """), conn, params={'table_name': table_name, 'start_date': start_date, 'end_date': end_date})
+
+    def summary(self, table_name):
+        """Zeilenzahl, ältestes Datum und Dateigröße des Archivs einer Tabelle"""
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"""
+                SELECT COALESCE(SUM(row_count), 0), MIN(min_date), COALESCE(SUM(file_bytes), 0)
+                FROM {ARCHIVE_MANIFEST_TABLE}
+                WHERE table_name = :table_name
+            """), {'table_name': table_name}).one()
+        return int(row[0]), row[1], int(row[2])
+
+    def iter_frames(self, table_name, start_date=None, end_date=None):
+        """Liefert archivierte Messwerte pro Datei (date/time als Text, value als float)"""
+        import pyarrow.parquet as pq
+
+        filters = []
+        if start_date is not None:
+            filters.append(('date', '>=', pd.Timestamp(start_date).date()))
+        if end_date is not None:
+            filters.append(('date', '<=', pd.Timestamp(end_date).date()))
+        for path in self.files(table_name, start_date, end_date)['path']:
+            df = pq.read_table(os.path.join(self.root, path), filters=filters or None).to_pandas()
+            if df.empty:
+                continue
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+            yield df.sort_values(['date', 'time'], kind='stable').reset_index(drop=True)
+
+    def read(self, table_name, start_date=None, end_date=None):
+        """Liefert alle archivierten Messwerte eines Zeitraums als ein DataFrame"""
+        frames = list(self.iter_frames(table_name, start_date, end_date))
+        if not frames:
+            return pd.DataFrame(columns=['index', 'date', 'time', 'value'])
+        return pd.concat(frames, ignore_index=True)
+
+    def archive_table(self, storage, table_name, older_than_days=ARCHIVE_AFTER_DAYS):
+        """Verschiebt Messwerte, die älter als older_than_days sind, monatsweise ins Archiv
+
+        Jeder Monat wird in einer eigenen kurzen Transaktion aus der Datenbank gelöscht.
+        Stimmt die Zahl der gelöschten Zeilen nicht mit der geschriebenen Datei überein
+        (gleichzeitiger Import in den Zeitraum), wird der Monat zurückgerollt und die
+        Datei verworfen.
+        """
+        import pyarrow.parquet as pq
+
+        validate_table_name(table_name)
+        cutoff = (date.today() - timedelta(days=older_than_days)).strftime('%Y-%m-%d')
+        with storage.engine.connect() as conn:
+            months = [row[0] for row in conn.execute(text(f"""
+                SELECT DISTINCT substr(date, 1, 7) FROM {table_name}
+                WHERE date < :cutoff AND date != ''
+                ORDER BY 1
+            """), {'cutoff': cutoff})]
+
+        summary = {'table': table_name, 'cutoff': cutoff, 'files': 0, 'rows': 0, 'bytes': 0}
+        for month in months:
+            lower, upper = month_bounds(month)
+            upper = min(upper, cutoff)
+            relative_path = os.path.join(table_name, f"month={month}", f"part-{uuid.uuid4().hex[:12]}.parquet")
+            path = os.path.join(self.root, relative_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            rows, min_date, max_date = 0, None, None
+            with storage.engine.connect() as conn, \
+                    pq.ParquetWriter(path, archive_schema(), compression=ARCHIVE_COMPRESSION) as writer:
+                result = conn.execution_options(stream_results=True).execute(text(f"""
+                    SELECT index, date, time, value FROM {table_name}
+                    WHERE date >= :lower AND date < :upper
+                    ORDER BY date, time
+                """), {'lower': lower, 'upper': upper})
+                columns = list(result.keys())
+                chunks = result.partitions(ARCHIVE_CHUNK_SIZE)
+                if storage.query_log is not None:
+                    chunks = storage.query_log.stream(conn, chunks)
+                for chunk in chunks:
+                    df = pd.DataFrame(chunk, columns=columns)
+                    writer.write_table(frame_to_archive(df))
+                    rows += len(df)
+                    min_date = min_date or df['date'].iloc[0]
+                    max_date = df['date'].iloc[-1]
+
+            try:
+                # Schreibsperre der Tabelle: kein Import oder Verdichten zwischen Zählen und Löschen
+                with storage.write_transaction(table_name) as conn:
+                    bounds = {'lower': lower, 'upper': upper}
+                    present = conn.execute(text(f"""
+                        SELECT COUNT(*) FROM {table_name} WHERE date >= :lower AND date < :upper
+                    """), bounds).scalar()
+                    deleted = conn.execute(text(f"""
+                        DELETE FROM {table_name} WHERE date >= :lower AND date < :upper
+                    """), bounds).rowcount
+                    if deleted < 0:
+                        # Treiber ohne rowcount (DuckDB): Zählung im selben Snapshot
+                        deleted = present
+                    if deleted != rows:
+                        raise RuntimeError(
+                            f"{table_name} {month}: {deleted} Zeilen gelöscht, aber {rows} archiviert"
+                        )
+                    conn.execute(text(f"""
+                        INSERT INTO {ARCHIVE_MANIFEST_TABLE}
+                            (path, table_name, partition, row_count, min_date, max_date, file_bytes)
+                        VALUES (:path, :table_name, :partition, :row_count, :min_date, :max_date, :file_bytes)
+                    """), {
+                        'path': relative_path,
+                        'table_name': table_name,
+                        'partition': month,
+                        'row_count': rows,
+                        'min_date': min_date,
+                        'max_date': max_date,
+                        'file_bytes': os.path.getsize(path)
+                    })
+                    bump_table_version(conn, table_name)
+            except Exception:
+                os.remove(path)
+                raise
+
+            summary['files'] += 1
+            summary['rows'] += rows
+            summary['bytes'] += os.path.getsize(path)
+        return summary
+
+    def drop(self, table_name):
+        """Entfernt Archivdateien und Manifest-Einträge einer gelöschten Tabelle"""
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(f"DELETE FROM {ARCHIVE_MANIFEST_TABLE} WHERE table_name = :table_name"),
+                {'table_name': table_name}
+            )
+        shutil.rmtree(os.path.join(self.root, table_name), ignore_errors=True)
+
+
+def parse_policy_arguments(values):
+    """Wandelt 'tabelle=tage'-Argumente in ein Dict um"""
+    policies = {}
+    for value in values or []:
+        table_name, separator, days = value.partition('=')
+        if not separator or not days.isdigit():
+            raise argparse.ArgumentTypeError(f"Ungültige Richtlinie '{value}', erwartet tabelle=tage")
+        policies[validate_table_name(table_name)] = int(days)
+    return policies
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Archiviert alte Messwerte als Parquet-Dateien")
+    parser.add_argument('--table', action='append', help="Nur diese Tabelle(n) archivieren")
+    parser.add_argument('--older-than', type=int, help="Alter in Tagen (überschreibt die Richtlinien)")
+    parser.add_argument('--set-policy', action='append', metavar='TABELLE=TAGE',
+                        help="Aufbewahrungsdauer einer Tabelle speichern")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    if args.set_policy:
+        for table_name, days in parse_policy_arguments(args.set_policy).items():
+            set_archive_policy(storage.engine, table_name, days)
+            print(f"Richtlinie gespeichert: {table_name} → {days} Tage")
+        return
+
+    policies = load_archive_policies(storage.engine)
+    for table_name in args.table or storage.list_tables():
+        days = args.older_than or policies.get(table_name, ARCHIVE_AFTER_DAYS)
+        try:
+            summary = storage.cold.archive_table(storage, table_name, days)
+        except Exception as e:
+            print(f"{table_name}: Fehler beim Archivieren: {e}")
+            continue
+        print(
+            f"{table_name}: {summary['rows']:,} Zeilen vor {summary['cutoff']} in "
+            f"{summary['files']} Datei(en) archiviert ({summary['bytes'] / 1024 / 1024:.1f} MB)"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Abdeckungsindex: Messwerte pro Tabelle, Tag und Stunde.
+
+Der Index wird beim Import in derselben Transaktion fortgeschrieben
+(Anzahl, erste und letzte Uhrzeit je Stunde) und bei Verdichtung oder
+Löschung angepasst. Daraus ergeben sich ohne Zugriff auf die Rohdaten
+    - die Verfügbarkeits-Heatmap (Tag × Stunde),
+    - das übliche Messintervall und Lücken, die es deutlich überschreiten,
+    - sinnvolle Standardzeiträume und die belegten Tage eines Zeitraums.
+
+Für Tabellen aus der Zeit vor dem Index wird er beim ersten Zugriff einmalig
+aus den Daten (Datenbank und Archiv) aufgebaut.
+
+Start:
+    python availability.py --rebuild            # Index aller Tabellen neu aufbauen
+    python availability.py --table csv1         # Lücken einer Tabelle ausgeben
+"""
+import argparse
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database import validate_table_name
+
+COVERAGE_TABLE = '_coverage'
+COVERAGE_STATE_TABLE = '_coverage_state'
+GAP_FACTOR = 3  # Lücke: Abstand größer als GAP_FACTOR × übliches Messintervall
+COVERAGE_COLUMNS = ['date', 'hour', 'samples', 'first_time', 'last_time']
+
+
+def ensure_coverage_tables(conn):
+    """Legt Index- und Statustabelle an"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {COVERAGE_TABLE} (
+            table_name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            samples BIGINT NOT NULL,
+            first_time TEXT NOT NULL,
+            last_time TEXT NOT NULL,
+            PRIMARY KEY (table_name, date, hour)
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {COVERAGE_STATE_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            built_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def _seconds_of_day(times):
+    """Uhrzeiten im Format HH:MM:SS als Sekunden des Tages (-1 bei anderem Format)"""
+    values = np.asarray(times.astype(str), dtype='U8')
+    chars = values.view(np.uint32).reshape(-1, 8).astype(np.int64) - ord('0')
+    digits = chars[:, [0, 1, 3, 4, 6, 7]]
+    valid = ((digits >= 0) & (digits <= 9)).all(axis=1) & (chars[:, 2] == ord(':') - ord('0')) & (chars[:, 5] == ord(':') - ord('0'))
+    seconds = (digits[:, 0] * 10 + digits[:, 1]) * 3600 + (digits[:, 2] * 10 + digits[:, 3]) * 60 + digits[:, 4] * 10 + digits[:, 5]
+    return np.where(valid & (seconds < 86400), seconds, -1)
+
+
+def _format_seconds(seconds):
+    return [f"{value // 3600:02d}:{value // 60 % 60:02d}:{value % 60:02d}" for value in seconds]
+
+
+def hour_counts(df):
+    """Fasst Messwerte (date, time) zu Stundenzeilen des Index zusammen
+
+    Gruppiert wird über Tagesnummer und Sekunden des Tages als Ganzzahlen statt
+    über die Zeichenketten, das hält den Import großer Dateien schnell.
+    """
+    valid = (df['date'].notna() & df['time'].notna()).to_numpy()
+    if not valid.any():
+        return pd.DataFrame(columns=COVERAGE_COLUMNS)
+    seconds = _seconds_of_day(df['time'][valid])
+    codes, dates = pd.factorize(df['date'][valid].astype(str))
+    known = seconds >= 0
+    seconds, codes = seconds[known], codes[known]
+    if not len(seconds):
+        return pd.DataFrame(columns=COVERAGE_COLUMNS)
+    grouped = pd.Series(seconds).groupby(codes * 24 + seconds // 3600, sort=False).agg(['size', 'min', 'max'])
+    keys = grouped.index.to_numpy()
+    return pd.DataFrame({
+        'date': np.asarray(dates)[keys // 24],
+        'hour': (keys % 24).astype(int),
+        'samples': grouped['size'].to_numpy(),
+        'first_time': _format_seconds(grouped['min'].to_numpy()),
+        'last_time': _format_seconds(grouped['max'].to_numpy())
+    })
+
+
+def merge_hour_counts(frames):
+    """Kombiniert Stundenzeilen mehrerer Quellen (Summe, früheste und späteste Uhrzeit)"""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=COVERAGE_COLUMNS)
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.groupby(['date', 'hour'], as_index=False).agg(
+        samples=('samples', 'sum'), first_time=('first_time', 'min'), last_time=('last_time', 'max')
+    )
+
+
+def record_coverage(conn, table_name, df):
+    """Schreibt den Index für neu eingefügte Messwerte in der Transaktion des Aufrufers fort"""
+    record_hour_counts(conn, table_name, hour_counts(df))
+
+
+def record_hour_counts(conn, table_name, counts):
+    """Schreibt bereits zusammengefasste Stundenzeilen (hour_counts) in den Index"""
+    if counts.empty:
+        return
+    ensure_coverage_tables(conn)
+    # Eine Anweisung für alle Stunden: die Spalten gehen als Arrays hinein und
+    # werden per unnest zu Zeilen, statt jede Stunde einzeln zu upserten
+    conn.execute(text(f"""
+        INSERT INTO {COVERAGE_TABLE} (table_name, date, hour, samples, first_time, last_time)
+        SELECT :table_name, unnest(CAST(:dates AS TEXT[])), unnest(CAST(:hours AS INTEGER[])),
+               unnest(CAST(:samples AS BIGINT[])), unnest(CAST(:first_times AS TEXT[])),
+               unnest(CAST(:last_times AS TEXT[]))
+        ON CONFLICT (table_name, date, hour) DO UPDATE SET
+            samples = {COVERAGE_TABLE}.samples + excluded.samples,
+            first_time = LEAST({COVERAGE_TABLE}.first_time, excluded.first_time),
+            last_time = GREATEST({COVERAGE_TABLE}.last_time, excluded.last_time)
+    """), _count_arrays(table_name, counts))
+
+
+def _count_arrays(table_name, counts):
+    return {
+        'table_name': table_name,
+        'dates': [str(value) for value in counts['date']],
+        'hours': [int(value) for value in counts['hour']],
+        'samples': [int(value) for value in counts['samples']],
+        'first_times': [str(value) for value in counts['first_time']],
+        'last_times': [str(value) for value in counts['last_time']]
+    }
+
+
+def clear_coverage(conn, table_name, start_date=None, end_date=None):
+    """Entfernt Indexzeilen einer Tabelle (optional nur für einen Zeitraum)"""
+    ensure_coverage_tables(conn)
+    conditions = ["table_name = :table_name"]
+    if start_date:
+        conditions.append("date >= :start_date")
+    if end_date:
+        conditions.append("date <= :end_date")
+    params = {'table_name': table_name, 'start_date': start_date, 'end_date': end_date}
+    conn.execute(text(f"DELETE FROM {COVERAGE_TABLE} WHERE {' AND '.join(conditions)}"), params)
+    if not start_date and not end_date:
+        conn.execute(text(f"DELETE FROM {COVERAGE_STATE_TABLE} WHERE table_name = :table_name"), params)
+
+
+def rebuild_coverage(storage, table_name):
+    """Baut den Index einer Tabelle aus Datenbank und Archiv neu auf"""
+    validate_table_name(table_name)
+    with storage.engine.begin() as conn:
+        hot = pd.read_sql(text(f"""
+            SELECT date, substr(time, 1, 2) as hour, COUNT(*) as samples,
+                   MIN(time) as first_time, MAX(time) as last_time
+            FROM {table_name}
+            WHERE date IS NOT NULL AND time IS NOT NULL
+            GROUP BY date, substr(time, 1, 2)
+        """), conn)
+        hot['hour'] = pd.to_numeric(hot['hour'], errors='coerce')
+        hot = hot.dropna(subset=['hour'])
+        frames = [hot]
+        if storage.cold is not None:
+            frames += [hour_counts(frame) for frame in storage.cold.iter_frames(table_name)]
+        counts = merge_hour_counts(frames)
+
+        clear_coverage(conn, table_name)
+        if not counts.empty:
+            conn.execute(text(f"""
+                INSERT INTO {COVERAGE_TABLE} (table_name, date, hour, samples, first_time, last_time)
+                SELECT :table_name, unnest(CAST(:dates AS TEXT[])), unnest(CAST(:hours AS INTEGER[])),
+                       unnest(CAST(:samples AS BIGINT[])), unnest(CAST(:first_times AS TEXT[])),
+                       unnest(CAST(:last_times AS TEXT[]))
+            """), _count_arrays(table_name, counts))
+        conn.execute(
+            text(f"INSERT INTO {COVERAGE_STATE_TABLE} (table_name) VALUES (:table_name)"),
+            {'table_name': table_name}
+        )
+    return len(counts)
+
+
+def load_coverage(storage, table_name, start_date=None, end_date=None):
+    """Liefert den Index einer Tabelle; fehlt er noch, wird er einmalig aufgebaut"""
+    validate_table_name(table_name)
+    with storage.engine.begin() as conn:
+        ensure_coverage_tables(conn)
+        built = conn.execute(
+            text(f"SELECT 1 FROM {COVERAGE_STATE_TABLE} WHERE table_name = :table_name"),
+            {'table_name': table_name}
+        ).scalar()
+    if not built:
+        rebuild_coverage(storage, table_name)
+
+    conditions = ["table_name = :table_name"]
+    if start_date:
+        conditions.append("date >= :start_date")
+    if end_date:
+        conditions.append("date <= :end_date")
+    with storage.read_engine.connect() as conn:
+        return pd.read_sql(text(f"""
+            SELECT {', '.join(COVERAGE_COLUMNS)} FROM {COVERAGE_TABLE}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY date, hour
+        """), conn, params={'table_name': table_name, 'start_date': start_date, 'end_date': end_date})
+
+
+def bucket_bounds(coverage):
+    """Erster und letzter Zeitstempel jeder Stundenzeile"""
+    first = pd.to_datetime(coverage['date'] + ' ' + coverage['first_time'], errors='coerce')
+    last = pd.to_datetime(coverage['date'] + ' ' + coverage['last_time'], errors='coerce')
+    return first, last
+
+
+def typical_interval(coverage):
+    """Übliches Messintervall in Sekunden (Median über Stunden mit mehreren Messwerten)"""
+    if coverage.empty:
+        return None
+    first, last = bucket_bounds(coverage)
+    spans = (last - first).dt.total_seconds()
+    valid = (coverage['samples'] > 1) & (spans > 0)
+    if not valid.any():
+        return None
+    return float(np.median(spans[valid] / (coverage.loc[valid, 'samples'] - 1)))
+
+
+def find_gaps(coverage, interval=None):
+    """Lücken zwischen aufeinanderfolgenden Stundenzeilen, die GAP_FACTOR × Messintervall überschreiten"""
+    interval = interval or typical_interval(coverage)
+    if interval is None or len(coverage) < 2:
+        return pd.DataFrame(columns=['Beginn', 'Ende', 'Dauer'])
+    first, last = bucket_bounds(coverage)
+    gap_start = last.iloc[:-1].reset_index(drop=True)
+    gap_end = first.iloc[1:].reset_index(drop=True)
+    duration = gap_end - gap_start
+    gaps = duration.dt.total_seconds() > GAP_FACTOR * interval
+    return pd.DataFrame({
+        'Beginn': gap_start[gaps],
+        'Ende': gap_end[gaps],
+        'Dauer': duration[gaps]
+    }).reset_index(drop=True)
+
+
+def availability_matrix(coverage):
+    """Messwerte je Tag (Zeilen) und Stunde (Spalten 0–23) für die Heatmap"""
+    matrix = coverage.pivot_table(index='date', columns='hour', values='samples', aggfunc='sum')
+    return matrix.reindex(columns=range(24))
+
+
+def default_date_range(coverage, fallback=None):
+    """Standardzeitraum: der letzte Tag mit Messwerten"""
+    if coverage.empty:
+        day = fallback or date.today()
+        return day, day
+    last_day = pd.to_datetime(coverage['date'].max()).date()
+    return last_day, last_day
+
+
+def covered_range(coverage, start_date, end_date):
+    """Erster und letzter belegter Tag innerhalb eines Zeitraums (None, wenn leer)"""
+    days = coverage.loc[(coverage['date'] >= start_date) & (coverage['date'] <= end_date), 'date']
+    if days.empty:
+        return None
+    return days.min(), days.max()
+
+
+def insert_gap_breaks(df, interval, column='timestamp'):
+    """Fügt an Lücken (> GAP_FACTOR × Messintervall) eine leere Zeile ein, damit Diagramme die Linie unterbrechen"""
+    if interval is None or len(df) < 2:
+        return df
+    timestamps = df[column].to_numpy()
+    steps = np.diff(timestamps) / np.timedelta64(1, 's')
+    positions = np.flatnonzero(steps > GAP_FACTOR * interval) + 1
+    if not len(positions):
+        return df
+    breaks = pd.DataFrame({
+        column: timestamps[positions - 1] + (timestamps[positions] - timestamps[positions - 1]) / 2,
+        'value': np.nan
+    })
+    order = np.concatenate([np.arange(len(df)), positions - 0.5])
+    combined = pd.concat([df.reset_index(drop=True), breaks], ignore_index=True)
+    return combined.iloc[np.argsort(order, kind='stable')].reset_index(drop=True)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Abdeckungsindex der Messwerttabellen")
+    parser.add_argument('--rebuild', action='store_true', help="Index neu aufbauen")
+    parser.add_argument('--table', action='append', help="Nur diese Tabelle(n)")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    for table_name in args.table or storage.list_tables():
+        if args.rebuild:
+            print(f"{table_name}: {rebuild_coverage(storage, table_name):,} Stunden indiziert")
+        coverage = load_coverage(storage, table_name)
+        interval = typical_interval(coverage)
+        gaps = find_gaps(coverage, interval)
+        print(f"{table_name}: {coverage['samples'].sum():,} Messwerte, "
+              f"Intervall {interval or 0:g} s, {len(gaps)} Lücke(n)")
+        if not args.rebuild and not gaps.empty:
+            print(gaps.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
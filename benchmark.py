@@ -0,0 +1,301 @@
+"""Benchmark für Import, Abfragen und Diagrammerstellung der Anwendung.
+
+Erzeugt synthetische Tabellen im Layout `index, date, time, value` (angelehnt an
+die 5-Minuten-Messwerte in `assets/csv data`), misst die zentralen Funktionen
+aus test.py gegen die lokale Datenbank (PostgreSQL oder DuckDB) und schreibt einen JSON- und
+Markdown-Bericht, der zwischen Commits verglichen werden kann.
+
+Start:
+    python benchmark.py --rows 100000 1000000 --repeat 3
+    python benchmark.py --rows 100000 --compare bench_results/benchmark_abc1234.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from database import get_table_version
+from storage import STORAGE_BACKEND, create_storage
+
+# Streamlit-Warnungen ("No runtime found") beim Aufruf außerhalb der App unterdrücken
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+import test as app  # noqa: E402
+
+BENCH_TABLE_PREFIX = '_bench_'
+DEFAULT_SIZES = [10 ** 5, 10 ** 6]
+START_TIMESTAMP = datetime(2024, 1, 1, 0, 57, 30)
+CADENCE_SECONDS = 300  # 5-Minuten-Takt wie in den Beispieldaten
+MAX_SPAN_SECONDS = 10 * 365 * 24 * 3600  # Zeitraum bleibt im datetime64-Bereich
+GENERATE_CHUNK_ROWS = 1_000_000
+INGEST_MAX_ROWS = 10 ** 6  # Größere Tabellen werden chunkweise per Massenimport befüllt
+QUERY_RANGE_DAYS = 7
+MULTI_TABLE_COUNT = 3
+
+DEFAULT_PLOT_OPTIONS = {
+    'line_type': 'lines',
+    'point_size': 6,
+    'line_width': 2,
+    'custom_colors': {},
+    'hide_anomalies': False,
+    'show_min': True,
+    'show_max': True,
+    'show_mean': True,
+    'show_median': False,
+    'show_std': False,
+    'show_percentiles': False,
+    'percentile_range': 25,
+    'show_trend': False,
+    'moving_average': False
+}
+
+
+def cadence_for(rows):
+    """Liefert den Messtakt in Sekunden; sehr große Tabellen werden verdichtet"""
+    return min(CADENCE_SECONDS, MAX_SPAN_SECONDS / rows)
+
+
+def generate_chunks(rows, seed=42, chunk_rows=GENERATE_CHUNK_ROWS):
+    """Erzeugt synthetische Messwerte als DataFrame-Chunks im Tabellenlayout
+
+    Die Werte bilden wie ein Undulator-Gap stückweise konstante Sollwerte mit
+    gelegentlichen Sprüngen und leichtem Rauschen nach.
+    """
+    rng = np.random.default_rng(seed)
+    cadence = cadence_for(rows)
+    level = 144.0
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        index = np.arange(start, start + n)
+        offsets = pd.to_timedelta(index * cadence, unit='s')
+        timestamps = pd.Timestamp(START_TIMESTAMP) + offsets
+
+        jumps = rng.random(n) < 0.002
+        steps = np.where(jumps, rng.normal(0, 20, n), 0.0)
+        values = level + np.cumsum(steps) + rng.normal(0, 0.01, n)
+        level = float(values[-1])
+
+        yield pd.DataFrame({
+            'index': index.astype(str),
+            'date': timestamps.strftime('%Y-%m-%d'),
+            'time': timestamps.strftime('%H:%M:%S'),
+            'value': np.round(values, 6).astype(str)
+        })
+
+
+def to_upload_csv(df):
+    """Wandelt einen Chunk in das Format der hochgeladenen CSV-Dateien um"""
+    timestamps = df['date'] + ' ' + df['time']
+    lines = df['index'] + ' , ' + timestamps + ', ' + df['value']
+    return ('\n'.join(lines) + '\n').encode()
+
+
+class UploadedFile(io.BytesIO):
+    """Minimaler Ersatz für das UploadedFile-Objekt von st.file_uploader"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def create_bench_table(storage, table_name):
+    """Legt eine leere Benchmark-Tabelle im Layout der Anwendung an"""
+    storage.drop_table(table_name)
+    storage.create_table(table_name)
+
+
+def measure(func, repeat):
+    """Führt eine Funktion mehrfach aus und liefert Laufzeiten und letztes Ergebnis"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        durations.append(time.perf_counter() - started)
+    return durations, result
+
+
+def summarize(durations, rows=None):
+    """Verdichtet Messwerte zu einem Berichtseintrag"""
+    entry = {
+        'median_s': statistics.median(durations),
+        'min_s': min(durations),
+        'max_s': max(durations),
+        'runs': len(durations)
+    }
+    if rows is not None:
+        entry['rows'] = int(rows)
+    return entry
+
+
+def bench_ingest(storage, table_name, rows, repeat):
+    """Misst process_csv_data + Insert bzw. den chunkweisen Massenimport großer Tabellen"""
+    results = {}
+    if rows <= INGEST_MAX_ROWS:
+        chunk = next(generate_chunks(rows, chunk_rows=rows))
+        uploaded = UploadedFile(to_upload_csv(chunk), f"{table_name}.csv")
+
+        def ingest():
+            create_bench_table(storage, table_name)
+            uploaded.seek(0)
+            df = app.process_csv_data(uploaded)
+            with storage.engine.begin() as conn:
+                storage.insert_measurements(conn, table_name, df)
+            return df
+
+        durations, _ = measure(ingest, repeat)
+        results['ingest'] = summarize(durations, rows)
+    else:
+        create_bench_table(storage, table_name)
+        started = time.perf_counter()
+        for chunk in generate_chunks(rows):
+            with storage.engine.begin() as conn:
+                storage.insert_measurements(conn, table_name, chunk)
+        results['bulk_load'] = summarize([time.perf_counter() - started], rows)
+
+    with storage.engine.begin() as conn:
+        conn.execute(text(f"ANALYZE {table_name}"))
+    return results
+
+
+def bench_queries(storage, table_name, rows, repeat):
+    """Misst Vorschau, Diagrammdaten, Suche und Diagrammerstellung"""
+    results = {}
+    start_date = START_TIMESTAMP.date()
+    end_date = start_date + timedelta(days=QUERY_RANGE_DAYS - 1)
+    start_str, end_str = start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+    version = get_table_version(storage.engine, table_name)
+
+    def preview():
+        app.load_preview_data.clear()
+        return app.load_preview_data(storage, table_name, version)
+
+    durations, _ = measure(preview, repeat)
+    results['load_preview_data'] = summarize(durations)
+
+    def chart_data():
+        app.get_chart_data.clear()
+        return app.get_chart_data(storage, table_name, start_str, end_str, version)
+
+    durations, chart_df = measure(chart_data, repeat)
+    results['get_chart_data'] = summarize(durations, len(chart_df))
+
+    durations, found = measure(
+        lambda: app.search_data_points(storage, table_name, {'date': start_str}),
+        repeat
+    )
+    results['search_data_points'] = summarize(durations, len(found))
+
+    durations, _ = measure(
+        lambda: app.create_visualization(chart_df, table_name, DEFAULT_PLOT_OPTIONS),
+        repeat
+    )
+    results['create_visualization'] = summarize(durations, len(chart_df))
+
+    dfs_dict = {f"{table_name}_{i}": chart_df for i in range(MULTI_TABLE_COUNT)}
+    durations, _ = measure(
+        lambda: app.create_multi_table_visualization(dfs_dict, DEFAULT_PLOT_OPTIONS),
+        repeat
+    )
+    results['create_multi_table_visualization'] = summarize(durations, len(chart_df) * MULTI_TABLE_COUNT)
+    return results
+
+
+def git_commit():
+    """Liefert den aktuellen Commit-Hash (oder 'unknown')"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def render_markdown(report, baseline=None):
+    """Erstellt eine Markdown-Tabelle, optional mit Vergleich zu einem früheren Bericht"""
+    lines = [
+        f"# Benchmark {report['commit']} ({report['created_at']})",
+        "",
+        "| Zeilen | Messung | Median [s] | Min [s] | Zeilen im Ergebnis |" + (" Δ zu Basis |" if baseline else ""),
+        "|---:|---|---:|---:|---:|" + ("---:|" if baseline else "")
+    ]
+    for size, operations in report['results'].items():
+        for name, entry in operations.items():
+            row = (
+                f"| {int(size):,} | {name} | {entry['median_s']:.4f} | {entry['min_s']:.4f} "
+                f"| {entry.get('rows', '')} |"
+            )
+            if baseline:
+                previous = baseline.get('results', {}).get(size, {}).get(name)
+                if previous and previous['median_s'] > 0:
+                    change = (entry['median_s'] / previous['median_s'] - 1) * 100
+                    row += f" {change:+.1f} % |"
+                else:
+                    row += " – |"
+            lines.append(row)
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für Import, Abfragen und Diagramme")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Tabellengrößen (z.B. 100000 1000000 100000000)")
+    parser.add_argument('--repeat', type=int, default=3, help="Wiederholungen pro Messung")
+    parser.add_argument('--output-dir', default='bench_results', help="Zielverzeichnis für die Berichte")
+    parser.add_argument('--compare', help="Früherer JSON-Bericht für den Vergleich")
+    parser.add_argument('--keep-tables', action='store_true', help="Benchmark-Tabellen nicht löschen")
+    parser.add_argument('--backend', default=STORAGE_BACKEND, choices=['postgresql', 'duckdb'],
+                        help="Storage-Backend")
+    args = parser.parse_args()
+
+    storage = create_storage(args.backend)
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'pandas': pd.__version__,
+        'results': {}
+    }
+
+    for rows in args.rows:
+        table_name = f"{BENCH_TABLE_PREFIX}{rows}"
+        print(f"Benchmark mit {rows:,} Zeilen ({table_name}) ...")
+        results = bench_ingest(storage, table_name, rows, args.repeat)
+        results.update(bench_queries(storage, table_name, rows, args.repeat))
+        report['results'][str(rows)] = results
+        if not args.keep_tables:
+            storage.drop_table(table_name)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    base_path = os.path.join(args.output_dir, f"benchmark_{report['commit']}_{args.backend}")
+    with open(f"{base_path}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    markdown = render_markdown(report, baseline)
+    with open(f"{base_path}.md", 'w') as f:
+        f.write(markdown)
+    print(markdown)
+    print(f"Bericht gespeichert: {base_path}.json / {base_path}.md")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,324 @@
+"""Tabellenkatalog: Namensräume, Tags und Suche über eine indizierte Metadatentabelle.
+
+Statt bei jedem Durchlauf alle Tabellennamen über den Inspector zu lesen,
+führt die Speicherschicht beim Anlegen und Löschen einen Katalog
+(_catalog, _catalog_tags) in derselben Transaktion mit. Die Suche (Präfix
+oder unscharf als Teilfolge der Zeichen), das Filtern nach Namensraum oder
+Tag und das seitenweise Blättern laufen als einzelne Abfrage auf dem Katalog
+und bleiben auch bei mehr als 10.000 Tabellen schnell.
+
+Der Namensraum ist standardmäßig der Teil des Namens vor dem ersten '_'
+(z.B. 'bl1' für 'bl1_gap_set') und kann überschrieben werden.
+
+Start:
+    python catalog.py --sync                           # Katalog mit der Datenbank abgleichen
+    python catalog.py --search gap --namespace bl1
+    python catalog.py --tag bl1_gap_set=beamline1,undulator
+"""
+import argparse
+
+import pandas as pd
+from sqlalchemy import text
+
+from database import bump_table_version, get_table_version, is_meta_table, validate_table_name
+
+CATALOG_TABLE = '_catalog'
+CATALOG_TAGS_TABLE = '_catalog_tags'
+CATALOG_PAGE_SIZE = 50
+MEASUREMENT_COLUMNS = ('index', 'date', 'time', 'value')
+LIKE_ESCAPE = '!'
+
+
+def ensure_catalog_tables(conn):
+    """Legt Katalog- und Tag-Tabelle samt Suchindizes an (einmal beim Erstellen des Storage-Backends)"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            search_name TEXT NOT NULL,
+            namespace TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {CATALOG_TAGS_TABLE} (
+            table_name TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            PRIMARY KEY (table_name, tag)
+        )
+    """))
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {CATALOG_TAGS_TABLE}_tag ON {CATALOG_TAGS_TABLE} (tag)"))
+    if conn.dialect.name == 'postgresql':
+        # Präfixsuche (LIKE 'abc%') über einen B-Baum unabhängig von der Sortierfolge
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {CATALOG_TABLE}_search ON {CATALOG_TABLE} (search_name text_pattern_ops)"
+        ))
+        conn.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {CATALOG_TABLE}_namespace ON {CATALOG_TABLE} (namespace, search_name)"
+        ))
+
+
+def default_namespace(table_name):
+    """Namensraum aus dem Tabellennamen: Teil vor dem ersten '_' (sonst leer)"""
+    prefix, separator, _ = table_name.partition('_')
+    return prefix.lower() if separator and prefix else ''
+
+
+def normalize_tags(tags):
+    """Tags als sortierte Liste ohne Leerzeichen und Duplikate (kleingeschrieben)"""
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    return sorted({tag.strip().lower() for tag in tags if tag and tag.strip()})
+
+
+def catalog_entry(table_name, kind='measurements', namespace=None):
+    """Parameter einer Katalogzeile"""
+    return {
+        'table_name': table_name,
+        'search_name': table_name.lower(),
+        'namespace': default_namespace(table_name) if namespace is None else namespace,
+        'kind': kind
+    }
+
+
+def register_table(conn, table_name, kind='measurements', namespace=None):
+    """Trägt eine Tabelle in der Transaktion des Aufrufers in den Katalog ein"""
+    validate_table_name(table_name)
+    ensure_catalog_tables(conn)
+    conn.execute(text(f"""
+        INSERT INTO {CATALOG_TABLE} (table_name, search_name, namespace, kind)
+        VALUES (:table_name, :search_name, :namespace, :kind)
+        ON CONFLICT (table_name) DO UPDATE SET kind = excluded.kind
+    """), catalog_entry(table_name, kind, namespace))
+    bump_table_version(conn, CATALOG_TABLE)
+
+
+def unregister_table(conn, table_name):
+    """Entfernt eine Tabelle samt Tags aus dem Katalog"""
+    ensure_catalog_tables(conn)
+    params = {'table_name': table_name}
+    conn.execute(text(f"DELETE FROM {CATALOG_TAGS_TABLE} WHERE table_name = :table_name"), params)
+    conn.execute(text(f"DELETE FROM {CATALOG_TABLE} WHERE table_name = :table_name"), params)
+    bump_table_version(conn, CATALOG_TABLE)
+
+
+def catalog_version(engine):
+    """Version des Katalogs (Teil der Cache-Schlüssel für Suchergebnisse)"""
+    return get_table_version(engine, CATALOG_TABLE)
+
+
+def sync_catalog(engine):
+    """Gleicht den Katalog mit den vorhandenen Tabellen ab; liefert (neu, entfernt)
+
+    Liest Tabellen und Spalten mit je einer Abfrage auf information_schema, damit
+    auch bei vielen Tabellen keine Abfrage pro Tabelle nötig ist.
+    """
+    with engine.begin() as conn:
+        ensure_catalog_tables(conn)
+        existing = {
+            row[0] for row in conn.execute(text("""
+                SELECT table_name FROM information_schema.tables WHERE table_schema = current_schema()
+            """))
+        }
+        measurement_tables = {
+            row[0] for row in conn.execute(text(f"""
+                SELECT table_name FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                  AND column_name IN ({', '.join(f"'{column}'" for column in MEASUREMENT_COLUMNS)})
+                GROUP BY table_name
+                HAVING COUNT(DISTINCT column_name) = {len(MEASUREMENT_COLUMNS)}
+            """))
+        }
+        catalogued = {row[0] for row in conn.execute(text(f"SELECT table_name FROM {CATALOG_TABLE}"))}
+
+        tables = {name for name in existing if not is_meta_table(name)}
+        added = sorted(tables - catalogued)
+        removed = sorted(catalogued - tables)
+        if added:
+            conn.execute(text(f"""
+                INSERT INTO {CATALOG_TABLE} (table_name, search_name, namespace, kind)
+                VALUES (:table_name, :search_name, :namespace, :kind)
+            """), [
+                catalog_entry(name, 'measurements' if name in measurement_tables else 'wide') for name in added
+            ])
+        for table_name in removed:
+            conn.execute(text(f"DELETE FROM {CATALOG_TAGS_TABLE} WHERE table_name = :table_name"),
+                         {'table_name': table_name})
+            conn.execute(text(f"DELETE FROM {CATALOG_TABLE} WHERE table_name = :table_name"),
+                         {'table_name': table_name})
+        if added or removed:
+            bump_table_version(conn, CATALOG_TABLE)
+    return added, removed
+
+
+def escape_like(value):
+    """Maskiert LIKE-Platzhalter ('_' kommt in fast jedem Tabellennamen vor)"""
+    return ''.join(LIKE_ESCAPE + ch if ch in '%_' + LIKE_ESCAPE else ch for ch in value.lower())
+
+
+def subsequence_pattern(query):
+    """LIKE-Muster für die unscharfe Suche: alle Zeichen in dieser Reihenfolge"""
+    return '%' + '%'.join(escape_like(ch) for ch in query) + '%'
+
+
+def search_tables(engine, query='', namespace=None, tag=None, kind='measurements',
+                  limit=CATALOG_PAGE_SIZE, offset=0):
+    """Sucht Tabellen im Katalog; liefert (DataFrame table_name/namespace/kind/tags, Gesamtzahl)
+
+    Treffer mit passendem Präfix stehen vor Teilstring- und unscharfen Treffern.
+    """
+    conditions = []
+    params = {'limit': limit, 'offset': offset}
+    if kind:
+        conditions.append("c.kind = :kind")
+        params['kind'] = kind
+    if namespace is not None:
+        conditions.append("c.namespace = :namespace")
+        params['namespace'] = namespace
+    if tag:
+        conditions.append(
+            f"EXISTS (SELECT 1 FROM {CATALOG_TAGS_TABLE} t WHERE t.table_name = c.table_name AND t.tag = :tag)"
+        )
+        params['tag'] = tag.lower()
+    rank = "0"
+    query = (query or '').strip()
+    if query:
+        conditions.append(f"c.search_name LIKE :fuzzy ESCAPE '{LIKE_ESCAPE}'")
+        params['fuzzy'] = subsequence_pattern(query)
+        params['prefix'] = escape_like(query) + '%'
+        params['contains'] = '%' + escape_like(query) + '%'
+        rank = (
+            f"CASE WHEN c.search_name LIKE :prefix ESCAPE '{LIKE_ESCAPE}' THEN 0 "
+            f"WHEN c.search_name LIKE :contains ESCAPE '{LIKE_ESCAPE}' THEN 1 ELSE 2 END"
+        )
+
+    with engine.connect() as conn:
+        page = pd.read_sql(text(f"""
+            SELECT c.table_name, c.namespace, c.kind, COUNT(*) OVER () as total, {rank} as rank
+            FROM {CATALOG_TABLE} c
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY rank, length(c.search_name), c.search_name
+            LIMIT :limit OFFSET :offset
+        """), conn, params=params)
+        total = int(page['total'].iloc[0]) if not page.empty else 0
+        if not page.empty:
+            tags = pd.read_sql(
+                text(f"""
+                    SELECT table_name, tag FROM {CATALOG_TAGS_TABLE}
+                    WHERE table_name IN ({', '.join(f':name{i}' for i in range(len(page)))})
+                    ORDER BY tag
+                """),
+                conn,
+                params={f'name{i}': name for i, name in enumerate(page['table_name'])}
+            )
+        else:
+            tags = pd.DataFrame(columns=['table_name', 'tag'])
+
+    page['tags'] = page['table_name'].map(tags.groupby('table_name')['tag'].agg(', '.join)).fillna('')
+    return page[['table_name', 'namespace', 'kind', 'tags']], total
+
+
+def table_entry(engine, table_name):
+    """Katalogeintrag einer Tabelle (namespace, kind, tags) oder None"""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text(f"SELECT namespace, kind FROM {CATALOG_TABLE} WHERE table_name = :table_name"),
+            {'table_name': table_name}
+        ).first()
+        if row is None:
+            return None
+        tags = [r[0] for r in conn.execute(
+            text(f"SELECT tag FROM {CATALOG_TAGS_TABLE} WHERE table_name = :table_name ORDER BY tag"),
+            {'table_name': table_name}
+        )]
+    return {'namespace': row[0], 'kind': row[1], 'tags': tags}
+
+
+def table_exists(engine, table_name, kind=None):
+    """Prüft über den Primärschlüssel des Katalogs, ob eine Tabelle existiert"""
+    entry = table_entry(engine, table_name)
+    return entry is not None and (kind is None or entry['kind'] == kind)
+
+
+def list_namespaces(engine, kind='measurements'):
+    """Namensräume mit Anzahl der Tabellen"""
+    with engine.connect() as conn:
+        return pd.read_sql(text(f"""
+            SELECT namespace, COUNT(*) as tables FROM {CATALOG_TABLE}
+            WHERE kind = :kind GROUP BY namespace ORDER BY namespace
+        """), conn, params={'kind': kind})
+
+
+def list_tags(engine):
+    """Vergebene Tags mit Anzahl der Tabellen"""
+    with engine.connect() as conn:
+        return pd.read_sql(text(f"""
+            SELECT tag, COUNT(*) as tables FROM {CATALOG_TAGS_TABLE} GROUP BY tag ORDER BY tag
+        """), conn)
+
+
+def set_tags(engine, table_name, tags):
+    """Ersetzt die Tags einer Tabelle"""
+    validate_table_name(table_name)
+    tags = normalize_tags(tags)
+    with engine.begin() as conn:
+        ensure_catalog_tables(conn)
+        conn.execute(text(f"DELETE FROM {CATALOG_TAGS_TABLE} WHERE table_name = :table_name"),
+                     {'table_name': table_name})
+        if tags:
+            conn.execute(
+                text(f"INSERT INTO {CATALOG_TAGS_TABLE} (table_name, tag) VALUES (:table_name, :tag)"),
+                [{'table_name': table_name, 'tag': tag} for tag in tags]
+            )
+        bump_table_version(conn, CATALOG_TABLE)
+    return tags
+
+
+def set_namespace(engine, table_name, namespace):
+    """Ordnet eine Tabelle einem Namensraum zu"""
+    validate_table_name(table_name)
+    with engine.begin() as conn:
+        ensure_catalog_tables(conn)
+        conn.execute(
+            text(f"UPDATE {CATALOG_TABLE} SET namespace = :namespace WHERE table_name = :table_name"),
+            {'table_name': table_name, 'namespace': namespace.strip().lower()}
+        )
+        bump_table_version(conn, CATALOG_TABLE)
+
+
+def parse_tag_argument(value):
+    """Wandelt 'tabelle=tag1,tag2' in (tabelle, [tags]) um"""
+    table_name, separator, tags = value.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Ungültige Angabe '{value}', erwartet tabelle=tag1,tag2")
+    return validate_table_name(table_name), normalize_tags(tags)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Tabellenkatalog durchsuchen und pflegen")
+    parser.add_argument('--sync', action='store_true', help="Katalog mit der Datenbank abgleichen")
+    parser.add_argument('--search', default='', help="Präfix oder unscharfer Suchbegriff")
+    parser.add_argument('--namespace', help="Nur dieser Namensraum")
+    parser.add_argument('--tag', action='append', type=parse_tag_argument, metavar='TABELLE=TAGS',
+                        help="Tags einer Tabelle setzen")
+    parser.add_argument('--limit', type=int, default=CATALOG_PAGE_SIZE, help="Treffer pro Seite")
+    args = parser.parse_args()
+
+    engine = create_storage().engine
+    if args.sync:
+        added, removed = sync_catalog(engine)
+        print(f"{len(added)} Tabelle(n) aufgenommen, {len(removed)} entfernt")
+    for table_name, tags in args.tag or []:
+        set_tags(engine, table_name, tags)
+        print(f"{table_name}: {', '.join(tags) or '(keine Tags)'}")
+    if args.sync or args.tag:
+        return
+    page, total = search_tables(engine, args.search, args.namespace, limit=args.limit)
+    print(page.to_string(index=False))
+    print(f"{len(page)} von {total:,} Treffern")
+
+
+if __name__ == '__main__':
+    main()
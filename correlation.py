@@ -0,0 +1,145 @@
+"""Korrelations- und Versatzanalyse zwischen mehreren Messreihen.
+
+Die Reihen werden auf ein gemeinsames Zeitraster im Überlappungsbereich
+gebracht (Mittelwert je Rasterzelle, Lücken linear interpoliert). Die
+Kreuzkorrelation aller Paare wird über die FFT in O(n log n) berechnet; die
+Spektren werden einmal pro Reihe bestimmt und die Paare blockweise als
+Matrixoperation ausgewertet.
+"""
+import numpy as np
+import pandas as pd
+
+MAX_GRID_POINTS = 4_000_000  # Obergrenze für die Länge des gemeinsamen Rasters
+PAIR_BATCH_BYTES = 256 * 1024 * 1024  # Speicher für gleichzeitig ausgewertete Paare
+
+
+def sampling_interval(timestamps):
+    """Median-Abstand aufeinanderfolgender Zeitstempel in Sekunden"""
+    steps = np.diff(timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64))
+    steps = steps[steps > 0]
+    return float(np.median(steps)) / 1e9 if len(steps) else None
+
+
+def align_frames(dfs_dict, resolution=None):
+    """Bringt die Reihen auf ein gemeinsames Raster im Überlappungsbereich
+
+    Liefert (Tabellennamen, Matrix k × n, Auflösung in Sekunden, Rasterbeginn).
+    Ohne resolution wird das größte Messintervall der Reihen verwendet.
+    """
+    series = {}
+    for table, df in dfs_dict.items():
+        valid = df['timestamp'].notna() & df['value'].notna()
+        if valid.sum() >= 2:
+            series[table] = df.loc[valid].sort_values('timestamp')
+    if len(series) < 2:
+        raise ValueError("Für die Analyse werden mindestens zwei Tabellen mit Messwerten benötigt")
+
+    start = max(df['timestamp'].iloc[0] for df in series.values())
+    end = min(df['timestamp'].iloc[-1] for df in series.values())
+    if end <= start:
+        raise ValueError("Die ausgewählten Tabellen überlappen sich zeitlich nicht")
+    span = (end - start).total_seconds()
+
+    if resolution is None:
+        intervals = [sampling_interval(df['timestamp']) for df in series.values()]
+        resolution = max(interval for interval in intervals if interval) if any(intervals) else 1.0
+    resolution = max(resolution, span / MAX_GRID_POINTS)
+    n = int(span // resolution) + 1
+
+    origin = start.to_datetime64().astype('datetime64[ns]').astype(np.int64)
+    matrix = np.empty((len(series), n))
+    grid = np.arange(n)
+    for row, df in enumerate(series.values()):
+        offsets = (df['timestamp'].to_numpy(dtype='datetime64[ns]').astype(np.int64) - origin) / 1e9
+        cells = np.floor(offsets / resolution).astype(np.int64)
+        inside = (cells >= 0) & (cells < n)
+        cells = cells[inside]
+        values = df['value'].to_numpy(dtype=np.float64)[inside]
+        counts = np.bincount(cells, minlength=n)
+        sums = np.bincount(cells, weights=values, minlength=n)
+        filled = counts > 0
+        if filled.sum() < 2:
+            raise ValueError(f"Zu wenige Messwerte im Überlappungsbereich: {list(series)[row]}")
+        matrix[row] = np.interp(grid, grid[filled], sums[filled] / counts[filled])
+    return list(series), matrix, resolution, start
+
+
+def estimate_bytes(table_count, points):
+    """Obergrenze des Speicherbedarfs der Analyse (Raster, Spektren, ein Paarblock)"""
+    points = min(points, MAX_GRID_POINTS)
+    nfft = 1 << int(2 * points - 1).bit_length()
+    pairs = table_count * (table_count - 1) // 2
+    batch_bytes = min(PAIR_BATCH_BYTES, max(1, pairs) * nfft * 16)
+    return table_count * points * 8 * 2 + table_count * (nfft // 2 + 1) * 16 + batch_bytes
+
+
+def standardize(matrix):
+    """Mittelwertfrei und auf Standardabweichung 1 skaliert (konstante Reihen werden 0)"""
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    std = centered.std(axis=1, keepdims=True)
+    return np.divide(centered, std, out=np.zeros_like(centered), where=std > 0)
+
+
+def cross_correlation_lags(matrix, max_lag):
+    """Bester Versatz aller Paare über FFT-Kreuzkorrelation
+
+    Liefert (Versatz-Matrix in Rasterschritten, Korrelation beim besten Versatz).
+    Ein positiver Versatz lag[i, j] bedeutet: Reihe i folgt Reihe j um lag Schritte.
+    Gesucht wird das betragsgrößte Maximum im Bereich |lag| <= max_lag.
+    """
+    k, n = matrix.shape
+    max_lag = int(min(max_lag, n - 1))
+    z = standardize(matrix)
+    nfft = 1 << int(2 * n - 1).bit_length()
+    spectra = np.fft.rfft(z, n=nfft, axis=1)
+
+    # Versätze 0..max_lag stehen am Anfang, -max_lag..-1 am Ende des Ergebnisses
+    lags = np.concatenate([np.arange(0, max_lag + 1), np.arange(-max_lag, 0)])
+    positions = lags % nfft
+
+    lag_matrix = np.zeros((k, k), dtype=np.int64)
+    peak_matrix = np.eye(k)
+    first, second = np.triu_indices(k, 1)
+    batch = max(1, PAIR_BATCH_BYTES // (nfft * 16))
+    for offset in range(0, len(first), batch):
+        i = first[offset:offset + batch]
+        j = second[offset:offset + batch]
+        correlations = np.fft.irfft(spectra[i] * np.conj(spectra[j]), n=nfft, axis=1)[:, positions] / n
+        best = np.abs(correlations).argmax(axis=1)
+        pair_lags = lags[best]
+        pair_peaks = correlations[np.arange(len(i)), best]
+        lag_matrix[i, j], lag_matrix[j, i] = pair_lags, -pair_lags
+        peak_matrix[i, j] = peak_matrix[j, i] = pair_peaks
+    return lag_matrix, peak_matrix
+
+
+def lag_analysis(dfs_dict, max_lag_seconds, resolution=None):
+    """Korrelationsmatrix, bester Versatz und Spitzenkorrelation für alle Tabellenpaare
+
+    Liefert ein Dict mit den Matrizen als DataFrames ('correlation', 'lag_seconds',
+    'peak'), einer Paarliste ('pairs') sowie Auflösung und Rasterlänge.
+    """
+    tables, matrix, resolution, start = align_frames(dfs_dict, resolution)
+    correlation = np.corrcoef(standardize(matrix))
+    correlation[~np.isfinite(correlation)] = 0.0
+    lag_steps, peak = cross_correlation_lags(matrix, max_lag_seconds / resolution)
+    lag_seconds = lag_steps * resolution
+
+    first, second = np.triu_indices(len(tables), 1)
+    pairs = pd.DataFrame({
+        'Tabelle A': np.array(tables)[first],
+        'Tabelle B': np.array(tables)[second],
+        'Korrelation': correlation[first, second],
+        'Versatz (s)': lag_seconds[first, second],
+        'Korrelation bei Versatz': peak[first, second]
+    }).sort_values('Korrelation bei Versatz', key=np.abs, ascending=False, ignore_index=True)
+
+    return {
+        'correlation': pd.DataFrame(correlation, index=tables, columns=tables),
+        'lag_seconds': pd.DataFrame(lag_seconds, index=tables, columns=tables),
+        'peak': pd.DataFrame(peak, index=tables, columns=tables),
+        'pairs': pairs,
+        'resolution': resolution,
+        'points': matrix.shape[1],
+        'start': start
+    }
@@ -0,0 +1,419 @@
+"""HTTP-Datenschnittstelle für Skripte und das Chart.js-Frontend (ersetzt getData.php).
+
+Endpunkte (alle GET, Datumsangaben im Format YYYY-MM-DD):
+    /api/tables?q=&namespace=&tag=&limit=&offset= Messwerttabellen aus dem Katalog (seitenweise)
+    /api/range?table=&start=&end=                 Rohdaten eines Zeitraums
+    /api/aggregate?table=&start=&end=&interval=&function=
+                                                  Verdichtung (avg/min/max/sum/count) pro Intervall in Sekunden
+    /api/multi?tables=a,b&start=&end=             Rohdaten mehrerer Tabellen
+    /api/distribution?tables=a,b&start=&end=&bins=
+                                                  Kennzahlen, Perzentile und Histogramm (in der Datenbank berechnet)
+
+Ergebnisse werden chunkweise gestreamt (Transfer-Encoding: chunked), als JSON oder
+mit format=arrow als Arrow-IPC-Stream. range, multi und distribution lassen mit
+anomalies=exclude die beim Import markierten Anomalien weg. Unterstützt gzip sowie ETag/If-None-Match
+auf Basis der Tabellenversionen. Die Datenbankverbindungen kommen aus dem Pool
+der Storage-Engine.
+
+Start:
+    python data_api.py --port 8502
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import zlib
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import distribution
+from catalog import search_tables, sync_catalog, table_exists
+from database import get_table_version, validate_table_name
+from storage import AGGREGATE_FUNCTIONS, STREAM_CHUNK_SIZE, create_storage, measurement_schema
+
+API_HOST = '127.0.0.1'
+API_PORT = 8502
+MAX_TABLES_PER_REQUEST = 20
+TABLE_LIST_MAX = 1000  # Treffer pro Seite in /api/tables
+ARROW_MIME_TYPE = 'application/vnd.apache.arrow.stream'
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_FILES = {
+    '/': ('index.html', 'text/html; charset=utf-8'),
+    '/index.html': ('index.html', 'text/html; charset=utf-8'),
+    '/script.js': ('script.js', 'application/javascript; charset=utf-8'),
+    '/styles.css': ('styles.css', 'text/css; charset=utf-8')
+}
+
+logger = logging.getLogger('data_api')
+
+
+class ApiError(Exception):
+    """Fehler mit HTTP-Statuscode, der als JSON an den Client geht"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ChunkedWriter:
+    """Schreibt den Antwortkörper als HTTP-Chunks, optional gzip-komprimiert"""
+
+    def __init__(self, wfile, compress=False):
+        self.wfile = wfile
+        self.compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def _send(self, data):
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        if self.compressor:
+            data = self.compressor.compress(data)
+        self._send(bytes(data))
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+    def close(self):
+        if self.compressor:
+            self._send(self.compressor.flush())
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    @property
+    def closed(self):
+        return False
+
+
+def parse_date(value, name):
+    """Prüft ein Datum im Format YYYY-MM-DD"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Parameter '{name}' muss ein Datum im Format YYYY-MM-DD sein")
+
+
+def frame_to_json_rows(df):
+    """Serialisiert einen Chunk als kommagetrennte JSON-Objekte (ohne Klammern)"""
+    return df.to_json(orient='records', date_format='iso')[1:-1]
+
+
+class DataApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    storage = None
+
+    # Hilfsfunktionen
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def require_table(self, name):
+        validate_table_name(name)
+        if not table_exists(self.storage.read_engine, name, kind='measurements'):
+            raise ApiError(404, f"Tabelle '{name}' nicht gefunden")
+        return name
+
+    def date_range(self, params):
+        # 'date' entspricht dem Parameter der bisherigen getData.php
+        start = params.get('start') or params.get('date')
+        end = params.get('end') or start
+        return parse_date(start, 'start'), parse_date(end, 'end')
+
+    def wants_arrow(self, params):
+        return params.get('format') == 'arrow' or ARROW_MIME_TYPE in self.headers.get('Accept', '')
+
+    def excludes_anomalies(self, params):
+        anomalies = params.get('anomalies', 'include')
+        if anomalies not in ('include', 'exclude'):
+            raise ApiError(400, "Parameter 'anomalies' muss 'include' oder 'exclude' sein")
+        return anomalies == 'exclude'
+
+    def check_etag(self, params, tables):
+        """Liefert das ETag der Anfrage oder None, wenn der Client bereits aktuell ist (304)"""
+        versions = [f"{table}:{get_table_version(self.storage.read_engine, table)}" for table in tables]
+        key = json.dumps([urlparse(self.path).path, sorted(params.items()), versions])
+        etag = f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+        if etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return None
+        return etag
+
+    def start_stream(self, content_type, etag=None):
+        """Sendet die Header einer gestreamten Antwort und liefert den Writer"""
+        compress = 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Cache-Control', 'no-cache')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Vary', 'Accept-Encoding')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self._streaming = True
+        return ChunkedWriter(self.wfile, compress)
+
+    def send_json(self, payload, status=200, etag=None):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_arrow(self, batches, etag, with_table=False):
+        """Schreibt Arrow-RecordBatches direkt aus dem Datenbank-Stream als Arrow-IPC-Stream"""
+        import pyarrow as pa
+
+        schema = measurement_schema()
+        if with_table:
+            schema = schema.insert(0, pa.field('table', pa.string()))
+        writer = self.start_stream(ARROW_MIME_TYPE, etag)
+        with pa.ipc.new_stream(writer, schema) as arrow_writer:
+            for batch in batches:
+                arrow_writer.write_batch(batch)
+        writer.close()
+
+    # Endpunkte
+
+    def handle_tables(self, params):
+        limit = min(int(params.get('limit', TABLE_LIST_MAX)), TABLE_LIST_MAX)
+        offset = int(params.get('offset', 0))
+        page, total = search_tables(
+            self.storage.read_engine, params.get('q', ''), params.get('namespace'), params.get('tag'),
+            limit=limit, offset=offset
+        )
+        self.send_json({
+            'status': 'success',
+            'tables': list(page['table_name']),
+            'items': page.to_dict(orient='records'),
+            'total': total,
+            'offset': offset
+        })
+
+    def handle_range(self, params):
+        table = self.require_table(params.get('table'))
+        start, end = self.date_range(params)
+        etag = self.check_etag(params, [table])
+        if etag is None:
+            return
+        chunk_size = int(params.get('chunk_size', STREAM_CHUNK_SIZE))
+        exclude = self.excludes_anomalies(params)
+        if self.wants_arrow(params):
+            self.stream_arrow(
+                self.storage.iter_batches(table, start, end, chunk_size, exclude_anomalies=exclude), etag
+            )
+            return
+        frames = self.storage.iter_range(table, start, end, chunk_size, exclude_anomalies=exclude)
+
+        writer = self.start_stream('application/json', etag)
+        writer.write(json.dumps({'status': 'success', 'table': table, 'start': start, 'end': end})[:-1])
+        writer.write(', "data": [')
+        rows = 0
+        for df in frames:
+            if df.empty:
+                continue
+            writer.write((',' if rows else '') + frame_to_json_rows(df.astype({'date': str, 'time': str})))
+            rows += len(df)
+        writer.write(f'], "rows": {rows}}}')
+        writer.close()
+
+    def handle_aggregate(self, params):
+        table = self.require_table(params.get('table'))
+        start, end = self.date_range(params)
+        function = params.get('function', 'avg')
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ApiError(400, f"Parameter 'function' muss einer von {', '.join(AGGREGATE_FUNCTIONS)} sein")
+        try:
+            interval = int(params.get('interval', 3600))
+        except ValueError:
+            raise ApiError(400, "Parameter 'interval' muss eine ganze Zahl (Sekunden) sein")
+        if interval <= 0:
+            raise ApiError(400, "Parameter 'interval' muss größer als 0 sein")
+        etag = self.check_etag(params, [table])
+        if etag is None:
+            return
+
+        df = self.storage.read_buckets(table, start, end, interval, function)
+        df['bucket'] = df['bucket'].astype(str)
+        if self.wants_arrow(params):
+            import pyarrow as pa
+
+            writer = self.start_stream(ARROW_MIME_TYPE, etag)
+            batch = pa.RecordBatch.from_pandas(df, preserve_index=False)
+            with pa.ipc.new_stream(writer, batch.schema) as arrow_writer:
+                arrow_writer.write_batch(batch)
+            writer.close()
+            return
+
+        writer = self.start_stream('application/json', etag)
+        writer.write(json.dumps({
+            'status': 'success',
+            'table': table,
+            'start': start,
+            'end': end,
+            'interval': interval,
+            'function': function,
+            'rows': len(df)
+        })[:-1])
+        writer.write(', "data": [' + (frame_to_json_rows(df) if not df.empty else '') + ']}')
+        writer.close()
+
+    def handle_multi(self, params):
+        names = [name for name in params.get('tables', '').split(',') if name]
+        if not names:
+            raise ApiError(400, "Parameter 'tables' fehlt")
+        if len(names) > MAX_TABLES_PER_REQUEST:
+            raise ApiError(400, f"Höchstens {MAX_TABLES_PER_REQUEST} Tabellen pro Anfrage")
+        tables = [self.require_table(name) for name in names]
+        start, end = self.date_range(params)
+        etag = self.check_etag(params, tables)
+        if etag is None:
+            return
+        exclude = self.excludes_anomalies(params)
+
+        if self.wants_arrow(params):
+            import pyarrow as pa
+
+            def batches():
+                for table in tables:
+                    for batch in self.storage.iter_batches(table, start, end, exclude_anomalies=exclude):
+                        yield batch.add_column(0, 'table', pa.array([table] * batch.num_rows, pa.string()))
+            self.stream_arrow(batches(), etag, with_table=True)
+            return
+
+        writer = self.start_stream('application/json', etag)
+        writer.write(json.dumps({'status': 'success', 'start': start, 'end': end})[:-1] + ', "data": {')
+        for position, table in enumerate(tables):
+            writer.write((',' if position else '') + json.dumps(table) + ': [')
+            rows = 0
+            for df in self.storage.iter_range(table, start, end, exclude_anomalies=exclude):
+                if df.empty:
+                    continue
+                writer.write((',' if rows else '') + frame_to_json_rows(df.astype({'date': str, 'time': str})))
+                rows += len(df)
+            writer.write(']')
+        writer.write('}}')
+        writer.close()
+
+    def handle_distribution(self, params):
+        names = [name for name in params.get('tables', params.get('table', '')).split(',') if name]
+        if not names:
+            raise ApiError(400, "Parameter 'tables' fehlt")
+        if len(names) > MAX_TABLES_PER_REQUEST:
+            raise ApiError(400, f"Höchstens {MAX_TABLES_PER_REQUEST} Tabellen pro Anfrage")
+        tables = [self.require_table(name) for name in names]
+        start, end = self.date_range(params)
+        try:
+            bins = int(params.get('bins', distribution.DEFAULT_BINS))
+        except ValueError:
+            raise ApiError(400, "Parameter 'bins' muss eine ganze Zahl sein")
+        if not 1 <= bins <= distribution.MAX_BINS:
+            raise ApiError(400, f"Parameter 'bins' muss zwischen 1 und {distribution.MAX_BINS} liegen")
+        exclude = self.excludes_anomalies(params)
+        etag = self.check_etag(params, tables)
+        if etag is None:
+            return
+
+        results = distribution.compare_distributions(self.storage, tables, start, end, bins, exclude)
+        first = next(iter(results.values()))['histogram']
+        self.send_json({
+            'status': 'success',
+            'start': start,
+            'end': end,
+            'bins': bins,
+            'edges': [*first['lower'], first['upper'].iloc[-1]],
+            'data': {
+                table: {
+                    'summary': result['summary'],
+                    'counts': result['histogram']['count'].tolist(),
+                    'below': result['below'],
+                    'above': result['above'],
+                    'approximate': result['approximate']
+                }
+                for table, result in results.items()
+            }
+        }, etag=etag)
+
+    def serve_static(self, path):
+        file_name, content_type = STATIC_FILES[path]
+        file_path = os.path.join(BASE_DIR, file_name)
+        if not os.path.exists(file_path):
+            raise ApiError(404, f"Datei '{file_name}' nicht gefunden")
+        with open(file_path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._streaming = False
+        parsed = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        routes = {
+            '/api/tables': self.handle_tables,
+            '/api/range': self.handle_range,
+            '/api/aggregate': self.handle_aggregate,
+            '/api/multi': self.handle_multi,
+            '/api/distribution': self.handle_distribution
+        }
+        try:
+            if parsed.path in STATIC_FILES:
+                self.serve_static(parsed.path)
+            elif parsed.path in routes:
+                routes[parsed.path](params)
+            else:
+                raise ApiError(404, f"Unbekannter Endpunkt '{parsed.path}'")
+        except (ApiError, ValueError) as e:
+            status = e.status if isinstance(e, ApiError) else 400
+            self.send_error_response(status, str(e))
+        except Exception as e:
+            logger.exception("Verarbeitungsfehler")
+            self.send_error_response(500, f"Verarbeitungsfehler: {e}")
+
+    def send_error_response(self, status, message):
+        if self._streaming:
+            # Header sind bereits gesendet: Verbindung abbrechen, damit der Client den Fehler bemerkt
+            self.close_connection = True
+            return
+        self.send_json({'status': 'error', 'error': message}, status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP-Datenschnittstelle für Messwerttabellen")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    DataApiHandler.storage = create_storage()
+    sync_catalog(DataApiHandler.storage.engine)
+    server = ThreadingHTTPServer((args.host, args.port), DataApiHandler)
+    logger.info("Datenschnittstelle läuft auf http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
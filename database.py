@@ -0,0 +1,85 @@
+"""Datenbankanbindung und gemeinsame Metadaten-Hilfsfunktionen.
+
+Wird sowohl von der Streamlit-Anwendung (test.py) als auch von den
+Hintergrunddiensten verwendet und importiert deshalb kein Streamlit.
+"""
+import re
+
+from sqlalchemy import create_engine, text
+
+# Verbesserte Konfigurationskonstanten
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'examdb',
+    'user': 'postgres',
+    'password': '123456',
+    'port': 5432  # Expliziter Port
+}
+
+# Interne Verwaltungstabellen beginnen mit diesem Präfix und werden in der
+# Tabellenauswahl der Anwendung ausgeblendet
+META_PREFIX = '_'
+TABLE_VERSIONS_TABLE = '_table_versions'
+
+TABLE_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def create_db_engine(config=DB_CONFIG, pool_size=5, max_overflow=10, **options):
+    """Erstellt eine SQLAlchemy-Engine mit Connection Pooling"""
+    return create_engine(
+        f'postgresql://{config["user"]}:{config["password"]}@{config["host"]}:{config["port"]}/{config["database"]}',
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=30,
+        pool_recycle=1800,  # Verbindungen nach 30 Minuten recyclen
+        **options
+    )
+
+
+def validate_table_name(table_name):
+    """Prüft einen Tabellennamen, bevor er in SQL eingesetzt wird"""
+    if not table_name or not TABLE_NAME_PATTERN.match(table_name):
+        raise ValueError(f"Ungültiger Tabellenname: '{table_name}'")
+    return table_name
+
+
+def is_meta_table(table_name):
+    """Gibt an, ob es sich um eine interne Verwaltungstabelle handelt"""
+    return table_name.startswith(META_PREFIX)
+
+
+def ensure_table_versions(conn):
+    """Legt die Versionstabelle an, falls sie noch nicht existiert"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def bump_table_version(conn, table_name):
+    """Erhöht die Datenversion einer Tabelle innerhalb der laufenden Transaktion"""
+    ensure_table_versions(conn)
+    conn.execute(text(f"""
+        INSERT INTO {TABLE_VERSIONS_TABLE} (table_name, version, updated_at)
+        VALUES (:table_name, 1, now())
+        ON CONFLICT (table_name)
+        DO UPDATE SET version = {TABLE_VERSIONS_TABLE}.version + 1, updated_at = now()
+    """), {'table_name': table_name})
+
+
+def get_table_version(engine, table_name):
+    """Liefert die aktuelle Datenversion einer Tabelle (0, wenn unbekannt)
+
+    Die Version wird bei jedem Schreibvorgang erhöht und dient als Teil der
+    Cache-Schlüssel, damit neue Daten ohne Warten auf die TTL sichtbar werden.
+    Die Versionstabelle legt das Storage-Backend beim Start an.
+    """
+    with engine.connect() as conn:
+        version = conn.execute(
+            text(f"SELECT version FROM {TABLE_VERSIONS_TABLE} WHERE table_name = :table_name"),
+            {'table_name': table_name}
+        ).scalar()
+    return version or 0
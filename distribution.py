@@ -0,0 +1,195 @@
+"""Werteverteilungen (Histogramm, Verteilungsfunktion, Boxplot) aus der Datenbank.
+
+Kennzahlen und Perzentile (percentile_cont) sowie die Klassenzählungen des
+Histogramms (width_bucket, bei DuckDB ein gleichwertiger Ausdruck) werden in der
+Datenbank berechnet; zum Client gelangen nur wenige hundert Zahlen pro Tabelle.
+Der Vergleich der Verteilungen von 20 Tabellen über ein Jahr überträgt damit
+Kilobytes statt der Rohdaten.
+
+    - Histogramm: Klassen gleicher Breite; beim Vergleich mehrerer Tabellen mit
+      gemeinsamen Grenzen, damit die Klassen übereinanderliegen
+    - Verteilungsfunktion: kumulierte Klassenzählungen
+    - Boxplot: Quartile aus percentile_cont, Whisker bis 1,5 × IQR (begrenzt auf Min/Max)
+
+Liegen archivierte Monate im Zeitraum, werden die Perzentile aus dem Histogramm
+interpoliert (approximate=True).
+
+Start:
+    python distribution.py --tables csv1 csv2 --start 2024-01-01 --end 2024-12-31 --bins 50
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from storage import SUMMARY_QUANTILES
+
+DEFAULT_BINS = 50
+MAX_BINS = 500
+MAX_COMPARE_TABLES = 20
+WHISKER_IQR = 1.5
+
+
+def quantile_key(q):
+    """Spaltenname eines Perzentils in value_summary (z.B. 0.25 → 'q25')"""
+    return f"q{round(q * 100):02d}"
+
+
+def value_bounds(summaries):
+    """Gemeinsame Histogrammgrenzen mehrerer Tabellen (Minimum und Maximum aller Werte)"""
+    filled = [summary for summary in summaries if summary['count']]
+    if not filled:
+        return 0.0, 1.0
+    lower = float(min(summary['min'] for summary in filled))
+    upper = float(max(summary['max'] for summary in filled))
+    if lower == upper:
+        # Konstante Reihe: eine Klasse um den Wert
+        lower, upper = lower - 0.5, upper + 0.5
+    return lower, upper
+
+
+def histogram_frame(counts, lower, upper, bins):
+    """Klassengrenzen und Zählungen der Klassen 1..bins; Werte außerhalb separat"""
+    edges = np.linspace(lower, upper, bins + 1)
+    counts = counts.set_index('bucket')['count'].reindex(range(bins + 2), fill_value=0)
+    histogram = pd.DataFrame({
+        'lower': edges[:-1],
+        'upper': edges[1:],
+        'count': counts.loc[1:bins].to_numpy()
+    })
+    return histogram, int(counts.loc[0]), int(counts.loc[bins + 1])
+
+
+def quantiles_from_histogram(histogram, quantiles):
+    """Perzentile durch lineare Interpolation innerhalb der Klassen"""
+    cumulative = histogram['count'].cumsum().to_numpy()
+    total = cumulative[-1] if len(cumulative) else 0
+    if not total:
+        return {quantile_key(q): None for q in quantiles}
+    result = {}
+    for q in quantiles:
+        position = int(np.searchsorted(cumulative, q * total))
+        position = min(position, len(cumulative) - 1)
+        before = cumulative[position - 1] if position else 0
+        share = (q * total - before) / max(cumulative[position] - before, 1)
+        row = histogram.iloc[position]
+        result[quantile_key(q)] = float(row['lower'] + share * (row['upper'] - row['lower']))
+    return result
+
+
+def table_distribution(storage, table_name, start_date, end_date, bins=DEFAULT_BINS, bounds=None,
+                       exclude_anomalies=False, summary=None):
+    """Kennzahlen und Histogramm einer Tabelle; bounds=(lower, upper) für gemeinsame Klassen"""
+    bins = int(min(max(bins, 1), MAX_BINS))
+    if summary is None:
+        summary = storage.value_summary(table_name, start_date, end_date, exclude_anomalies)
+    lower, upper = bounds or value_bounds([summary])
+    counts = storage.value_histogram(table_name, start_date, end_date, lower, upper, bins, exclude_anomalies)
+    histogram, below, above = histogram_frame(counts, lower, upper, bins)
+
+    approximate = any(summary.get(quantile_key(q)) is None for q in SUMMARY_QUANTILES) and summary['count'] > 0
+    if approximate:
+        summary = {**summary, **quantiles_from_histogram(histogram, SUMMARY_QUANTILES)}
+    return {
+        'table': table_name,
+        'summary': summary,
+        'histogram': histogram,
+        'below': below,
+        'above': above,
+        'approximate': approximate
+    }
+
+
+def compare_distributions(storage, tables, start_date, end_date, bins=DEFAULT_BINS, exclude_anomalies=False):
+    """Verteilungen mehrerer Tabellen mit gemeinsamen Histogrammgrenzen"""
+    if len(tables) > MAX_COMPARE_TABLES:
+        raise ValueError(f"Höchstens {MAX_COMPARE_TABLES} Tabellen pro Vergleich")
+    summaries = {
+        table: storage.value_summary(table, start_date, end_date, exclude_anomalies) for table in tables
+    }
+    bounds = value_bounds(summaries.values())
+    return {
+        table: table_distribution(
+            storage, table, start_date, end_date, bins, bounds, exclude_anomalies, summary=summaries[table]
+        )
+        for table in tables
+    }
+
+
+def cdf_frame(distribution):
+    """Empirische Verteilungsfunktion an den oberen Klassengrenzen (Anteil 0–1)"""
+    histogram = distribution['histogram']
+    total = distribution['summary']['count']
+    cumulative = distribution['below'] + histogram['count'].cumsum()
+    return pd.DataFrame({
+        'value': histogram['upper'],
+        'fraction': cumulative / total if total else 0.0
+    })
+
+
+def box_statistics(summary):
+    """Quartile und Whisker für einen vorberechneten Boxplot
+
+    Die Whisker reichen bis 1,5 × IQR, höchstens bis zum kleinsten bzw. größten
+    Wert (ohne Rohdaten ist der äußerste Wert innerhalb der Grenze nicht bekannt).
+    """
+    q1, median, q3 = summary['q25'], summary['q50'], summary['q75']
+    iqr = q3 - q1
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'lowerfence': max(summary['min'], q1 - WHISKER_IQR * iqr),
+        'upperfence': min(summary['max'], q3 + WHISKER_IQR * iqr),
+        'mean': summary['mean'],
+        'sd': summary['std']
+    }
+
+
+def summary_frame(distributions):
+    """Kennzahlen mehrerer Tabellen als Tabelle"""
+    rows = []
+    for table, distribution in distributions.items():
+        summary = distribution['summary']
+        rows.append({
+            'Tabelle': table,
+            'Anzahl': summary['count'],
+            'Min': summary['min'],
+            'P5': summary['q05'],
+            'Q1': summary['q25'],
+            'Median': summary['q50'],
+            'Q3': summary['q75'],
+            'P95': summary['q95'],
+            'Max': summary['max'],
+            'Mittelwert': summary['mean'],
+            'Std.-Abw.': summary['std'],
+            'geschätzt': distribution['approximate']
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Werteverteilung von Messwerttabellen (in der Datenbank berechnet)")
+    parser.add_argument('--tables', nargs='+', required=True)
+    parser.add_argument('--start', help="Startdatum YYYY-MM-DD (ohne: alle Daten)")
+    parser.add_argument('--end', help="Enddatum YYYY-MM-DD")
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS)
+    parser.add_argument('--exclude-anomalies', action='store_true')
+    args = parser.parse_args()
+
+    storage = create_storage()
+    distributions = compare_distributions(
+        storage, args.tables, args.start, args.end or args.start, args.bins, args.exclude_anomalies
+    )
+    print(summary_frame(distributions).to_string(index=False))
+    for table, distribution in distributions.items():
+        histogram = distribution['histogram']
+        print(f"\n{table}: {len(histogram)} Klassen von {histogram['lower'].iloc[0]:.6g} "
+              f"bis {histogram['upper'].iloc[-1]:.6g}")
+        print(' '.join(str(count) for count in histogram['count']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,329 @@
+"""Cache fertiger Diagramme (Plotly-Figur als JSON) für Standard- und häufig aufgerufene Ansichten.
+
+Der Schlüssel besteht aus Tabelle, Tabellenversion, Zeitraum, Auflösung (Grenze
+für die Verdichtung), Darstellungsoptionen und einer Prüfsumme des Codes, der
+die Figur erzeugt. Neue Daten oder ein geändertes Layout ergeben damit einen
+neuen Schlüssel; veraltete Einträge fallen aus dem LRU bzw. werden beim
+Aufwärmen aus dem Verzeichnis entfernt.
+
+    - Speicher: zuletzt genutzte Figuren als Dict (Zeitachsen als datetime64),
+      begrenzt auf FIGURE_CACHE_MB
+    - Verzeichnis FIGURE_CACHE_DIR: serialisierte Figuren als JSON, überdauern
+      Neustarts und werden von externen Aufwärmläufen befüllt
+    - Aufrufe je Tabelle werden in _chart_views gezählt (im Hintergrund); ein
+      Hintergrund-Thread wärmt für die meistgesehenen Tabellen die Standardansicht
+      der letzten belegten Tage vor
+
+Ein Treffer kommt ohne Datenbankabfrage, ohne pandas und ohne Neuaufbau der
+Figur aus.
+
+Start:
+    python figcache.py --warm --tables 10 --days 3    # Aufwärmen ins Verzeichnis (z.B. per cron)
+    python figcache.py --stats
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import plotly.io as pio
+from sqlalchemy import text
+
+from frames import MemoryBudget
+
+FIGURE_CACHE = os.environ.get('FIGURE_CACHE', '1') == '1'
+FIGURE_CACHE_MB = int(os.environ.get('FIGURE_CACHE_MB', 256))
+FIGURE_CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', 'data/figures')  # leer: nur im Speicher
+FIGURE_DISK_MB = int(os.environ.get('FIGURE_DISK_MB', 2048))
+WARM_TABLES = int(os.environ.get('FIGURE_WARM_TABLES', 10))  # meistgesehene Tabellen
+WARM_DAYS = int(os.environ.get('FIGURE_WARM_DAYS', 3))  # letzte belegte Tage je Tabelle
+WARM_INTERVAL = int(os.environ.get('FIGURE_WARM_INTERVAL', 600))  # Sekunden; 0: kein Hintergrund-Thread
+WARM_MEMORY_MB = int(os.environ.get('FIGURE_WARM_MEMORY_MB', 512))  # Speicherbudget des Aufwärmens
+VIEWS_TABLE = '_chart_views'
+
+logger = logging.getLogger('figcache')
+
+
+def ensure_views_table(conn):
+    """Legt die Tabelle der Diagrammaufrufe an (einmal beim Erstellen des Storage-Backends)"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {VIEWS_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            views BIGINT NOT NULL,
+            last_viewed TIMESTAMP NOT NULL
+        )
+    """))
+
+
+def most_viewed(engine, limit=WARM_TABLES):
+    """Die am häufigsten als Diagramm aufgerufenen Tabellen"""
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT table_name FROM {VIEWS_TABLE}
+            ORDER BY views DESC, last_viewed DESC
+            LIMIT :limit
+        """), {'limit': limit}).scalars()
+        return list(rows)
+
+
+def code_version(*functions):
+    """Prüfsumme des Quelltexts der Funktionen, die eine Figur erzeugen"""
+    source = ''.join(inspect.getsource(function) for function in functions)
+    return hashlib.sha1(source.encode()).hexdigest()[:12]
+
+
+def figure_key(table_name, version, start_date, end_date, resolution, options, code=''):
+    """Cache-Schlüssel einer Diagrammansicht"""
+    key = json.dumps([table_name, version, start_date, end_date, resolution, sorted(options.items()), code],
+                     default=str)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def restore_figure(figure):
+    """Wandelt die Zeitachsen einer geladenen Figur zurück in datetime64
+
+    Plotly kopiert die Daten jeder Figur; Listen mit Zehntausenden Zeitstempeln
+    kosten dabei ein Vielfaches eines numpy-Arrays.
+    """
+    for trace in figure.get('data', []):
+        values = trace.get('x')
+        if isinstance(values, list) and values and isinstance(values[0], str):
+            try:
+                trace['x'] = np.array(values, dtype='datetime64[us]')
+            except ValueError:
+                pass
+    return figure
+
+
+def figure_bytes(value):
+    """Geschätzter Speicherbedarf einer Figur als Dict"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(figure_bytes(item) for item in value.values()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(figure_bytes(item) for item in value) + 56
+    if isinstance(value, str):
+        return len(value) + 49
+    return 32
+
+
+class FigureCache:
+    """Zweistufiger Cache für Figuren: LRU im Speicher, JSON-Dateien im Verzeichnis"""
+
+    def __init__(self, max_bytes=FIGURE_CACHE_MB * 2 ** 20, directory=FIGURE_CACHE_DIR,
+                 disk_bytes=FIGURE_DISK_MB * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_bytes = disk_bytes
+        self.hits = self.disk_hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Serialisierung und Schreiben der Dateien verzögern die Anzeige nicht
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='figure-cache')
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """Liefert (Figur als Dict, Kennzahlen) oder None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry['figure'], entry['meta']
+        if self.directory and os.path.exists(self.path(key)):
+            try:
+                with open(self.path(key)) as f:
+                    stored = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Diagramm %s nicht lesbar: %s", key, e)
+            else:
+                figure = restore_figure(stored['figure'])
+                self._remember(key, figure, stored['meta'])
+                with self._lock:
+                    self.disk_hits += 1
+                return figure, stored['meta']
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def contains(self, key):
+        with self._lock:
+            if key in self._entries:
+                return True
+        return bool(self.directory) and os.path.exists(self.path(key))
+
+    def put(self, key, figure, meta):
+        """Speichert eine Figur; die Datei wird im Hintergrund geschrieben"""
+        figure = figure.to_dict()
+        self._remember(key, figure, meta)
+        if self.directory:
+            self._executor.submit(self._write, key, figure, meta)
+
+    def _remember(self, key, figure, meta):
+        size = figure_bytes(figure)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous['bytes']
+            self._entries[key] = {'figure': figure, 'meta': meta, 'bytes': size}
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted['bytes']
+
+    def _write(self, key, figure, meta):
+        try:
+            temporary = f"{self.path(key)}.{threading.get_ident()}.tmp"
+            with open(temporary, 'w') as f:
+                f.write(f'{{"meta": {json.dumps(meta, default=str)}, '
+                        f'"figure": {pio.to_json(figure, validate=False)}}}')
+            os.replace(temporary, self.path(key))
+        except OSError as e:
+            logger.error("Diagramm %s konnte nicht gespeichert werden: %s", key, e)
+
+    def prune(self):
+        """Löscht die ältesten Dateien, bis das Verzeichnis unter FIGURE_DISK_MB liegt"""
+        if not self.directory:
+            return 0
+        files = [
+            entry for entry in os.scandir(self.directory) if entry.is_file() and entry.name.endswith('.json')
+        ]
+        files.sort(key=lambda entry: entry.stat().st_atime, reverse=True)
+        total, removed = 0, 0
+        for entry in files:
+            total += entry.stat().st_size
+            if total > self.disk_bytes:
+                os.remove(entry.path)
+                removed += 1
+        return removed
+
+    def record_view(self, engine, table_name):
+        """Zählt einen Diagrammaufruf (im Hintergrund, ohne die Anzeige zu verzögern)"""
+        self._executor.submit(self._record_view, engine, table_name)
+
+    def _record_view(self, engine, table_name):
+        try:
+            with engine.begin() as conn:
+                ensure_views_table(conn)
+                conn.execute(text(f"""
+                    INSERT INTO {VIEWS_TABLE} (table_name, views, last_viewed)
+                    VALUES (:table_name, 1, CURRENT_TIMESTAMP)
+                    ON CONFLICT (table_name) DO UPDATE SET
+                        views = {VIEWS_TABLE}.views + 1,
+                        last_viewed = excluded.last_viewed
+                """), {'table_name': table_name})
+        except Exception as e:
+            logger.error("Aufruf von %s konnte nicht gezählt werden: %s", table_name, e)
+
+    def stats(self):
+        """Kennzahlen für die Admin-Ansicht"""
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        files = [entry for entry in os.scandir(self.directory)] if self.directory else []
+        return {
+            'entries': entries,
+            'memory_bytes': size,
+            'files': len(files),
+            'disk_bytes': sum(entry.stat().st_size for entry in files),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
+
+
+def warm_ranges(coverage, days=WARM_DAYS):
+    """Zeiträume zum Aufwärmen: die letzten belegten Tage einzeln (der letzte ist die Standardansicht)"""
+    if coverage.empty:
+        return []
+    recent = sorted(coverage['date'].unique(), reverse=True)[:days]
+    return [(day, day) for day in recent]
+
+
+def warm(storage, cache, render, limit=WARM_TABLES, days=WARM_DAYS, budget=None):
+    """Erzeugt fehlende Figuren der Standardansicht für die meistgesehenen Tabellen
+
+    render(storage, cache, table_name, start_date, end_date, budget) liefert True,
+    wenn die Figur neu erstellt wurde. Das Aufwärmen läuft ohne Streamlit-Sitzung
+    und reserviert geladene Frames gegen ein eigenes Speicherbudget.
+    """
+    from availability import load_coverage
+    from catalog import table_exists
+
+    budget = budget or MemoryBudget(WARM_MEMORY_MB * 2 ** 20)
+    built = 0
+    for table_name in most_viewed(storage.read_engine, limit):
+        if not table_exists(storage.read_engine, table_name, kind='measurements'):
+            continue
+        try:
+            for start_date, end_date in warm_ranges(load_coverage(storage, table_name), days):
+                built += bool(render(storage, cache, table_name, str(start_date), str(end_date), budget))
+        except Exception as e:
+            logger.error("Aufwärmen von %s fehlgeschlagen: %s", table_name, e)
+    cache.prune()
+    return built
+
+
+def start_warmer(storage, cache, render, interval=WARM_INTERVAL):
+    """Startet den Hintergrund-Thread, der den Cache regelmäßig aufwärmt"""
+    if not interval:
+        return None
+    budget = MemoryBudget(WARM_MEMORY_MB * 2 ** 20)
+
+    def loop():
+        while True:
+            started = time.perf_counter()
+            try:
+                built = warm(storage, cache, render, budget=budget)
+                logger.info("%d Diagramme aufgewärmt (%.1f s)", built, time.perf_counter() - started)
+            except Exception as e:
+                logger.error("Aufwärmen fehlgeschlagen: %s", e)
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name='figure-warmer', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagramm-Cache aufwärmen und auswerten")
+    parser.add_argument('--warm', action='store_true', help="Standardansichten der meistgesehenen Tabellen erzeugen")
+    parser.add_argument('--tables', type=int, default=WARM_TABLES, help="Anzahl der Tabellen")
+    parser.add_argument('--days', type=int, default=WARM_DAYS, help="Letzte belegte Tage je Tabelle")
+    parser.add_argument('--stats', action='store_true', help="Belegung des Verzeichnisses anzeigen")
+    args = parser.parse_args()
+
+    if not FIGURE_CACHE_DIR:
+        parser.error("FIGURE_CACHE_DIR ist leer; ohne Verzeichnis teilt ein externer Lauf nichts mit der App")
+    cache = FigureCache()
+    if args.warm:
+        # Streamlit-Warnungen ("No runtime found") beim Aufruf außerhalb der App unterdrücken
+        logging.getLogger('streamlit').setLevel(logging.ERROR)
+        import test as app
+        from storage import create_storage
+
+        started = time.perf_counter()
+        built = warm(create_storage(), cache, app.render_chart_figure, args.tables, args.days)
+        cache._executor.shutdown(wait=True)
+        print(f"{built} Diagramme erzeugt ({time.perf_counter() - started:.1f} s)")
+    if args.stats or not args.warm:
+        stats = cache.stats()
+        print(f"{stats['files']:,} Diagramme, {stats['disk_bytes'] / 2 ** 20:,.1f} MB in {FIGURE_CACHE_DIR}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Typisierte, speicherschonende DataFrames für Messwerte.
+
+Statt Text-Spalten (date, time, value als Strings) liefert der Ladepfad eine
+datetime64[ns]-Spalte 'timestamp', Messwerte als float64 (oder float32 über
+FRAME_VALUE_DTYPE) und den Index als int32 bzw. kategorisch. Die Spalten werden
+anhand der vorab ermittelten Zeilenzahl einmalig angelegt und chunkweise
+befüllt, sodass kein pd.concat und keine Zwischenkopie nötig ist.
+
+Ein MemoryBudget begrenzt den Speicher, den eine Sitzung für geladene Frames
+belegen darf, und wird vor dem Laden geprüft.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+FRAME_VALUE_DTYPE = os.environ.get('FRAME_VALUE_DTYPE', 'float64')
+SESSION_MEMORY_BUDGET_MB = int(os.environ.get('SESSION_MEMORY_MB', 1024))
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+INDEX_DTYPE = np.int32
+
+
+class MemoryBudgetExceeded(Exception):
+    """Ein Ladevorgang würde das Speicherbudget der Sitzung überschreiten"""
+
+
+class MemoryBudget:
+    """Reservierungen (Schlüssel → Bytes) gegen eine feste Obergrenze"""
+
+    def __init__(self, limit_bytes=SESSION_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.limit_bytes = limit_bytes
+        self.reservations = {}
+
+    @property
+    def used_bytes(self):
+        return sum(self.reservations.values())
+
+    def reserve(self, key, nbytes, label=None):
+        """Reserviert Speicher für key; eine frühere Reservierung desselben Schlüssels wird ersetzt"""
+        available = self.limit_bytes - self.used_bytes + self.reservations.get(key, 0)
+        if nbytes > available:
+            raise MemoryBudgetExceeded(
+                f"Speicherbudget der Sitzung überschritten: {label or key} benötigt ca. "
+                f"{nbytes / 1024 / 1024:,.1f} MB, verfügbar sind {max(available, 0) / 1024 / 1024:,.1f} MB "
+                f"von {self.limit_bytes / 1024 / 1024:,.0f} MB. Bitte einen kürzeren Zeitraum wählen."
+            )
+        self.reservations[key] = nbytes
+
+    def release(self, key):
+        self.reservations.pop(key, None)
+
+    def release_scope(self, scope):
+        """Gibt alle Reservierungen frei, deren Schlüssel (Tupel) mit scope beginnt"""
+        for key in [key for key in self.reservations if isinstance(key, tuple) and key[:1] == (scope,)]:
+            del self.reservations[key]
+
+    def clear(self):
+        self.reservations.clear()
+
+
+def bytes_per_row(value_dtype=FRAME_VALUE_DTYPE, include_index=False):
+    """Speicherbedarf einer Zeile im typisierten Frame"""
+    size = np.dtype('datetime64[ns]').itemsize + np.dtype(value_dtype).itemsize
+    if include_index:
+        size += np.dtype(INDEX_DTYPE).itemsize
+    return size
+
+
+def estimate_bytes(row_count, value_dtype=FRAME_VALUE_DTYPE, include_index=False):
+    """Geschätzter Speicherbedarf eines typisierten Frames"""
+    return int(row_count) * bytes_per_row(value_dtype, include_index)
+
+
+def parse_index(values):
+    """Wandelt einen Index-Chunk in int32 um; None, wenn er nicht ganzzahlig darstellbar ist"""
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.isna().any():
+        return None
+    info = np.iinfo(INDEX_DTYPE)
+    if len(numbers) and (numbers.min() < info.min or numbers.max() > info.max or (numbers % 1 != 0).any()):
+        return None
+    return numbers.to_numpy(dtype=INDEX_DTYPE)
+
+
+def build_typed_frame(chunks, row_count, value_dtype=FRAME_VALUE_DTYPE, include_index=False):
+    """Befüllt vorab angelegte Spalten aus Chunks mit date/time/value (und index)
+
+    row_count ist eine Obergrenze; das Ergebnis wird auf die tatsächlich gelesenen
+    Zeilen gekürzt. Zeilen über row_count hinaus (gleichzeitiger Import) werden
+    ignoriert und erscheinen mit der nächsten Tabellenversion.
+    """
+    timestamps = np.empty(row_count, dtype='datetime64[ns]')
+    values = np.empty(row_count, dtype=value_dtype)
+    index = np.empty(row_count, dtype=INDEX_DTYPE) if include_index else None
+    position = 0
+
+    for chunk in chunks:
+        n = min(len(chunk), row_count - position)
+        if n <= 0:
+            break
+        chunk = chunk.iloc[:n]
+        timestamps[position:position + n] = pd.to_datetime(
+            chunk['date'].astype(str) + ' ' + chunk['time'].astype(str),
+            format=TIMESTAMP_FORMAT,
+            errors='coerce'
+        ).to_numpy(dtype='datetime64[ns]')
+        values[position:position + n] = pd.to_numeric(chunk['value'], errors='coerce')
+        if include_index:
+            parsed = parse_index(chunk['index']) if index.dtype == INDEX_DTYPE else None
+            if parsed is None and index.dtype == INDEX_DTYPE:
+                # Nicht numerischer Index: auf Text umstellen, am Ende kategorisch speichern
+                index = index.astype(object)
+            index[position:position + n] = parsed if parsed is not None else chunk['index'].to_numpy()
+        position += n
+
+    columns = {}
+    if include_index:
+        index = index[:position]
+        columns['index'] = index if index.dtype == INDEX_DTYPE else pd.Categorical(index)
+    columns['timestamp'] = timestamps[:position]
+    columns['value'] = values[:position]
+    return pd.DataFrame(columns, copy=False)
+
+
+def batch_arrays(batch):
+    """Zeitstempel (datetime64[ns], ungültige als NaT) und Messwerte eines Arrow-Batches mit date/time/value"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    joined = pc.binary_join_element_wise(batch.column('date'), batch.column('time'), ' ')
+    timestamps = pc.strptime(joined, format=TIMESTAMP_FORMAT, unit='ns', error_is_null=True)
+    values = batch.column('value').cast(pa.float64())
+    return timestamps.to_numpy(zero_copy_only=False), values.to_numpy(zero_copy_only=False)
+
+
+def frame_to_measurements(df):
+    """Wandelt einen typisierten Frame zurück in das Tabellenlayout index/date/time/value"""
+    result = pd.DataFrame({
+        'date': df['timestamp'].dt.strftime('%Y-%m-%d'),
+        'time': df['timestamp'].dt.strftime('%H:%M:%S'),
+        'value': df['value']
+    })
+    if 'index' in df.columns:
+        result.insert(0, 'index', df['index'])
+    return result
@@ -1,4 +1,5 @@
 <?php
+// Veraltet: Ersetzt durch die Datenschnittstelle in data_api.py (/api/range, /api/aggregate, /api/multi)
 // Verbesserte Konstanten und Konfiguration
 define('DB_CONFIG', [
     'host' => 'localhost',
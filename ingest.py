@@ -0,0 +1,276 @@
+"""Inkrementeller Import wachsender CSV-Dateien aus überwachten Verzeichnissen.
+
+Die Datenerfassung (DAQ) schreibt CSV-Dateien, die über den Tag wachsen. Dieser
+Dienst merkt sich pro Datei den Byte-Offset und den letzten Index und überträgt
+nur neu hinzugekommene, vollständige Zeilen in kleinen Batches in die
+zugeordnete Tabelle.
+
+Die Identität einer Datei (Inode und erste Zeile) wird mitgespeichert. Eine
+ersetzte Datei (Rotation) wird von vorne importiert; wird dieselbe Datei
+abgeschnitten oder neu geschrieben, beginnt der Import ebenfalls von vorne,
+Zeilen bis zum letzten Index werden aber übersprungen.
+
+Start:
+    python ingest.py --watch "assets/csv data=fhifel_gap" --interval 2
+"""
+import argparse
+import hashlib
+import io
+import logging
+import os
+import time
+from glob import glob
+
+import pandas as pd
+from sqlalchemy import text
+
+from database import validate_table_name
+from storage import INSERT_BATCH_SIZE, create_storage
+
+INGEST_STATE_TABLE = '_ingest_state'
+WATCH_INTERVAL = 2.0  # Sekunden zwischen zwei Durchläufen
+MAX_BYTES_PER_TICK = 4 * 1024 * 1024  # Obergrenze pro Datei und Durchlauf
+
+logger = logging.getLogger('ingest')
+
+
+def normalize_measurements(df):
+    """Teilt den Zeitstempel in date/time auf und liefert das Tabellenlayout der Anwendung"""
+    df['index'] = df['index'].str.strip()
+    df['timestamp'] = pd.to_datetime(df['timestamp'].str.strip())
+    df['date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
+    df['time'] = df['timestamp'].dt.strftime('%H:%M:%S')
+    df['value'] = df['value'].str.strip()
+    return df[['index', 'date', 'time', 'value']].copy()
+
+
+def parse_measurement_lines(raw_bytes):
+    """Wandelt vollständige CSV-Zeilen (index, timestamp, value) in einen DataFrame um
+
+    Zeilen mit falscher Feldanzahl, ohne Index, mit ungültigem Zeitstempel oder
+    nicht numerischem Messwert werden verworfen. Liefert (DataFrame, verworfene
+    Zeilen als Text), damit eine fehlerhafte Zeile den Import der Datei nicht anhält.
+    """
+    lines = [line for line in raw_bytes.splitlines() if line.strip()]
+    rejected = [line for line in lines if line.count(b',') != 2]
+    accepted = [line for line in lines if line.count(b',') == 2]
+    if not accepted:
+        empty = pd.DataFrame({column: pd.Series(dtype=str) for column in ['index', 'date', 'time', 'value']})
+        return empty, [line.decode(errors='replace') for line in rejected]
+    df = pd.read_csv(
+        io.BytesIO(b'\n'.join(accepted)),
+        header=None,
+        names=['index', 'timestamp', 'value'],
+        dtype={'index': str, 'timestamp': str, 'value': str},
+        skip_blank_lines=True
+    )
+    index = df['index'].str.strip()
+    timestamps = pd.to_datetime(df['timestamp'].str.strip(), errors='coerce')
+    values = pd.to_numeric(df['value'].str.strip(), errors='coerce')
+    valid = index.notna() & (index != '') & timestamps.notna() & values.notna()
+    rejected = [line.decode(errors='replace') for line in rejected] + [
+        ','.join(str(field) for field in row) for row in df[~valid].itertuples(index=False)
+    ]
+    return normalize_measurements(df[valid].reset_index(drop=True)), rejected
+
+
+def ensure_ingest_state(conn):
+    """Legt die Tabelle für den Importfortschritt an"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {INGEST_STATE_TABLE} (
+            file_path TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            byte_offset BIGINT NOT NULL DEFAULT 0,
+            last_index TEXT,
+            rows_ingested BIGINT NOT NULL DEFAULT 0,
+            rows_rejected BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now(),
+            file_id TEXT
+        )
+    """))
+
+
+def file_identity(file_path):
+    """Inode und Prüfsumme der ersten Zeile; None, solange die erste Zeile unvollständig ist"""
+    with open(file_path, 'rb') as f:
+        head = f.readline()
+    if not head.endswith(b'\n'):
+        return None
+    return f"{os.stat(file_path).st_ino}:{hashlib.sha1(head).hexdigest()[:16]}"
+
+
+def drop_known_rows(df, last_index):
+    """Verwirft Zeilen bis einschließlich des zuletzt übertragenen Index"""
+    if last_index is None or df.empty:
+        return df
+    indexes = pd.to_numeric(df['index'], errors='coerce')
+    try:
+        last = float(last_index)
+    except ValueError:
+        return df
+    return df[~(indexes <= last)]
+
+
+def load_ingest_state(engine):
+    """Liefert den gespeicherten Importfortschritt aller Dateien"""
+    with engine.begin() as conn:
+        ensure_ingest_state(conn)
+        return pd.read_sql(
+            text(f"SELECT * FROM {INGEST_STATE_TABLE} ORDER BY updated_at DESC"),
+            conn
+        )
+
+
+class FolderWatcher:
+    """Überwacht Verzeichnisse und überträgt neue CSV-Zeilen in die zugeordneten Tabellen"""
+
+    def __init__(self, storage, folders, pattern='*.csv', batch_size=INSERT_BATCH_SIZE,
+                 max_bytes=MAX_BYTES_PER_TICK):
+        self.storage = storage
+        self.engine = storage.engine
+        self.folders = {path: validate_table_name(table) for path, table in folders.items()}
+        self.pattern = pattern
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        with self.engine.begin() as conn:
+            ensure_ingest_state(conn)
+
+    def _get_state(self, conn, file_path):
+        """Offset, letzter Index und Dateiidentität (0, None, None für neue Dateien)"""
+        row = conn.execute(
+            text(f"""
+                SELECT byte_offset, last_index, file_id FROM {INGEST_STATE_TABLE}
+                WHERE file_path = :file_path
+            """),
+            {'file_path': file_path}
+        ).first()
+        return tuple(row) if row else (0, None, None)
+
+    def _save_state(self, conn, file_path, table_name, offset, last_index, rows, file_id, rejected=0):
+        conn.execute(text(f"""
+            INSERT INTO {INGEST_STATE_TABLE}
+                (file_path, table_name, byte_offset, last_index, rows_ingested, rows_rejected, updated_at, file_id)
+            VALUES (:file_path, :table_name, :offset, :last_index, :rows, :rejected, now(), :file_id)
+            ON CONFLICT (file_path) DO UPDATE SET
+                table_name = EXCLUDED.table_name,
+                byte_offset = EXCLUDED.byte_offset,
+                last_index = EXCLUDED.last_index,
+                rows_ingested = {INGEST_STATE_TABLE}.rows_ingested + EXCLUDED.rows_ingested,
+                rows_rejected = {INGEST_STATE_TABLE}.rows_rejected + EXCLUDED.rows_rejected,
+                updated_at = now(),
+                file_id = EXCLUDED.file_id
+        """), {
+            'file_path': file_path,
+            'table_name': table_name,
+            'offset': offset,
+            'last_index': last_index,
+            'rows': rows,
+            'rejected': rejected,
+            'file_id': file_id
+        })
+
+    def ingest_file(self, file_path, table_name):
+        """Überträgt die seit dem letzten Durchlauf angehängten Zeilen einer Datei
+
+        Pro Aufruf werden höchstens max_bytes gelesen; unvollständige Zeilen am
+        Dateiende bleiben bis zum nächsten Durchlauf liegen.
+        """
+        size = os.path.getsize(file_path)
+        file_id = file_identity(file_path)
+        with self.storage.write_transaction(table_name) as conn:
+            offset, last_index, stored_id = self._get_state(conn, file_path)
+            if stored_id is not None and file_id is not None and file_id != stored_id:
+                # Andere Datei unter demselben Namen (Rotation): vollständig importieren
+                logger.warning("%s wurde ersetzt, Import beginnt neu", file_path)
+                offset, last_index = 0, None
+            elif size < offset:
+                # Dieselbe Datei wurde abgeschnitten oder neu geschrieben: bekannte Zeilen überspringen
+                logger.warning("%s ist kleiner geworden, Import beginnt neu ab Index %s", file_path, last_index)
+                offset = 0
+            if size == offset:
+                return 0
+
+            with open(file_path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(self.max_bytes)
+            end = chunk.rfind(b'\n')
+            if end < 0:
+                return 0
+            chunk = chunk[:end + 1]
+
+            df, rejected = parse_measurement_lines(chunk)
+            if rejected:
+                # Verworfene Zeilen werden übersprungen, der Offset rückt trotzdem weiter
+                logger.warning(
+                    "%s: %d fehlerhafte Zeile(n) verworfen, z.B. %r", file_path, len(rejected), rejected[0]
+                )
+            df = drop_known_rows(df, last_index)
+            rows = self.storage.insert_measurements(conn, table_name, df, self.batch_size) if not df.empty else 0
+            if rows:
+                last_index = df['index'].iloc[-1]
+            self._save_state(
+                conn, file_path, table_name, offset + len(chunk), last_index, rows, file_id, len(rejected)
+            )
+
+        logger.info("%s: %d Zeilen nach %s übertragen", file_path, rows, table_name)
+        return rows
+
+    def run_once(self):
+        """Führt einen Durchlauf über alle überwachten Verzeichnisse aus"""
+        total = 0
+        for folder, table_name in self.folders.items():
+            for file_path in sorted(glob(os.path.join(folder, self.pattern))):
+                try:
+                    total += self.ingest_file(os.path.abspath(file_path), table_name)
+                except Exception as e:
+                    logger.error("Fehler beim Import von %s: %s", file_path, e)
+        return total
+
+    def run_forever(self, interval=WATCH_INTERVAL):
+        """Überwacht die Verzeichnisse, bis der Prozess beendet wird"""
+        logger.info("Überwache %s", ', '.join(f"{p} -> {t}" for p, t in self.folders.items()))
+        while True:
+            # Solange Rückstand besteht, ohne Pause weiterarbeiten
+            if self.run_once() == 0:
+                time.sleep(interval)
+
+
+def parse_watch_arguments(values):
+    """Wandelt 'verzeichnis=tabelle' Angaben in ein Dictionary um"""
+    folders = {}
+    for value in values:
+        path, sep, table_name = value.rpartition('=')
+        if not sep or not path:
+            raise ValueError(f"Ungültige Angabe '{value}', erwartet: verzeichnis=tabelle")
+        folders[path] = table_name
+    return folders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inkrementeller CSV-Import aus überwachten Verzeichnissen")
+    parser.add_argument('--watch', action='append', required=True,
+                        help="Verzeichnis und Zieltabelle im Format verzeichnis=tabelle (mehrfach möglich)")
+    parser.add_argument('--pattern', default='*.csv', help="Dateimuster innerhalb der Verzeichnisse")
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL, help="Wartezeit in Sekunden")
+    parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE, help="Zeilen pro INSERT-Batch")
+    parser.add_argument('--max-bytes', type=int, default=MAX_BYTES_PER_TICK,
+                        help="Maximal gelesene Bytes pro Datei und Durchlauf")
+    parser.add_argument('--once', action='store_true', help="Nur einen Durchlauf ausführen")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    watcher = FolderWatcher(
+        create_storage(),
+        parse_watch_arguments(args.watch),
+        pattern=args.pattern,
+        batch_size=args.batch_size,
+        max_bytes=args.max_bytes
+    )
+    if args.once:
+        watcher.run_once()
+    else:
+        watcher.run_forever(args.interval)
+
+
+if __name__ == '__main__':
+    main()
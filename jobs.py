@@ -0,0 +1,506 @@
+"""Hintergrundaufträge (Jobs) für Import, Export, Migration und Verdichtung.
+
+Aufträge werden mit Parametern in der Tabelle _jobs gespeichert und von
+Workern abgearbeitet, die unabhängig vom Streamlit-Skript laufen. Ein Neuladen
+der Seite oder ein Rerun bricht einen laufenden Import daher nicht mehr ab,
+und die Sitzung bleibt währenddessen bedienbar.
+
+    - Status: queued → running → done | failed | cancelled
+    - Fortschritt (0–1) und Meldung schreibt der Auftrag selbst fort
+    - Abbrechen: wartende Aufträge sofort, laufende beim nächsten Fortschrittsschritt
+      (die Transaktion des Auftrags wird zurückgerollt)
+    - Wiederholen: fehlgeschlagene Versuche werden bis JOB_MAX_ATTEMPTS mit
+      wachsender Wartezeit erneut eingeplant; abgeschlossene Aufträge lassen sich
+      manuell neu starten
+    - Aufträge, deren Worker abgestürzt ist (kein Lebenszeichen seit
+      JOB_STALE_SECONDS), werden erneut eingeplant
+
+Mit PostgreSQL laufen die Worker als eigene Prozesse (volle CPU-Leistung,
+Aufträge werden über FOR UPDATE SKIP LOCKED verteilt). Mit DuckDB kann nur
+ein Prozess schreiben; die Worker laufen dann als Threads im Anwendungsprozess.
+
+Start:
+    python jobs.py --workers 4                                     # Worker-Pool im Vordergrund
+    python jobs.py --submit export --param table_name=csv1         # Auftrag einreihen
+    python jobs.py --list
+    python jobs.py --cancel 3f2a9c…  /  --retry 3f2a9c…
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+JOBS_TABLE = '_jobs'
+JOB_DIR = os.environ.get('JOB_DIR', 'data/jobs')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # Worker der Anwendung (0: nur externe Worker)
+JOB_POLL_INTERVAL = 1.0  # Sekunden zwischen zwei Abfragen der Warteschlange
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 10  # Sekunden Wartezeit vor dem n-ten erneuten Versuch: n × JOB_RETRY_DELAY
+JOB_STALE_SECONDS = 120  # ohne Lebenszeichen gilt ein laufender Auftrag als verwaist
+HEARTBEAT_INTERVAL = 10
+PROGRESS_INTERVAL = 0.5  # Fortschritt wird höchstens so oft (Sekunden) gespeichert
+INGEST_CHUNK_ROWS = 100_000
+
+FINAL_STATUSES = ('done', 'failed', 'cancelled')
+JOB_LABELS = {
+    'ingest': "CSV-Import",
+    'multichannel': "Mehrkanal-Import",
+    'export': "CSV-Export",
+    'migration': "Tabelle kopieren",
+    'compaction': "Verdichtung",
+    'anomalies': "Anomalie-Scan"
+}
+
+logger = logging.getLogger('jobs')
+_claim_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    """Der Auftrag wurde während der Ausführung abgebrochen"""
+
+
+def ensure_jobs_table(conn):
+    """Legt die Auftragstabelle an (einmal beim Erstellen des Storage-Backends)"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            status TEXT NOT NULL,
+            progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+            worker TEXT,
+            created_at TIMESTAMP NOT NULL,
+            run_after TIMESTAMP NOT NULL,
+            started_at TIMESTAMP,
+            heartbeat_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    """))
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {JOBS_TABLE}_queue_idx ON {JOBS_TABLE} (status, run_after)"))
+
+
+def job_path(*parts):
+    """Pfad im Arbeitsverzeichnis der Aufträge (Verzeichnis wird angelegt)"""
+    path = os.path.join(JOB_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def save_upload(uploaded_file):
+    """Speichert eine hochgeladene Datei für einen Auftrag und liefert ihren Pfad"""
+    path = job_path('uploads', f"{uuid.uuid4().hex[:12]}_{os.path.basename(uploaded_file.name)}")
+    uploaded_file.seek(0)
+    with open(path, 'wb') as f:
+        while chunk := uploaded_file.read(8 * 1024 * 1024):
+            f.write(chunk)
+    uploaded_file.seek(0)
+    return path
+
+
+def submit_job(engine, kind, params, max_attempts=JOB_MAX_ATTEMPTS):
+    """Reiht einen Auftrag ein und liefert seine ID"""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"Unbekannte Auftragsart: '{kind}'")
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    with engine.begin() as conn:
+        ensure_jobs_table(conn)
+        conn.execute(text(f"""
+            INSERT INTO {JOBS_TABLE} (id, kind, params, status, max_attempts, created_at, run_after)
+            VALUES (:id, :kind, :params, 'queued', :max_attempts, :now, :now)
+        """), {'id': job_id, 'kind': kind, 'params': json.dumps(params, default=str),
+               'max_attempts': max_attempts, 'now': now})
+    return job_id
+
+
+def cancel_job(engine, job_id):
+    """Bricht einen wartenden Auftrag ab bzw. fordert den Abbruch eines laufenden an"""
+    with engine.begin() as conn:
+        ensure_jobs_table(conn)
+        conn.execute(text(f"""
+            UPDATE {JOBS_TABLE} SET status = 'cancelled', finished_at = :now
+            WHERE id = :id AND status = 'queued'
+        """), {'id': job_id, 'now': datetime.now()})
+        conn.execute(text(f"""
+            UPDATE {JOBS_TABLE} SET cancel_requested = TRUE
+            WHERE id = :id AND status = 'running'
+        """), {'id': job_id})
+
+
+def retry_job(engine, job_id):
+    """Plant einen abgeschlossenen, fehlgeschlagenen oder abgebrochenen Auftrag erneut ein
+
+    Importe löschen ihre hochgeladene Datei nach Erfolg; ohne Datei wird die
+    Wiederholung mit einer Fehlermeldung abgelehnt.
+    """
+    with engine.begin() as conn:
+        ensure_jobs_table(conn)
+        params = conn.execute(
+            text(f"SELECT params FROM {JOBS_TABLE} WHERE id = :id"), {'id': job_id}
+        ).scalar()
+        path = json.loads(params).get('path') if params else None
+        if path and not os.path.exists(path):
+            raise ValueError(
+                f"Die hochgeladene Datei '{os.path.basename(path)}' ist nicht mehr vorhanden "
+                f"(nach erfolgreichem Import gelöscht); bitte erneut hochladen"
+            )
+        conn.execute(text(f"""
+            UPDATE {JOBS_TABLE}
+            SET status = 'queued', attempts = 0, progress = 0, message = NULL, error = NULL,
+                cancel_requested = FALSE, run_after = :now, finished_at = NULL
+            WHERE id = :id AND status IN ('done', 'failed', 'cancelled')
+        """), {'id': job_id, 'now': datetime.now()})
+
+
+def load_jobs(engine, limit=50):
+    """Die jüngsten Aufträge (laufende und wartende zuerst)"""
+    with engine.connect() as conn:
+        jobs = pd.read_sql(text(f"""
+            SELECT id, kind, params, status, progress, message, result, error, attempts, max_attempts,
+                   cancel_requested, created_at, started_at, finished_at
+            FROM {JOBS_TABLE}
+            ORDER BY CASE status WHEN 'running' THEN 0 WHEN 'queued' THEN 1 ELSE 2 END, created_at DESC
+            LIMIT {int(limit)}
+        """), conn)
+    for column in ['params', 'result']:
+        jobs[column] = jobs[column].map(lambda value: json.loads(value) if isinstance(value, str) else {})
+    for column in ['message', 'error']:
+        jobs[column] = jobs[column].astype(object).where(jobs[column].notna(), None)
+    return jobs
+
+
+def requeue_stale_jobs(conn):
+    """Plant laufende Aufträge ohne Lebenszeichen erneut ein (Worker abgestürzt)"""
+    cutoff = datetime.now() - timedelta(seconds=JOB_STALE_SECONDS)
+    conn.execute(text(f"""
+        UPDATE {JOBS_TABLE}
+        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+            error = 'Worker ohne Lebenszeichen', worker = NULL
+        WHERE status = 'running' AND heartbeat_at < :cutoff
+    """), {'cutoff': cutoff})
+
+
+class JobContext:
+    """Wird dem Auftrag übergeben: Fortschritt melden und auf Abbruch prüfen"""
+
+    def __init__(self, engine, job_id, attempt):
+        self.engine = engine
+        self.job_id = job_id
+        self.attempt = attempt
+        self._reported_at = 0.0
+
+    def progress(self, fraction, message=None, force=False):
+        """Speichert den Fortschritt (gedrosselt) und bricht ab, wenn das angefordert wurde"""
+        now = time.monotonic()
+        if not force and now - self._reported_at < PROGRESS_INTERVAL:
+            return
+        self._reported_at = now
+        with self.engine.begin() as conn:
+            cancel = conn.execute(text(f"""
+                UPDATE {JOBS_TABLE} SET progress = :progress, message = :message, heartbeat_at = :now
+                WHERE id = :id
+                RETURNING cancel_requested
+            """), {'id': self.job_id, 'progress': min(max(float(fraction), 0.0), 1.0),
+                   'message': message, 'now': datetime.now()}).scalar()
+        if cancel:
+            raise JobCancelled()
+
+
+class JobWorker:
+    """Holt Aufträge aus der Warteschlange und führt sie aus"""
+
+    def __init__(self, storage, name=None):
+        self.storage = storage
+        self.engine = storage.engine
+        self.name = name or f"{os.getpid()}-{threading.get_ident()}"
+        with self.engine.begin() as conn:
+            ensure_jobs_table(conn)
+
+    def claim(self):
+        """Übernimmt den ältesten fälligen Auftrag; None, wenn keiner wartet"""
+        skip_locked = " FOR UPDATE SKIP LOCKED" if self.storage.dialect == 'postgresql' else ""
+        now = datetime.now()
+        with _claim_lock, self.engine.begin() as conn:
+            requeue_stale_jobs(conn)
+            row = conn.execute(text(f"""
+                UPDATE {JOBS_TABLE}
+                SET status = 'running', worker = :worker, attempts = attempts + 1,
+                    started_at = :now, heartbeat_at = :now, progress = 0, message = NULL
+                WHERE id = (
+                    SELECT id FROM {JOBS_TABLE}
+                    WHERE status = 'queued' AND run_after <= :now
+                    ORDER BY created_at
+                    LIMIT 1{skip_locked}
+                ) AND status = 'queued'
+                RETURNING id, kind, params, attempts, max_attempts
+            """), {'worker': self.name, 'now': now}).mappings().first()
+        return dict(row) if row else None
+
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(text(f"UPDATE {JOBS_TABLE} SET heartbeat_at = :now WHERE id = :id"),
+                                 {'id': job_id, 'now': datetime.now()})
+            except Exception as e:
+                logger.warning("Lebenszeichen für Auftrag %s fehlgeschlagen: %s", job_id, e)
+
+    def _finish(self, job_id, status, **values):
+        assignments = ', '.join(f"{column} = :{column}" for column in values)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                UPDATE {JOBS_TABLE} SET status = :status, {assignments}
+                WHERE id = :id
+            """), {'id': job_id, 'status': status, **values})
+
+    def run_job(self, job):
+        """Führt einen übernommenen Auftrag aus und speichert Ergebnis oder Fehler"""
+        context = JobContext(self.engine, job['id'], job['attempts'])
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job['id'], stop), daemon=True)
+        heartbeat.start()
+        logger.info("Auftrag %s (%s) gestartet, Versuch %d", job['id'], job['kind'], job['attempts'])
+        try:
+            result = JOB_HANDLERS[job['kind']](self.storage, json.loads(job['params']), context)
+            self._finish(job['id'], 'done', progress=1.0, result=json.dumps(result or {}, default=str),
+                         error=None, finished_at=datetime.now())
+            logger.info("Auftrag %s abgeschlossen", job['id'])
+        except JobCancelled:
+            self._finish(job['id'], 'cancelled', message="Abgebrochen", finished_at=datetime.now())
+            logger.info("Auftrag %s abgebrochen", job['id'])
+        except Exception as e:
+            logger.error("Auftrag %s fehlgeschlagen: %s", job['id'], e)
+            if job['attempts'] < job['max_attempts']:
+                retry_at = datetime.now() + timedelta(seconds=JOB_RETRY_DELAY * job['attempts'])
+                self._finish(job['id'], 'queued', error=str(e), run_after=retry_at,
+                             message=f"Neuer Versuch um {retry_at:%H:%M:%S}")
+            else:
+                self._finish(job['id'], 'failed', error=str(e), finished_at=datetime.now())
+        finally:
+            stop.set()
+
+    def run_once(self):
+        """Führt höchstens einen Auftrag aus; liefert True, wenn einer ausgeführt wurde"""
+        job = self.claim()
+        if job is None:
+            return False
+        self.run_job(job)
+        return True
+
+    def run_forever(self, interval=JOB_POLL_INTERVAL, stop=None):
+        while stop is None or not stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                logger.error("Worker %s: %s", self.name, e)
+            time.sleep(interval)
+
+
+def worker_process(name):
+    """Einstiegspunkt eines Worker-Prozesses (eigene Datenbankverbindungen)"""
+    from storage import create_storage
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    JobWorker(create_storage(), name).run_forever()
+
+
+def start_workers(storage, count=JOB_WORKERS):
+    """Startet count Worker: Prozesse mit PostgreSQL, Threads mit DuckDB"""
+    workers = []
+    for number in range(count):
+        name = f"{os.getpid()}-w{number}"
+        if storage.dialect == 'postgresql':
+            worker = multiprocessing.get_context('spawn').Process(
+                target=worker_process, args=(name,), name=f"job-worker-{number}", daemon=True
+            )
+        else:
+            worker = threading.Thread(
+                target=JobWorker(storage, name).run_forever, name=f"job-worker-{number}", daemon=True
+            )
+        worker.start()
+        workers.append(worker)
+    return workers
+
+
+# Auftragsarten: handler(storage, params, context) → Ergebnis (JSON-serialisierbar)
+
+def run_ingest(storage, params, context):
+    """Importiert eine Messwert-CSV (index, timestamp, value) über eine Staging-Tabelle
+
+    Mit replace=True ersetzt die Datei den Inhalt der Tabelle, sonst wird sie angehängt.
+    """
+    from ingest import normalize_measurements
+
+    path, table_name = params['path'], params['table_name']
+    size = max(os.path.getsize(path), 1)
+    with open(path, 'rb') as f, storage.staged_load(table_name, replace=params.get('replace', False)) as load:
+        reader = pd.read_csv(
+            f,
+            header=None,
+            names=['index', 'timestamp', 'value'],
+            dtype={'index': str, 'timestamp': str, 'value': str},
+            chunksize=INGEST_CHUNK_ROWS
+        )
+        for chunk in reader:
+            load.insert(normalize_measurements(chunk))
+            context.progress(f.tell() / size, f"{load.rows:,} Zeilen geladen")
+        context.progress(1.0, f"{load.rows:,} Zeilen geladen, Übernahme in '{table_name}'", force=True)
+    os.remove(path)
+    return {'table': table_name, 'rows': load.rows}
+
+
+def run_multichannel(storage, params, context):
+    """Mehrkanal-Import (je Kanal eine Tabelle oder eine typisierte Tabelle) mit dem bestätigten Schema"""
+    from schema import import_wide_csv
+
+    path = params['path']
+    size = max(os.path.getsize(path), 1)
+    with open(path, 'rb') as f:
+        imported = import_wide_csv(
+            storage, f, params['prefix'], params.get('mode', 'long'), pd.DataFrame(params['schema']),
+            params['options'],
+            timestamp_column=params['timestamp_column'], channels=params['channels'],
+            progress=lambda rows: context.progress(f.tell() / size, f"{rows:,} Zeilen gelesen")
+        )
+    os.remove(path)
+    return {'tables': imported, 'rows': sum(imported.values())}
+
+
+def run_export(storage, params, context):
+    """Exportiert eine Tabelle (optional einen Zeitraum, ohne markierte Anomalien) gestreamt als CSV-Datei"""
+    from streaming import write_csv
+
+    table_name = params['table_name']
+    start_date, end_date = params.get('start_date'), params.get('end_date')
+    total = max(storage.count_rows(table_name, start_date, end_date), 1)
+    path = job_path('exports', f"{table_name}_{context.job_id[:8]}.csv")
+    try:
+        rows = write_csv(
+            storage, table_name, path, start_date, end_date,
+            progress=lambda rows: context.progress(rows / total, f"{rows:,} Zeilen exportiert"),
+            exclude_anomalies=params.get('exclude_anomalies', False)
+        )
+    except BaseException:
+        os.remove(path)
+        raise
+    return {'table': table_name, 'rows': rows, 'path': path}
+
+
+def run_migration(storage, params, context):
+    """Kopiert die Messwerte einer Tabelle unverändert in eine neue Tabelle (ohne archivierte Monate)"""
+    from catalog import table_exists
+    from storage import STREAM_CHUNK_SIZE
+
+    source, target = params['source'], params['target']
+    if table_exists(storage.engine, target):
+        raise ValueError(f"Tabelle '{target}' existiert bereits")
+    total = max(storage.count_rows(source), 1)
+    # Die Zieltabelle entsteht erst mit der Übernahme der vollständigen Kopie
+    with storage.staged_load(target, replace=True) as load:
+        for chunk in storage.read_chunks(source, STREAM_CHUNK_SIZE):
+            load.insert(chunk)
+            context.progress(load.rows / total, f"{load.rows:,} Zeilen kopiert")
+    return {'source': source, 'table': target, 'rows': load.rows}
+
+
+def run_compaction(storage, params, context):
+    """Wendet die Aufbewahrungsrichtlinie einer Tabelle (ohne table_name: aller Tabellen) an"""
+    from retention import apply_policy, format_summary, load_retention_policies
+
+    policies = load_retention_policies(storage.engine)
+    if params.get('table_name'):
+        policies = policies[policies['table_name'] == params['table_name']]
+        if policies.empty:
+            raise ValueError(f"Keine Aufbewahrungsrichtlinie für '{params['table_name']}'")
+    summaries = []
+    for position, policy in enumerate(policies.itertuples(index=False)):
+        summary = apply_policy(
+            storage, policy.table_name, int(policy.raw_days), policy.minute_days,
+            progress=lambda done, total: context.progress(
+                (position + done / max(total, 1)) / len(policies), f"{policy.table_name}: {done}/{total} Tage"
+            )
+        )
+        summaries.append(format_summary(summary))
+    return {'summaries': summaries}
+
+
+def run_anomaly_scan(storage, params, context):
+    """Berechnet die Anomalie-Markierungen einer Tabelle mit ihren aktuellen Parametern neu"""
+    from anomalies import rescan
+
+    table_name = params['table_name']
+    flagged = rescan(
+        storage, table_name,
+        progress=lambda rows, total: context.progress(rows / max(total, 1), f"{rows:,} Zeilen geprüft")
+    )
+    return {'table': table_name, 'flagged': flagged}
+
+
+JOB_HANDLERS = {
+    'ingest': run_ingest,
+    'multichannel': run_multichannel,
+    'export': run_export,
+    'migration': run_migration,
+    'compaction': run_compaction,
+    'anomalies': run_anomaly_scan
+}
+
+
+def parse_param(value):
+    """Wandelt 'name=wert' in ein Schlüssel-Wert-Paar um"""
+    name, separator, param = value.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Ungültiger Parameter '{value}', erwartet name=wert")
+    return name, param
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Hintergrundaufträge ausführen und verwalten")
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS, help="Anzahl Worker")
+    parser.add_argument('--submit', choices=list(JOB_HANDLERS), help="Auftrag einreihen")
+    parser.add_argument('--param', action='append', type=parse_param, default=[], metavar='NAME=WERT')
+    parser.add_argument('--list', action='store_true', help="Aufträge anzeigen")
+    parser.add_argument('--cancel', metavar='ID', help="Auftrag abbrechen")
+    parser.add_argument('--retry', metavar='ID', help="Auftrag erneut einplanen")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    storage = create_storage()
+    if args.submit:
+        print(submit_job(storage.engine, args.submit, dict(args.param)))
+    elif args.list:
+        jobs = load_jobs(storage.engine)
+        print(jobs[['id', 'kind', 'status', 'progress', 'message', 'error']].to_string(index=False))
+    elif args.cancel:
+        cancel_job(storage.engine, args.cancel)
+    elif args.retry:
+        retry_job(storage.engine, args.retry)
+    elif storage.dialect == 'postgresql':
+        for worker in start_workers(storage, args.workers):
+            worker.join()
+    else:
+        # DuckDB: ein schreibender Prozess, Worker als Threads
+        threads = start_workers(storage, args.workers)
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,471 @@
+"""Lasttest der Streamlit-Anwendung mit mehreren gleichzeitigen Sitzungen.
+
+Jede simulierte Sitzung ist eine eigene AppTest-Instanz von test.py (Streamlits
+Test-API) und läuft in einem eigenen Thread – wie die Script-Threads der
+Sitzungen auf dem Server teilen sich alle Sitzungen den Prozess, die
+Datenbank-Pools (cache_resource) und die Datencaches (cache_data). Jede Sitzung
+durchläuft wiederholt die typischen Schritte der Leitwarte:
+
+    - open:    App laden
+    - select:  Tabelle über die Katalogsuche auswählen
+    - preview: Vorschau anzeigen
+    - chart:   Einzeldiagramm für einen zufälligen Zeitraum
+    - multi:   mehrere Tabellen vergleichen
+    - upload:  CSV hochladen und als Importauftrag einreihen
+
+Pro Gleichzeitigkeitsstufe werden Latenz-Perzentile je Schritt, die Wartezeit
+auf eine Verbindung aus den SQLAlchemy-Pools, die höchste Pool-Belegung und der
+Speicherverbrauch (RSS) des Prozesses gemessen und wie beim Benchmark als JSON-
+und Markdown-Bericht gespeichert.
+
+Start:
+    python loadtest.py --sessions 1 5 10 20 --iterations 3
+    STORAGE_BACKEND=duckdb python loadtest.py --sessions 1 5 --tables 3 --rows 50000 --no-upload
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from sqlalchemy import pool as sa_pool, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from streamlit.components.v2.component_manager import BidiComponentManager
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+
+from benchmark import START_TIMESTAMP, cadence_for, generate_chunks, git_commit, to_upload_csv
+from jobs import JOBS_TABLE, ensure_jobs_table
+from storage import STORAGE_BACKEND, create_storage
+
+# Streamlit-Warnungen ("No runtime found") beim Aufruf außerhalb der App unterdrücken
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test.py')
+LOAD_TABLE_PREFIX = 'loadtest_'
+DEFAULT_LEVELS = [1, 5, 10, 20]
+DEFAULT_TABLES = 5
+DEFAULT_ROWS = 100_000
+CHART_RANGE_DAYS = 7
+MULTI_TABLE_COUNT = 3
+UPLOAD_ROWS = 500
+APP_TIMEOUT = 120  # Sekunden pro Durchlauf der App, bevor AppTest abbricht
+SAMPLE_INTERVAL = 0.1  # Sekunden zwischen zwei Messungen von Pool-Belegung und Speicher
+JOB_DRAIN_TIMEOUT = 300
+PERCENTILES = [50, 95, 99]
+STEPS = ['open', 'select', 'preview', 'chart', 'multi', 'upload']
+
+
+def current_rss():
+    """Aktueller Speicherverbrauch (RSS) des Prozesses in Bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # Ohne /proc (macOS): Höchstwert; ru_maxrss ist dort in Bytes angegeben
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+@contextmanager
+def shared_runtime():
+    """Eine gemeinsame Runtime und ein Skript-Cache für alle Sitzungen wie auf dem Server
+
+    AppTest setzt pro Durchlauf eine eigene Runtime als Singleton und entfernt sie
+    danach wieder; bei gleichzeitigen Sitzungen verlöre ein laufendes Skript so
+    seine Runtime. Außerdem teilen sich die Sitzungen damit die Datencaches und
+    den übersetzten Code von test.py. Die Runtime ist der nachgebildet, die AppTest
+    (Streamlit 1.61 und neuer) selbst anlegt.
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    runtime.bidi_component_registry = BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+    script_cache = ScriptCache()
+    original = Runtime.__dict__['instance'], Runtime.__dict__['exists'], ScriptCache
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+    try:
+        yield runtime
+    finally:
+        Runtime.instance, Runtime.exists, app_test.ScriptCache = original
+        local_script_runner.ScriptCache = ScriptCache
+
+
+class PoolProbe:
+    """Misst die Wartezeit auf Verbindungen aller SQLAlchemy-Pools im Prozess
+
+    Pool.connect wird für die Dauer des Lasttests umhüllt; die gemessene Zeit
+    umfasst das Warten auf eine freie Verbindung und gegebenenfalls deren Aufbau.
+    Ein Hintergrund-Thread erfasst die höchste Pool-Belegung und den Speicher.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pools = set()
+        self.original_connect = None
+        self.stop_event = threading.Event()
+        self.sampler = None
+        self.reset()
+
+    def reset(self):
+        """Beginnt eine neue Messreihe (je Gleichzeitigkeitsstufe)"""
+        with self.lock:
+            self.waits = []
+            self.timeouts = 0
+            self.peak_checked_out = 0
+            self.peak_overflow = 0
+            self.peak_rss = current_rss()
+
+    def __enter__(self):
+        probe = self
+        original_connect = self.original_connect = sa_pool.Pool.connect
+
+        def connect(pool):
+            started = time.perf_counter()
+            try:
+                return original_connect(pool)
+            except PoolTimeoutError:
+                with probe.lock:
+                    probe.timeouts += 1
+                raise
+            finally:
+                with probe.lock:
+                    probe.waits.append(time.perf_counter() - started)
+                    probe.pools.add(pool)
+
+        sa_pool.Pool.connect = connect
+        self.stop_event.clear()
+        self.sampler = threading.Thread(target=self.sample, name='loadtest-sampler', daemon=True)
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.sampler.join()
+        sa_pool.Pool.connect = self.original_connect
+
+    def sample(self):
+        """Erfasst periodisch Pool-Belegung und Speicher"""
+        while not self.stop_event.wait(self.interval):
+            with self.lock:
+                pools = list(self.pools)
+            checked_out = sum(getattr(p, 'checkedout', lambda: 0)() for p in pools)
+            overflow = sum(max(getattr(p, 'overflow', lambda: 0)(), 0) for p in pools)
+            rss = current_rss()
+            with self.lock:
+                self.peak_checked_out = max(self.peak_checked_out, checked_out)
+                self.peak_overflow = max(self.peak_overflow, overflow)
+                self.peak_rss = max(self.peak_rss, rss)
+
+    def summary(self):
+        """Kennzahlen der aktuellen Messreihe"""
+        with self.lock:
+            waits = list(self.waits)
+            entry = {
+                'checkouts': len(waits),
+                'timeouts': self.timeouts,
+                'peak_checked_out': self.peak_checked_out,
+                'peak_overflow': self.peak_overflow,
+                'peak_rss_mb': self.peak_rss / 2 ** 20
+            }
+        entry.update(percentiles(waits, 'wait'))
+        entry['wait_max_ms'] = max(waits) * 1000 if waits else None
+        return entry
+
+
+def percentiles(durations, prefix):
+    """p50/p95/p99 einer Messreihe in Millisekunden"""
+    return {
+        f"{prefix}_p{p}_ms": float(np.percentile(durations, p)) * 1000 if durations else None
+        for p in PERCENTILES
+    }
+
+
+def seed_tables(storage, count, rows):
+    """Legt die Tabellen des Lasttests an und befüllt sie über eine Staging-Tabelle"""
+    tables = []
+    for number in range(count):
+        table_name = f"{LOAD_TABLE_PREFIX}{number}"
+        with storage.staged_load(table_name, replace=True) as load:
+            for chunk in generate_chunks(rows, seed=number):
+                load.insert(chunk)
+        tables.append(table_name)
+    return tables
+
+
+def drop_tables(storage, tables):
+    """Entfernt die Tabellen des Lasttests"""
+    for table_name in tables:
+        storage.drop_table(table_name)
+
+
+def pending_jobs(storage):
+    """Anzahl der wartenden und laufenden Hintergrundaufträge"""
+    with storage.engine.begin() as conn:
+        ensure_jobs_table(conn)
+        return conn.execute(text(
+            f"SELECT COUNT(*) FROM {JOBS_TABLE} WHERE status IN ('queued', 'running')"
+        )).scalar()
+
+
+def wait_for_jobs(storage, timeout=JOB_DRAIN_TIMEOUT):
+    """Wartet, bis die Importaufträge abgearbeitet sind; liefert die Wartezeit"""
+    started = time.perf_counter()
+    while pending_jobs(storage) and time.perf_counter() - started < timeout:
+        time.sleep(0.5)
+    return time.perf_counter() - started
+
+
+class Session:
+    """Eine simulierte Sitzung: eigene AppTest-Instanz mit eigenem Session State"""
+
+    def __init__(self, number, tables, rows, upload=True):
+        self.number = number
+        self.tables = tables
+        self.upload = upload
+        self.rng = random.Random(number)
+        self.days = max(1, int(rows * cadence_for(rows) // 86400))
+        self.at = AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT)
+        self.table = None
+        self.latencies = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+        self.messages = []
+
+    def step(self, name, *actions):
+        """Führt Interaktionen nacheinander aus und misst die Dauer der App-Durchläufe"""
+        started = time.perf_counter()
+        try:
+            for action in actions:
+                action().run()
+            failures = [e.message for e in self.at.exception] + [e.value for e in self.at.error]
+        except Exception as e:
+            failures = [f"{type(e).__name__}: {str(e)}"]
+        self.latencies[name].append(time.perf_counter() - started)
+        if failures:
+            self.errors[name] += 1
+            self.messages.extend(f"{name}: {message}" for message in failures[:3])
+
+    def select_view(self, view):
+        return lambda: self.at.radio(key="active_view").set_value(view)
+
+    def run_flows(self, iteration):
+        """Ein Durchgang durch alle Schritte"""
+        at = self.at
+        self.step('open', lambda: at)
+        self.table = self.rng.choice(self.tables)
+        self.step(
+            'select',
+            lambda: at.text_input(key="catalog_query").set_value(self.table),
+            lambda: at.selectbox(key="selected_table").set_value(self.table)
+        )
+        self.step('preview', self.select_view("Preview"))
+
+        # Zufälliger Zeitraum, damit sich die Sitzungen nicht nur einen Cache-Eintrag teilen
+        offset = self.rng.randrange(max(1, self.days - CHART_RANGE_DAYS))
+        start = START_TIMESTAMP.date() + timedelta(days=offset)
+        end = start + timedelta(days=CHART_RANGE_DAYS - 1)
+        self.step(
+            'chart',
+            self.select_view("Diagram - Single"),
+            lambda: at.date_input(key=f"single_{self.table}_start_date").set_value(start),
+            lambda: at.date_input(key=f"single_{self.table}_end_date").set_value(end)
+        )
+        self.step(
+            'multi',
+            self.select_view("Diagram - Multi"),
+            lambda: at.text_input(key="comparison_search").set_value(LOAD_TABLE_PREFIX),
+            lambda: at.multiselect(key="comparison_table_selector").set_value(
+                self.rng.sample(self.tables, min(MULTI_TABLE_COUNT, len(self.tables)))
+            )
+        )
+        if self.upload:
+            name = f"{self.table}_s{self.number}_{iteration}.csv"
+            chunk = next(generate_chunks(UPLOAD_ROWS, seed=self.rng.randrange(2 ** 31), chunk_rows=UPLOAD_ROWS))
+            self.step(
+                'upload',
+                self.select_view("Upload"),
+                lambda: at.file_uploader[0].set_value((name, to_upload_csv(chunk), 'text/csv')),
+                lambda: at.button(key=f"upload_{name}").click()
+            )
+
+    def run(self, iterations, barrier):
+        barrier.wait()
+        for iteration in range(iterations):
+            self.run_flows(iteration)
+
+
+def warm_up(tables, rows, upload):
+    """Ein ungemessener Durchgang legt die Metatabellen an und startet die Job-Worker der App"""
+    session = Session(-1, tables, rows, upload)
+    session.run_flows(0)
+    return session.messages
+
+
+def run_level(sessions, tables, rows, iterations, upload, probe, storage):
+    """Startet sessions gleichzeitige Sitzungen und liefert die Kennzahlen der Stufe"""
+    clients = [Session(number, tables, rows, upload) for number in range(sessions)]
+    barrier = threading.Barrier(sessions + 1)
+    threads = [
+        threading.Thread(target=client.run, args=(iterations, barrier), name=f"session-{client.number}")
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+
+    rss_before = current_rss()
+    probe.reset()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    drain = wait_for_jobs(storage) if upload else 0.0
+
+    steps = {}
+    for name in STEPS:
+        durations = [d for client in clients for d in client.latencies[name]]
+        if not durations:
+            continue
+        steps[name] = {
+            'runs': len(durations),
+            'errors': sum(client.errors[name] for client in clients),
+            **percentiles(durations, 'latency')
+        }
+    flows = sessions * iterations
+    return {
+        'sessions': sessions,
+        'duration_s': duration,
+        'flows_per_s': flows / duration if duration else None,
+        'job_drain_s': drain,
+        'rss_before_mb': rss_before / 2 ** 20,
+        'rss_after_mb': current_rss() / 2 ** 20,
+        'pool': probe.summary(),
+        'steps': steps,
+        'messages': [message for client in clients for message in client.messages][:20]
+    }
+
+
+def format_ms(value, digits=0):
+    return '–' if value is None else f"{value:,.{digits}f}"
+
+
+def render_markdown(report):
+    """Erstellt die Markdown-Tabellen des Berichts"""
+    lines = [
+        f"# Lasttest {report['commit']} ({report['created_at']})",
+        "",
+        f"{report['tables']} Tabellen × {report['rows']:,} Zeilen · {report['iterations']} Durchgänge je Sitzung "
+        f"· Backend {report['backend']}",
+        "",
+        "## Latenz je Schritt",
+        "",
+        "| Sitzungen | Schritt | Läufe | Fehler | p50 [ms] | p95 [ms] | p99 [ms] |",
+        "|---:|---|---:|---:|---:|---:|---:|"
+    ]
+    for level in report['levels']:
+        for name, entry in level['steps'].items():
+            lines.append(
+                f"| {level['sessions']} | {name} | {entry['runs']} | {entry['errors']} "
+                f"| {format_ms(entry['latency_p50_ms'])} | {format_ms(entry['latency_p95_ms'])} "
+                f"| {format_ms(entry['latency_p99_ms'])} |"
+            )
+    lines += [
+        "",
+        "## Verbindungen und Speicher",
+        "",
+        "| Sitzungen | Abläufe/s | Wartezeit p50 [ms] | p95 [ms] | p99 [ms] | max [ms] | Timeouts "
+        "| max. belegt | max. Overflow | RSS davor [MB] | RSS max [MB] | RSS danach [MB] |",
+        "|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|---:|"
+    ]
+    for level in report['levels']:
+        pool = level['pool']
+        lines.append(
+            f"| {level['sessions']} | {level['flows_per_s']:.2f} | {format_ms(pool['wait_p50_ms'], 1)} "
+            f"| {format_ms(pool['wait_p95_ms'], 1)} | {format_ms(pool['wait_p99_ms'], 1)} "
+            f"| {format_ms(pool['wait_max_ms'], 1)} | {pool['timeouts']} | {pool['peak_checked_out']} "
+            f"| {pool['peak_overflow']} | {level['rss_before_mb']:.0f} | {pool['peak_rss_mb']:.0f} "
+            f"| {level['rss_after_mb']:.0f} |"
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest mit mehreren gleichzeitigen Sitzungen")
+    parser.add_argument('--sessions', type=int, nargs='+', default=DEFAULT_LEVELS,
+                        help="Gleichzeitigkeitsstufen (Anzahl Sitzungen)")
+    parser.add_argument('--iterations', type=int, default=3, help="Durchgänge je Sitzung")
+    parser.add_argument('--tables', type=int, default=DEFAULT_TABLES, help="Anzahl Testtabellen")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="Zeilen je Testtabelle")
+    parser.add_argument('--no-upload', action='store_true', help="Upload-Schritt auslassen")
+    parser.add_argument('--clear-caches', action='store_true',
+                        help="Datencaches vor jeder Stufe leeren (kalter Start statt geteilter Caches)")
+    parser.add_argument('--output-dir', default='bench_results', help="Zielverzeichnis für die Berichte")
+    parser.add_argument('--keep-tables', action='store_true', help="Testtabellen nicht löschen")
+    args = parser.parse_args()
+
+    # Backend wie in der App aus STORAGE_BACKEND (die Sitzungen teilen sich das Modul storage)
+    storage = create_storage()
+    print(f"Lege {args.tables} Testtabellen mit je {args.rows:,} Zeilen an ...")
+    tables = seed_tables(storage, args.tables, args.rows)
+
+    report = {
+        'commit': git_commit(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'backend': STORAGE_BACKEND,
+        'pandas': pd.__version__,
+        'tables': args.tables,
+        'rows': args.rows,
+        'iterations': args.iterations,
+        'levels': []
+    }
+    try:
+        with shared_runtime(), PoolProbe() as probe:
+            for message in warm_up(tables, args.rows, not args.no_upload):
+                print(f"  Aufwärmen: {message}")
+            for sessions in args.sessions:
+                if args.clear_caches:
+                    st.cache_data.clear()
+                print(f"Stufe mit {sessions} Sitzungen ...")
+                level = run_level(sessions, tables, args.rows, args.iterations, not args.no_upload, probe, storage)
+                report['levels'].append(level)
+                for message in level['messages']:
+                    print(f"  {message}")
+    finally:
+        if not args.keep_tables:
+            drop_tables(storage, tables)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    base_path = os.path.join(args.output_dir, f"loadtest_{report['commit']}_{STORAGE_BACKEND}")
+    with open(f"{base_path}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    markdown = render_markdown(report)
+    with open(f"{base_path}.md", 'w') as f:
+        f.write(markdown)
+    print(markdown)
+    print(f"Bericht gespeichert: {base_path}.json / {base_path}.md")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""Optionale Speicherprofilierung mit tracemalloc pro Durchlauf und pro gemessener Funktion.
+
+Mit MEMORY_PROFILE=1 verfolgt tracemalloc alle Python-Allokationen der
+Anwendung (deutlich langsamer, nur zur Diagnose gedacht). Erfasst werden:
+
+    - pro Span aus perf.py (alle @perf.timed-Funktionen und perf.span-Blöcke):
+      verbleibende Allokation und Spitzenwert während des Aufrufs
+    - pro vollständigem Durchlauf: aktueller und höchster Speicherstand sowie die
+      größten Allokationsstellen und der Zuwachs seit dem vorigen Durchlauf,
+      zugeordnet zur auslösenden Zeile im Code der Anwendung
+    - die Größe der st.cache_data-Einträge je Funktion (serialisiert)
+
+Ein Snapshot kostet je nach Heap bis zu Sekunden; mit MEMORY_SNAPSHOT_EVERY=n
+werden die Allokationsstellen nur bei jedem n-ten Durchlauf ermittelt.
+
+Die Ergebnisse erscheinen in der Sidebar unter "🧠 Speicherprofil" und werden
+als JSON-Zeile pro Durchlauf in MEMORY_DUMP geschrieben. Die Werte von
+tracemalloc gelten prozessweit: Laufen mehrere Sitzungen gleichzeitig, enthalten
+sie auch Allokationen der anderen Script-Threads.
+
+Start:
+    MEMORY_PROFILE=1 python3 -m streamlit run test.py
+    python memprof.py --dump data/memprof.jsonl --top 20    # größte Allokationsstellen aller Durchläufe
+"""
+import argparse
+import json
+import os
+import threading
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+MEMORY_PROFILE = os.environ.get('MEMORY_PROFILE', '0') == '1'
+MEMORY_DUMP_PATH = os.environ.get('MEMORY_DUMP', 'data/memprof.jsonl')
+TRACE_FRAMES = int(os.environ.get('MEMORY_TRACE_FRAMES', 25))  # Aufruftiefe je Allokation
+SNAPSHOT_EVERY = max(1, int(os.environ.get('MEMORY_SNAPSHOT_EVERY', 1)))  # Snapshot bei jedem n-ten Durchlauf
+TOP_ALLOCATIONS = 15
+HISTORY_RUNS = 50  # Durchläufe, die für die Admin-Ansicht im Speicher bleiben
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+IGNORED_LOCATIONS = ('<frozen importlib', '<unknown>', tracemalloc.__file__)
+# Messhüllen sind nie die Ursache einer Allokation; gezählt wird der Aufrufer
+WRAPPER_FILES = {os.path.join(APP_DIR, name) for name in ['perf.py', 'memprof.py']}
+
+_local = threading.local()
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY_RUNS)
+_last_snapshot = None
+_runs = 0
+
+
+def enabled():
+    """True, wenn die Speicherprofilierung aktiv ist"""
+    return MEMORY_PROFILE and tracemalloc.is_tracing()
+
+
+def _frames():
+    if not hasattr(_local, 'frames'):
+        _local.frames = []
+    return _local.frames
+
+
+def _enter():
+    """Beginnt einen Messrahmen; der Spitzenwert des umgebenden Rahmens bleibt erhalten"""
+    current, peak = tracemalloc.get_traced_memory()
+    frames = _frames()
+    if frames:
+        frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+    frame = {'start': current, 'peak': 0}
+    frames.append(frame)
+    tracemalloc.reset_peak()
+    return frame
+
+
+def _exit(frame):
+    """Schließt einen Messrahmen; liefert (verbleibende Allokation, Spitzenwert) in Bytes"""
+    frames = _frames()
+    for position in range(len(frames) - 1, -1, -1):
+        if frames[position] is frame:
+            del frames[position]
+            break
+    current, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, frame['peak'])
+    if frames:
+        frames[-1]['peak'] = max(frames[-1]['peak'], peak)
+    return current - frame['start'], max(peak - frame['start'], 0)
+
+
+@contextmanager
+def track(entry):
+    """Ergänzt einen perf-Span um alloc_bytes und peak_bytes (nur mit MEMORY_PROFILE)"""
+    if not enabled():
+        yield entry
+        return
+    frame = _enter()
+    try:
+        yield entry
+    finally:
+        entry['alloc_bytes'], entry['peak_bytes'] = _exit(frame)
+
+
+def begin_run():
+    """Startet tracemalloc bei Bedarf und beginnt die Messung eines Durchlaufs"""
+    if not MEMORY_PROFILE:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+    # Ein abgebrochener Durchlauf (st.stop, Ausnahme) hinterlässt keinen offenen Rahmen
+    _frames().clear()
+    _local.run_frame = _enter()
+
+
+def short_path(filename):
+    """Pfad relativ zur Anwendung bzw. ab dem Paketverzeichnis (z.B. pandas/core/frame.py)"""
+    if filename.startswith(APP_DIR):
+        return os.path.relpath(filename, APP_DIR)
+    parts = filename.split(os.sep)
+    if 'site-packages' in parts:
+        return '/'.join(parts[parts.index('site-packages') + 1:])
+    return '/'.join(parts[-2:])
+
+
+def app_location(traceback):
+    """Jüngster Aufrufrahmen im Code der Anwendung, sonst der Ort der Allokation"""
+    for frame in reversed(traceback):
+        if frame.filename.startswith(APP_DIR) and frame.filename not in WRAPPER_FILES:
+            return f"{short_path(frame.filename)}:{frame.lineno}"
+    return origin_location(traceback)
+
+
+def origin_location(traceback):
+    """Ort der eigentlichen Allokation (z.B. innerhalb von pandas)"""
+    frame = traceback[-1] if len(traceback) else None
+    return f"{short_path(frame.filename)}:{frame.lineno}" if frame else "?"
+
+
+def group_statistics(statistics, size_attr='size', count_attr='count', top=TOP_ALLOCATIONS):
+    """Fasst tracemalloc-Statistiken nach Codezeile der Anwendung zusammen"""
+    groups = {}
+    for stat in statistics:
+        if len(stat.traceback) and stat.traceback[-1].filename.startswith(IGNORED_LOCATIONS):
+            continue
+        location = app_location(stat.traceback)
+        group = groups.setdefault(location, {'location': location, 'origin': origin_location(stat.traceback),
+                                             'size_bytes': 0, 'count': 0})
+        group['size_bytes'] += getattr(stat, size_attr)
+        group['count'] += getattr(stat, count_attr)
+    ranked = sorted(groups.values(), key=lambda group: abs(group['size_bytes']), reverse=True)
+    return [group for group in ranked if group['size_bytes']][:top]
+
+
+def cache_entry_sizes():
+    """Anzahl und Größe der st.cache_data-Einträge je Funktion (serialisiert)"""
+    from streamlit.runtime.caching.cache_data_api import get_data_cache_stats_provider
+
+    sizes = {}
+    for stats in get_data_cache_stats_provider().get_stats().values():
+        for stat in stats:
+            name = stat.cache_name.rsplit('.', 1)[-1]
+            entry = sizes.setdefault(name, {'function': name, 'entries': 0, 'total_bytes': 0, 'max_bytes': 0})
+            entry['entries'] += 1
+            entry['total_bytes'] += stat.byte_length
+            entry['max_bytes'] = max(entry['max_bytes'], stat.byte_length)
+    return sorted(sizes.values(), key=lambda entry: entry['total_bytes'], reverse=True)
+
+
+def finish_run(run_id, spans, label='rerun'):
+    """Schließt die Messung eines Durchlaufs ab, speichert sie in der Historie und im Dump"""
+    global _last_snapshot, _runs
+    frame = getattr(_local, 'run_frame', None)
+    if not enabled() or frame is None:
+        return None
+    _local.run_frame = None
+    alloc, peak = _exit(frame)
+    current, _ = tracemalloc.get_traced_memory()
+    with _lock:
+        _runs += 1
+        take_snapshot = _runs % SNAPSHOT_EVERY == 0
+    snapshot = previous = None
+    if take_snapshot:
+        snapshot = tracemalloc.take_snapshot()
+        with _lock:
+            previous, _last_snapshot = _last_snapshot, snapshot
+
+    record = {
+        'ts': datetime.now().isoformat(timespec='milliseconds'),
+        'run_id': run_id,
+        'label': label,
+        'thread': threading.current_thread().name,
+        'current_bytes': current,
+        'run_alloc_bytes': alloc,
+        'run_peak_bytes': peak,
+        'top_allocations': group_statistics(snapshot.statistics('traceback')) if snapshot else [],
+        'top_growth': group_statistics(
+            snapshot.compare_to(previous, 'traceback') if snapshot and previous else [],
+            size_attr='size_diff', count_attr='count_diff'
+        ),
+        'spans': [
+            {key: span.get(key) for key in ['name', 'table', 'duration_ms', 'bytes', 'alloc_bytes', 'peak_bytes']}
+            for span in spans if 'peak_bytes' in span
+        ],
+        'caches': cache_entry_sizes()
+    }
+    with _lock:
+        _history.append(record)
+        if MEMORY_DUMP_PATH:
+            os.makedirs(os.path.dirname(MEMORY_DUMP_PATH) or '.', exist_ok=True)
+            with open(MEMORY_DUMP_PATH, 'a') as f:
+                f.write(json.dumps(record, default=str) + '\n')
+    return record
+
+
+def history():
+    """Die zuletzt gemessenen Durchläufe (älteste zuerst)"""
+    with _lock:
+        return list(_history)
+
+
+def function_summary(records):
+    """Speicherkennzahlen je gemessener Funktion über mehrere Durchläufe"""
+    spans = pd.DataFrame([span for record in records for span in record['spans']])
+    if spans.empty:
+        return spans
+    return (
+        spans.groupby('name')
+        .agg(calls=('name', 'size'), peak_bytes=('peak_bytes', 'max'), alloc_bytes=('alloc_bytes', 'mean'),
+             result_bytes=('bytes', 'max'))
+        .sort_values('peak_bytes', ascending=False)
+        .reset_index()
+    )
+
+
+def load_dump(path=MEMORY_DUMP_PATH):
+    """Liest die Durchläufe einer Dump-Datei"""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Auswertung der Speicherprofil-Datei")
+    parser.add_argument('--dump', default=MEMORY_DUMP_PATH, help="JSON-Lines-Datei aus MEMORY_DUMP")
+    parser.add_argument('--top', type=int, default=TOP_ALLOCATIONS, help="Anzahl der Einträge je Liste")
+    args = parser.parse_args()
+
+    records = load_dump(args.dump)
+    if not records:
+        print("Keine Durchläufe in der Dump-Datei")
+        return
+    print(f"{len(records):,} Durchläufe, höchster Spitzenwert "
+          f"{max(r['run_peak_bytes'] for r in records) / 2 ** 20:,.1f} MB\n")
+
+    allocations = pd.DataFrame([a for r in records for a in r['top_allocations']])
+    if not allocations.empty:
+        print("Größte Allokationsstellen (Maximum über alle Durchläufe):")
+        print(allocations.groupby(['location', 'origin'])['size_bytes'].max()
+              .sort_values(ascending=False).head(args.top).to_string(), '\n')
+
+    growth = pd.DataFrame([g for r in records for g in r['top_growth']])
+    if not growth.empty:
+        print("Zuwachs zwischen Durchläufen (Summe):")
+        print(growth.groupby('location')['size_bytes'].sum()
+              .sort_values(ascending=False).head(args.top).to_string(), '\n')
+
+    functions = function_summary(records)
+    if not functions.empty:
+        print("Funktionen nach Spitzenwert:")
+        print(functions.head(args.top).to_string(index=False), '\n')
+
+    caches = pd.DataFrame(records[-1]['caches'])
+    if not caches.empty:
+        print("Cache-Einträge (letzter Durchlauf):")
+        print(caches.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""Leichtgewichtige Zeitmessung für Datenbankabfragen, pandas-Verarbeitung und Diagramme.
+
+Jeder Messpunkt (Span) erfasst Dauer, Zeilenzahl und Größe in Bytes. Die Spans
+eines Streamlit-Durchlaufs werden pro Thread gesammelt (jede Sitzung läuft in
+einem eigenen Script-Thread) und im Performance-Panel angezeigt. Ist die
+Umgebungsvariable PERF_LOG gesetzt, wird jeder Span zusätzlich als JSON-Zeile
+in diese Datei geschrieben.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import pandas as pd
+
+import memprof
+
+PERF_LOG_PATH = os.environ.get('PERF_LOG')
+DEEP_SIZE_MAX_ROWS = 1_000_000  # Darüber wird nur die flache Speichergröße ermittelt
+
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def start_run(label='rerun'):
+    """Beginnt die Sammlung für einen neuen Durchlauf"""
+    _local.run_id = uuid.uuid4().hex[:8]
+    _local.label = label
+    _local.spans = []
+
+
+def current_run_id():
+    """Kennung des aktuellen Durchlaufs (wie im JSON-Lines-Log)"""
+    return getattr(_local, 'run_id', None)
+
+
+def current_spans():
+    """Liefert die im aktuellen Durchlauf gesammelten Spans"""
+    return list(getattr(_local, 'spans', []))
+
+
+def frame_size(df):
+    """Liefert Zeilenzahl und Speichergröße eines DataFrames"""
+    deep = len(df) <= DEEP_SIZE_MAX_ROWS
+    return len(df), int(df.memory_usage(index=True, deep=deep).sum())
+
+
+def result_size(result):
+    """Schätzt Zeilen und Bytes eines Funktionsergebnisses (DataFrame, Tupel, Figure)"""
+    if isinstance(result, pd.DataFrame):
+        return frame_size(result)
+    if isinstance(result, tuple):
+        rows, size = 0, 0
+        for item in result:
+            item_rows, item_size = result_size(item)
+            rows += item_rows or 0
+            size += item_size or 0
+        return rows, size
+    if hasattr(result, 'data') and hasattr(result, 'layout'):
+        # Plotly-Figure: Anzahl der Datenpunkte über alle Traces
+        points = sum(len(trace.x) for trace in result.data if getattr(trace, 'x', None) is not None)
+        return points, None
+    return None, None
+
+
+def _record(entry):
+    spans = getattr(_local, 'spans', None)
+    if spans is not None:
+        spans.append(entry)
+    if PERF_LOG_PATH:
+        line = json.dumps({
+            'ts': datetime.now().isoformat(timespec='milliseconds'),
+            'run_id': getattr(_local, 'run_id', None),
+            **entry
+        }, default=str)
+        with _log_lock:
+            with open(PERF_LOG_PATH, 'a') as f:
+                f.write(line + '\n')
+
+
+@contextmanager
+def span(name, **meta):
+    """Misst die Dauer eines Blocks; rows/bytes können im gelieferten Dict gesetzt werden"""
+    entry = {'name': name, 'rows': None, 'bytes': None, **meta}
+    started = time.perf_counter()
+    try:
+        with memprof.track(entry):
+            yield entry
+    finally:
+        entry['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        _record(entry)
+
+
+def timed(name):
+    """Dekorator, der Dauer sowie Zeilen und Bytes des Ergebnisses erfasst
+
+    Über einer st.cache_data-Funktion angewendet, zeigt eine Dauer nahe null
+    einen Cache-Treffer an. Die clear()-Methode gecachter Funktionen bleibt erhalten.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as entry:
+                result = func(*args, **kwargs)
+                entry['rows'], entry['bytes'] = result_size(result)
+            return result
+
+        if hasattr(func, 'clear'):
+            wrapper.clear = func.clear
+        return wrapper
+    return decorator
+
+
+def stream(name, items, **meta):
+    """Misst einen Iterator von Chunks: Zeit bis zum ersten Chunk und reine Abrufzeit
+
+    Die Verarbeitung beim Aufrufer zwischen zwei Chunks zählt nicht zur Dauer.
+    Der Span wird auch bei vorzeitigem Abbruch des Iterators erfasst.
+    """
+    entry = {'name': name, 'rows': 0, 'bytes': 0, 'first_row_ms': None, **meta}
+    elapsed = 0.0
+    iterator = iter(items)
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                elapsed += time.perf_counter() - started
+            if entry['first_row_ms'] is None:
+                entry['first_row_ms'] = round(elapsed * 1000, 3)
+            entry['rows'] += len(item)
+            entry['bytes'] += int(item.nbytes if hasattr(item, 'nbytes') else item.memory_usage(index=False).sum())
+            yield item
+    finally:
+        entry['duration_ms'] = round(elapsed * 1000, 3)
+        _record(entry)
@@ -0,0 +1,227 @@
+"""Protokoll langsamer Abfragen mit automatisch erfasstem EXPLAIN-Plan (nur PostgreSQL).
+
+Jede Anweisung, die länger als SLOW_QUERY_THRESHOLD_MS dauert, wird mitsamt
+Parametern und Ausführungsplan (EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)) in der
+Tabelle _slow_query_log gespeichert. Der Plan wird in einem Hintergrund-Thread
+über eine eigene Verbindung ermittelt, damit die auslösende Abfrage nicht
+zusätzlich verzögert wird. Gestreamte Abfragen (serverseitiger Cursor) werden
+über den gesamten Abruf aller Chunks gemessen.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from sqlalchemy import event, text
+
+SLOW_QUERY_TABLE = '_slow_query_log'
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_MS', 1000))
+# EXPLAIN ANALYZE führt die Abfrage erneut aus; mit 0 wird nur der geschätzte Plan erfasst
+SLOW_QUERY_ANALYZE = os.environ.get('SLOW_QUERY_ANALYZE', '1') == '1'
+MAX_PENDING_EXPLAINS = 10
+
+TABLE_PATTERN = re.compile(r'\bFROM\s+([A-Za-z_][A-Za-z0-9_]*)', re.IGNORECASE)
+
+logger = logging.getLogger('querylog')
+
+
+def ensure_slow_query_log(conn):
+    """Legt die Protokolltabelle an"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SLOW_QUERY_TABLE} (
+            id BIGSERIAL PRIMARY KEY,
+            logged_at TIMESTAMP NOT NULL DEFAULT now(),
+            table_name TEXT,
+            duration_ms DOUBLE PRECISION NOT NULL,
+            statement TEXT NOT NULL,
+            parameters TEXT,
+            plan JSONB,
+            seq_scans INTEGER,
+            shared_hit_blocks BIGINT,
+            shared_read_blocks BIGINT
+        )
+    """))
+    conn.execute(text(f"""
+        CREATE INDEX IF NOT EXISTS {SLOW_QUERY_TABLE}_table_idx
+        ON {SLOW_QUERY_TABLE} (table_name, duration_ms DESC)
+    """))
+
+
+def extract_table_name(statement):
+    """Ermittelt die erste Tabelle nach FROM (ohne interne Verwaltungstabellen)"""
+    for name in TABLE_PATTERN.findall(statement):
+        if not name.startswith('_'):
+            return name
+    return None
+
+
+def summarize_plan(plan):
+    """Zählt Seq Scans und Puffer-Zugriffe eines JSON-Plans"""
+    seq_scans = 0
+    stack = [plan.get('Plan', {})]
+    while stack:
+        node = stack.pop()
+        if node.get('Node Type') == 'Seq Scan':
+            seq_scans += 1
+        stack.extend(node.get('Plans', []))
+    root = plan.get('Plan', {})
+    return seq_scans, root.get('Shared Hit Blocks'), root.get('Shared Read Blocks')
+
+
+class SlowQueryLog:
+    """Hängt sich an die Cursor-Events einer Engine und protokolliert langsame Anweisungen"""
+
+    def __init__(self, engine, threshold_ms=SLOW_QUERY_THRESHOLD_MS, analyze=SLOW_QUERY_ANALYZE):
+        self.engine = engine
+        self.threshold_ms = threshold_ms
+        self.analyze = analyze
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        self._pending = 0
+        self._lock = threading.Lock()
+        with engine.begin() as conn:
+            ensure_slow_query_log(conn.execution_options(skip_query_log=True))
+        self.watch(engine)
+
+    def watch(self, engine):
+        """Protokolliert auch die Anweisungen einer weiteren Engine (z.B. Lese-Pool oder Replikat)
+
+        Plan und Protokolleintrag werden über die Engine der Primärdatenbank erfasst.
+        """
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_start'].pop()
+        duration_ms = (time.perf_counter() - started) * 1000
+        if executemany or conn.get_execution_options().get('skip_query_log'):
+            return
+        if context is not None and context.execution_options.get('stream_results'):
+            # Serverseitiger Cursor: hier ist nur der Cursor geöffnet, gemessen wird in stream()
+            conn.info['streamed_query'] = (statement, parameters)
+            return
+        self.record(statement, parameters, duration_ms)
+
+    def record(self, statement, parameters, duration_ms):
+        """Protokolliert eine Abfrage oberhalb des Schwellwerts (Plan im Hintergrund)"""
+        if duration_ms < self.threshold_ms:
+            return
+        if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return
+        with self._lock:
+            if self._pending >= MAX_PENDING_EXPLAINS:
+                logger.warning("Zu viele ausstehende EXPLAINs, Abfrage wird nicht protokolliert")
+                return
+            self._pending += 1
+        self._executor.submit(self._capture, statement, parameters, duration_ms)
+
+    def stream(self, conn, items):
+        """Misst eine gestreamte Abfrage (stream_results) über die gesamte Iteration
+
+        Die Datenbank arbeitet beim Abholen der Chunks; gezählt wird die Zeit in
+        execute und allen Abrufen, nicht die Verarbeitung beim Aufrufer dazwischen.
+        Auch ein vorzeitig abgebrochener Abruf wird mit der bis dahin gemessenen
+        Dauer protokolliert.
+        """
+        elapsed = 0.0
+        iterator = iter(items)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - started
+                yield item
+        finally:
+            streamed = conn.info.pop('streamed_query', None)
+            if streamed is not None:
+                self.record(*streamed, elapsed * 1000)
+
+    def _handle_error(self, exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_start'):
+            conn.info['query_start'].pop()
+        if conn is not None:
+            conn.info.pop('streamed_query', None)
+
+    def _capture(self, statement, parameters, duration_ms):
+        try:
+            options = "ANALYZE, BUFFERS, FORMAT JSON" if self.analyze else "FORMAT JSON"
+            raw = self.engine.raw_connection()
+            try:
+                with raw.cursor() as cursor:
+                    cursor.execute(f"EXPLAIN ({options}) {statement}", parameters)
+                    plan = cursor.fetchone()[0][0]
+                raw.rollback()
+            finally:
+                raw.close()
+
+            seq_scans, hit_blocks, read_blocks = summarize_plan(plan)
+            with self.engine.begin() as conn:
+                conn.execution_options(skip_query_log=True).execute(text(f"""
+                    INSERT INTO {SLOW_QUERY_TABLE}
+                        (table_name, duration_ms, statement, parameters, plan,
+                         seq_scans, shared_hit_blocks, shared_read_blocks)
+                    VALUES
+                        (:table_name, :duration_ms, :statement, :parameters, CAST(:plan AS JSONB),
+                         :seq_scans, :hit_blocks, :read_blocks)
+                """), {
+                    'table_name': extract_table_name(statement),
+                    'duration_ms': duration_ms,
+                    'statement': statement.strip(),
+                    'parameters': json.dumps(parameters, default=str),
+                    'plan': json.dumps(plan),
+                    'seq_scans': seq_scans,
+                    'hit_blocks': hit_blocks,
+                    'read_blocks': read_blocks
+                })
+        except Exception as e:
+            logger.error("EXPLAIN für langsame Abfrage fehlgeschlagen: %s", e)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+
+def load_worst_tables(engine, limit=20):
+    """Fasst die protokollierten Abfragen pro Tabelle zusammen (langsamste zuerst)"""
+    with engine.connect() as conn:
+        conn.execution_options(skip_query_log=True)
+        return pd.read_sql(text(f"""
+            SELECT
+                table_name,
+                COUNT(*) as queries,
+                MAX(duration_ms) as max_ms,
+                AVG(duration_ms) as avg_ms,
+                SUM(CASE WHEN seq_scans > 0 THEN 1 ELSE 0 END) as with_seq_scan,
+                MAX(logged_at) as last_seen
+            FROM {SLOW_QUERY_TABLE}
+            GROUP BY table_name
+            ORDER BY max_ms DESC
+            LIMIT :limit
+        """), conn, params={'limit': limit})
+
+
+def load_slow_queries(engine, table_name=None, limit=20):
+    """Liefert die langsamsten protokollierten Abfragen, optional für eine Tabelle"""
+    where_clause = "WHERE table_name = :table_name" if table_name else ""
+    with engine.connect() as conn:
+        conn.execution_options(skip_query_log=True)
+        return pd.read_sql(text(f"""
+            SELECT logged_at, table_name, duration_ms, seq_scans,
+                   shared_hit_blocks, shared_read_blocks, statement, parameters,
+                   plan::text as plan
+            FROM {SLOW_QUERY_TABLE}
+            {where_clause}
+            ORDER BY duration_ms DESC
+            LIMIT :limit
+        """), conn, params={'table_name': table_name, 'limit': limit})
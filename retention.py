@@ -0,0 +1,216 @@
+"""Aufbewahrungs- und Verdichtungsrichtlinien pro Tabelle.
+
+Eine Richtlinie legt fest, wie lange Rohdaten erhalten bleiben (raw_days) und
+ab welchem Alter die 1-Minuten-Mittelwerte zu Stundenmittelwerten verdichtet
+werden (minute_days, optional). Die verdichteten Werte ersetzen die Rohdaten in
+derselben Tabelle, sodass alle Ansichten unverändert weiterarbeiten.
+
+Die Verdichtung läuft tageweise in jeweils einer kurzen Transaktion; andere
+Schreibzugriffe warten höchstens die Dauer eines Tages.
+
+Start:
+    python retention.py --set-policy csv1=7:90   # Rohdaten 7 Tage, Minutenwerte 90 Tage
+    python retention.py --once                   # einmal alle Richtlinien anwenden
+    python retention.py --interval 3600          # stündlich
+"""
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from anomalies import clear_anomalies
+from availability import clear_coverage
+from database import validate_table_name
+
+RETENTION_POLICY_TABLE = '_retention_policies'
+COMPACTION_INTERVAL = 3600  # Sekunden zwischen zwei Läufen
+COMPACTION_PAUSE = 0.05  # Pause zwischen zwei Tagen, damit wartende Schreibzugriffe zum Zug kommen
+
+# Stufe → (Länge des Zeitpräfixes, Auffüllung zur vollen Uhrzeit)
+STAGES = {
+    'minute': (5, ':00'),
+    'hour': (2, ':00:00')
+}
+
+logger = logging.getLogger('retention')
+
+
+def ensure_retention_policies(conn):
+    """Legt die Richtlinientabelle an (einmal beim Erstellen des Storage-Backends)"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {RETENTION_POLICY_TABLE} (
+            table_name TEXT PRIMARY KEY,
+            raw_days INTEGER NOT NULL,
+            minute_days INTEGER
+        )
+    """))
+
+
+def set_retention_policy(engine, table_name, raw_days, minute_days=None):
+    """Speichert die Richtlinie einer Tabelle"""
+    validate_table_name(table_name)
+    if minute_days is not None and minute_days < raw_days:
+        raise ValueError("Minutenwerte müssen mindestens so lange wie Rohdaten aufbewahrt werden")
+    with engine.begin() as conn:
+        ensure_retention_policies(conn)
+        conn.execute(text(f"""
+            INSERT INTO {RETENTION_POLICY_TABLE} (table_name, raw_days, minute_days)
+            VALUES (:table_name, :raw_days, :minute_days)
+            ON CONFLICT (table_name)
+            DO UPDATE SET raw_days = excluded.raw_days, minute_days = excluded.minute_days
+        """), {'table_name': table_name, 'raw_days': raw_days, 'minute_days': minute_days})
+
+
+def load_retention_policies(engine):
+    """Liefert alle Richtlinien als DataFrame"""
+    with engine.connect() as conn:
+        return pd.read_sql(text(f"SELECT * FROM {RETENTION_POLICY_TABLE} ORDER BY table_name"), conn)
+
+
+def pending_days(conn, table_name, cutoff, stage):
+    """Tage vor cutoff, die noch feiner als die Zielstufe aufgelöst sind"""
+    length, suffix = STAGES[stage]
+    rows = conn.execute(text(f"""
+        SELECT date FROM {table_name}
+        WHERE date < :cutoff AND date != ''
+        GROUP BY date
+        HAVING COUNT(*) > COUNT(DISTINCT substr(time, 1, {length}))
+            OR MIN(substr(time, {length + 1})) != :suffix
+            OR MAX(substr(time, {length + 1})) != :suffix
+        ORDER BY date
+    """), {'cutoff': cutoff, 'suffix': suffix})
+    return [row[0] for row in rows]
+
+
+def compact_day(storage, table_name, day, stage):
+    """Ersetzt die Messwerte eines Tages durch Mittelwerte der Stufe; liefert (vorher, nachher)"""
+    length, suffix = STAGES[stage]
+    with storage.write_transaction(table_name) as conn:
+        storage.lock_for_rewrite(conn, table_name)
+        aggregated = pd.read_sql(text(f"""
+            SELECT
+                MIN(index) as index,
+                date,
+                substr(time, 1, {length}) || :suffix as time,
+                AVG(CAST(value AS DOUBLE PRECISION)) as value,
+                COUNT(*) as samples
+            FROM {table_name}
+            WHERE date = :day
+            GROUP BY date, substr(time, 1, {length})
+            ORDER BY 3
+        """), conn, params={'day': day, 'suffix': suffix})
+        conn.execute(text(f"DELETE FROM {table_name} WHERE date = :day"), {'day': day})
+        clear_coverage(conn, table_name, day, day)
+        # Markierungen beziehen sich auf die ersetzten Einzelwerte
+        clear_anomalies(conn, table_name, day, day)
+        aggregated['value'] = aggregated['value'].astype(str)
+        storage.insert_measurements(conn, table_name, aggregated, detect=False)
+    return int(aggregated['samples'].sum()), len(aggregated)
+
+
+def apply_policy(storage, table_name, raw_days, minute_days=None, progress=None):
+    """Wendet die Richtlinie einer Tabelle an und liefert eine Zusammenfassung
+
+    progress(erledigt, gesamt) wird nach jedem verdichteten Tag aufgerufen.
+    """
+    validate_table_name(table_name)
+    today = date.today()
+    stages = [('minute', raw_days)]
+    if minute_days is not None and not pd.isna(minute_days):
+        stages.append(('hour', int(minute_days)))
+
+    summary = {'table': table_name, 'days': 0, 'rows_before': 0, 'rows_after': 0,
+               'bytes_before': storage.table_size(table_name), 'bytes_after': None}
+    # Ältere Tage zuerst auf Stundenwerte, danach die jüngeren auf Minutenwerte; jeder Tag
+    # wird nur einmal auf seine gröbste fällige Stufe verdichtet
+    work = {}
+    for stage, days in reversed(stages):
+        cutoff = (today - timedelta(days=days)).strftime('%Y-%m-%d')
+        with storage.engine.connect() as conn:
+            for day in pending_days(conn, table_name, cutoff, stage):
+                work.setdefault(day, stage)
+    for day, stage in work.items():
+        before, after = compact_day(storage, table_name, day, stage)
+        summary['days'] += 1
+        summary['rows_before'] += before
+        summary['rows_after'] += after
+        if progress is not None:
+            progress(summary['days'], len(work))
+        time.sleep(COMPACTION_PAUSE)
+
+    if summary['days']:
+        storage.reclaim_space(table_name)
+    summary['bytes_after'] = storage.table_size(table_name)
+    return summary
+
+
+def format_summary(summary):
+    """Einzeilige Meldung über die verdichteten Zeilen und den freigegebenen Speicher"""
+    message = (
+        f"{summary['table']}: {summary['days']} Tag(e) verdichtet, "
+        f"{summary['rows_before']:,} → {summary['rows_after']:,} Zeilen"
+    )
+    if summary['bytes_before'] is not None and summary['bytes_after'] is not None:
+        reclaimed = (summary['bytes_before'] - summary['bytes_after']) / 1024 / 1024
+        message += f", {reclaimed:,.1f} MB freigegeben"
+    return message
+
+
+def run_once(storage):
+    """Wendet alle gespeicherten Richtlinien an"""
+    summaries = []
+    existing_tables = set(storage.list_tables())
+    for _, policy in load_retention_policies(storage.engine).iterrows():
+        if policy['table_name'] not in existing_tables:
+            continue
+        try:
+            summary = apply_policy(storage, policy['table_name'], int(policy['raw_days']), policy['minute_days'])
+            logger.info(format_summary(summary))
+            summaries.append(summary)
+        except Exception as e:
+            logger.error("Verdichtung von %s fehlgeschlagen: %s", policy['table_name'], e)
+    return summaries
+
+
+def parse_policy_argument(value):
+    """Wandelt 'tabelle=rohdaten_tage[:minuten_tage]' in (tabelle, raw_days, minute_days) um"""
+    table_name, separator, days = value.partition('=')
+    raw_days, _, minute_days = days.partition(':')
+    if not separator or not raw_days.isdigit() or (minute_days and not minute_days.isdigit()):
+        raise argparse.ArgumentTypeError(
+            f"Ungültige Richtlinie '{value}', erwartet tabelle=rohdaten_tage[:minuten_tage]"
+        )
+    return validate_table_name(table_name), int(raw_days), int(minute_days) if minute_days else None
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Verdichtet alte Messwerte nach Aufbewahrungsrichtlinien")
+    parser.add_argument('--set-policy', action='append', type=parse_policy_argument,
+                        metavar='TABELLE=ROH[:MINUTEN]', help="Richtlinie speichern (Tage)")
+    parser.add_argument('--interval', type=float, default=COMPACTION_INTERVAL, help="Wartezeit in Sekunden")
+    parser.add_argument('--once', action='store_true', help="Nur einen Durchlauf ausführen")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    storage = create_storage()
+    if args.set_policy:
+        for table_name, raw_days, minute_days in args.set_policy:
+            set_retention_policy(storage.engine, table_name, raw_days, minute_days)
+            logger.info("Richtlinie gespeichert: %s → Rohdaten %d Tage, Minutenwerte %s Tage",
+                        table_name, raw_days, minute_days if minute_days is not None else "unbegrenzt")
+        return
+
+    while True:
+        run_once(storage)
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""Lese-/Schreib-Routing mit getrennten Connection-Pools und Lese-Replikaten (nur PostgreSQL).
+
+Schreibzugriffe (Import, Anlegen, Löschen, Verwaltungstabellen) laufen über
+den Schreib-Pool der Primärdatenbank, lesende Abfragen des Dashboards über
+einen eigenen Lese-Pool. Ein großer Import belegt damit nicht mehr die
+Verbindungen, die die Diagramme benötigen.
+
+Sind Replikate konfiguriert (DB_READ_REPLICAS), werden Messwertabfragen
+reihum auf sie verteilt, solange ihre Replikationsverzögerung höchstens
+REPLICA_MAX_LAG_SECONDS beträgt. Die Verzögerung wird höchstens alle
+REPLICA_CHECK_INTERVAL Sekunden gemessen. Ein nicht erreichbares oder zu weit
+zurückliegendes Replikat wird übergangen, ebenso eines, dessen Datenversion der
+abgefragten Tabelle (_table_versions) hinter der Primärdatenbank liegt. Die
+Version wird mit jedem Schreibvorgang in derselben Transaktion erhöht, daher
+gilt das auch für Importe anderer Prozesse (Job-Worker, Ordnerüberwachung).
+Sonst liest die Abfrage vom Lese-Pool der Primärdatenbank.
+
+Konfiguration über Umgebungsvariablen:
+    DB_WRITE_POOL_SIZE, DB_WRITE_MAX_OVERFLOW     Schreib-Pool (Standard 5 / 5)
+    DB_READ_POOL_SIZE, DB_READ_MAX_OVERFLOW       Lese-Pools je Datenbank (Standard 10 / 10)
+    DB_READ_REPLICAS                              z.B. "localhost:5433,replica2:5432"
+    REPLICA_MAX_LAG_SECONDS                       Standard 5
+
+Start:
+    DB_READ_REPLICAS=localhost:5433 python routing.py    # Replikate, Verzögerung und Pool-Auslastung
+"""
+import argparse
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from database import DB_CONFIG, create_db_engine, get_table_version
+
+WRITE_POOL_SIZE = int(os.environ.get('DB_WRITE_POOL_SIZE', 5))
+WRITE_MAX_OVERFLOW = int(os.environ.get('DB_WRITE_MAX_OVERFLOW', 5))
+READ_POOL_SIZE = int(os.environ.get('DB_READ_POOL_SIZE', 10))
+READ_MAX_OVERFLOW = int(os.environ.get('DB_READ_MAX_OVERFLOW', 10))
+READ_REPLICAS = [address.strip() for address in os.environ.get('DB_READ_REPLICAS', '').split(',') if address.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_CHECK_INTERVAL = 5  # Sekunden zwischen zwei Messungen der Replikationsverzögerung
+REPLICA_RETRY_INTERVAL = 30  # Sekunden, bis ein nicht erreichbares Replikat erneut versucht wird
+REPLICA_CONNECT_TIMEOUT = 3  # Sekunden für den Verbindungsaufbau zu einem Replikat
+
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+logger = logging.getLogger('routing')
+
+
+def replica_config(address, config=DB_CONFIG):
+    """Verbindungsdaten eines Replikats ('host' oder 'host:port', sonst wie die Primärdatenbank)"""
+    host, _, port = address.partition(':')
+    return {**config, 'host': host, 'port': int(port) if port else config['port']}
+
+
+def pool_status(name, role, engine):
+    """Kennzahlen eines QueuePools (Größe, belegte und freie Verbindungen, Auslastung)"""
+    pool = engine.pool
+    size = pool.size()
+    checked_out = pool.checkedout()
+    capacity = size + max(pool._max_overflow, 0)
+    return {
+        'pool': name,
+        'role': role,
+        'size': size,
+        'checked_out': checked_out,
+        'idle': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'capacity': capacity,
+        'utilization': checked_out / capacity if capacity else None
+    }
+
+
+class Replica:
+    """Lese-Pool eines Replikats mit zuletzt gemessener Verzögerung"""
+
+    def __init__(self, address, engine):
+        self.address = address
+        self.engine = engine
+        self.lag = None
+        self.checked_at = 0.0
+        self.error = None
+
+
+class ReadRouter:
+    """Wählt für lesende Abfragen ein Replikat oder den Lese-Pool der Primärdatenbank"""
+
+    def __init__(self, primary_engine, replica_engines=None, max_lag=REPLICA_MAX_LAG_SECONDS,
+                 check_interval=REPLICA_CHECK_INTERVAL):
+        self.primary = primary_engine
+        self.replicas = [Replica(address, engine) for address, engine in (replica_engines or {}).items()]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.routed = {'primary': 0, 'replica': 0, 'fallback': 0}
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._lock = threading.Lock()
+
+    def measure_lag(self, replica):
+        """Misst die Replikationsverzögerung (Sekunden); None, wenn das Replikat nicht erreichbar ist
+
+        Die Abfrage läuft ohne Sperre; nur das Ergebnis wird unter der Sperre übernommen.
+        """
+        try:
+            with replica.engine.connect() as conn:
+                lag, error = float(conn.execute(text(LAG_QUERY)).scalar() or 0), None
+        except DBAPIError as e:
+            lag, error = None, str(e.orig or e).strip().splitlines()[0]
+            logger.warning("Replikat %s nicht erreichbar: %s", replica.address, error)
+        with self._lock:
+            replica.lag, replica.error = lag, error
+            replica.checked_at = time.monotonic()
+        return lag
+
+    def _due(self, replica):
+        interval = self.check_interval if replica.error is None else REPLICA_RETRY_INTERVAL
+        return time.monotonic() - replica.checked_at >= interval
+
+    def _usable(self, replica):
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    def _mark_unreachable(self, replica, error):
+        with self._lock:
+            replica.lag, replica.error = None, str(error.orig or error).strip().splitlines()[0]
+            replica.checked_at = time.monotonic()
+
+    def _caught_up(self, replica, table_name, version):
+        """Hat das Replikat die Datenversion der Primärdatenbank für table_name bereits eingespielt?"""
+        try:
+            return get_table_version(replica.engine, table_name) >= version
+        except DBAPIError as e:
+            self._mark_unreachable(replica, e)
+            logger.warning("Replikat %s nicht erreichbar: %s", replica.address, replica.error)
+            return False
+
+    def choose(self, table_name=None):
+        """Liefert (Engine, Replikat oder None) für eine lesende Abfrage auf table_name"""
+        if self._cycle is None:
+            return self.primary, None
+        with self._lock:
+            start = next(self._cycle)
+            ordered = self.replicas[start:] + self.replicas[:start]
+            due = [replica for replica in ordered if self._due(replica)]
+            for replica in due:
+                # Messung übernehmen: parallele Leser nutzen bis dahin den letzten Wert
+                replica.checked_at = time.monotonic()
+        # Messung außerhalb der Sperre, damit ein langsames Replikat keine anderen Leser aufhält
+        for replica in due:
+            self.measure_lag(replica)
+        candidates = [replica for replica in ordered if self._usable(replica)]
+        if not candidates:
+            return self.primary, None
+        if table_name is None:
+            return candidates[0].engine, candidates[0]
+        # Versionsvergleich außerhalb der Sperre, damit parallele Leser nicht aufeinander warten
+        version = get_table_version(self.primary, table_name)
+        for replica in candidates:
+            if self._caught_up(replica, table_name, version):
+                return replica.engine, replica
+        return self.primary, None
+
+    @contextmanager
+    def connect(self, table_name=None):
+        """Lesende Verbindung; schlägt der Verbindungsaufbau zum Replikat fehl, wird die Primärdatenbank verwendet"""
+        engine, replica = self.choose(table_name)
+        try:
+            conn = engine.connect()
+            route = 'replica' if replica else 'primary'
+        except DBAPIError as e:
+            if replica is None:
+                raise
+            self._mark_unreachable(replica, e)
+            logger.warning("Replikat %s nicht erreichbar, lese von der Primärdatenbank", replica.address)
+            conn = self.primary.connect()
+            route = 'fallback'
+        with self._lock:
+            self.routed[route] += 1
+        with conn:
+            yield conn
+
+    def engines(self):
+        """Alle Lese-Engines (Primärdatenbank und Replikate)"""
+        return [self.primary] + [replica.engine for replica in self.replicas]
+
+    def pool_metrics(self, write_engine=None):
+        """Auslastung aller Pools und Zustand der Replikate als DataFrame"""
+        rows = []
+        if write_engine is not None:
+            rows.append(pool_status('primary', 'write', write_engine))
+        rows.append(pool_status('primary', 'read', self.primary))
+        for replica in self.replicas:
+            rows.append({
+                **pool_status(replica.address, 'replica', replica.engine),
+                'lag_seconds': replica.lag,
+                'error': replica.error
+            })
+        return pd.DataFrame(rows)
+
+    def dispose(self):
+        self.primary.dispose()
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+
+def create_engines(config=DB_CONFIG, replicas=READ_REPLICAS):
+    """Erstellt Schreib-Engine und ReadRouter mit getrennten Pools"""
+    write_engine = create_db_engine(config, pool_size=WRITE_POOL_SIZE, max_overflow=WRITE_MAX_OVERFLOW)
+    read_engine = create_db_engine(config, pool_size=READ_POOL_SIZE, max_overflow=READ_MAX_OVERFLOW)
+    replica_engines = {
+        address: create_db_engine(
+            replica_config(address, config), pool_size=READ_POOL_SIZE, max_overflow=READ_MAX_OVERFLOW,
+            connect_args={'connect_timeout': REPLICA_CONNECT_TIMEOUT}
+        )
+        for address in replicas
+    }
+    return write_engine, ReadRouter(read_engine, replica_engines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lese-/Schreib-Routing prüfen")
+    parser.add_argument('--replica', action='append', help="Replikat host[:port] (Standard: DB_READ_REPLICAS)")
+    args = parser.parse_args()
+
+    write_engine, router = create_engines(replicas=args.replica or READ_REPLICAS)
+    for replica in router.replicas:
+        lag = router.measure_lag(replica)
+        state = f"Verzögerung {lag:.2f} s" if lag is not None else f"nicht erreichbar ({replica.error})"
+        print(f"{replica.address}: {state}")
+    with router.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print(router.pool_metrics(write_engine).to_string(index=False))
+    router.dispose()
+    write_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,309 @@
+"""Schema-Erkennung und Import für breite Mehrkanal-CSV-Dateien.
+
+Die Spaltentypen (integer, double, timestamp, boolean, text) werden aus einer
+Stichprobe der ersten Zeilen ermittelt. Anschließend wird die Datei in einem
+Durchlauf chunkweise gelesen und entweder
+    - als eine typisierte Tabelle mit allen Kanälen ('wide') oder
+    - als je eine Messwerttabelle pro Kanal im Anwendungslayout ('long')
+gespeichert.
+
+Start:
+    python schema.py logger.csv                                # erkannte Typen und CREATE TABLE
+    python schema.py logger.csv --import logger --mode long    # eine Tabelle pro Kanal
+    python schema.py logger.csv --import logger --mode wide    # eine typisierte Tabelle
+"""
+import argparse
+import csv
+import re
+from contextlib import ExitStack
+
+import pandas as pd
+
+from database import validate_table_name
+
+SAMPLE_ROWS = 10_000
+CSV_CHUNK_ROWS = 100_000
+BOOLEAN_VALUES = {
+    'true': True, 'false': False, 'yes': True, 'no': False,
+    'ja': True, 'nein': False, 't': True, 'f': False
+}
+SQL_TYPES = {
+    'integer': 'BIGINT',
+    'double': 'DOUBLE PRECISION',
+    'timestamp': 'TIMESTAMP',
+    'boolean': 'BOOLEAN',
+    'text': 'TEXT'
+}
+NUMERIC_TYPES = ('integer', 'double')
+IMPORT_MODES = {
+    'long': "Je Kanal eine Messwerttabelle",
+    'wide': "Eine typisierte Tabelle"
+}
+
+INTEGER_PATTERN = re.compile(r'^[+-]?\d+$')
+DECIMAL_COMMA_PATTERN = re.compile(r'^[+-]?\d+(,\d+)?$')
+UMLAUTS = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+
+def sanitize_column_name(name, position=0):
+    """Wandelt einen CSV-Spaltennamen in einen SQL-konformen Namen um"""
+    clean = re.sub(r'\W+', '_', str(name).lower().strip().translate(UMLAUTS), flags=re.ASCII).strip('_')
+    if not clean:
+        clean = f"column_{position}"
+    if clean[0].isdigit():
+        clean = f"c_{clean}"
+    return clean
+
+
+def detect_separator(sample_text):
+    """Ermittelt das Trennzeichen anhand der ersten Zeilen"""
+    try:
+        return csv.Sniffer().sniff(sample_text, delimiters=',;\t|').delimiter
+    except csv.Error:
+        return ','
+
+
+def infer_column_type(values, decimal='.'):
+    """Bestimmt den engsten Typ, in den sich alle nicht leeren Stichprobenwerte umwandeln lassen"""
+    values = values.dropna().astype(str).str.strip()
+    values = values[values != '']
+    if values.empty:
+        return 'text'
+    if values.str.lower().isin(BOOLEAN_VALUES.keys()).all():
+        return 'boolean'
+    if values.str.match(INTEGER_PATTERN).all():
+        return 'integer'
+    numeric = values.str.replace(',', '.', regex=False) if decimal == ',' else values
+    if pd.to_numeric(numeric, errors='coerce').notna().all():
+        return 'double'
+    if pd.to_datetime(values, errors='coerce', format='mixed').notna().all():
+        return 'timestamp'
+    return 'text'
+
+
+def read_sample(source, sample_rows=SAMPLE_ROWS):
+    """Liest die Stichprobe als Text und liefert (DataFrame, Trennzeichen, Dezimalzeichen)"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+        head = source.read(64 * 1024)
+        source.seek(0)
+        if isinstance(head, bytes):
+            head = head.decode(errors='replace')
+    else:
+        with open(source, errors='replace') as f:
+            head = f.read(64 * 1024)
+    separator = detect_separator(head)
+    sample = pd.read_csv(source, sep=separator, nrows=sample_rows, dtype=str, skipinitialspace=True)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+    # Dezimalkomma nur bei anderem Trennzeichen (z.B. deutsche Logger-Exporte mit ';')
+    decimal = '.'
+    if separator != ',':
+        for column in sample.columns:
+            values = sample[column].dropna().str.strip()
+            if not values.empty and values.str.match(DECIMAL_COMMA_PATTERN).all() \
+                    and values.str.contains(',', regex=False).any():
+                decimal = ','
+                break
+    return sample, separator, decimal
+
+
+def infer_schema(source, sample_rows=SAMPLE_ROWS):
+    """Ermittelt Spaltentypen aus einer Stichprobe
+
+    Liefert einen DataFrame mit Quellspalte, SQL-Name, Typ, Anteil leerer Werte
+    und einem Beispielwert sowie die erkannten CSV-Parameter.
+    """
+    sample, separator, decimal = read_sample(source, sample_rows)
+    rows = []
+    used_names = set()
+    for position, column in enumerate(sample.columns):
+        name = sanitize_column_name(column, position)
+        while name in used_names:
+            name = f"{name}_{position}"
+        used_names.add(name)
+        values = sample[column]
+        non_empty = values.dropna()
+        rows.append({
+            'source': column,
+            'column': name,
+            'type': infer_column_type(values, decimal),
+            'nulls': round(1 - len(non_empty) / len(values), 3) if len(values) else 1.0,
+            'example': non_empty.iloc[0] if not non_empty.empty else None
+        })
+    schema = pd.DataFrame(rows, columns=['source', 'column', 'type', 'nulls', 'example'])
+    return schema, {'sep': separator, 'decimal': decimal, 'sample_rows': len(sample)}
+
+
+def generate_create_table(table_name, schema):
+    """Erstellt ein CREATE TABLE-Statement mit den erkannten Typen"""
+    validate_table_name(table_name)
+    definitions = ',\n'.join(f'    "{row.column}" {SQL_TYPES[row.type]}' for row in schema.itertuples())
+    return f"CREATE TABLE {table_name} (\n{definitions}\n);"
+
+
+def generate_table_structure(csv_file_path, table_name="generated_table"):
+    """Schlägt eine typisierte Tabellenstruktur für eine CSV-Datei vor"""
+    try:
+        schema, _ = infer_schema(csv_file_path)
+    except Exception as e:
+        return f"Fehler beim Einlesen der Datei: {e}"
+    return generate_create_table(table_name, schema)
+
+
+def convert_chunk(chunk, schema, decimal='.'):
+    """Wandelt einen Text-Chunk anhand des Schemas in typisierte Spalten um"""
+    converted = {}
+    for row in schema.itertuples():
+        values = chunk[row.source]
+        if values.dtype == object:
+            values = values.str.strip()
+        if row.type in NUMERIC_TYPES:
+            if decimal == ',':
+                values = values.str.replace(',', '.', regex=False)
+            values = pd.to_numeric(values, errors='coerce')
+            if row.type == 'integer':
+                try:
+                    values = values.astype('Int64')
+                except (TypeError, ValueError):
+                    raise ValueError(
+                        f"Spalte '{row.source}' enthält außerhalb der Stichprobe nicht ganzzahlige Werte; "
+                        f"bitte den Typ 'double' wählen"
+                    )
+        elif row.type == 'timestamp':
+            try:
+                # Schneller Pfad für ISO-Zeitstempel, sonst elementweise Erkennung
+                values = pd.to_datetime(values, format='ISO8601')
+            except (TypeError, ValueError):
+                values = pd.to_datetime(values, errors='coerce', format='mixed')
+        elif row.type == 'boolean':
+            values = values.str.lower().map(BOOLEAN_VALUES).astype('boolean')
+        converted[row.column] = values
+    return pd.DataFrame(converted)
+
+
+def iter_typed_chunks(source, schema, options, chunk_rows=CSV_CHUNK_ROWS):
+    """Liest die gesamte Datei in einem Durchlauf und liefert typisierte Chunks"""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    reader = pd.read_csv(
+        source,
+        sep=options['sep'],
+        dtype=str,
+        skipinitialspace=True,
+        chunksize=chunk_rows
+    )
+    for chunk in reader:
+        yield convert_chunk(chunk, schema, options['decimal'])
+
+
+def channel_table_name(prefix, channel):
+    """Tabellenname eines Kanals im Long-Format"""
+    return validate_table_name(f"{prefix}_{channel}")
+
+
+def split_timestamps(timestamps):
+    """Formatiert die Zeitstempel eines Chunks einmalig als date- und time-Spalten"""
+    return timestamps.dt.strftime('%Y-%m-%d'), timestamps.dt.strftime('%H:%M:%S')
+
+
+def to_measurements(df, channel, dates, times, offset=0):
+    """Liefert einen Kanal im Anwendungslayout index/date/time/value"""
+    valid = dates.notna() & df[channel].notna()
+    return pd.DataFrame({
+        'index': pd.RangeIndex(offset, offset + len(df))[valid.to_numpy()].astype(str).to_numpy(),
+        'date': dates[valid],
+        'time': times[valid],
+        'value': df.loc[valid, channel].astype(str)
+    })
+
+
+def import_wide_csv(storage, source, table_name, mode='long', schema=None, options=None,
+                    timestamp_column=None, channels=None, chunk_rows=CSV_CHUNK_ROWS, progress=None):
+    """Importiert eine Mehrkanal-CSV in einem Durchlauf
+
+    mode='wide': eine Tabelle table_name mit allen Spalten in den erkannten Typen.
+    mode='long': je Kanal eine Tabelle table_name_<kanal> im Layout index/date/time/value;
+    timestamp_column ist die Zeitspalte, channels die numerischen Kanäle (Standard: alle).
+    progress(gelesene Zeilen) wird nach jedem Chunk aufgerufen.
+    Liefert ein Dict Tabelle → importierte Zeilen.
+    """
+    validate_table_name(table_name)
+    if schema is None or options is None:
+        schema, options = infer_schema(source)
+
+    if mode == 'wide':
+        storage.create_typed_table(table_name, [(row.column, SQL_TYPES[row.type]) for row in schema.itertuples()])
+        targets = {table_name: 0}
+    elif mode == 'long':
+        if timestamp_column is None:
+            timestamps = schema.loc[schema['type'] == 'timestamp', 'column']
+            if timestamps.empty:
+                raise ValueError("Keine Zeitstempel-Spalte erkannt; bitte timestamp_column angeben")
+            timestamp_column = timestamps.iloc[0]
+        if channels is None:
+            channels = list(schema.loc[schema['type'].isin(NUMERIC_TYPES), 'column'])
+        if not channels:
+            raise ValueError("Keine numerischen Kanäle erkannt")
+        existing_tables = set(storage.list_tables())
+        targets = {}
+        for channel in channels:
+            target = channel_table_name(table_name, channel)
+            if target not in existing_tables:
+                storage.create_table(target)
+            targets[target] = 0
+    else:
+        raise ValueError(f"Unbekannter Importmodus: '{mode}'")
+
+    offset = 0
+    if mode == 'wide':
+        with storage.write_transaction(table_name) as conn:
+            for chunk in iter_typed_chunks(source, schema, options, chunk_rows):
+                targets[table_name] += storage.insert_frame(conn, table_name, chunk)
+                offset += len(chunk)
+                if progress is not None:
+                    progress(offset)
+        return targets
+
+    # Je Kanal eine Staging-Tabelle: die Kanaltabellen werden erst bei der Übernahme
+    # nach dem Einlesen und nur kurz gesperrt
+    with ExitStack() as stack:
+        loads = {target: stack.enter_context(storage.staged_load(target)) for target in targets}
+        for chunk in iter_typed_chunks(source, schema, options, chunk_rows):
+            dates, times = split_timestamps(chunk[timestamp_column])
+            for channel in channels:
+                target = channel_table_name(table_name, channel)
+                loads[target].insert(to_measurements(chunk, channel, dates, times, offset))
+            offset += len(chunk)
+            if progress is not None:
+                progress(offset)
+    return {target: load.rows for target, load in loads.items()}
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Schema-Erkennung und Import für Mehrkanal-CSV-Dateien")
+    parser.add_argument('csv_file', help="Pfad zur CSV-Datei")
+    parser.add_argument('--sample-rows', type=int, default=SAMPLE_ROWS, help="Zeilen der Stichprobe")
+    parser.add_argument('--import', dest='table', help="Tabellenname (bzw. Präfix im Long-Format) für den Import")
+    parser.add_argument('--mode', choices=list(IMPORT_MODES), default='long', help="Speicherformat")
+    parser.add_argument('--timestamp', help="Zeitstempel-Spalte (Standard: erste erkannte)")
+    args = parser.parse_args()
+
+    schema, options = infer_schema(args.csv_file, args.sample_rows)
+    print(schema.to_string(index=False))
+    print()
+    print(generate_create_table(args.table or 'generated_table', schema))
+    if args.table:
+        imported = import_wide_csv(
+            create_storage(), args.csv_file, args.table, args.mode, schema, options,
+            timestamp_column=args.timestamp
+        )
+        for table_name, rows in imported.items():
+            print(f"{table_name}: {rows:,} Zeilen importiert")
+
+
+if __name__ == '__main__':
+    main()
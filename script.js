@@ -0,0 +1,110 @@
+// script.js - Chart.js-Frontend für die Datenschnittstelle (data_api.py)
+const API_BASE = '/api';
+const AGGREGATE_INTERVAL = 3600; // Sekunden pro Verdichtungsintervall
+
+// Zuordnung der Auswahl "Funktion" zu den Aggregatfunktionen der API
+const FUNCTION_MAP = {
+    average: 'avg',
+    min: 'min',
+    max: 'max',
+    sum: 'sum'
+};
+
+const LINE_DASH = {
+    solid: [],
+    dashed: [8, 4],
+    dotted: [2, 3]
+};
+
+let chart = null;
+
+async function fetchJson(url) {
+    const response = await fetch(url);
+    const payload = await response.json();
+    if (!response.ok || payload.status === 'error') {
+        throw new Error(payload.error || `HTTP ${response.status}`);
+    }
+    return payload;
+}
+
+async function loadTables() {
+    const { tables } = await fetchJson(`${API_BASE}/tables`);
+    const select = document.getElementById('tableSelect');
+    select.innerHTML = '';
+    tables.forEach(name => select.add(new Option(name, name)));
+}
+
+async function loadSeries(table, date, func) {
+    const params = new URLSearchParams({ table, start: date, end: date });
+    if (func === 'raw') {
+        const { data } = await fetchJson(`${API_BASE}/range?${params}`);
+        return data.map(row => ({ label: row.time, value: row.value }));
+    }
+    params.set('function', FUNCTION_MAP[func]);
+    params.set('interval', AGGREGATE_INTERVAL);
+    const { data } = await fetchJson(`${API_BASE}/aggregate?${params}`);
+    return data.map(row => ({ label: row.bucket.slice(11, 16), value: row.value }));
+}
+
+function showStatistics(series) {
+    const container = document.getElementById('statsContainer');
+    if (!series.length) {
+        container.textContent = 'Keine Daten für den gewählten Zeitraum';
+        return;
+    }
+    const values = series.map(point => point.value);
+    const mean = values.reduce((sum, value) => sum + value, 0) / values.length;
+    container.innerHTML = `
+        <p>Datenpunkte: ${values.length}</p>
+        <p>Minimum: ${Math.min(...values).toFixed(3)}</p>
+        <p>Maximum: ${Math.max(...values).toFixed(3)}</p>
+        <p>Mittelwert: ${mean.toFixed(3)}</p>`;
+}
+
+async function updateChart(event) {
+    if (event) {
+        event.preventDefault();
+    }
+    const table = document.getElementById('tableSelect').value;
+    const date = document.getElementById('dateSelect').value;
+    const func = document.getElementById('functionSelect').value;
+
+    try {
+        const series = await loadSeries(table, date, func);
+        const dataset = {
+            label: table,
+            data: series.map(point => point.value),
+            borderColor: document.getElementById('lineColor').value,
+            borderWidth: Number(document.getElementById('lineWidth').value),
+            borderDash: LINE_DASH[document.getElementById('lineStyle').value],
+            pointRadius: 0,
+            fill: false
+        };
+        const labels = series.map(point => point.label);
+
+        if (chart) {
+            chart.data.labels = labels;
+            chart.data.datasets = [dataset];
+            chart.update();
+        } else {
+            chart = new Chart(document.getElementById('dataChart'), {
+                type: 'line',
+                data: { labels, datasets: [dataset] },
+                options: { animation: false, responsive: true }
+            });
+        }
+        showStatistics(series);
+    } catch (error) {
+        document.getElementById('statsContainer').textContent = `Fehler beim Laden der Daten: ${error.message}`;
+    }
+}
+
+document.addEventListener('DOMContentLoaded', async () => {
+    document.getElementById('chartControls').addEventListener('submit', updateChart);
+    try {
+        await loadTables();
+        await updateChart();
+    } catch (error) {
+        document.getElementById('statsContainer').textContent = `Fehler beim Laden der Tabellen: ${error.message}`;
+    }
+});
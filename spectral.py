@@ -0,0 +1,151 @@
+"""Spektralanalyse (Welch-PSD und Spektrogramm) mit begrenztem Speicher.
+
+Die Messwerte werden als Arrow-Batches aus der Datenbank gestreamt; überlappende,
+mit einem Hann-Fenster gewichtete Segmente werden je Chunk als Matrix
+transformiert und nur ihre Leistungsspektren aufsummiert. Im Speicher liegen
+daher höchstens ein Chunk, der Rest des letzten Segments und die Summen
+(Frequenzen × Spektrogramm-Spalten), unabhängig von der Länge des Zeitraums.
+
+An Messlücken (Abstand > GAP_FACTOR × Abtastintervall) beginnt ein neues
+Segment, sodass keine Segmente über Lücken hinweg gebildet werden.
+"""
+import numpy as np
+import pandas as pd
+
+from frames import batch_arrays
+
+DEFAULT_SEGMENT_LENGTH = 1024
+SEGMENT_OVERLAP = 0.5
+GAP_FACTOR = 1.5
+SPECTROGRAM_COLUMNS = 400
+
+
+class WelchAccumulator:
+    """Summiert Leistungsspektren überlappender Segmente über beliebig viele Chunks"""
+
+    def __init__(self, segment_length=DEFAULT_SEGMENT_LENGTH, sample_rate=None,
+                 overlap=SEGMENT_OVERLAP, column_seconds=None):
+        self.segment_length = segment_length
+        self.step = max(1, int(segment_length * (1 - overlap)))
+        self.window = np.hanning(segment_length)
+        self.sample_rate = sample_rate
+        self.column_ns = int(column_seconds * 1e9) if column_seconds else None
+        self.origin = None
+        self.power_sum = np.zeros(segment_length // 2 + 1)
+        self.segments = 0
+        self.samples = 0
+        self.columns = {}  # Spektrogramm-Spalte → [Leistungssumme, Segmente]
+        self.buffer_times = np.empty(0, dtype=np.int64)
+        self.buffer_values = np.empty(0)
+
+    def add(self, timestamps, values):
+        """Verarbeitet einen Chunk (Zeitstempel als datetime64, Messwerte als float)"""
+        times = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        valid = np.isfinite(values) & (times != np.iinfo(np.int64).min)
+        times, values = times[valid], values[valid]
+        if not len(times):
+            return
+        self.samples += len(times)
+        if self.origin is None:
+            self.origin = times[0]
+        times = np.concatenate([self.buffer_times, times])
+        values = np.concatenate([self.buffer_values, values])
+        if self.sample_rate is None:
+            steps = np.diff(times)
+            steps = steps[steps > 0]
+            if not len(steps):
+                self.buffer_times, self.buffer_values = times, values
+                return
+            self.sample_rate = 1e9 / float(np.median(steps))
+
+        # Zusammenhängende Abschnitte; nur der letzte wird im nächsten Chunk fortgesetzt
+        interval_ns = 1e9 / self.sample_rate
+        breaks = np.flatnonzero(np.diff(times) > GAP_FACTOR * interval_ns) + 1
+        bounds = np.concatenate([[0], breaks, [len(times)]])
+        for start, end in zip(bounds[:-2], bounds[1:-1]):
+            self._process(times[start:end], values[start:end])
+        start = bounds[-2]
+        consumed = self._process(times[start:], values[start:])
+        self.buffer_times = times[start + consumed:].copy()
+        self.buffer_values = values[start + consumed:].copy()
+
+    def _process(self, times, values):
+        """Wertet alle vollständigen Segmente eines lückenlosen Abschnitts aus; liefert die verbrauchten Werte"""
+        n = len(values)
+        if n < self.segment_length:
+            return 0
+        starts = np.arange(0, n - self.segment_length + 1, self.step)
+        segments = np.lib.stride_tricks.sliding_window_view(values, self.segment_length)[starts]
+        segments = (segments - segments.mean(axis=1, keepdims=True)) * self.window
+        power = np.abs(np.fft.rfft(segments, axis=1)) ** 2
+        self.power_sum += power.sum(axis=0)
+        self.segments += len(starts)
+
+        if self.column_ns:
+            centers = times[starts + self.segment_length // 2]
+            columns = (centers - self.origin) // self.column_ns
+            unique, inverse = np.unique(columns, return_inverse=True)
+            sums = np.zeros((len(unique), power.shape[1]))
+            np.add.at(sums, inverse, power)
+            counts = np.bincount(inverse, minlength=len(unique))
+            for column, column_sum, count in zip(unique, sums, counts):
+                entry = self.columns.setdefault(int(column), [0.0, 0])
+                entry[0] = entry[0] + column_sum
+                entry[1] += int(count)
+        return int(starts[-1]) + self.step
+
+    def _scale(self):
+        """Faktor für die einseitige Leistungsdichte (Einheit²/Hz)"""
+        scale = np.full(self.segment_length // 2 + 1, 2.0 / (self.sample_rate * (self.window ** 2).sum()))
+        scale[0] /= 2
+        if self.segment_length % 2 == 0:
+            scale[-1] /= 2
+        return scale
+
+    def result(self):
+        """Frequenzen, mittlere Leistungsdichte und Spektrogramm als Dict"""
+        if not self.segments:
+            raise ValueError(
+                f"Zu wenige zusammenhängende Messwerte: mindestens {self.segment_length} ohne Lücke benötigt"
+            )
+        scale = self._scale()
+        frequencies = np.fft.rfftfreq(self.segment_length, d=1 / self.sample_rate)
+        result = {
+            'frequencies': frequencies,
+            'psd': self.power_sum / self.segments * scale,
+            'sample_rate': self.sample_rate,
+            'segments': self.segments,
+            'samples': self.samples,
+            'spectrogram': None
+        }
+        if self.column_ns and self.columns:
+            positions = np.array(sorted(self.columns))
+            result['spectrogram'] = {
+                'times': pd.to_datetime(self.origin + positions * self.column_ns + self.column_ns // 2),
+                'frequencies': frequencies,
+                'psd': np.array([self.columns[p][0] / self.columns[p][1] for p in positions]) * scale
+            }
+        return result
+
+
+def welch_spectrum(storage, table_name, start_date=None, end_date=None,
+                   segment_length=DEFAULT_SEGMENT_LENGTH, sample_rate=None, column_seconds=None):
+    """Welch-PSD (und optional Spektrogramm) eines Zeitraums, chunkweise aus der Datenbank gelesen"""
+    accumulator = WelchAccumulator(segment_length, sample_rate, column_seconds=column_seconds)
+    for batch in storage.iter_batches(table_name, start_date, end_date):
+        accumulator.add(*batch_arrays(batch))
+    return accumulator.result()
+
+
+def dominant_frequencies(result, count=5):
+    """Die stärksten lokalen Maxima der Leistungsdichte (ohne Gleichanteil)"""
+    psd = result['psd']
+    peaks = np.flatnonzero((psd[1:-1] > psd[:-2]) & (psd[1:-1] >= psd[2:])) + 1
+    peaks = peaks[np.argsort(psd[peaks])[::-1][:count]]
+    frequencies = result['frequencies'][peaks]
+    return pd.DataFrame({
+        'Frequenz (Hz)': frequencies,
+        'Periode (s)': 1 / frequencies,
+        'Leistungsdichte': psd[peaks]
+    })
@@ -0,0 +1,980 @@
+"""Speicherschicht für Messwerttabellen.
+
+Alle Tabellenoperationen der Anwendung (Anlegen, Löschen, Import, Abfragen)
+laufen über ein Storage-Objekt. Neben PostgreSQL steht DuckDB als eingebettetes,
+spaltenorientiertes Backend zur Verfügung, das ohne Datenbankserver auskommt
+und lokale Parquet-Dateien direkt einbinden kann.
+
+Auswahl über die Umgebungsvariable STORAGE_BACKEND ('postgresql' oder 'duckdb').
+
+Schreibzugriffe auf eine Tabelle sind über write_transaction gegeneinander
+gesperrt (je Tabelle, zwischen Prozessen über Advisory Locks); Dateien werden
+über StagedLoad zunächst in eine Staging-Tabelle geladen und dann in einem
+Schritt übernommen.
+"""
+import io
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import OperationalError
+
+import perf
+from database import bump_table_version, ensure_table_versions, is_meta_table, validate_table_name
+from anomalies import (
+    AnomalyDetector, clear_anomalies, drop_flagged, ensure_anomaly_tables, exclusion_condition, insert_flags,
+    load_anomalies, record_anomalies
+)
+from archive import ARCHIVE_DIR, ColdTier
+from availability import clear_coverage, hour_counts, merge_hour_counts, record_coverage, record_hour_counts
+from catalog import ensure_catalog_tables, register_table, unregister_table
+from figcache import ensure_views_table
+from frames import FRAME_VALUE_DTYPE, build_typed_frame
+from jobs import ensure_jobs_table
+from querylog import SlowQueryLog
+from retention import ensure_retention_policies
+from routing import create_engines
+
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'postgresql')
+DUCKDB_PATH = os.environ.get('DUCKDB_PATH', 'data/csvms.duckdb')
+INSERT_BATCH_SIZE = 5000
+SEARCH_LIMIT = 1000
+STREAM_CHUNK_SIZE = 50_000
+LIVE_FETCH_LIMIT = 10_000  # Höchstzahl neuer Messwerte pro Abruf im Live-Modus
+SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', '1') == '1'
+ARCHIVE_ENABLED = os.environ.get('ARCHIVE_ENABLED', '1') == '1'
+TABLE_LOCK_TIMEOUT = float(os.environ.get('TABLE_LOCK_TIMEOUT', 30))  # Sekunden Wartezeit auf die Schreibsperre
+ADVISORY_LOCK_NAMESPACE = 7301  # erster Schlüssel der Advisory Locks, zweiter: hashtext(Tabellenname)
+STAGING_PREFIX = '_stage_'
+
+MEASUREMENT_COLUMNS = ['index', 'date', 'time', 'value']
+
+SUMMARY_QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]  # Perzentile der Werteverteilung
+
+# Erlaubte Aggregatfunktionen für zeitliche Verdichtung
+AGGREGATE_FUNCTIONS = {
+    'avg': 'AVG',
+    'min': 'MIN',
+    'max': 'MAX',
+    'sum': 'SUM',
+    'count': 'COUNT'
+}
+
+
+class TableLockedError(Exception):
+    """Die Schreibsperre einer Tabelle wurde nicht rechtzeitig erlangt"""
+
+    def __init__(self, table_name, timeout):
+        super().__init__(
+            f"Tabelle '{table_name}' wird gerade beschrieben (Sperre nicht innerhalb von {timeout:g} s erhalten)"
+        )
+        self.table_name = table_name
+
+
+_table_locks = {}
+_table_locks_guard = threading.Lock()
+
+
+def process_lock(table_name):
+    """Sperre einer Tabelle innerhalb des Prozesses (Sitzungen und Job-Threads)"""
+    with _table_locks_guard:
+        return _table_locks.setdefault(table_name, threading.Lock())
+
+
+class Storage:
+    """Gemeinsame SQL-Operationen über eine SQLAlchemy-Engine
+
+    Unterklassen überschreiben nur die dialektspezifischen Teile
+    (Massenimport, numerischer Vergleichstyp, Tabellenliste).
+    """
+    dialect = None
+    numeric_type = 'numeric'
+    query_log = None
+    cold = None  # Archivebene (ColdTier), falls aktiviert
+
+    def __init__(self, engine, router=None):
+        self.engine = engine  # Schreibzugriffe und Verwaltungstabellen
+        self.router = router  # ReadRouter für lesende Abfragen (nur PostgreSQL)
+        # Verwaltungstabellen einmal anlegen; Lesepfade (Versionen, Katalog, Aufträge,
+        # Aufrufe, Richtlinien, Anti-Join auf Anomalien) fragen danach nur noch ab
+        with engine.begin() as conn:
+            ensure_table_versions(conn)
+            ensure_catalog_tables(conn)
+            ensure_anomaly_tables(conn)
+            ensure_jobs_table(conn)
+            ensure_views_table(conn)
+            ensure_retention_policies(conn)
+
+    @property
+    def read_engine(self):
+        """Lese-Pool der Primärdatenbank (ohne Router identisch mit der Schreib-Engine)"""
+        return self.router.primary if self.router is not None else self.engine
+
+    def read_connection(self, table_name=None):
+        """Verbindung für eine lesende Abfrage, bei konfigurierten Replikaten ggf. auf ein Replikat geroutet"""
+        if self.router is not None:
+            return self.router.connect(table_name)
+        return self.engine.connect()
+
+    def _read_frame(self, conn, query, params=None, name='query', table_name=None):
+        """Führt eine Abfrage aus und misst SQL-Ausführung und DataFrame-Aufbau getrennt"""
+        with perf.span(f"sql:{name}", table=table_name) as entry:
+            result = conn.execute(text(query), params or {})
+            columns = list(result.keys())
+            rows = result.fetchall()
+            entry['rows'] = len(rows)
+        with perf.span(f"pandas:{name}", table=table_name) as entry:
+            df = pd.DataFrame(rows, columns=columns)
+            entry['rows'], entry['bytes'] = perf.frame_size(df)
+        return df
+
+    def _iter_frames(self, conn, query, params=None, chunk_size=STREAM_CHUNK_SIZE):
+        """Liefert ein Abfrageergebnis als DataFrame-Chunks über einen serverseitigen Cursor
+
+        stream_results öffnet bei psycopg2 einen benannten Cursor; der Client hält
+        höchstens chunk_size Zeilen, statt das gesamte Ergebnis vorab zu übertragen.
+        Das Protokoll langsamer Abfragen misst deshalb den gesamten Abruf.
+        """
+        def frames():
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                text(query), params or {}
+            )
+            columns = list(result.keys())
+            for rows in result.partitions(chunk_size):
+                yield pd.DataFrame(rows, columns=columns)
+
+        if self.query_log is None:
+            yield from frames()
+        else:
+            yield from self.query_log.stream(conn, frames())
+
+    def _iter_batches(self, conn, query, params=None, chunk_size=STREAM_CHUNK_SIZE, schema=None):
+        """Liefert ein Abfrageergebnis als Arrow-RecordBatches über einen serverseitigen Cursor"""
+        import pyarrow as pa
+
+        for df in self._iter_frames(conn, query, params, chunk_size):
+            yield pa.RecordBatch.from_pandas(df, schema=schema, preserve_index=False)
+
+    def _cold_frames(self, table_name, start_date=None, end_date=None):
+        """Archivierte Messwerte eines Zeitraums (leer ohne Archivebene)"""
+        if self.cold is None:
+            return []
+        return list(self.cold.iter_frames(table_name, start_date, end_date))
+
+    def bucket_expression(self, timestamp_expr):
+        """SQL-Ausdruck, der einen Zeitstempel auf den Beginn seines :interval-Sekunden-Intervalls kürzt"""
+        return (
+            f"to_timestamp(floor(extract(epoch from {timestamp_expr}) / :interval) * :interval) "
+            f"AT TIME ZONE 'UTC'"
+        )
+
+    def histogram_expression(self, value_expr):
+        """SQL-Ausdruck für die Klasse 1..:bins eines Werts zwischen :lower und :upper (0/:bins+1: außerhalb)"""
+        return f"width_bucket({value_expr}, :lower, :upper, :bins)"
+
+    # Schreibsperren
+
+    def _acquire_table_lock(self, conn, table_name, timeout):
+        """Sperre zwischen Prozessen bis zum Ende der Transaktion (ohne Datenbankserver nicht nötig)"""
+
+    @contextmanager
+    def write_transaction(self, table_names, timeout=TABLE_LOCK_TIMEOUT):
+        """Transaktion mit exklusiver Schreibsperre auf eine oder mehrere Tabellen bis zum Commit
+
+        Lesende Abfragen und Schreibzugriffe auf andere Tabellen laufen ungehindert
+        weiter. Mehrere Tabellen werden in fester Reihenfolge gesperrt, damit sich
+        zwei Transaktionen nicht gegenseitig blockieren. timeout=None wartet unbegrenzt.
+        """
+        names = sorted({table_names} if isinstance(table_names, str) else set(table_names))
+        acquired = []
+        try:
+            for table_name in names:
+                lock = process_lock(table_name)
+                if not lock.acquire(timeout=-1 if timeout is None else timeout):
+                    raise TableLockedError(table_name, timeout)
+                acquired.append(lock)
+            with self.engine.begin() as conn:
+                for table_name in names:
+                    self._acquire_table_lock(conn, table_name, timeout)
+                yield conn
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    def staged_load(self, table_name, replace=False, timeout=TABLE_LOCK_TIMEOUT):
+        """Import über eine Staging-Tabelle (siehe StagedLoad)"""
+        return StagedLoad(self, table_name, replace, timeout)
+
+    # Tabellenverwaltung
+
+    def list_tables(self):
+        """Liefert die sortierten Messwerttabellen ohne interne Verwaltungstabellen"""
+        names = inspect(self.engine).get_table_names()
+        return sorted(name for name in names if not is_meta_table(name))
+
+    def create_table(self, table_name):
+        """Legt eine Messwerttabelle im Layout der Anwendung an"""
+        validate_table_name(table_name)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE TABLE {table_name} (
+                    index TEXT,
+                    date TEXT,
+                    time TEXT,
+                    value TEXT
+                )
+            """))
+            register_table(conn, table_name)
+            # Replikate werden für die Tabelle erst genutzt, wenn sie dort angelegt ist
+            bump_table_version(conn, table_name)
+
+    def drop_table(self, table_name, timeout=TABLE_LOCK_TIMEOUT):
+        """Löscht eine Messwerttabelle, sobald kein Import mehr in sie schreibt"""
+        validate_table_name(table_name)
+        with self.write_transaction(table_name, timeout) as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {table_name} CASCADE"))
+            clear_coverage(conn, table_name)
+            clear_anomalies(conn, table_name, forget=True)
+            unregister_table(conn, table_name)
+            bump_table_version(conn, table_name)
+        if self.cold is not None:
+            self.cold.drop(table_name)
+
+    def lock_for_rewrite(self, conn, table_name):
+        """Sperrt eine Tabelle bis zum Ende der Transaktion gegen gleichzeitige Schreibzugriffe"""
+
+    def table_size(self, table_name):
+        """Belegter Speicher einer Tabelle in Bytes (None, wenn nicht ermittelbar)"""
+        return None
+
+    def reclaim_space(self, table_name):
+        """Gibt den Platz gelöschter Zeilen zur Wiederverwendung frei"""
+
+    # Import
+
+    def _bulk_insert(self, conn, table_name, df, batch_size):
+        # Spalten des DataFrames (Messwertlayout oder typisierte Mehrkanal-Tabelle)
+        params = [f"p{position}" for position in range(len(df.columns))]
+        insert_query = text(f"""
+            INSERT INTO {table_name} ({column_list(df.columns)})
+            VALUES ({', '.join(':' + param for param in params)})
+        """)
+        records = [dict(zip(params, row)) for row in df.astype(object).where(df.notna(), None).itertuples(index=False)]
+        for start in range(0, len(records), batch_size):
+            conn.execute(insert_query, records[start:start + batch_size])
+
+    def insert_measurements(self, conn, table_name, df, batch_size=INSERT_BATCH_SIZE, detect=True):
+        """Fügt Messwerte in eine Tabelle ein
+
+        Läuft in der Transaktion des Aufrufers, damit Daten und Verwaltungsinformationen
+        (Versionszähler, Import-Offsets, Abdeckungsindex, Anomalie-Markierungen) gemeinsam
+        festgeschrieben werden. detect=False überspringt die Anomalieerkennung (z.B. für
+        verdichtete Werte).
+        """
+        validate_table_name(table_name)
+        if not df.empty:
+            self._bulk_insert(conn, table_name, df[MEASUREMENT_COLUMNS], batch_size)
+            record_coverage(conn, table_name, df)
+            if detect:
+                record_anomalies(conn, table_name, df)
+        bump_table_version(conn, table_name)
+        return len(df)
+
+    def create_typed_table(self, table_name, columns):
+        """Legt eine Tabelle mit typisierten Spalten an (columns: Liste aus (Name, SQL-Typ))"""
+        validate_table_name(table_name)
+        definitions = ',\n'.join(f'"{validate_table_name(name)}" {sql_type}' for name, sql_type in columns)
+        with self.engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE {table_name} (\n{definitions}\n)"))
+            register_table(conn, table_name, kind='wide')
+            bump_table_version(conn, table_name)
+
+    def insert_frame(self, conn, table_name, df, batch_size=INSERT_BATCH_SIZE):
+        """Fügt einen beliebigen DataFrame (Spaltennamen = Tabellenspalten) in der Transaktion des Aufrufers ein"""
+        validate_table_name(table_name)
+        if not df.empty:
+            self._bulk_insert(conn, table_name, df, batch_size)
+        bump_table_version(conn, table_name)
+        return len(df)
+
+    # Abfragen
+
+    def preview(self, table_name, limit):
+        """Liefert Zeilenzahl, erste Zeilen, Kennzahlen und Datumsbereich einer Tabelle"""
+        validate_table_name(table_name)
+        with self.read_connection(table_name) as conn:
+            row_count = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+            archived_rows, archived_min_date, _ = (
+                self.cold.summary(table_name) if self.cold is not None else (0, None, 0)
+            )
+            if row_count == 0 and archived_rows == 0:
+                return 0, None, None, None
+
+            # Archivierte Monate sind die ältesten: die ersten Zeilen kommen zuerst aus dem Archiv
+            cold = self._cold_head(table_name, limit) if archived_rows else pd.DataFrame()
+            df = self._read_frame(conn, f"""
+                SELECT * FROM {table_name}
+                ORDER BY date, time, index
+                LIMIT :limit
+            """, {'limit': limit - len(cold)}, 'preview', table_name)
+            if not cold.empty:
+                df = pd.concat([cold.astype({'index': str, 'value': str})[df.columns], df], ignore_index=True)
+
+            stats = self._read_frame(conn, f"""
+                SELECT
+                    COUNT(*) as total_rows,
+                    COUNT(DISTINCT index) as unique_indices,
+                    COUNT(DISTINCT index) as max_index
+                FROM {table_name}
+            """, name='preview_stats', table_name=table_name)
+
+            date_range = self._read_frame(conn, f"""
+                SELECT
+                    MIN(date) as min_date,
+                    MAX(date) as max_date
+                FROM {table_name}
+                WHERE date IS NOT NULL AND date != ''
+            """, name='preview_date_range', table_name=table_name)
+
+        if archived_rows:
+            # Archivierte Zeilen zählen mit; der älteste Messtag steht im Manifest.
+            # Die Indizes zählen nur in der Datenbank (archived_rows weist darauf hin)
+            stats['total_rows'] += archived_rows
+            stats['archived_rows'] = archived_rows
+            min_date = date_range['min_date'].iloc[0]
+            date_range['min_date'] = archived_min_date if min_date is None else min(min_date, archived_min_date)
+            if date_range['max_date'].iloc[0] is None:
+                date_range['max_date'] = self.cold.files(table_name)['max_date'].max()
+        return row_count + archived_rows, df, stats, date_range
+
+    def _cold_head(self, table_name, limit):
+        """Die ersten limit archivierten Messwerte (Dateien in Datumsreihenfolge)"""
+        frames, rows = [], 0
+        for cold in self.cold.iter_frames(table_name):
+            frames.append(cold.head(limit - rows))
+            rows += len(frames[-1])
+            if rows >= limit:
+                break
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def read_since(self, table_name, last_date=None, last_time=None, limit=LIVE_FETCH_LIMIT):
+        """Liefert höchstens limit Messwerte nach dem letzten bekannten Zeitstempel
+
+        Ohne Zeitstempel werden die neuesten limit Messwerte geliefert (Startfenster
+        des Live-Modus). Der Vergleich erfolgt auf den Textspalten, damit nur die
+        neuen Zeilen gelesen werden.
+        """
+        validate_table_name(table_name)
+        if last_date is None:
+            query = f"""
+                SELECT date, time, value FROM (
+                    SELECT date, time, CAST(value AS DOUBLE PRECISION) as value
+                    FROM {table_name}
+                    WHERE date IS NOT NULL AND date != ''
+                    ORDER BY date DESC, time DESC
+                    LIMIT :limit
+                ) latest
+                ORDER BY date, time
+            """
+        else:
+            query = f"""
+                SELECT date, time, CAST(value AS DOUBLE PRECISION) as value
+                FROM {table_name}
+                WHERE date > :last_date OR (date = :last_date AND time > :last_time)
+                ORDER BY date, time
+                LIMIT :limit
+            """
+        params = {'last_date': last_date, 'last_time': last_time, 'limit': limit}
+        with self.read_connection(table_name) as conn:
+            return self._read_frame(conn, query, params, 'since', table_name)
+
+    def _range_condition(self, start_date, end_date):
+        """WHERE-Bedingung für einen optionalen Zeitraum"""
+        if start_date is None:
+            return "TRUE"
+        return "date::date BETWEEN :start_date AND :end_date"
+
+    def count_rows(self, table_name, start_date=None, end_date=None):
+        """Zeilenzahl eines Zeitraums (Obergrenze, archivierte Monate zählen vollständig)"""
+        validate_table_name(table_name)
+        with self.read_connection(table_name) as conn:
+            row_count = conn.execute(text(f"""
+                SELECT COUNT(*) FROM {table_name}
+                WHERE {self._range_condition(start_date, end_date)}
+            """), {'start_date': start_date, 'end_date': end_date}).scalar()
+        if self.cold is not None:
+            row_count += int(self.cold.files(table_name, start_date, end_date)['row_count'].sum())
+        return row_count
+
+    def _range_query(self, table_name, start_date, end_date, include_index, ordered, exclude_anomalies=False):
+        """Abfrage der Messwerte eines Zeitraums im Layout [index,] date, time, value"""
+        return f"""
+            SELECT
+                {'index,' if include_index else ''}
+                date,
+                time,
+                CAST(value AS DOUBLE PRECISION) as value
+            FROM {table_name} m
+            WHERE {self._range_condition(start_date, end_date)}
+            {'AND ' + exclusion_condition('m') if exclude_anomalies else ''}
+            {'ORDER BY date, time' if ordered else ''}
+        """
+
+    def _range_params(self, table_name, start_date, end_date):
+        return {'start_date': start_date, 'end_date': end_date, 'anomaly_table': table_name}
+
+    def _cold_range(self, table_name, start_date, end_date, exclude_anomalies):
+        """Archivierte Messwerte eines Zeitraums, auf Wunsch ohne markierte Anomalien"""
+        frames = self.cold.iter_frames(table_name, start_date, end_date)
+        if not exclude_anomalies:
+            yield from frames
+            return
+        with self.read_connection(table_name) as conn:
+            flags = load_anomalies(conn, table_name, start_date, end_date)
+        for cold in frames:
+            yield drop_flagged(cold, flags)
+
+    def iter_range(self, table_name, start_date=None, end_date=None, chunk_size=STREAM_CHUNK_SIZE,
+                   include_index=False, ordered=True, exclude_anomalies=False):
+        """Liefert die Messwerte eines Zeitraums (ohne Zeitraum: alle) chunkweise, ohne sie zu puffern
+
+        Mit ordered=False entfällt die Sortierung, sodass die Datenbank die ersten
+        Zeilen sofort liefert (für Statistiken und Verdichtung). exclude_anomalies
+        lässt die beim Import markierten Messwerte weg.
+        """
+        validate_table_name(table_name)
+        columns = ['index', 'date', 'time', 'value'] if include_index else ['date', 'time', 'value']
+        if self.cold is not None:
+            for cold in self._cold_range(table_name, start_date, end_date, exclude_anomalies):
+                yield cold[columns]
+        query = self._range_query(table_name, start_date, end_date, include_index, ordered, exclude_anomalies)
+        with self.read_connection(table_name) as conn:
+            yield from perf.stream(
+                "sql:stream",
+                self._iter_frames(conn, query, self._range_params(table_name, start_date, end_date), chunk_size),
+                table=table_name
+            )
+
+    def iter_batches(self, table_name, start_date=None, end_date=None, chunk_size=STREAM_CHUNK_SIZE,
+                     include_index=False, ordered=True, exclude_anomalies=False):
+        """Wie iter_range, liefert aber Arrow-RecordBatches im Schema measurement_schema()"""
+        import pyarrow as pa
+
+        validate_table_name(table_name)
+        schema = measurement_schema(include_index)
+        if self.cold is not None:
+            for cold in self._cold_range(table_name, start_date, end_date, exclude_anomalies):
+                cold = cold.astype({name: str for name in schema.names if name != 'value'})
+                yield pa.RecordBatch.from_pandas(cold[schema.names], schema=schema, preserve_index=False)
+        query = self._range_query(table_name, start_date, end_date, include_index, ordered, exclude_anomalies)
+        with self.read_connection(table_name) as conn:
+            yield from perf.stream(
+                "sql:stream_arrow",
+                self._iter_batches(
+                    conn, query, self._range_params(table_name, start_date, end_date), chunk_size, schema
+                ),
+                table=table_name
+            )
+
+    def read_typed(self, table_name, start_date=None, end_date=None, value_dtype=FRAME_VALUE_DTYPE,
+                   include_index=False, row_count=None, exclude_anomalies=False):
+        """Lädt Messwerte als typisierten Frame (timestamp, value[, index]) ohne Zwischenkopien"""
+        if row_count is None:
+            row_count = self.count_rows(table_name, start_date, end_date)
+        with perf.span("pandas:typed_frame", table=table_name) as entry:
+            df = build_typed_frame(
+                self.iter_range(
+                    table_name, start_date, end_date, include_index=include_index, exclude_anomalies=exclude_anomalies
+                ),
+                row_count,
+                value_dtype,
+                include_index
+            )
+            entry['rows'], entry['bytes'] = perf.frame_size(df)
+        return df
+
+    def read_buckets(self, table_name, start_date, end_date, interval_seconds, function='avg'):
+        """Verdichtet die Messwerte eines Zeitraums auf feste Intervalle (avg/min/max/sum/count)"""
+        validate_table_name(table_name)
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Unbekannte Aggregatfunktion: '{function}'")
+        bucket = self.bucket_expression("(date || ' ' || time)::timestamp")
+        query = f"""
+            SELECT
+                {bucket} as bucket,
+                {AGGREGATE_FUNCTIONS[function]}(CAST(value AS DOUBLE PRECISION)) as value,
+                COUNT(*) as samples
+            FROM {table_name}
+            WHERE date::date BETWEEN :start_date AND :end_date
+            GROUP BY 1
+            ORDER BY 1
+        """
+        with self.read_connection(table_name) as conn:
+            df = self._read_frame(conn, query, {
+                'start_date': start_date,
+                'end_date': end_date,
+                'interval': int(interval_seconds)
+            }, 'buckets', table_name)
+        cold_frames = self._cold_frames(table_name, start_date, end_date)
+        if cold_frames:
+            df = merge_cold_buckets(df, pd.concat(cold_frames, ignore_index=True), interval_seconds, function)
+        return df
+
+    def _value_query(self, table_name, start_date, end_date, exclude_anomalies):
+        """Unterabfrage der numerischen Messwerte (Spalte v) eines Zeitraums"""
+        return f"""
+            SELECT CAST(value AS DOUBLE PRECISION) AS v
+            FROM {table_name} m
+            WHERE {self._range_condition(start_date, end_date)}
+            {'AND ' + exclusion_condition('m') if exclude_anomalies else ''}
+        """
+
+    def value_summary(self, table_name, start_date=None, end_date=None, exclude_anomalies=False):
+        """Kennzahlen und Perzentile der Werte eines Zeitraums, vollständig in der Datenbank berechnet
+
+        Liegen archivierte Monate im Zeitraum, werden Anzahl, Extremwerte, Mittelwert
+        und Standardabweichung exakt zusammengeführt; die Perzentile sind dann None.
+        """
+        validate_table_name(table_name)
+        quantiles = ',\n'.join(
+            f"percentile_cont({q}) WITHIN GROUP (ORDER BY v) AS q{round(q * 100):02d}" for q in SUMMARY_QUANTILES
+        )
+        query = f"""
+            SELECT COUNT(v) AS count, MIN(v) AS min, MAX(v) AS max, AVG(v) AS mean, STDDEV_SAMP(v) AS std,
+                   {quantiles}
+            FROM ({self._value_query(table_name, start_date, end_date, exclude_anomalies)}) s
+        """
+        with self.read_connection(table_name) as conn:
+            summary = self._read_frame(
+                conn, query, self._range_params(table_name, start_date, end_date), 'value_summary', table_name
+            ).iloc[0].to_dict()
+        summary['count'] = int(summary['count'])
+        if self.cold is None:
+            return summary
+        cold = [
+            frame['value'].dropna()
+            for frame in self._cold_range(table_name, start_date, end_date, exclude_anomalies)
+        ]
+        cold = pd.concat(cold, ignore_index=True) if cold else pd.Series(dtype=float)
+        return merge_cold_summary(summary, cold) if len(cold) else summary
+
+    def value_histogram(self, table_name, start_date, end_date, lower, upper, bins, exclude_anomalies=False):
+        """Anzahl der Werte je Klasse gleicher Breite zwischen lower und upper (bucket 1..bins)
+
+        Klasse 0 und bins + 1 zählen die Werte unterhalb bzw. oberhalb der Grenzen.
+        Nur die Klassenzählungen verlassen die Datenbank.
+        """
+        validate_table_name(table_name)
+        query = f"""
+            SELECT
+                CASE WHEN v = :upper THEN :bins ELSE {self.histogram_expression('v')} END AS bucket,
+                COUNT(*) AS count
+            FROM ({self._value_query(table_name, start_date, end_date, exclude_anomalies)}) s
+            WHERE v IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """
+        params = {
+            **self._range_params(table_name, start_date, end_date),
+            'lower': float(lower), 'upper': float(upper), 'bins': int(bins)
+        }
+        with self.read_connection(table_name) as conn:
+            df = self._read_frame(conn, query, params, 'value_histogram', table_name)
+        counts = pd.Series(0, index=range(int(bins) + 2), dtype='int64')
+        counts = counts.add(df.set_index('bucket')['count'].astype('int64'), fill_value=0)
+        if self.cold is not None:
+            for frame in self._cold_range(table_name, start_date, end_date, exclude_anomalies):
+                values = frame['value'].dropna().to_numpy(dtype=float)
+                counts = counts.add(
+                    pd.Series(histogram_buckets(values, lower, upper, bins)).value_counts(), fill_value=0
+                )
+        return counts.astype('int64').rename_axis('bucket').rename('count').reset_index()
+
+    def read_chunks(self, table_name, chunk_size):
+        """Liefert alle Zeilen einer Tabelle als DataFrame-Chunks"""
+        validate_table_name(table_name)
+        with self.read_connection(table_name) as conn:
+            yield from self._iter_frames(conn, f"SELECT * FROM {table_name}", chunk_size=chunk_size)
+
+    def search(self, table_name, filters, limit=SEARCH_LIMIT):
+        """Sucht Datenpunkte anhand von Index, Datum, Zeit und/oder Wert
+
+        filters enthält bereits validierte Werte für die Schlüssel
+        'index' (int), 'date' (str), 'time' (str) und 'value' (float).
+        """
+        validate_table_name(table_name)
+        conditions = []
+        params = {}
+        if 'index' in filters:
+            conditions.append("CAST(index AS integer) = :search_index")
+            params['search_index'] = filters['index']
+        if 'date' in filters:
+            conditions.append("date = :search_date")
+            params['search_date'] = filters['date']
+        if 'time' in filters:
+            conditions.append("time = :search_time")
+            params['search_time'] = filters['time']
+        if 'value' in filters:
+            conditions.append(f"value::{self.numeric_type} = :search_value")
+            params['search_value'] = filters['value']
+
+        where_clause = " AND ".join(conditions) if conditions else "TRUE"
+        query = f"""
+            SELECT DISTINCT
+                CAST(index AS integer) as index,
+                date,
+                time,
+                value::{self.numeric_type} as value
+            FROM {table_name}
+            WHERE {where_clause}
+            ORDER BY date, time, index
+            LIMIT {int(limit)}
+        """
+        with self.read_connection(table_name) as conn:
+            hot = self._read_frame(conn, query, params, 'search', table_name)
+        cold = self._cold_search(table_name, filters) if self.cold is not None else pd.DataFrame()
+        if cold.empty:
+            return hot
+        return (
+            pd.concat([cold, hot], ignore_index=True)
+            .drop_duplicates()
+            .sort_values(['date', 'time', 'index'], kind='stable')
+            .head(int(limit))
+            .reset_index(drop=True)
+        )
+
+    def _cold_search(self, table_name, filters):
+        """Wendet die Suchfilter auf die archivierten Messwerte an (mit Datum nur auf dessen Dateien)"""
+        day = filters.get('date')
+        frames = []
+        for cold in self.cold.iter_frames(table_name, day, day):
+            index = pd.to_numeric(cold['index'], errors='coerce')
+            value = pd.to_numeric(cold['value'], errors='coerce')
+            mask = pd.Series(True, index=cold.index)
+            if 'index' in filters:
+                mask &= index == filters['index']
+            if 'date' in filters:
+                mask &= cold['date'] == filters['date']
+            if 'time' in filters:
+                mask &= cold['time'] == filters['time']
+            if 'value' in filters:
+                mask &= value == filters['value']
+            if mask.any():
+                frames.append(pd.DataFrame({
+                    'index': index[mask].astype('Int64'), 'date': cold.loc[mask, 'date'],
+                    'time': cold.loc[mask, 'time'], 'value': value[mask]
+                }))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def measurement_schema(include_index=False):
+    """Arrow-Schema der gestreamten Messwerte ([index,] date, time, value)"""
+    import pyarrow as pa
+
+    fields = [('date', pa.string()), ('time', pa.string()), ('value', pa.float64())]
+    if include_index:
+        fields.insert(0, ('index', pa.string()))
+    return pa.schema(fields)
+
+
+def column_list(columns):
+    """Kommagetrennte, in Anführungszeichen gesetzte Spaltennamen für INSERT/COPY"""
+    return ', '.join(f'"{validate_table_name(name)}"' for name in columns)
+
+
+def merge_cold_buckets(hot, cold, interval_seconds, function):
+    """Verdichtet archivierte Messwerte in pandas und führt sie mit den Datenbank-Intervallen zusammen"""
+    timestamps = pd.to_datetime(cold['date'] + ' ' + cold['time'], errors='coerce')
+    grouped = cold['value'].groupby(timestamps.dt.floor(f"{int(interval_seconds)}s"))
+    pandas_function = {'avg': 'mean'}.get(function, function)
+    cold_buckets = pd.DataFrame({
+        'value': grouped.agg(pandas_function),
+        'samples': grouped.size()
+    }).rename_axis('bucket').reset_index()
+    if hot.empty:
+        return cold_buckets
+
+    # Ein Intervall kann an der Grenze zwischen Archiv und Datenbank in beiden Teilen liegen
+    combined = pd.concat([cold_buckets, hot], ignore_index=True)
+    combined['bucket'] = pd.to_datetime(combined['bucket'])
+    combined['weighted'] = combined['value'] * combined['samples']
+    groups = combined.groupby('bucket', sort=True)
+    merge_function = {'avg': 'sum', 'count': 'sum', 'sum': 'sum', 'min': 'min', 'max': 'max'}[function]
+    merged = pd.DataFrame({
+        'value': groups['value'].agg(merge_function),
+        'samples': groups['samples'].sum()
+    })
+    if function == 'avg':
+        merged['value'] = groups['weighted'].sum() / merged['samples']
+    return merged.reset_index()
+
+
+def histogram_buckets(values, lower, upper, bins):
+    """Klassen 0..bins+1 wie Storage.histogram_expression für Werte aus dem Archiv"""
+    buckets = np.floor((values - lower) / (upper - lower) * bins).astype('int64') + 1
+    buckets = np.clip(buckets, 0, bins + 1)
+    buckets[values == upper] = bins
+    return buckets
+
+
+def merge_cold_summary(summary, cold):
+    """Führt Kennzahlen aus der Datenbank mit archivierten Werten zusammen (Perzentile entfallen)"""
+    hot_count = summary['count']
+    count = hot_count + len(cold)
+    hot_mean = summary['mean'] if hot_count else 0.0
+    mean = (hot_mean * hot_count + cold.sum()) / count
+    # Summe der quadrierten Abweichungen beider Teile um den gemeinsamen Mittelwert
+    hot_ss = (summary['std'] ** 2 * (hot_count - 1) if hot_count > 1 else 0.0) + hot_count * (hot_mean - mean) ** 2
+    cold_ss = ((cold - mean) ** 2).sum()
+    merged = {
+        'count': int(count),
+        'min': min(summary['min'], cold.min()) if hot_count else cold.min(),
+        'max': max(summary['max'], cold.max()) if hot_count else cold.max(),
+        'mean': mean,
+        'std': ((hot_ss + cold_ss) / (count - 1)) ** 0.5 if count > 1 else None
+    }
+    return {**summary, **merged, **{key: None for key in summary if key.startswith('q')}}
+
+
+class PostgresStorage(Storage):
+    """PostgreSQL-Backend mit COPY-basiertem Massenimport"""
+    dialect = 'postgresql'
+
+    def _acquire_table_lock(self, conn, table_name, timeout):
+        # Advisory Lock statt LOCK TABLE: Leser werden nicht blockiert; lock_timeout begrenzt die Wartezeit
+        if timeout is not None:
+            conn.execute(text(f"SET LOCAL lock_timeout = '{int(timeout * 1000)}ms'"))
+        try:
+            conn.execute(
+                text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:table_name))"),
+                {'namespace': ADVISORY_LOCK_NAMESPACE, 'table_name': table_name}
+            )
+        except OperationalError as e:
+            raise TableLockedError(table_name, timeout) from e
+        if timeout is not None:
+            # Der Timeout gilt nur für die Sperre, nicht für DDL und Schreibzugriffe danach
+            conn.execute(text("SET LOCAL lock_timeout = DEFAULT"))
+
+    def lock_for_rewrite(self, conn, table_name):
+        # Lesende Abfragen laufen weiter, nur Schreibzugriffe warten
+        conn.execute(text(f"LOCK TABLE {table_name} IN SHARE ROW EXCLUSIVE MODE"))
+
+    def table_size(self, table_name):
+        with self.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT pg_total_relation_size(CAST(:table_name AS regclass))"),
+                {'table_name': table_name}
+            ).scalar()
+
+    def reclaim_space(self, table_name):
+        # VACUUM ist außerhalb einer Transaktion auszuführen
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(f"VACUUM (ANALYZE) {table_name}"))
+
+    def _bulk_insert(self, conn, table_name, df, batch_size):
+        # COPY über die DBAPI-Verbindung der laufenden Transaktion
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        with conn.connection.driver_connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {table_name} ({column_list(df.columns)}) FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
+
+
+class DuckDBStorage(Storage):
+    """Eingebettetes DuckDB-Backend (ein Prozess, keine Serverinstallation nötig)"""
+    dialect = 'duckdb'
+    numeric_type = 'DOUBLE'
+
+    def bucket_expression(self, timestamp_expr):
+        return (
+            f"make_timestamp(CAST(floor(epoch_us({timestamp_expr}) / (CAST(:interval AS BIGINT) * 1000000)) "
+            f"* CAST(:interval AS BIGINT) * 1000000 AS BIGINT))"
+        )
+
+    def histogram_expression(self, value_expr):
+        # DuckDB kennt kein width_bucket
+        return (
+            f"CASE WHEN {value_expr} < :lower THEN 0 WHEN {value_expr} >= :upper THEN :bins + 1 "
+            f"ELSE CAST(floor(({value_expr} - :lower) / (:upper - :lower) * :bins) AS INTEGER) + 1 END"
+        )
+
+    def reclaim_space(self, table_name):
+        with self.engine.connect() as conn:
+            conn.execute(text("CHECKPOINT"))
+
+    def list_tables(self):
+        inspector = inspect(self.engine)
+        names = inspector.get_table_names() + inspector.get_view_names()
+        return sorted(name for name in names if not is_meta_table(name))
+
+    def _bulk_insert(self, conn, table_name, df, batch_size):
+        # DataFrame direkt (spaltenweise) registrieren statt zeilenweiser INSERTs
+        raw = conn.connection.driver_connection
+        raw.register('_insert_frame', df)
+        try:
+            columns = column_list(df.columns)
+            raw.execute(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM _insert_frame")
+        finally:
+            raw.unregister('_insert_frame')
+
+    def _iter_batches(self, conn, query, params=None, chunk_size=STREAM_CHUNK_SIZE, schema=None):
+        # DuckDB liefert das Ergebnis spaltenweise als Arrow-Stream, ohne Python-Objekte je Zeile
+        result = conn.execute(text(query), params or {})
+        for batch in result.cursor.to_arrow_reader(chunk_size):
+            yield batch.cast(schema) if schema is not None and batch.schema != schema else batch
+
+    def _iter_frames(self, conn, query, params=None, chunk_size=STREAM_CHUNK_SIZE):
+        for batch in self._iter_batches(conn, query, params, chunk_size):
+            yield batch.to_pandas()
+
+    def attach_parquet(self, table_name, path):
+        """Bindet Parquet-Dateien (auch Glob-Muster) als Tabelle im Anwendungslayout ein
+
+        Die Daten bleiben in den Dateien und werden bei jeder Abfrage von DuckDB
+        vektorisiert gelesen.
+        """
+        validate_table_name(table_name)
+        escaped_path = path.replace("'", "''")
+        with self.engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE OR REPLACE VIEW {table_name} AS
+                SELECT
+                    CAST(index AS VARCHAR) AS index,
+                    CAST(date AS VARCHAR) AS date,
+                    CAST(time AS VARCHAR) AS time,
+                    CAST(value AS VARCHAR) AS value
+                FROM read_parquet('{escaped_path}')
+            """))
+            clear_coverage(conn, table_name)
+            register_table(conn, table_name)
+            bump_table_version(conn, table_name)
+
+    def drop_table(self, table_name, timeout=TABLE_LOCK_TIMEOUT):
+        validate_table_name(table_name)
+        if table_name in inspect(self.engine).get_view_names():
+            with self.write_transaction(table_name, timeout) as conn:
+                conn.execute(text(f"DROP VIEW IF EXISTS {table_name}"))
+                clear_coverage(conn, table_name)
+                clear_anomalies(conn, table_name, forget=True)
+                unregister_table(conn, table_name)
+                bump_table_version(conn, table_name)
+        else:
+            super().drop_table(table_name, timeout)
+
+
+class StagedLoad:
+    """Lädt Messwerte in eine Staging-Tabelle und übernimmt sie anschließend in einem Schritt
+
+    Das Einlesen läuft ohne Sperre auf der Zieltabelle, sodass mehrere Importe
+    in dieselbe Tabelle parallel laden. Nur die Übernahme (INSERT … SELECT bzw.
+    bei replace=True der Austausch per RENAME) hält kurz die Schreibsperre;
+    Leser sehen eine Datei entweder gar nicht oder vollständig.
+
+        with storage.staged_load('csv1') as load:
+            for chunk in chunks:
+                load.insert(chunk)
+
+    Die Übernahme erfolgt beim Verlassen des Blocks; bei einer Ausnahme wird die
+    Staging-Tabelle verworfen und die Zieltabelle bleibt unverändert.
+    """
+
+    def __init__(self, storage, table_name, replace=False, timeout=TABLE_LOCK_TIMEOUT):
+        self.storage = storage
+        self.table_name = validate_table_name(table_name)
+        self.replace = replace
+        self.timeout = timeout
+        self.staging = f"{STAGING_PREFIX}{table_name}_{uuid.uuid4().hex[:8]}"
+        self.rows = 0
+        self._counts = []
+        self._flags = []
+        self.detector = None
+
+    def __enter__(self):
+        with self.storage.engine.begin() as conn:
+            conn.execute(text(f"CREATE TABLE {self.staging} (index TEXT, date TEXT, time TEXT, value TEXT)"))
+            # Beim Anhängen setzt die Erkennung am Fenster des letzten Imports fort
+            self.detector = AnomalyDetector.for_table(conn, self.table_name, resume=not self.replace)
+        return self
+
+    def insert(self, df, batch_size=INSERT_BATCH_SIZE):
+        """Lädt einen Chunk in die Staging-Tabelle (für Leser noch unsichtbar)"""
+        if not df.empty:
+            with self.storage.engine.begin() as conn:
+                self.storage._bulk_insert(conn, self.staging, df[MEASUREMENT_COLUMNS], batch_size)
+            self._counts.append(hour_counts(df))
+            if self.detector is not None:
+                self._flags.append(self.detector.flag(df))
+            self.rows += len(df)
+        return len(df)
+
+    def commit(self):
+        """Übernimmt die Staging-Tabelle unter Schreibsperre in die Zieltabelle"""
+        storage, table_name = self.storage, self.table_name
+        with storage.write_transaction(table_name, self.timeout) as conn:
+            if self.replace:
+                previous = f"{STAGING_PREFIX}old_{uuid.uuid4().hex[:8]}"
+                if inspect(conn).has_table(table_name):
+                    conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {previous}"))
+                conn.execute(text(f"ALTER TABLE {self.staging} RENAME TO {table_name}"))
+                conn.execute(text(f"DROP TABLE IF EXISTS {previous}"))
+                clear_coverage(conn, table_name)
+                clear_anomalies(conn, table_name)
+                register_table(conn, table_name)
+            else:
+                columns = column_list(MEASUREMENT_COLUMNS)
+                conn.execute(text(f"INSERT INTO {table_name} ({columns}) SELECT {columns} FROM {self.staging}"))
+            record_hour_counts(conn, table_name, merge_hour_counts(self._counts))
+            if self.detector is not None:
+                if self._flags:
+                    insert_flags(conn, table_name, pd.concat(self._flags, ignore_index=True))
+                self.detector.save(conn, table_name)
+            bump_table_version(conn, table_name)
+        if self.replace and storage.cold is not None:
+            storage.cold.drop(table_name)
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            with self.storage.engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {self.staging}"))
+        return False
+
+
+def create_duckdb_engine(path=DUCKDB_PATH):
+    """Erstellt eine Engine für eine lokale DuckDB-Datei (benötigt duckdb-engine)"""
+    try:
+        import duckdb_engine  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "Für das DuckDB-Backend werden die Pakete 'duckdb' und 'duckdb-engine' benötigt"
+        ) from e
+    if path != ':memory:':
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return create_engine(f'duckdb:///{path}')
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    """Erstellt das konfigurierte Storage-Backend"""
+    if backend == 'duckdb':
+        storage = DuckDBStorage(create_duckdb_engine())
+    elif backend == 'postgresql':
+        write_engine, router = create_engines()
+        storage = PostgresStorage(write_engine, router)
+        if SLOW_QUERY_LOG:
+            storage.query_log = SlowQueryLog(storage.engine)
+            for engine in router.engines():
+                storage.query_log.watch(engine)
+    else:
+        raise ValueError(f"Unbekanntes Storage-Backend: '{backend}'")
+    if ARCHIVE_ENABLED:
+        storage.cold = ColdTier(storage.engine, ARCHIVE_DIR)
+    return storage
@@ -0,0 +1,179 @@
+"""Auswertungen über gestreamte Messwerte mit konstantem Speicherbedarf.
+
+Statistiken, Verdichtung für Diagramme und der CSV-Export lesen die Messwerte
+als Arrow-Batches über einen serverseitigen Cursor (Storage.iter_batches) und
+halten nur den aktuellen Batch sowie ihre Zwischenergebnisse im Speicher:
+    - StreamingStats: Anzahl, Mittelwert, Standardabweichung, Minimum, Maximum
+    - MinMaxDownsampler: Minimum und Maximum je Zeitintervall (Spitzen bleiben erhalten)
+    - write_csv: Export im Tabellenlayout, Batch für Batch in eine Datei
+
+Statistiken und Verdichtung hängen nicht von der Reihenfolge ab und lesen
+daher unsortiert; die ersten Zeilen liegen so nach wenigen Millisekunden vor.
+
+Start:
+    python streaming.py --table csv1                                  # Statistik und Zeit bis zur ersten Zeile
+    python streaming.py --table csv1 --export csv1.csv                # CSV-Export
+    python streaming.py --table csv1 --start 2024-01-01 --end 2024-01-31
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from frames import batch_arrays
+
+OVERVIEW_BUCKETS = 5_000  # Zeitintervalle der Diagramm-Verdichtung (je Intervall Minimum und Maximum)
+
+
+class StreamingStats:
+    """Anzahl, Mittelwert, Varianz (Chan et al.), Minimum und Maximum über beliebig viele Chunks"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, values):
+        """Nimmt die gültigen Werte eines Chunks auf"""
+        values = values[np.isfinite(values)]
+        n = len(values)
+        if not n:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def result(self):
+        """Kennzahlen als Series (Index wie bei Series.describe)"""
+        if not self.count:
+            return pd.Series({'count': 0}, name='value', dtype=float)
+        return pd.Series({
+            'count': self.count,
+            'mean': self.mean,
+            'std': np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan,
+            'min': self.min,
+            'max': self.max
+        }, name='value')
+
+
+class MinMaxDownsampler:
+    """Behält je Zeitintervall den kleinsten und größten Messwert mit Zeitstempel"""
+
+    def __init__(self, start, end, buckets=OVERVIEW_BUCKETS):
+        self.start = np.datetime64(pd.Timestamp(start), 'ns').astype(np.int64)
+        span = max(np.datetime64(pd.Timestamp(end), 'ns').astype(np.int64) - self.start, 1)
+        self.width = -(-span // buckets)
+        self.buckets = buckets
+        self.min_values = np.full(buckets, np.inf)
+        self.min_times = np.zeros(buckets, dtype=np.int64)
+        self.max_values = np.full(buckets, -np.inf)
+        self.max_times = np.zeros(buckets, dtype=np.int64)
+
+    def add(self, timestamps, values):
+        """Nimmt einen Chunk auf (Zeitstempel als datetime64, Reihenfolge beliebig)"""
+        times = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+        valid = np.isfinite(values) & (times != np.iinfo(np.int64).min)
+        times, values = times[valid], values[valid]
+        cells = (times - self.start) // self.width
+        inside = (cells >= 0) & (cells < self.buckets)
+        if not inside.any():
+            return
+        frame = pd.DataFrame({'cell': cells[inside], 'time': times[inside], 'value': values[inside]})
+        groups = frame.groupby('cell', sort=False)['value']
+        for positions, target_values, target_times, better in (
+            (groups.idxmin(), self.min_values, self.min_times, np.less),
+            (groups.idxmax(), self.max_values, self.max_times, np.greater)
+        ):
+            chosen = frame.loc[positions.to_numpy()]
+            cell = chosen['cell'].to_numpy()
+            update = better(chosen['value'].to_numpy(), target_values[cell])
+            target_values[cell[update]] = chosen['value'].to_numpy()[update]
+            target_times[cell[update]] = chosen['time'].to_numpy()[update]
+
+    def result(self):
+        """Verdichtete Reihe (timestamp, value) in zeitlicher Reihenfolge"""
+        filled = np.isfinite(self.min_values)
+        times = np.concatenate([self.min_times[filled], self.max_times[filled]])
+        values = np.concatenate([self.min_values[filled], self.max_values[filled]])
+        df = pd.DataFrame({'timestamp': times.astype('datetime64[ns]'), 'value': values})
+        # Minimum und Maximum fallen bei einzelnen Messwerten je Intervall zusammen
+        return df.drop_duplicates().sort_values('timestamp', kind='stable', ignore_index=True)
+
+
+def summarize_range(storage, table_name, start_date, end_date, buckets=OVERVIEW_BUCKETS, exclude_anomalies=False):
+    """Verdichtete Reihe und Kennzahlen eines Zeitraums in einem unsortierten Durchlauf"""
+    stats = StreamingStats()
+    downsampler = MinMaxDownsampler(start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1), buckets)
+    batches = storage.iter_batches(table_name, start_date, end_date, ordered=False, exclude_anomalies=exclude_anomalies)
+    for batch in batches:
+        timestamps, values = batch_arrays(batch)
+        stats.add(values)
+        downsampler.add(timestamps, values)
+    return downsampler.result(), stats.result()
+
+
+def write_csv(storage, table_name, target, start_date=None, end_date=None, progress=None, exclude_anomalies=False):
+    """Schreibt die Messwerte im Tabellenlayout (index, date, time, value) Batch für Batch als CSV
+
+    target ist ein Dateipfad oder ein geöffnetes Textdatei-Objekt; progress(geschriebene Zeilen)
+    wird nach jedem Batch aufgerufen, exclude_anomalies lässt markierte Messwerte weg.
+    Liefert die Zeilenzahl.
+    """
+    rows = 0
+    handle = open(target, 'w', newline='') if isinstance(target, str) else target
+    try:
+        batches = storage.iter_batches(
+            table_name, start_date, end_date, include_index=True, exclude_anomalies=exclude_anomalies
+        )
+        for batch in batches:
+            batch.to_pandas().to_csv(handle, index=False, header=(rows == 0))
+            rows += batch.num_rows
+            if progress is not None:
+                progress(rows)
+        if rows == 0:
+            handle.write('index,date,time,value\n')
+    finally:
+        if handle is not target:
+            handle.close()
+    return rows
+
+
+def main():
+    from storage import create_storage
+
+    parser = argparse.ArgumentParser(description="Gestreamte Auswertung einer Messwerttabelle")
+    parser.add_argument('--table', required=True, help="Tabellenname")
+    parser.add_argument('--start', help="Startdatum (YYYY-MM-DD)")
+    parser.add_argument('--end', help="Enddatum (YYYY-MM-DD)")
+    parser.add_argument('--export', help="CSV-Datei, in die exportiert wird")
+    args = parser.parse_args()
+    start, end = (args.start, args.end or args.start) if args.start else (None, None)
+
+    storage = create_storage()
+    started = time.perf_counter()
+    if args.export:
+        rows = write_csv(storage, args.table, args.export, start, end)
+        print(f"{rows:,} Zeilen nach {args.export} exportiert ({time.perf_counter() - started:.2f} s)")
+        return
+
+    stats = StreamingStats()
+    first_batch = None
+    for batch in storage.iter_batches(args.table, start, end, ordered=False):
+        if first_batch is None:
+            first_batch = time.perf_counter() - started
+        stats.add(batch_arrays(batch)[1])
+    print(f"Erste Zeilen nach {(first_batch or 0) * 1000:,.1f} ms, gesamt {time.perf_counter() - started:.2f} s")
+    print(stats.result().to_string())
+
+
+if __name__ == '__main__':
+    main()
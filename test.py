@@ -1,5 +1,4 @@
 import pandas as pd
-from sqlalchemy import create_engine, inspect, text
 import streamlit as st
 import plotly.express as px
 from datetime import datetime, timedelta
@@ -7,108 +6,156 @@ import time
 import numpy as np
 import plotly.graph_objects as go
 import re
+import os
 import random
+import tempfile
+
+import anomalies
+import correlation
+import distribution
+import figcache
+import memprof
+import perf
+import spectral
+from availability import (
+    availability_matrix, covered_range, default_date_range, find_gaps, insert_gap_breaks, load_coverage,
+    typical_interval
+)
+from catalog import (
+    CATALOG_PAGE_SIZE, catalog_version, list_namespaces, list_tags, search_tables, set_namespace, set_tags,
+    sync_catalog, table_entry, table_exists
+)
+from database import get_table_version
+from frames import MemoryBudget, estimate_bytes
+from ingest import normalize_measurements, load_ingest_state
+from jobs import JOB_LABELS, JOB_WORKERS, cancel_job, load_jobs, retry_job, save_upload, start_workers, submit_job
+from querylog import load_slow_queries, load_worst_tables
+from retention import load_retention_policies
+from schema import (
+    IMPORT_MODES, NUMERIC_TYPES, SQL_TYPES, generate_create_table, infer_schema, sanitize_column_name
+)
+from storage import DuckDBStorage, create_storage
+from streaming import OVERVIEW_BUCKETS, summarize_range, write_csv
 
-# Verbesserte Konfigurationskonstanten
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'examdb',
-    'user': 'postgres',
-    'password': '123456',
-    'port': 5432  # Expliziter Port
-}
-DEFAULT_DATE = '2024-01-24'
 PREVIEW_LIMIT = 5
+AUTO_REFRESH_INTERVAL = 5  # Sekunden zwischen zwei Versionsprüfungen
+LIVE_REFRESH_INTERVAL = 2  # Sekunden zwischen zwei Abrufen im Live-Modus
+LIVE_DEFAULT_POINTS = 2000
+LIVE_MAX_POINTS = 10000  # Obergrenze des gleitenden Fensters pro Sitzung
+CHART_MAX_POINTS = 200_000  # Darüber wird das Diagramm gestreamt verdichtet statt vollständig geladen
+# Standardansicht des Einzeldiagramms (Voreinstellungen der Visualisierungsoptionen)
+DEFAULT_CHART_SETTINGS = {
+    'line_type': 'lines+markers',
+    'point_size': 6,
+    'line_width': 2,
+    'gap_breaks': True,
+    'hide_anomalies': False
+}
+DELETE_LOCK_TIMEOUT = 2  # Sekunden, die das Löschen auf laufende Schreibzugriffe wartet
+JOB_REFRESH_SECONDS = 3  # Aktualisierungsintervall des Jobs-Panels
+JOB_PANEL_LIMIT = 10
+JOB_STATUS_LABELS = {
+    'queued': "⏳ wartet",
+    'running': "🔄 läuft",
+    'done': "✅ fertig",
+    'failed': "❌ fehlgeschlagen",
+    'cancelled': "⛔ abgebrochen"
+}
 
 # Verbesserte Datenbankverbindung mit Connection Pooling
 @st.cache_resource
-def get_database_connection():
-    """Erstellt und cached die Datenbankverbindung mit Connection Pooling"""
+def get_storage():
+    """Erstellt und cached das Storage-Backend (PostgreSQL mit Connection Pooling oder DuckDB)"""
     try:
-        engine = create_engine(
-            f'postgresql://{DB_CONFIG["user"]}:{DB_CONFIG["password"]}@{DB_CONFIG["host"]}:{DB_CONFIG["port"]}/{DB_CONFIG["database"]}',
-            pool_size=5,  # Optimale Poolgröße
-            max_overflow=10,
-            pool_timeout=30,
-            pool_recycle=1800  # Verbindungen nach 30 Minuten recyclen
-        )
-        return engine
+        return create_storage()
     except Exception as e:
         st.error(f"Datenbankverbindung fehlgeschlagen: {str(e)}")
         return None
 
-@st.cache_data(ttl=300)  # Cache für 5 Minuten
-def get_sorted_tables(_engine):
-    """Cached Funktion zum Abrufen der sortierten Tabellenliste"""
-    with _engine.connect() as conn:  # Stellt sicher, dass die Verbindung geschlossen wird
-        inspector = inspect(_engine)
-        return sorted(inspector.get_table_names())
+@st.cache_resource
+def get_job_workers(_storage):
+    """Startet die Worker für Hintergrundaufträge einmal pro Serverprozess (JOB_WORKERS=0: nur externe Worker)"""
+    return start_workers(_storage, JOB_WORKERS) if JOB_WORKERS else []
+
+@st.cache_resource
+def get_figure_cache():
+    """Diagramm-Cache des Serverprozesses (Speicher und FIGURE_CACHE_DIR)"""
+    return figcache.FigureCache()
+
+@st.cache_resource
+def get_figure_warmer(_storage):
+    """Wärmt den Diagramm-Cache einmal pro Serverprozess im Hintergrund auf (FIGURE_WARM_INTERVAL=0: aus)"""
+    return figcache.start_warmer(_storage, get_figure_cache(), render_chart_figure)
+
+@st.cache_resource
+def sync_table_catalog(_storage):
+    """Gleicht den Tabellenkatalog einmal pro Serverprozess mit der Datenbank ab"""
+    return sync_catalog(_storage.engine)
+
+@st.cache_data(ttl=300)
+def search_table_catalog(_storage, query, namespace=None, tag=None, page=0, version=0,
+                         page_size=CATALOG_PAGE_SIZE):
+    """Eine Seite der Katalogsuche (pro Katalogversion)"""
+    return search_tables(_storage.read_engine, query, namespace, tag, limit=page_size, offset=page * page_size)
+
+@st.cache_data(ttl=300)
+def get_catalog_facets(_storage, version=0):
+    """Namensräume und Tags für die Filter der Tabellenauswahl"""
+    return list_namespaces(_storage.read_engine), list_tags(_storage.read_engine)
+
+def get_memory_budget():
+    """Speicherbudget der aktuellen Sitzung für geladene Frames"""
+    if 'memory_budget' not in st.session_state:
+        st.session_state.memory_budget = MemoryBudget()
+    return st.session_state.memory_budget
+
+@st.cache_data(ttl=300)
+def count_table_rows(_storage, table_name, start_date=None, end_date=None, version=0):
+    """Zeilenzahl eines Zeitraums für Vorabreservierung und Vorbelegung (pro Tabellenversion)"""
+    return _storage.count_rows(table_name, start_date, end_date)
+
+def reserve_frame_memory(storage, table_name, start_date=None, end_date=None, version=0, include_index=False,
+                         scope=None):
+    """Prüft vor dem Laden, ob der Frame ins Speicherbudget der Sitzung passt
 
-# Optimierte Datenabfrage mit Chunking
+    scope ordnet die Reservierung einer Ansicht zu; Fragmente geben beim
+    Neuzeichnen mit release_scope die Reservierungen ihres letzten Laufs frei.
+    """
+    row_count = count_table_rows(storage, table_name, start_date, end_date, version)
+    get_memory_budget().reserve(
+        (scope, table_name, start_date, end_date, include_index),
+        estimate_bytes(row_count, include_index=include_index),
+        label=f"'{table_name}' ({row_count:,} Zeilen)"
+    )
+    return row_count
+
+# Typisiertes Laden: Spalten werden einmalig angelegt und chunkweise befüllt
 @st.cache_data(ttl=300)
-def load_data(_engine, table_name, chunk_size=1000):
-    """Lädt Daten in Chunks für bessere Performance"""
+def load_data(_storage, table_name, chunk_size=1000):
+    """Lädt die gesamte Tabelle als typisierten Frame (index, timestamp, value)"""
     try:
-        chunks = []
-        with _engine.connect() as conn:
-            for chunk_df in pd.read_sql(
-                f"SELECT * FROM {table_name}",
-                conn,
-                chunksize=chunk_size
-            ):
-                chunks.append(chunk_df)
-        return pd.concat(chunks) if chunks else pd.DataFrame()
+        return _storage.read_typed(table_name, include_index=True)
     except Exception as e:
         st.error(f"Fehler beim Laden der Daten: {str(e)}")
         return pd.DataFrame()
 
+@perf.timed('db:load_preview_data')
 @st.cache_data
-def load_preview_data(_engine, table_name):
-    """Lädt und cached Vorschaudaten"""
+def load_preview_data(_storage, table_name, version=0):
+    """Lädt und cached Vorschaudaten (pro Tabellenversion)"""
     try:
-        with _engine.connect() as conn:
-            # Prüfe ob Tabelle Daten enthält
-            count_query = text(f"SELECT COUNT(*) FROM {table_name}")
-            row_count = conn.execute(count_query).scalar()
-            
-            if row_count == 0:
-                st.info(f"Die Tabelle '{table_name}' ist leer.")
-                return pd.DataFrame(), pd.DataFrame({'total_rows': [0], 'unique_indices': [0], 'max_index': [0]}), \
-                       pd.DataFrame({'min_date': ['Kein Datum'], 'max_date': ['Kein Datum']})
-            
-            # Vorschau der Daten
-            preview_query = text(f"""
-                SELECT * FROM {table_name} 
-                ORDER BY date, time, index
-                LIMIT :limit
-            """)
-            df = pd.read_sql(preview_query, conn, params={'limit': PREVIEW_LIMIT})
-            
-            # Statistiken
-            stats_query = text(f"""
-                SELECT 
-                    COUNT(*) as total_rows,
-                    COUNT(DISTINCT index) as unique_indices,
-                    COUNT(DISTINCT index) as max_index
-                FROM {table_name}
-            """)
-            stats = pd.read_sql(stats_query, conn)
-            
-            # Datumsbereich
-            date_query = text(f"""
-                SELECT 
-                    MIN(date) as min_date,
-                    MAX(date) as max_date
-                FROM {table_name}
-                WHERE date IS NOT NULL AND date != ''
-            """)
-            date_range = pd.read_sql(date_query, conn)
-            
-            # Wenn keine Datumswerte gefunden wurden
-            if date_range['min_date'].iloc[0] is None:
-                date_range = pd.DataFrame({'min_date': ['Kein Datum'], 'max_date': ['Kein Datum']})
-            
-            return df, stats, date_range
+        row_count, df, stats, date_range = _storage.preview(table_name, PREVIEW_LIMIT)
+        
+        if row_count == 0:
+            st.info(f"Die Tabelle '{table_name}' ist leer.")
+            return pd.DataFrame(), pd.DataFrame({'total_rows': [0], 'unique_indices': [0], 'max_index': [0]}), \
+                   pd.DataFrame({'min_date': ['Kein Datum'], 'max_date': ['Kein Datum']})
+        
+        # Wenn keine Datumswerte gefunden wurden
+        if date_range['min_date'].iloc[0] is None:
+            date_range = pd.DataFrame({'min_date': ['Kein Datum'], 'max_date': ['Kein Datum']})
+        
+        return df, stats, date_range
             
     except Exception as e:
         st.error(f"Fehler beim Laden der Vorschau: {str(e)}")
@@ -152,7 +199,10 @@ def format_preview_data(df, stats, date_range):
             st.metric(
                 "Indizes",
                 formatted_indices,
-                help=f"Unique Indizes: {unique_indices:,}"
+                help=f"Unique Indizes: {unique_indices:,}" + (
+                    " (nur Datenbank, archivierte Monate nicht mitgezählt)"
+                    if stats.iloc[0].get('archived_rows', 0) else ""
+                )
             )
         
         with col3:
@@ -190,19 +240,341 @@ def format_preview_data(df, stats, date_range):
     except Exception as e:
         st.error(f"Fehler bei der Formatierung der Vorschau: {str(e)}")
 
-def search_data_points(engine, table_name: str, search_params: dict) -> pd.DataFrame:
+@perf.timed('db:get_chart_data')
+@st.cache_data(ttl=300)
+def get_chart_data(_storage, table_name: str, start_date: str, end_date: str, version: int = 0,
+                   exclude_anomalies: bool = False) -> pd.DataFrame:
+    """Lädt die Messwerte eines Zeitraums als typisierten Frame (timestamp, value)
+
+    Die Tabellenversion ist Teil des Cache-Schlüssels.
+    """
+    row_count = count_table_rows(_storage, table_name, start_date, end_date, version)
+    return _storage.read_typed(
+        table_name, start_date, end_date, row_count=row_count, exclude_anomalies=exclude_anomalies
+    )
+
+@perf.timed('db:get_chart_overview')
+@st.cache_data(ttl=300)
+def get_chart_overview(_storage, table_name, start_date, end_date, version=0, exclude_anomalies=False):
+    """Verdichtete Reihe und Kennzahlen eines großen Zeitraums aus einem gestreamten Durchlauf"""
+    return summarize_range(_storage, table_name, start_date, end_date, exclude_anomalies=exclude_anomalies)
+
+@perf.timed('db:get_anomaly_flags')
+@st.cache_data(ttl=300)
+def get_anomaly_flags(_storage, table_name, start_date, end_date, version=0):
+    """Beim Import markierte Anomalien eines Zeitraums mit Zeitstempel (pro Tabellenversion)"""
+    return read_anomaly_flags(_storage, table_name, start_date, end_date)
+
+def read_anomaly_flags(storage, table_name, start_date, end_date):
+    """Markierte Anomalien eines Zeitraums direkt aus der Datenbank (ohne Streamlit-Cache)"""
+    with storage.read_connection(table_name) as conn:
+        flags = anomalies.load_anomalies(conn, table_name, start_date, end_date)
+    flags['timestamp'] = pd.to_datetime(flags['date'] + ' ' + flags['time'], format='%Y-%m-%d %H:%M:%S')
+    return flags
+
+def render_anomaly_settings(storage, table_name):
+    """Parameter der Anomalieerkennung einer Tabelle bearbeiten und Neuberechnung einreihen"""
+    try:
+        with storage.engine.begin() as conn:
+            anomalies.ensure_anomaly_tables(conn)
+            settings = anomalies.load_settings(conn, table_name)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            method = st.selectbox(
+                "Verfahren", list(anomalies.METHODS), index=list(anomalies.METHODS).index(settings['method']),
+                format_func=anomalies.METHODS.get, key=f"anomaly_method_{table_name}"
+            )
+        with col2:
+            window_size = st.number_input(
+                "Fenster (Messwerte)", 5, 10_000, int(settings['window_size']), key=f"anomaly_window_{table_name}"
+            )
+        with col3:
+            threshold = st.number_input(
+                "Schwelle", 1.0, 50.0, float(settings['threshold']), 0.5, key=f"anomaly_threshold_{table_name}",
+                help="Score ab dem ein Messwert markiert wird (Vielfache der MAD bzw. von σ)"
+            )
+        enabled = st.checkbox("Beim Import prüfen", value=bool(settings['enabled']), key=f"anomaly_enabled_{table_name}")
+        if st.button("Speichern und neu berechnen", key=f"anomaly_rescan_{table_name}"):
+            anomalies.save_settings(storage.engine, table_name, method, window_size, threshold, enabled)
+            job_id = submit_job(storage.engine, 'anomalies', {'table_name': table_name})
+            st.success(f"Neuberechnung als Auftrag `{job_id[:8]}` eingereiht")
+    except Exception as e:
+        st.error(f"Fehler bei den Parametern der Anomalieerkennung: {str(e)}")
+
+@st.cache_data(ttl=300)
+def get_table_coverage(_storage, table_name, version=0):
+    """Abdeckungsindex einer Tabelle (Messwerte je Tag und Stunde, pro Tabellenversion)"""
+    return load_coverage(_storage, table_name)
+
+def init_date_range(key, coverage):
+    """Belegt die Datumsauswahl einmalig mit dem letzten Tag, an dem Messwerte vorliegen"""
+    if f"{key}_start_date" not in st.session_state:
+        start, end = default_date_range(coverage)
+        st.session_state[f"{key}_start_date"] = start
+        st.session_state[f"{key}_end_date"] = end
+
+def describe_coverage(coverage):
+    """Kurzbeschreibung des verfügbaren Zeitraums"""
+    if coverage.empty:
+        return "Die Tabelle enthält keine Messwerte."
+    first = datetime.strptime(coverage['date'].min(), '%Y-%m-%d')
+    last = datetime.strptime(coverage['date'].max(), '%Y-%m-%d')
+    return f"Messwerte liegen vom {first:%d.%m.%Y} bis {last:%d.%m.%Y} vor."
+
+def render_availability(coverage, key):
+    """Verfügbarkeits-Heatmap (Tag × Stunde) und die längsten Lücken"""
+    if coverage.empty:
+        st.info("Die Tabelle enthält keine Messwerte.")
+        return
+    interval = typical_interval(coverage)
+    gaps = find_gaps(coverage, interval)
+    st.caption(
+        f"{coverage['samples'].sum():,} Messwerte · {describe_coverage(coverage)} "
+        f"Übliches Messintervall: {interval or 0:g} s · {len(gaps):,} Lücken"
+    )
+    fig = px.imshow(
+        availability_matrix(coverage),
+        labels={'x': "Stunde", 'y': "Datum", 'color': "Messwerte"},
+        aspect='auto',
+        color_continuous_scale='Greens'
+    )
+    st.plotly_chart(fig, use_container_width=True, key=f"availability_{key}")
+    if not gaps.empty:
+        st.dataframe(
+            gaps.sort_values('Dauer', ascending=False).head(100).astype({'Dauer': str}),
+            hide_index=True,
+            use_container_width=True
+        )
+
+@perf.timed('analysis:lag_analysis')
+@st.cache_data(ttl=300, max_entries=8)
+def get_lag_analysis(_dfs_dict, versions, start_date, end_date, max_lag_seconds, resolution=None):
+    """Korrelations- und Versatzanalyse der verglichenen Tabellen (pro Tabellenversion und Zeitraum)"""
+    return correlation.lag_analysis(_dfs_dict, max_lag_seconds, resolution)
+
+def render_lag_analysis(dfs_dict, versions, start_date, end_date, options):
+    """Korrelationsmatrix und bester Versatz je Tabellenpaar"""
+    st.markdown("#### Kreuzkorrelation und Versatz")
+    if len(dfs_dict) < 2:
+        st.info("Für die Analyse werden mindestens zwei Tabellen benötigt.")
+        return
+    try:
+        points = max(len(df) for df in dfs_dict.values())
+        get_memory_budget().reserve(
+            ('multi', 'lag_analysis', tuple(dfs_dict)),
+            correlation.estimate_bytes(len(dfs_dict), points),
+            label=f"Versatzanalyse ({len(dfs_dict)} Tabellen)"
+        )
+        with st.spinner("Berechne Kreuzkorrelation..."):
+            result = get_lag_analysis(
+                dfs_dict, tuple(sorted(versions.items())), start_date, end_date,
+                options['max_lag_seconds'], options['lag_resolution'] or None
+            )
+
+        st.caption(
+            f"Gemeinsames Raster ab {result['start']:%d.%m.%Y %H:%M:%S}: {result['points']:,} Punkte "
+            f"im Abstand von {result['resolution']:g} s. Positiver Versatz: die Zeilentabelle folgt der Spaltentabelle."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = px.imshow(
+                result['peak'], zmin=-1, zmax=1, text_auto='.2f',
+                color_continuous_scale='RdBu_r', title="Korrelation beim besten Versatz"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            fig = px.imshow(
+                result['lag_seconds'], text_auto='.4g', color_continuous_scale='RdBu_r',
+                color_continuous_midpoint=0, title="Bester Versatz (s)"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+        st.dataframe(
+            result['pairs'],
+            column_config={
+                'Korrelation': st.column_config.NumberColumn(format="%.3f"),
+                'Korrelation bei Versatz': st.column_config.NumberColumn(format="%.3f")
+            },
+            hide_index=True,
+            use_container_width=True
+        )
+    except Exception as e:
+        st.error(f"Fehler bei der Versatzanalyse: {str(e)}")
+
+@perf.timed('analysis:welch_spectrum')
+@st.cache_data(ttl=3600, max_entries=16)
+def get_spectrum(_storage, table_name, start_date, end_date, version, segment_length, column_seconds):
+    """Welch-PSD und Spektrogramm eines Zeitraums (pro Tabellenversion), chunkweise aus der Datenbank"""
+    return spectral.welch_spectrum(
+        _storage, table_name, start_date, end_date, segment_length, column_seconds=column_seconds
+    )
+
+def render_spectrum(storage, table_name, start_date, end_date, version):
+    """Leistungsdichtespektrum, Spektrogramm und dominante Frequenzen"""
+    col1, col2 = st.columns(2)
+    with col1:
+        segment_length = st.selectbox(
+            "Segmentlänge (Messwerte)", [256, 1024, 4096, 16384], index=1, key="spectrum_segment",
+            help="Längere Segmente: feinere Frequenzauflösung, weniger Mittelung"
+        )
+    with col2:
+        log_scale = st.checkbox("Logarithmische Frequenzachse", value=True, key="spectrum_log")
+    if not st.checkbox("Spektrum berechnen", key="single_spectrum",
+                       help="Liest den Zeitraum chunkweise aus der Datenbank; das Ergebnis wird zwischengespeichert"):
+        return
+
+    try:
+        span = (datetime.strptime(end_date, '%Y-%m-%d') - datetime.strptime(start_date, '%Y-%m-%d')).days + 1
+        column_seconds = span * 86400 / spectral.SPECTROGRAM_COLUMNS
+        with st.spinner("Berechne Spektrum..."):
+            result = get_spectrum(storage, table_name, start_date, end_date, version, segment_length, column_seconds)
+
+        st.caption(
+            f"{result['samples']:,} Messwerte, {result['segments']:,} Segmente, "
+            f"Abtastrate {result['sample_rate']:.4g} Hz, Auflösung {result['frequencies'][1]:.3g} Hz"
+        )
+        fig = go.Figure(go.Scatter(x=result['frequencies'][1:], y=result['psd'][1:], mode='lines'))
+        fig.update_layout(
+            title="Leistungsdichtespektrum (Welch)",
+            xaxis_title="Frequenz (Hz)",
+            yaxis_title="Leistungsdichte (Einheit²/Hz)",
+            xaxis_type='log' if log_scale else 'linear',
+            yaxis_type='log'
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        spectrogram = result['spectrogram']
+        if spectrogram is not None and len(spectrogram['times']) > 1:
+            fig = go.Figure(go.Heatmap(
+                x=spectrogram['times'],
+                y=spectrogram['frequencies'][1:],
+                z=10 * np.log10(np.maximum(spectrogram['psd'][:, 1:].T, np.finfo(float).tiny)),
+                colorscale='Viridis',
+                colorbar={'title': 'dB'}
+            ))
+            fig.update_layout(
+                title="Spektrogramm",
+                yaxis_title="Frequenz (Hz)",
+                yaxis_type='log' if log_scale else 'linear'
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(spectral.dominant_frequencies(result), hide_index=True, use_container_width=True)
+    except Exception as e:
+        st.error(f"Fehler bei der Frequenzanalyse: {str(e)}")
+
+@st.fragment(run_every=AUTO_REFRESH_INTERVAL)
+def watch_table_versions(storage, table_names, key):
+    """Startet einen Rerun, sobald neue Daten (z.B. aus dem Watch-Ordner-Import) vorliegen"""
+    versions = {table: get_table_version(storage.read_engine, table) for table in table_names}
+    state_key = f"watched_versions_{key}"
+    previous = st.session_state.get(state_key)
+    st.session_state[state_key] = versions
+    if previous is not None and previous != versions:
+        st.rerun()
+
+def append_live_samples(window, new_rows, max_points):
+    """Hängt neue Messwerte an das Live-Fenster an und begrenzt es auf max_points"""
+    samples = pd.DataFrame({
+        'timestamp': pd.to_datetime(new_rows['date'] + ' ' + new_rows['time'], errors='coerce'),
+        'value': new_rows['value'].astype('float64')
+    })
+    if window is not None and not window.empty:
+        samples = pd.concat([window, samples], ignore_index=True)
+    return samples.iloc[-max_points:].reset_index(drop=True)
+
+@st.fragment(run_every=LIVE_REFRESH_INTERVAL)
+def render_live_chart(storage, table_name, max_points):
+    """Streifenschreiber: lädt nur Messwerte nach dem letzten bekannten Zeitstempel"""
+    state_key = f"live_{table_name}"
+    live = st.session_state.get(state_key)
+    if live is None or live['max_points'] != max_points:
+        live = {'version': None, 'window': None, 'last': None, 'appended': 0, 'max_points': max_points}
+
+    try:
+        # Günstige Versionsprüfung; nur bei Änderungen wird die Tabelle gelesen
+        version = get_table_version(storage.read_engine, table_name)
+        if version != live['version']:
+            if live['last'] is None:
+                new_rows = storage.read_since(table_name, limit=max_points)
+            else:
+                new_rows = storage.read_since(table_name, *live['last'], limit=max_points)
+                if len(new_rows) >= max_points:
+                    # Mehr neue Werte als das Fenster fasst: mit den neuesten Werten neu beginnen
+                    live['window'] = None
+                    new_rows = storage.read_since(table_name, limit=max_points)
+            if not new_rows.empty:
+                live['window'] = append_live_samples(live['window'], new_rows, max_points)
+                live['last'] = (new_rows['date'].iloc[-1], new_rows['time'].iloc[-1])
+            live['appended'] = len(new_rows)
+            live['version'] = version
+        st.session_state[state_key] = live
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Live-Daten: {str(e)}")
+        return
+
+    window = live['window']
+    if window is None or window.empty:
+        st.info(f"Die Tabelle '{table_name}' enthält noch keine Daten.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Letzter Messwert", f"{window['value'].iloc[-1]:.6f}")
+    with col2:
+        st.metric("Zeitpunkt", window['timestamp'].iloc[-1].strftime('%d.%m.%y %H:%M:%S'))
+    with col3:
+        st.metric("Punkte im Fenster", f"{len(window):,}", delta=live['appended'] or None)
+
+    fig = go.Figure(go.Scattergl(
+        x=window['timestamp'],
+        y=window['value'],
+        mode='lines',
+        name=table_name,
+        line=dict(width=2)
+    ))
+    fig.update_layout(
+        height=500,
+        margin=dict(t=30, b=40, l=60, r=20),
+        xaxis_title="Zeit",
+        yaxis_title="Messwert",
+        plot_bgcolor='white',
+        uirevision=table_name  # Zoom bleibt bei neuen Punkten erhalten
+    )
+    with perf.span("render:live_chart", table=table_name, rows=len(window)):
+        st.plotly_chart(fig, use_container_width=True, key=f"live_chart_{table_name}")
+
+@perf.timed('db:view_data')
+@st.cache_data(ttl=300)
+def load_view_data(_storage, table_name, version=0):
+    """Lädt die gesamte Tabelle typisiert für die View-Data-Ansicht (pro Tabellenversion)"""
+    row_count = count_table_rows(_storage, table_name, version=version)
+    return _storage.read_typed(table_name, include_index=True, row_count=row_count)
+
+def build_csv_export(storage, table_name, exclude_anomalies=False):
+    """Schreibt den CSV-Export erst beim Klick gestreamt in eine temporäre Datei
+
+    Die Tabelle wird dafür nicht als Frame geladen und der Export nicht im Cache gehalten.
+    """
+    export_file = tempfile.TemporaryFile(mode='w+', newline='')
+    write_csv(storage, table_name, export_file, exclude_anomalies=exclude_anomalies)
+    export_file.seek(0)
+    return export_file
+
+@st.cache_data(ttl=300)
+def load_search_results(_storage, table_name, filters, version=0):
+    """Cached Suchabfrage, damit Diagramm-Optionen keine erneute Suche auslösen"""
+    return _storage.search(table_name, filters)
+
+@perf.timed('db:search_data_points')
+def search_data_points(storage, table_name: str, search_params: dict) -> pd.DataFrame:
     """Sucht spezifische Datenpunkte in der examDB und bereitet sie für die Visualisierung auf"""
+    filters = {}
     try:
-        conditions = []
-        params = {}
-        
         # Index-Suche angepasst an die examDB-Struktur
         if search_params.get('index'):
             # Konvertiere den Index-Wert in einen Integer
             try:
-                index_value = int(search_params['index'])
-                conditions.append("CAST(index AS integer) = :search_index")
-                params['search_index'] = index_value
+                filters['index'] = int(search_params['index'])
             except ValueError:
                 st.error("Der Index muss eine ganze Zahl sein")
                 return pd.DataFrame()
@@ -210,71 +582,89 @@ def search_data_points(engine, table_name: str, search_params: dict) -> pd.DataF
         # Zeit-basierte Suche
         if search_params.get('date') or search_params.get('time'):
             if search_params.get('date'):
-                conditions.append("date = :search_date")
-                params['search_date'] = search_params['date']
+                filters['date'] = search_params['date']
                 
             if search_params.get('time'):
                 try:
                     time_str = search_params['time']
                     if len(time_str.split(':')) == 2:
                         time_str += ':00'
-                    conditions.append("time = :search_time")
-                    params['search_time'] = time_str
+                    filters['time'] = time_str
                 except Exception as e:
                     st.error(f"Ungültiges Zeitformat. Bitte verwenden Sie HH:MM:SS: {str(e)}")
                     return pd.DataFrame()
         
         if search_params.get('value') is not None:
             try:
-                value = float(search_params['value'])
-                conditions.append("value::numeric = :search_value")
-                params['search_value'] = value
+                filters['value'] = float(search_params['value'])
             except ValueError:
                 st.error("Ungültiger Wert für die Suche")
                 return pd.DataFrame()
 
-        # Erstelle WHERE-Klausel
-        where_clause = " AND ".join(conditions) if conditions else "TRUE"
-        
-        # Query angepasst an die examDB-Struktur
-        query = f"""
-            SELECT DISTINCT
-                CAST(index AS integer) as index,
-                date,
-                time,
-                value::numeric as value
-            FROM {table_name}
-            WHERE {where_clause}
-            ORDER BY date, time, index
-            LIMIT 1000
-        """
+        df = load_search_results(
+            storage, table_name, filters, get_table_version(storage.read_engine, table_name)
+        ).copy()
         
-        with engine.connect() as conn:
-            # Debug-Ausgabe vor der Ausführung
-            st.write("Debug - SQL Query:", query)
-            st.write("Debug - Parameter:", params)
-            
-            df = pd.read_sql_query(text(query), conn, params=params)
-            
-            if df.empty:
-                st.info("Keine Datenpunkte gefunden.")
-            else:
-                st.success(f"{len(df)} Datenpunkte gefunden")
-                # Formatierung der Ergebnisse
-                df['value'] = pd.to_numeric(df['value'], errors='coerce').round(6)
-                
-                # Konvertiere date und time für die Anzeige
-                df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-                df['time'] = pd.to_datetime(df['time'], format='%H:%M:%S').dt.strftime('%H:%M:%S')
+        if df.empty:
+            st.info("Keine Datenpunkte gefunden.")
+        else:
+            st.success(f"{len(df)} Datenpunkte gefunden")
+            # Formatierung der Ergebnisse
+            df['value'] = pd.to_numeric(df['value'], errors='coerce').round(6)
             
-            return df
+            # Konvertiere date und time für die Anzeige
+            df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
+            df['time'] = pd.to_datetime(df['time'], format='%H:%M:%S').dt.strftime('%H:%M:%S')
+        
+        return df
             
     except Exception as e:
         st.error(f"Fehler bei der Datenbankabfrage: {str(e)}")
-        st.error(f"Query: {query}")
-        st.error(f"Parameter: {params}")
+        st.error(f"Suchfilter: {filters}")
         return pd.DataFrame()
 
+def add_search_results(fig, search_results):
+    """Markiert gefundene Datenpunkte in einem Diagramm"""
+    if search_results is None or search_results.empty:
+        return fig
+    search_df = search_results.copy()
+    search_df['datetime'] = pd.to_datetime(
+        search_df['date'].astype(str) + ' ' + search_df['time'].astype(str)
+    )
+
+    # Hover-Template für Suchresultate
+    search_hover_template = (
+        "<b>Gefundener Punkt</b>" +
+        (" auf Index %{customdata}" if 'index' in search_df.columns else "") +
+        "<br><br>" +
+        "Datum: %{x|%Y-%m-%d}<br>" +
+        "Zeit: %{x|%H:%M:%S}<br>" +
+        "Wert: %{y:.6f}<br>" +
+        "<extra></extra>"
+    )
+
+    search_scatter_args = {
+        'x': search_df['datetime'],
+        'y': search_df['value'],
+        'mode': 'markers',
+        'name': 'Gefundene Punkte',
+        'marker': dict(
+            symbol='star',
+            size=15,
+            color='red',
+            line=dict(color='black', width=1)
+        ),
+        'hovertemplate': search_hover_template
+    }
+
+    # Füge customdata nur hinzu, wenn Index vorhanden ist
+    if 'index' in search_df.columns:
+        search_scatter_args['customdata'] = search_df['index']
+
+    fig.add_trace(go.Scatter(**search_scatter_args))
+    return fig
+
+@perf.timed('figure:create_visualization')
 def create_visualization(df, selected_table, options=None, search_results=None):
     """Erstellt eine scrollbare Datenvisualisierung mit markierten Suchpunkten"""
     try:
@@ -292,11 +682,14 @@ def create_visualization(df, selected_table, options=None, search_results=None):
         # Konvertiere Datentypen
         plot_df['value'] = pd.to_numeric(plot_df['value'], errors='coerce')
         
-        # Korrekte Konvertierung von Datum und Zeit zu datetime
-        plot_df['datetime'] = pd.to_datetime(
-            plot_df['date'].astype(str) + ' ' + plot_df['time'].astype(str),
-            format='%Y-%m-%d %H:%M:%S'
-        )
+        # Typisierte Frames liefern den Zeitstempel bereits als datetime64
+        if 'timestamp' in plot_df.columns:
+            plot_df['datetime'] = plot_df['timestamp']
+        else:
+            plot_df['datetime'] = pd.to_datetime(
+                plot_df['date'].astype(str) + ' ' + plot_df['time'].astype(str),
+                format='%Y-%m-%d %H:%M:%S'
+            )
         
         # Erstelle Grundvisualisierung
         fig = go.Figure()
@@ -312,10 +705,13 @@ def create_visualization(df, selected_table, options=None, search_results=None):
             "<extra></extra>"
         )
 
+        # Lücken laut Abdeckungsindex unterbrechen die Linie
+        line_df = insert_gap_breaks(plot_df, options.get('gap_interval'), 'datetime')
+
         # Füge Datenpunkte hinzu
         scatter_args = {
-            'x': plot_df['datetime'],
-            'y': plot_df['value'],
+            'x': line_df['datetime'],
+            'y': line_df['value'],
             'mode': options['line_type'],
             'name': 'Messwerte',
             'line': dict(width=options['line_width'], color='#1f77b4'),
@@ -324,48 +720,32 @@ def create_visualization(df, selected_table, options=None, search_results=None):
         }
         
         # Füge customdata nur hinzu, wenn Index vorhanden ist
-        if 'index' in plot_df.columns:
-            scatter_args['customdata'] = plot_df['index']
+        if 'index' in line_df.columns:
+            scatter_args['customdata'] = line_df['index']
 
         fig.add_trace(go.Scatter(**scatter_args))
 
+        # Beim Import markierte Anomalien
+        flags = options.get('anomalies')
+        if flags is not None and not flags.empty:
+            fig.add_trace(go.Scatter(
+                x=flags['timestamp'],
+                y=flags['value'],
+                mode='markers',
+                name='Anomalien',
+                customdata=flags['score'],
+                marker=dict(symbol='x', size=10, color='red'),
+                hovertemplate=(
+                    "<b>Anomalie</b><br>" +
+                    "Zeitpunkt: %{x}<br>" +
+                    "Wert: %{y:.6f}<br>" +
+                    "Score: %{customdata:.1f}<br>" +
+                    "<extra></extra>"
+                )
+            ))
+
         # Suchresultate mit Index im Hover
-        if search_results is not None and not search_results.empty:
-            search_df = search_results.copy()
-            search_df['datetime'] = pd.to_datetime(
-                search_df['date'].astype(str) + ' ' + search_df['time'].astype(str)
-            )
-            
-            # Hover-Template für Suchresultate
-            search_hover_template = (
-                "<b>Gefundener Punkt</b>" +
-                (" auf Index %{customdata}" if 'index' in search_df.columns else "") +
-                "<br><br>" +
-                "Datum: %{x|%Y-%m-%d}<br>" +
-                "Zeit: %{x|%H:%M:%S}<br>" +
-                "Wert: %{y:.6f}<br>" +
-                "<extra></extra>"
-            )
-            
-            search_scatter_args = {
-                'x': search_df['datetime'],
-                'y': search_df['value'],
-                'mode': 'markers',
-                'name': 'Gefundene Punkte',
-                'marker': dict(
-                    symbol='star',
-                    size=15,
-                    color='red',
-                    line=dict(color='black', width=1)
-                ),
-                'hovertemplate': search_hover_template
-            }
-            
-            # Füge customdata nur hinzu, wenn Index vorhanden ist
-            if 'index' in search_df.columns:
-                search_scatter_args['customdata'] = search_df['index']
-            
-            fig.add_trace(go.Scatter(**search_scatter_args))
+        add_search_results(fig, search_results)
 
         # Layout-Konfiguration mit Legende unter dem Titel
         fig.update_layout(
@@ -461,6 +841,110 @@ def create_visualization(df, selected_table, options=None, search_results=None):
         st.error(f"DataFrame Typen: {df.dtypes}")
         return None
 
+def load_chart_inputs(storage, table_name, start_date, end_date, version, hide_anomalies):
+    """Anomalien, Zeilenzahl, Daten und Kennzahlen des Einzeldiagramms über die Caches der Sitzung"""
+    flags = get_anomaly_flags(storage, table_name, start_date, end_date, version)
+
+    # Große Zeiträume werden gestreamt auf Minimum/Maximum je Intervall verdichtet
+    row_count = count_table_rows(storage, table_name, start_date, end_date, version)
+    if row_count > CHART_MAX_POINTS:
+        df, stats = get_chart_overview(storage, table_name, start_date, end_date, version, hide_anomalies)
+    else:
+        reserve_frame_memory(storage, table_name, start_date, end_date, version)
+        df = get_chart_data(storage, table_name, start_date, end_date, version, hide_anomalies)
+        stats = df['value'].describe()
+    return flags, row_count, df, stats
+
+def read_chart_inputs(storage, table_name, start_date, end_date, hide_anomalies, budget):
+    """Wie load_chart_inputs, aber ohne Streamlit-Caches und Sitzung (Aufwärmen im Hintergrund)
+
+    Der Frame wird gegen das übergebene Speicherbudget reserviert.
+    """
+    flags = read_anomaly_flags(storage, table_name, start_date, end_date)
+    row_count = storage.count_rows(table_name, start_date, end_date)
+    if row_count > CHART_MAX_POINTS:
+        df, stats = summarize_range(storage, table_name, start_date, end_date, exclude_anomalies=hide_anomalies)
+    else:
+        budget.reserve(
+            (table_name, start_date, end_date, False), estimate_bytes(row_count),
+            label=f"'{table_name}' ({row_count:,} Zeilen)"
+        )
+        df = storage.read_typed(
+            table_name, start_date, end_date, row_count=row_count, exclude_anomalies=hide_anomalies
+        )
+        stats = df['value'].describe()
+    return flags, row_count, df, stats
+
+def build_chart_figure(storage, table_name, start_date, end_date, version, coverage, settings, budget=None):
+    """Lädt die Daten eines Zeitraums und erstellt das Einzeldiagramm; liefert (Figur, Kennzahlen)
+
+    Ohne budget laufen die Abfragen über die Caches und das Speicherbudget der
+    Sitzung, mit budget direkt gegen die Datenbank (außerhalb eines Skriptlaufs).
+    """
+    if budget is None:
+        flags, row_count, df, stats = load_chart_inputs(
+            storage, table_name, start_date, end_date, version, settings['hide_anomalies']
+        )
+    else:
+        flags, row_count, df, stats = read_chart_inputs(
+            storage, table_name, start_date, end_date, settings['hide_anomalies'], budget
+        )
+    overview = row_count > CHART_MAX_POINTS
+    meta = {
+        'rows': row_count,
+        'points': len(df),
+        'overview': overview,
+        'anomalies': len(flags),
+        'stats': stats.to_dict()
+    }
+    if df.empty:
+        return None, meta
+
+    options = {
+        'line_type': settings['line_type'],
+        'point_size': settings['point_size'],
+        'line_width': settings['line_width'],
+        'gap_interval': typical_interval(coverage) if settings['gap_breaks'] else None,
+        'anomalies': None if settings['hide_anomalies'] else flags
+    }
+    if overview and options['gap_interval']:
+        # Verdichtete Punkte liegen bis zu zwei Intervalle auseinander
+        days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+        options['gap_interval'] = max(options['gap_interval'], days * 86400 / OVERVIEW_BUCKETS)
+    return create_visualization(df, table_name, options), meta
+
+# Änderungen am Diagrammcode machen gespeicherte Figuren ungültig
+FIGURE_CODE_VERSION = figcache.code_version(create_visualization, add_search_results, build_chart_figure)
+
+def chart_figure_key(table_name, version, start_date, end_date, settings):
+    """Schlüssel des Einzeldiagramms im Diagramm-Cache (Auflösung: Grenze für die Verdichtung)"""
+    return figcache.figure_key(
+        table_name, version, start_date, end_date, CHART_MAX_POINTS, settings, FIGURE_CODE_VERSION
+    )
+
+def render_chart_figure(storage, cache, table_name, start_date, end_date, budget, settings=DEFAULT_CHART_SETTINGS):
+    """Legt eine fehlende Ansicht im Diagramm-Cache an (Aufwärmen); True, wenn sie neu erstellt wurde
+
+    Läuft im Hintergrund-Thread ohne Sitzung: keine Streamlit-Caches, eigenes Speicherbudget.
+    """
+    version = get_table_version(storage.read_engine, table_name)
+    coverage = load_coverage(storage, table_name)
+    covered = covered_range(coverage, start_date, end_date)
+    if covered is None:
+        return False
+    start_date, end_date = covered
+    key = chart_figure_key(table_name, version, start_date, end_date, settings)
+    if cache.contains(key):
+        return False
+    try:
+        fig, meta = build_chart_figure(storage, table_name, start_date, end_date, version, coverage, settings, budget)
+    finally:
+        budget.release((table_name, start_date, end_date, False))
+    if fig is None:
+        return False
+    cache.put(key, fig, meta)
+    return True
+
 def process_csv_data(uploaded_file):
     """Verarbeitet CSV-Daten"""
     try:
@@ -484,13 +968,8 @@ def process_csv_data(uploaded_file):
         
         st.write("Gelesene Daten vor Verarbeitung:", df.head())
         
-        # Timestamp in date und time aufteilen
-        df['timestamp'] = pd.to_datetime(df['timestamp'].str.strip())
-        df['date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
-        df['time'] = df['timestamp'].dt.strftime('%H:%M:%S')
-        
-        # Finale Daten vorbereiten
-        result_df = df[['index', 'date', 'time', 'value']].copy()
+        # Timestamp in date und time aufteilen und finale Daten vorbereiten
+        result_df = normalize_measurements(df)
         
         # Debug-Ausgabe der finalen Daten
         st.write("Finale Daten für Upload:", result_df.head())
@@ -501,39 +980,6 @@ def process_csv_data(uploaded_file):
         st.error(f"Details: {type(e).__name__}: {str(e)}")
         return None
 
-def remove_outliers(df, threshold=3.0):
-    """
-    Entfernt Ausreißer aus dem DataFrame basierend auf der IQR-Methode
-    
-    Args:
-        df: DataFrame mit 'datetime' und 'value' Spalten
-        threshold: IQR-Faktor für die Ausreißererkennung (Standard: 3.0)
-    
-    Returns:
-        DataFrame ohne Ausreißer, Anzahl der Ausreißer, untere und obere Grenze
-    """
-    df_clean = df.copy()
-    
-    # Berechne Q1, Q3 und IQR für die Werte
-    Q1 = df_clean['value'].quantile(0.25)
-    Q3 = df_clean['value'].quantile(0.75)
-    IQR = Q3 - Q1
-    
-    # Definiere die Grenzen für Ausreißer
-    lower_bound = Q1 - threshold * IQR
-    upper_bound = Q3 + threshold * IQR
-    
-    # Markiere Ausreißer
-    outliers_mask = (df_clean['value'] < lower_bound) | (df_clean['value'] > upper_bound)
-    
-    # Berechne die Anzahl der Ausreißer
-    n_outliers = outliers_mask.sum()
-    
-    # Entferne Ausreißer
-    df_clean = df_clean[~outliers_mask]
-    
-    return df_clean, n_outliers, lower_bound, upper_bound
-
 def get_random_color():
     """Generiert eine zufällige, ansprechende Farbe"""
     # Vordefinierte, ansprechende Farben
@@ -556,6 +1002,7 @@ def get_random_color():
     ]
     return random.choice(color_palette)
 
+@perf.timed('figure:create_multi_table_visualization')
 def create_multi_table_visualization(dfs_dict, options):
     """Erstellt eine Visualisierung für mehrere Tabellen mit definierten Standardfarben"""
     try:
@@ -582,55 +1029,54 @@ def create_multi_table_visualization(dfs_dict, options):
             plot_df = df.copy()
             
             # Datenaufbereitung
-            plot_df['datetime'] = pd.to_datetime(
-                plot_df['date'].astype(str) + ' ' + plot_df['time'].astype(str)
-            )
+            if 'timestamp' in plot_df.columns:
+                plot_df['datetime'] = plot_df['timestamp']
+            else:
+                plot_df['datetime'] = pd.to_datetime(
+                    plot_df['date'].astype(str) + ' ' + plot_df['time'].astype(str)
+                )
             plot_df['value'] = pd.to_numeric(plot_df['value'], errors='coerce')
             
-            # Ausreißerbehandlung wenn aktiviert
-            if options['remove_outliers']:
-                plot_df_clean, n_outliers, lower_bound, upper_bound = remove_outliers(
-                    plot_df, 
-                    threshold=options['outlier_threshold']
-                )
-                
-                # Zeige Informationen über entfernte Ausreißer
+            # Beim Import markierte Anomalien ausblenden (unabhängig vom geladenen Ausschnitt)
+            flags = options.get('anomalies', {}).get(table_name)
+            if options['hide_anomalies'] and flags is not None and not flags.empty:
+                flagged = plot_df['datetime'].isin(flags['timestamp'])
+                outliers_df = plot_df[flagged]
                 st.info(f"""
-                    **Ausreißeranalyse für {table_name}:**
-                    - Entfernte Ausreißer: {n_outliers}
-                    - Untere Grenze: {lower_bound:.6f}
-                    - Obere Grenze: {upper_bound:.6f}
+                    **Anomalien in {table_name}:**
+                    - Ausgeblendet: {len(outliers_df):,}
+                    - Höchster Score: {flags['score'].max():.1f}
                 """)
-                
-                # Zeige Ausreißer in separater Trace
-                outliers_df = plot_df[~plot_df.index.isin(plot_df_clean.index)]
+
+                # Zeige Anomalien in separater Trace
                 if not outliers_df.empty:
                     fig.add_trace(go.Scatter(
                         x=outliers_df['datetime'],
                         y=outliers_df['value'],
                         mode='markers',
-                        name=f'{table_name} (Ausreißer)',
-                marker=dict(
+                        name=f'{table_name} (Anomalien)',
+                        marker=dict(
                             symbol='x',
                             size=10,
-                    color=color,
+                            color=color,
                             line=dict(width=2, color='red')
-                ),
-                hovertemplate=(
-                            "<b>Ausreißer</b><br>" +
+                        ),
+                        hovertemplate=(
+                            "<b>Anomalie</b><br>" +
                             "Zeitpunkt: %{x}<br>" +
                             "Wert: %{y:.6f}<br>" +
-                    "<extra></extra>"
-                )
+                            "<extra></extra>"
+                        )
                     ))
-                
+
                 # Verwende bereinigte Daten für die Hauptvisualisierung
-                plot_df = plot_df_clean
+                plot_df = plot_df[~flagged]
             
-            # Hauptlinie mit angepasster Farbe
+            # Hauptlinie mit angepasster Farbe, an Lücken unterbrochen
+            line_df = insert_gap_breaks(plot_df, options.get('gap_intervals', {}).get(table_name), 'datetime')
             fig.add_trace(go.Scatter(
-                x=plot_df['datetime'],
-                y=plot_df['value'],
+                x=line_df['datetime'],
+                y=line_df['value'],
                 mode=options['line_type'],
                 name=table_name,
                 line=dict(width=options['line_width'], color=color),
@@ -813,17 +1259,76 @@ def create_multi_table_visualization(dfs_dict, options):
         st.error(f"Fehler bei der Multi-Tabellen-Visualisierung: {str(e)}")
         return None
 
-def delete_table(engine, table_name):
-    """Löscht eine Tabelle aus der Postgres-Datenbank"""
+def delete_table(storage, table_name):
+    """Löscht eine Tabelle aus der Datenbank (nicht während ein Import in sie schreibt)"""
     try:
-        with engine.connect() as conn:
-            conn.execute(text(f"DROP TABLE IF EXISTS {table_name} CASCADE"))
-            conn.commit()
+        storage.drop_table(table_name, timeout=DELETE_LOCK_TIMEOUT)
         return True
     except Exception as e:
         st.error(f"Fehler beim Löschen der Tabelle: {str(e)}")
         return False
 
+def render_table_picker(storage):
+    """Tabellenauswahl über den Katalog: Suche, Namensraum, Tag und seitenweise Liste
+
+    Liefert die ausgewählte Tabelle und die Tabellen der aktuellen Seite.
+    """
+    version = catalog_version(storage.read_engine)
+    namespaces, tags = get_catalog_facets(storage, version)
+    query = st.text_input("Tabelle suchen", key="catalog_query", placeholder="Präfix oder Teil des Namens")
+    col1, col2 = st.columns(2)
+    with col1:
+        namespace_counts = dict(zip(namespaces['namespace'], namespaces['tables']))
+        namespace = st.selectbox(
+            "Namensraum",
+            [None, *namespace_counts],
+            format_func=lambda ns: "Alle" if ns is None else f"{ns or '(ohne)'} ({namespace_counts[ns]:,})",
+            key="catalog_namespace"
+        )
+    with col2:
+        tag = st.selectbox("Tag", [None, *tags['tag']], format_func=lambda t: "Alle" if t is None else t,
+                           key="catalog_tag")
+
+    # Neue Suche oder Filter: zurück auf die erste Seite
+    page = st.session_state.get("catalog_page", 1)
+    results, total = search_table_catalog(storage, query, namespace, tag, page - 1, version)
+    if results.empty and page > 1:
+        st.session_state.catalog_page = page = 1
+        results, total = search_table_catalog(storage, query, namespace, tag, 0, version)
+    pages = max(1, -(-total // CATALOG_PAGE_SIZE))
+    if pages > 1:
+        st.number_input(f"Seite (von {pages:,})", min_value=1, max_value=pages, key="catalog_page")
+
+    page_tables = list(results['table_name'])
+    selected_table = st.selectbox(
+        "Wählen Sie eine Tabelle aus",
+        page_tables if page_tables else ["Keine Tabellen verfügbar"],
+        key="selected_table"
+    )
+    st.caption(f"{len(page_tables):,} von {total:,} Tabellen")
+    return selected_table, page_tables
+
+def render_catalog_entry(storage, table_name):
+    """Namensraum und Tags der ausgewählten Tabelle bearbeiten"""
+    try:
+        entry = table_entry(storage.read_engine, table_name) or {'namespace': '', 'tags': []}
+        namespace = st.text_input("Namensraum", value=entry['namespace'], key=f"catalog_ns_{table_name}")
+        tags = st.text_input("Tags (kommagetrennt)", value=", ".join(entry['tags']), key=f"catalog_tags_{table_name}",
+                             help="z.B. Beamline oder Messgröße")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Speichern", key="catalog_save", use_container_width=True):
+                set_namespace(storage.engine, table_name, namespace)
+                set_tags(storage.engine, table_name, tags)
+                st.success("Katalogeintrag gespeichert")
+        with col2:
+            if st.button("Katalog abgleichen", key="catalog_sync", use_container_width=True,
+                         help="Übernimmt Tabellen, die außerhalb der Anwendung angelegt oder gelöscht wurden"):
+                added, removed = sync_catalog(storage.engine)
+                st.success(f"{len(added)} aufgenommen, {len(removed)} entfernt")
+    except Exception as e:
+        st.error(f"Fehler beim Bearbeiten des Katalogs: {str(e)}")
+
 def format_number(number):
     """Formatiert Zahlen in lesbares Format"""
     if number >= 1000000:
@@ -833,20 +1338,1080 @@ def format_number(number):
     else:
         return str(number)
 
+def show_performance_panel():
+    """Zeigt die Zeitmessungen des aktuellen Durchlaufs in einem einklappbaren Panel"""
+    spans = perf.current_spans()
+    with st.sidebar.expander("⏱️ Performance"):
+        if not spans:
+            st.info("Keine Messungen in diesem Durchlauf")
+            return
+        spans_df = pd.DataFrame(spans)
+        for column in ['table', 'rows', 'bytes', 'first_row_ms']:
+            if column not in spans_df.columns:
+                spans_df[column] = None
+        st.metric("Gemessene Zeit", f"{spans_df['duration_ms'].sum():,.0f} ms")
+        budget = get_memory_budget()
+        st.caption(
+            f"Speicherbudget: {budget.used_bytes / 1024 / 1024:,.1f} von "
+            f"{budget.limit_bytes / 1024 / 1024:,.0f} MB reserviert"
+        )
+        if figcache.FIGURE_CACHE:
+            figures = get_figure_cache().stats()
+            st.caption(
+                f"Diagramm-Cache: {figures['entries']:,} Figuren ({figures['memory_bytes'] / 1024 / 1024:,.1f} MB), "
+                f"{figures['files']:,} Dateien · Treffer {figures['hits']:,} + {figures['disk_hits']:,} aus Dateien, "
+                f"Fehlversuche {figures['misses']:,}"
+            )
+        st.dataframe(
+            spans_df[['name', 'table', 'duration_ms', 'first_row_ms', 'rows', 'bytes']]
+                .sort_values('duration_ms', ascending=False),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "duration_ms": st.column_config.NumberColumn("Dauer [ms]", format="%.1f"),
+                "first_row_ms": st.column_config.NumberColumn(
+                    "Erste Zeile [ms]", format="%.1f", help="Zeit bis zum ersten Chunk bei gestreamten Abfragen"
+                ),
+                "rows": st.column_config.NumberColumn("Zeilen"),
+                "bytes": st.column_config.NumberColumn("Bytes")
+            }
+        )
+        if perf.PERF_LOG_PATH:
+            st.caption(f"JSON-Lines-Log: `{perf.PERF_LOG_PATH}`")
+
+def show_slow_query_log(storage):
+    """Admin-Ansicht der langsamsten Abfragen pro Tabelle inklusive Ausführungsplan"""
+    if storage.query_log is None:
+        return
+    with st.sidebar.expander("🐢 Langsame Abfragen"):
+        st.caption(f"Schwellwert: {storage.query_log.threshold_ms:,.0f} ms")
+        try:
+            worst_tables = load_worst_tables(storage.read_engine)
+            if worst_tables.empty:
+                st.info("Keine langsamen Abfragen protokolliert")
+                return
+            st.dataframe(
+                worst_tables,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "max_ms": st.column_config.NumberColumn("Max [ms]", format="%.0f"),
+                    "avg_ms": st.column_config.NumberColumn("Ø [ms]", format="%.0f"),
+                    "with_seq_scan": st.column_config.NumberColumn("Seq Scans")
+                }
+            )
+            table_filter = st.selectbox(
+                "Tabelle",
+                [None] + [name for name in worst_tables['table_name'] if name],
+                format_func=lambda x: "Alle" if x is None else x,
+                key="slow_query_table"
+            )
+            for _, row in load_slow_queries(storage.read_engine, table_filter, limit=10).iterrows():
+                st.markdown(
+                    f"**{row['duration_ms']:,.0f} ms** · `{row['table_name']}` · "
+                    f"{row['seq_scans']} Seq Scan(s) · {row['logged_at']:%Y-%m-%d %H:%M:%S}"
+                )
+                st.code(row['statement'], language='sql')
+                st.caption(f"Parameter: {row['parameters']}")
+                st.json(row['plan'], expanded=False)
+        except Exception as e:
+            st.error(f"Fehler beim Laden des Abfrageprotokolls: {str(e)}")
+
+def show_pool_metrics(storage):
+    """Auslastung der Schreib-/Lese-Pools und Zustand der Replikate (nur mit Lese-/Schreib-Routing)"""
+    if storage.router is None:
+        return
+    with st.sidebar.expander("🔌 Verbindungspools"):
+        try:
+            metrics = storage.router.pool_metrics(storage.engine)
+            routed = storage.router.routed
+            st.caption(
+                f"Lesezugriffe: {routed['replica']:,} Replikat · {routed['primary']:,} Primär · "
+                f"{routed['fallback']:,} Ausweichen auf Primär"
+            )
+            st.dataframe(
+                metrics,
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "utilization": st.column_config.ProgressColumn(
+                        "Auslastung", min_value=0.0, max_value=1.0, format="percent"
+                    ),
+                    "lag_seconds": st.column_config.NumberColumn("Verzögerung [s]", format="%.2f")
+                }
+            )
+        except Exception as e:
+            st.error(f"Fehler beim Laden der Pool-Kennzahlen: {str(e)}")
+
+def show_memory_profile():
+    """Admin-Ansicht der Speicherprofilierung (nur mit MEMORY_PROFILE=1)"""
+    with st.sidebar.expander("🧠 Speicherprofil"):
+        records = memprof.history()
+        if not records:
+            st.info("Noch keine gemessenen Durchläufe")
+            return
+        try:
+            last = records[-1]
+            col1, col2 = st.columns(2)
+            col1.metric("Belegt (tracemalloc)", f"{last['current_bytes'] / 2 ** 20:,.1f} MB")
+            col2.metric(
+                "Spitze im Durchlauf", f"{last['run_peak_bytes'] / 2 ** 20:,.1f} MB",
+                delta=f"{last['run_alloc_bytes'] / 2 ** 20:+,.1f} MB", delta_color="inverse"
+            )
+            byte_columns = {
+                column: st.column_config.NumberColumn(label, format="%d")
+                for column, label in [
+                    ('size_bytes', "Bytes"), ('peak_bytes', "Spitze [B]"), ('alloc_bytes', "Verbleibend [B]"),
+                    ('result_bytes', "Ergebnis [B]"), ('total_bytes', "Gesamt [B]"), ('max_bytes', "Größter [B]")
+                ]
+            }
+
+            st.markdown("**Funktionen nach Spitzenwert**")
+            st.dataframe(memprof.function_summary(records), hide_index=True, use_container_width=True,
+                         column_config=byte_columns)
+            st.markdown("**Cache-Einträge (serialisiert)**")
+            st.dataframe(pd.DataFrame(last['caches']), hide_index=True, use_container_width=True,
+                         column_config=byte_columns)
+            # Snapshots gibt es je nach MEMORY_SNAPSHOT_EVERY nicht in jedem Durchlauf
+            snapshot = next((record for record in reversed(records) if record['top_allocations']), None)
+            if snapshot:
+                st.markdown(f"**Größte Allokationen** ({snapshot['ts'][11:19]})")
+                st.dataframe(pd.DataFrame(snapshot['top_allocations']), hide_index=True,
+                             use_container_width=True, column_config=byte_columns)
+            if snapshot and snapshot['top_growth']:
+                st.markdown("**Zuwachs seit dem vorigen Snapshot**")
+                st.dataframe(pd.DataFrame(snapshot['top_growth']), hide_index=True, use_container_width=True,
+                             column_config=byte_columns)
+            st.markdown("**Durchläufe**")
+            st.line_chart(pd.DataFrame(records).set_index('ts')[['current_bytes', 'run_peak_bytes']])
+            if memprof.MEMORY_DUMP_PATH:
+                st.caption(f"Dump: `{memprof.MEMORY_DUMP_PATH}` · Auswertung: `python memprof.py`")
+        except Exception as e:
+            st.error(f"Fehler beim Anzeigen des Speicherprofils: {str(e)}")
+
+def render_maintenance_form(storage):
+    """Wartungsaufträge einreihen: Tabelle migrieren oder Aufbewahrungsrichtlinien anwenden"""
+    with st.form("job_maintenance_form", clear_on_submit=True):
+        kind = st.radio(
+            "Wartung", ['migration', 'compaction'], format_func=JOB_LABELS.get, horizontal=True,
+            key="job_maintenance_kind"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            source = st.text_input(
+                "Tabelle", key="job_maintenance_source",
+                help="Migration: Quelltabelle · Verdichtung: leer für alle Tabellen mit Richtlinie"
+            )
+        with col2:
+            target = st.text_input("Zieltabelle (nur Migration)", key="job_maintenance_target")
+        if not st.form_submit_button("Auftrag einreihen"):
+            return
+    try:
+        if kind == 'migration':
+            if not table_exists(storage.read_engine, source, kind='measurements'):
+                raise ValueError(f"Tabelle '{source}' nicht gefunden")
+            if not target or table_exists(storage.read_engine, target):
+                raise ValueError("Bitte einen neuen, noch nicht vorhandenen Tabellennamen als Ziel angeben")
+            params = {'source': source, 'target': target}
+        else:
+            policies = load_retention_policies(storage.engine)
+            if policies.empty:
+                raise ValueError(
+                    "Keine Aufbewahrungsrichtlinien hinterlegt: `python retention.py --set-policy tabelle=30:365`"
+                )
+            if source and source not in set(policies['table_name']):
+                raise ValueError(f"Keine Aufbewahrungsrichtlinie für '{source}'")
+            params = {'table_name': source} if source else {}
+        submit_job(storage.engine, kind, params)
+        st.success(f"{JOB_LABELS[kind]} eingereiht")
+    except ValueError as e:
+        st.error(str(e))
+    except Exception as e:
+        st.error(f"Fehler beim Einreihen des Auftrags: {str(e)}")
+
+@st.fragment(run_every=JOB_REFRESH_SECONDS)
+def render_jobs_panel(storage):
+    """Hintergrundaufträge mit Fortschritt, Abbrechen und Wiederholen (aktualisiert sich selbst)"""
+    with st.expander("⚙️ Jobs"):
+        try:
+            jobs = load_jobs(storage.engine, limit=JOB_PANEL_LIMIT)
+        except Exception as e:
+            st.error(f"Fehler beim Laden der Aufträge: {str(e)}")
+            return
+        if not JOB_WORKERS:
+            st.caption("Aufträge werden von externen Workern ausgeführt: `python jobs.py --workers 4`")
+        render_maintenance_form(storage)
+        if jobs.empty:
+            st.info("Keine Aufträge")
+            return
+        for job in jobs.itertuples(index=False):
+            target = job.params.get('table_name') or job.params.get('prefix') or job.params.get('target') or ""
+            st.markdown(f"**{JOB_LABELS.get(job.kind, job.kind)}** `{target}` · {JOB_STATUS_LABELS[job.status]}")
+            if job.status in ('queued', 'running'):
+                st.progress(float(job.progress), text=job.message or None)
+                if st.button("Abbrechen", key=f"job_cancel_{job.id}", disabled=bool(job.cancel_requested)):
+                    cancel_job(storage.engine, job.id)
+                    st.rerun(scope="fragment")
+                continue
+            if job.status == 'done':
+                if 'rows' in job.result:
+                    st.caption(f"{job.result['rows']:,} Zeilen · {job.finished_at:%H:%M:%S}")
+                path = job.result.get('path')
+                if path and os.path.exists(path):
+                    st.download_button(
+                        "💾 Export herunterladen",
+                        lambda path=path: open(path, 'rb'),
+                        os.path.basename(path),
+                        "text/csv",
+                        key=f"job_download_{job.id}"
+                    )
+            else:
+                if job.error:
+                    st.caption(f"Fehler nach {job.attempts} Versuch(en): {job.error}")
+                if st.button("Wiederholen", key=f"job_retry_{job.id}"):
+                    try:
+                        retry_job(storage.engine, job.id)
+                        st.rerun(scope="fragment")
+                    except ValueError as e:
+                        st.error(str(e))
+
 def show_current_table(table_name):
     """Zeigt die aktuelle Tabelle als Überschrift an"""
     st.markdown(f"### 📊 Aktuelle Tabelle: `{table_name}`")
 
+@st.fragment
+def render_preview_tab(storage, selected_table):
+    """Vorschau-Tab: Kennzahlen und erste Zeilen der Tabelle"""
+    show_current_table(selected_table)
+    preview_df, stats, date_range = load_preview_data(
+        storage, selected_table, get_table_version(storage.read_engine, selected_table)
+    )
+    format_preview_data(preview_df, stats, date_range)
+
+@st.fragment
+def render_view_data_tab(storage, selected_table):
+    """View-Data-Tab: gesamte Tabelle mit Export und Statistiken"""
+    show_current_table(selected_table)
+    st.header("Gesamte Daten")
+
+    # Automatisches Laden der Daten ohne Button
+    try:
+        version = get_table_version(storage.read_engine, selected_table)
+        reserve_frame_memory(storage, selected_table, version=version, include_index=True)
+        df = load_view_data(storage, selected_table, version)
+    
+        if df.empty:
+            st.info(f"Die Tabelle '{selected_table}' enthält keine Daten.")
+        else:
+            # Zeige Anzahl der Datensätze
+            st.success(f"{len(df):,} Datensätze geladen")
+        
+            # Container für die Tabelle mit voller Breite
+            with st.container(), perf.span("render:view_data_table", rows=len(df)):
+                # Responsives Layout für die Tabelle
+                st.dataframe(
+                    df,
+                    use_container_width=True,
+                    height=800,  # Noch größere Höhe
+                    column_config={
+                        "index": st.column_config.TextColumn(
+                            "Index",
+                            width="small",
+                            help="Messreihen-Index"
+                        ),
+                        "timestamp": st.column_config.DatetimeColumn(
+                            "Zeitstempel",
+                            format="YYYY-MM-DD HH:mm:ss",
+                            help="Messdatum und -zeitpunkt"
+                        ),
+                        "value": st.column_config.NumberColumn(
+                            "Messwert",
+                            format="%.20f",
+                            help="Gemessener Wert"
+                        )
+                    },
+                    hide_index=True
+                )
+        
+            # Export-Optionen und Statistiken
+            col1, col2 = st.columns([1, 3])
+            with col1:
+                exclude_anomalies = st.checkbox(
+                    "Anomalien ausschließen", key='export-exclude-anomalies',
+                    help="Beim Import markierte Messwerte nicht exportieren"
+                )
+                st.download_button(
+                    "💾 Als CSV speichern",
+                    lambda: build_csv_export(storage, selected_table, exclude_anomalies),
+                    f"{selected_table}_export.csv",
+                    "text/csv",
+                    key='download-csv',
+                    use_container_width=True
+                )
+                if st.button("⏳ Im Hintergrund exportieren", key='export-job', use_container_width=True):
+                    try:
+                        job_id = submit_job(storage.engine, 'export', {
+                            'table_name': selected_table,
+                            'exclude_anomalies': exclude_anomalies
+                        })
+                        st.success(f"Export als Auftrag `{job_id[:8]}` eingereiht")
+                    except Exception as e:
+                        st.error(f"Fehler beim Einreihen des Exports: {str(e)}")
+        
+            with col2:
+                with st.expander("📊 Statistiken anzeigen"):
+                    stats_col1, stats_col2, stats_col3 = st.columns(3)
+                    with stats_col1:
+                        st.metric("Datensätze", f"{len(df):,}")
+                    with stats_col2:
+                        st.metric(
+                            "Zeitraum",
+                            f"{df['timestamp'].min():%Y-%m-%d} bis {df['timestamp'].max():%Y-%m-%d}"
+                        )
+                    with stats_col3:
+                        st.metric("Unique Indizes", f"{df['index'].nunique():,}")
+                    
+                    if df['value'].notna().any():
+                        st.write("Messwert-Statistiken:")
+                        st.dataframe(
+                            df['value'].describe().round(3),
+                            use_container_width=True
+                        )
+                    
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Daten: {str(e)}")
+        st.error(f"Details: {type(e).__name__}: {str(e)}")
+
+@st.fragment
+def render_upload_tab(storage, selected_table):
+    """Upload-Tab: CSV-Dateien verarbeiten und übertragen"""
+    show_current_table(selected_table)
+    st.header("CSV-Daten hochladen")
+    uploaded_files = st.file_uploader(
+        "Wählen Sie CSV Dateien aus",
+        type=['csv'],
+        accept_multiple_files=True
+    )
+
+    replace = st.checkbox(
+        "Tabelleninhalt ersetzen",
+        key="upload_replace",
+        help="Die Datei ersetzt alle Messwerte der Tabelle in einem Schritt, statt angehängt zu werden"
+    )
+    if uploaded_files:
+        for uploaded_file in uploaded_files:
+            st.subheader(f"Verarbeite: {uploaded_file.name}")
+            df = process_csv_data(uploaded_file)
+        
+            if df is not None:
+                st.write("Vorschau der verarbeiteten Daten:")
+                st.dataframe(df.head())
+            
+                upload_key = f"upload_{uploaded_file.name}"
+                if st.button(f"'{uploaded_file.name}' übertragen", key=upload_key):
+                    try:
+                        # Der Import läuft als Hintergrundauftrag und übersteht Reruns der Seite
+                        job_id = submit_job(storage.engine, 'ingest', {
+                            'path': save_upload(uploaded_file),
+                            'table_name': selected_table,
+                            'replace': replace
+                        })
+                        st.success(f"Import als Auftrag `{job_id[:8]}` eingereiht – Fortschritt unter „Jobs“")
+                    except Exception as e:
+                        st.error(f"Fehler beim Übertragen: {str(e)}")
+
+    with st.expander("Mehrkanal-CSV importieren"):
+        render_multichannel_import(storage)
+
+def render_multichannel_import(storage):
+    """Erkennt die Spaltentypen einer breiten CSV und importiert je Kanal eine Tabelle"""
+    uploaded_file = st.file_uploader("Mehrkanal-CSV auswählen", type=['csv'], key="multichannel_upload")
+    if uploaded_file is None:
+        return
+
+    try:
+        schema, options = infer_schema(uploaded_file)
+        st.caption(
+            f"Typen aus {options['sample_rows']:,} Zeilen erkannt · Trennzeichen '{options['sep']}' · "
+            f"Dezimalzeichen '{options['decimal']}'"
+        )
+        schema = st.data_editor(
+            schema,
+            column_config={
+                'source': st.column_config.TextColumn("Spalte", disabled=True),
+                'column': st.column_config.TextColumn("SQL-Name", disabled=True),
+                'type': st.column_config.SelectboxColumn("Typ", options=list(SQL_TYPES)),
+                'nulls': st.column_config.NumberColumn("Leer", format="percent", disabled=True),
+                'example': st.column_config.TextColumn("Beispiel", disabled=True)
+            },
+            hide_index=True,
+            key="multichannel_schema"
+        )
+
+        timestamp_columns = list(schema.loc[schema['type'] == 'timestamp', 'column'])
+        if not timestamp_columns:
+            st.warning("Keine Zeitstempel-Spalte erkannt.")
+            return
+        mode = st.radio(
+            "Speicherformat", list(IMPORT_MODES), format_func=IMPORT_MODES.get, horizontal=True,
+            key="multichannel_mode"
+        )
+        prefix = st.text_input(
+            "Tabellenpräfix" if mode == 'long' else "Tabellenname",
+            value=sanitize_column_name(uploaded_file.name.rsplit('.', 1)[0]),
+            key="multichannel_prefix"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            timestamp_column = st.selectbox("Zeitstempel", timestamp_columns, key="multichannel_timestamp")
+        with col2:
+            numeric_columns = list(schema.loc[schema['type'].isin(NUMERIC_TYPES), 'column'])
+            # Im breiten Format werden immer alle Spalten übernommen
+            channels = st.multiselect(
+                "Kanäle", numeric_columns, default=numeric_columns, key="multichannel_channels",
+                disabled=mode == 'wide'
+            )
+
+        with st.expander("Tabellenstruktur (SQL)"):
+            st.code(generate_create_table(prefix, schema), language='sql')
+
+        label = f"{len(channels)} Kanäle importieren" if mode == 'long' else "Als Tabelle importieren"
+        if (channels or mode == 'wide') and st.button(label, key="multichannel_import"):
+            job_id = submit_job(storage.engine, 'multichannel', {
+                'path': save_upload(uploaded_file),
+                'prefix': prefix,
+                'mode': mode,
+                'schema': schema.to_dict('records'),
+                'options': options,
+                'timestamp_column': timestamp_column,
+                'channels': channels
+            })
+            st.success(f"{IMPORT_MODES[mode]}: Import als Auftrag `{job_id[:8]}` eingereiht")
+    except Exception as e:
+        st.error(f"Fehler beim Mehrkanal-Import: {str(e)}")
+
+@st.fragment
+def render_single_diagram_tab(storage, selected_table):
+    """Diagramm-Tab für die ausgewählte Tabelle"""
+    show_current_table(selected_table)
+    st.header("Datenvisualisierung")
+
+    if st.toggle("Live-Modus", key="single_live_mode",
+                 help="Zeigt fortlaufend die neuesten Messwerte; es werden nur neue Werte nachgeladen"):
+        max_points = st.slider(
+            "Fenstergröße (Messwerte)", 100, LIVE_MAX_POINTS, LIVE_DEFAULT_POINTS, step=100,
+            key="live_window_points"
+        )
+        render_live_chart(storage, selected_table, max_points)
+        return
+
+    try:
+        version = get_table_version(storage.read_engine, selected_table)
+        coverage = get_table_coverage(storage, selected_table, version)
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Daten: {str(e)}")
+        return
+
+    # Standardzeitraum aus dem Abdeckungsindex: letzter Tag mit Messwerten
+    init_date_range(f"single_{selected_table}", coverage)
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Startdatum", key=f"single_{selected_table}_start_date")
+    with col2:
+        end_date = st.date_input("Enddatum", key=f"single_{selected_table}_end_date")
+    with st.expander("Datenverfügbarkeit"):
+        render_availability(coverage, "single")
+
+    try:
+        # Konvertiere Datum in String-Format für PostgreSQL
+        start_date_str = start_date.strftime('%Y-%m-%d')
+        end_date_str = end_date.strftime('%Y-%m-%d')
+
+        # Leere Zeiträume ohne Abfrage erkennen, sonst auf die belegten Tage beschränken
+        covered = covered_range(coverage, start_date_str, end_date_str)
+        if covered is None:
+            st.warning(f"Keine Daten für den ausgewählten Zeitraum gefunden. {describe_coverage(coverage)}")
+            return
+        start_date_str, end_date_str = covered
+    
+        hide_anomalies = st.toggle(
+            "Anomalien ausblenden", key="single_hide_anomalies",
+            help="Beim Import markierte Messwerte aus Diagramm und Statistik ausschließen"
+        )
+        # Hinweise zu Verdichtung und Anomalien stehen über den Optionen
+        notes = st.container()
+        if st.toggle("Automatisch aktualisieren", key="single_auto_refresh",
+                     help="Lädt das Diagramm neu, sobald neue Daten importiert wurden"):
+            watch_table_versions(storage, [selected_table], "single")
+
+        # Visualisierungsoptionen
+        with st.expander("Visualisierungsoptionen"):
+            settings = {
+                'line_type': st.selectbox(
+                    "Darstellungsart",
+                    options=['lines+markers', 'lines', 'markers'],
+                    format_func=lambda x: {
+                        'lines+markers': 'Linien + Punkte',
+                        'lines': 'Nur Linien',
+                        'markers': 'Nur Punkte'
+                    }[x]
+                ),
+                'point_size': st.slider("Punktgröße", 2, 15, 6),
+                'line_width': st.slider("Linienbreite", 1, 5, 2),
+                'gap_breaks': st.checkbox("Lücken unterbrechen die Linie", value=True, key="single_gap_breaks"),
+                'hide_anomalies': hide_anomalies
+            }
+
+        # Initialisiere search_results
+        search_results = None
+
+        # Suchbereich
+        with st.expander("🔍 Datenpunkte suchen"):
+            search_col1, search_col2 = st.columns(2)
+        
+            with search_col1:
+                search_index = st.text_input(
+                    "Index suchen",
+                    value="",
+                    key="search_index",
+                    help="Geben Sie den Index ein"
+                )
+        
+            search_col3, search_col4, search_col5 = st.columns(3)
+        
+            with search_col3:
+                search_date = st.date_input(
+                    "Datum suchen",
+                    value=None,
+                    key="search_date",
+                    help="Format: YYYY-MM-DD"
+                )
+        
+            with search_col4:
+                search_time = st.text_input(
+                    "Zeit suchen (HH:MM:SS)",
+                    value="",
+                    key="search_time",
+                    help="Format: HH:MM:SS oder HH:MM"
+                )
+            
+                if search_time and not re.match(r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])?$', search_time):
+                    st.error("Ungültiges Zeitformat. Bitte verwenden Sie HH:MM:SS oder HH:MM")
+                    search_time = None
+        
+            with search_col5:
+                search_value = st.number_input(
+                    "Wert suchen",
+                    value=None,
+                    format="%.6f",
+                    step=0.000001,
+                    key="search_value",
+                    help="Dezimalzahl mit bis zu 6 Nachkommastellen"
+                )
+    
+        # Suchparameter sammeln
+        search_params = {}
+        if search_index:
+            search_params['index'] = search_index
+        if search_date:
+            search_params['date'] = search_date.strftime('%Y-%m-%d')
+        if search_time:
+            search_params['time'] = search_time
+        if search_value is not None:
+            search_params['value'] = search_value
+
+        # Suchergebnisse abrufen
+        if search_params:
+            search_results = search_data_points(storage, selected_table, search_params)
+            if not search_results.empty:
+                st.success(f"{len(search_results)} Datenpunkte gefunden")
+                with st.expander("Gefundene Datenpunkte"):
+                    st.dataframe(
+                        search_results,
+                        column_config={
+                            "date": st.column_config.TextColumn("Datum", width="medium"),
+                            "time": st.column_config.TextColumn("Zeit", width="medium"),
+                            "value": st.column_config.NumberColumn(
+                                "Wert",
+                                format="%.6f",
+                                width="medium"
+                            )
+                        }
+                    )
+
+        # Diagramm aus dem Diagramm-Cache; sonst Daten laden und Figur erstellen
+        cache = get_figure_cache() if figcache.FIGURE_CACHE else None
+        key = chart_figure_key(selected_table, version, start_date_str, end_date_str, settings)
+        cached = cache.get(key) if cache else None
+        if cached:
+            with perf.span("figure:cache_hit", table=selected_table):
+                figure, meta = cached
+                fig = go.Figure(figure, _validate=False)
+        else:
+            fig, meta = build_chart_figure(
+                storage, selected_table, start_date_str, end_date_str, version, coverage, settings
+            )
+            if fig is not None and cache:
+                cache.put(key, fig, meta)
+        if cache and selected_table not in st.session_state.setdefault("counted_chart_views", set()):
+            st.session_state.counted_chart_views.add(selected_table)
+            cache.record_view(storage.engine, selected_table)
+
+        with notes:
+            if meta['overview']:
+                st.caption(
+                    f"{meta['rows']:,} Messwerte im Zeitraum – dargestellt sind Minimum und Maximum "
+                    f"je Intervall ({meta['points']:,} Punkte). Für Einzelwerte den Zeitraum verkürzen."
+                )
+            if meta['anomalies']:
+                st.caption(
+                    f"{meta['anomalies']:,} beim Import markierte Anomalien im Zeitraum"
+                    + (" (ausgeblendet)" if hide_anomalies else "")
+                )
+
+        if fig:
+            add_search_results(fig, search_results)
+            with perf.span("render:plotly_chart", table=selected_table):
+                st.plotly_chart(fig, use_container_width=True)
+
+            with st.expander("Statistiken"):
+                st.dataframe(pd.Series(meta['stats'], name='value'))
+
+            with st.expander("Frequenzanalyse"):
+                render_spectrum(storage, selected_table, start_date_str, end_date_str, version)
+
+            with st.expander("Anomalieerkennung"):
+                render_anomaly_settings(storage, selected_table)
+        else:
+            st.warning("Keine Daten für den ausgewählten Zeitraum gefunden.")
+            
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Daten: {str(e)}")
+
+@st.fragment
+def render_multi_diagram_tab(storage, selected_table):
+    """Vergleichs-Tab für mehrere Tabellen"""
+    # Zeige die aktuelle Tabelle und den Vergleichsbereich
+    st.header("Vergleich mehrerer Tabellen")
+    # Das Fragment läuft ohne main() neu: Reservierungen des letzten Laufs freigeben
+    get_memory_budget().release_scope('multi')
+
+    # Mehrfachauswahl von Tabellen: Suchtreffer aus dem Katalog plus bereits gewählte Tabellen
+    search = st.text_input("Tabellen suchen", key="comparison_search", placeholder="Präfix oder Teil des Namens")
+    results, total = search_table_catalog(
+        storage, search, page_size=100, version=catalog_version(storage.read_engine)
+    )
+    chosen = [
+        table for table in st.session_state.get("comparison_table_selector", [selected_table])
+        if table != "Keine Tabellen verfügbar"
+    ]
+    options = list(dict.fromkeys([*chosen, *results['table_name']]))
+    selected_tables_for_comparison = st.multiselect(
+        "Wählen Sie die zu vergleichenden Tabellen",
+        options=options,
+        default=[selected_table] if selected_table != "Keine Tabellen verfügbar" else None,
+        key="comparison_table_selector",
+        help=f"{total:,} Tabellen passen zur Suche; angezeigt werden die ersten 100"
+    )
+
+    try:
+        coverages = {
+            table: get_table_coverage(storage, table, get_table_version(storage.read_engine, table))
+            for table in selected_tables_for_comparison
+        }
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Daten: {str(e)}")
+        return
+
+    # Datumsauswahl (Standard: letzter Tag, an dem eine der Tabellen Messwerte hat)
+    init_date_range("multi", pd.concat(coverages.values()) if coverages else pd.DataFrame(columns=['date']))
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Startdatum", key="multi_start_date")
+    with col2:
+        end_date = st.date_input("Enddatum", key="multi_end_date")
+    if coverages:
+        with st.expander("Datenverfügbarkeit"):
+            daily = pd.DataFrame({
+                table: coverage.groupby('date')['samples'].sum() for table, coverage in coverages.items()
+            }).sort_index()
+            if not daily.empty:
+                fig = px.imshow(
+                    daily.T, labels={'x': "Datum", 'y': "Tabelle", 'color': "Messwerte"},
+                    aspect='auto', color_continuous_scale='Greens'
+                )
+                st.plotly_chart(fig, use_container_width=True, key="availability_multi")
+
+    # Datenverarbeitung und Visualisierung
+    if selected_tables_for_comparison:
+        try:
+            # Daten für alle ausgewählten Tabellen laden
+            dfs_dict = {}
+            versions = {}
+            start_date_str = start_date.strftime('%Y-%m-%d')
+            end_date_str = end_date.strftime('%Y-%m-%d')
+        
+            # Fortschrittsbalken für das Laden der Daten
+            progress_text = "Lade Daten..."
+            progress_bar = st.progress(0)
+        
+            gap_intervals = {}
+            anomaly_flags = {}
+            for idx, table in enumerate(selected_tables_for_comparison):
+                # Tabellen ohne Messwerte im Zeitraum werden ohne Abfrage übersprungen
+                covered = covered_range(coverages[table], start_date_str, end_date_str)
+                if covered is not None:
+                    version = get_table_version(storage.read_engine, table)
+                    reserve_frame_memory(storage, table, *covered, version, scope='multi')
+                    df = get_chart_data(storage, table, *covered, version)
+                    if not df.empty:
+                        dfs_dict[table] = df
+                        versions[table] = version
+                        gap_intervals[table] = typical_interval(coverages[table])
+                        anomaly_flags[table] = get_anomaly_flags(storage, table, *covered, version)
+            
+                # Update Fortschrittsbalken
+                progress = (idx + 1) / len(selected_tables_for_comparison)
+                progress_bar.progress(progress)
+        
+            # Entferne Fortschrittsbalken nach dem Laden
+            progress_bar.empty()
+        
+            if st.toggle("Automatisch aktualisieren", key="multi_auto_refresh",
+                         help="Lädt das Diagramm neu, sobald neue Daten importiert wurden"):
+                watch_table_versions(storage, selected_tables_for_comparison, "multi")
+        
+            if dfs_dict:
+                # Container für das Diagramm
+                chart_container = st.container()
+            
+                # Visualisierungsoptionen unter dem Diagramm
+                with st.expander("📊 Visualisierungsoptionen"):
+                    # Tabs für verschiedene Optionskategorien
+                    viz_tab1, viz_tab2, viz_tab3 = st.tabs([
+                        "⚙️ Grundeinstellungen", 
+                        "📊 Statistische Anzeigen", 
+                        "📈 Erweiterte Analysen"
+                    ])
+                
+                    # Tab 1: Grundeinstellungen
+                    with viz_tab1:
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            options = {
+                                'line_type': st.selectbox(
+                                    "Linientyp",
+                                    options=['lines+markers', 'lines', 'markers'],
+                                    format_func=lambda x: {
+                                        'lines+markers': 'Linien + Punkte',
+                                        'lines': 'Nur Linien',
+                                        'markers': 'Nur Punkte'
+                                    }[x],
+                                    key="multi_line_type"
+                                ),
+                                'point_size': st.slider(
+                                    "Punktgröße", 
+                                    2, 20, 8, 
+                                    key="multi_point_size"
+                                ),
+                                'line_width': st.slider(
+                                    "Linienbreite", 
+                                    1, 10, 2, 
+                                    key="multi_line_width"
+                                ),
+                                'color_scheme': st.selectbox(
+                                    "Farbschema",
+                                    options=[
+                                        'Set1', 'Set2', 'Set3', 'Paired', 'Dark2',
+                                        'Pastel1', 'Pastel2', 'Bold', 'Safe'
+                                    ],
+                                    format_func=lambda x: {
+                                        'Set1': 'Standard',
+                                        'Set2': 'Gedämpft',
+                                        'Set3': 'Pastelltöne',
+                                        'Paired': 'Paarweise',
+                                        'Dark2': 'Dunkel',
+                                        'Pastel1': 'Pastell Hell',
+                                        'Pastel2': 'Pastell Dunkel',
+                                        'Bold': 'Kräftig',
+                                        'Safe': 'Farbenblind-freundlich'
+                                    }[x],
+                                    key="multi_color_scheme"
+                                ),
+                                'custom_colors': {},
+                                'default_colors': {}
+                            }
+                    
+                        with col2:
+                            options.update({
+                                'hide_anomalies': st.checkbox(
+                                    "Anomalien ausblenden",
+                                    key="multi_outliers",
+                                    help="Beim Import markierte Messwerte aus den Linien entfernen und als Kreuze zeigen"
+                                )
+                            })
+                        
+                            # Individuelle Farben für jede ausgewählte Tabelle
+                            if selected_tables_for_comparison:
+                                st.markdown("##### 🎨 Individuelle Farben")
+                                st.markdown("(Standardmäßig wird für jeden Graph eine zufällige Farbe gewählt)")
+                                for table in selected_tables_for_comparison:
+                                    color = st.color_picker(
+                                        f"Farbe für {table}",
+                                        key=f"color_{table}",
+                                        help=f"Wählen Sie eine individuelle Farbe für {table}"
+                                    )
+                                    if color != '#000000':  # Nur wenn eine Farbe ausgewählt wurde
+                                        options['custom_colors'][table] = color
+
+                    # Tab 2: Statistische Anzeigen
+                    with viz_tab2:
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            options.update({
+                                'show_min': st.checkbox("Minimum", key="multi_min"),
+                                'show_max': st.checkbox("Maximum", key="multi_max"),
+                                'show_mean': st.checkbox("Mittelwert", key="multi_mean"),
+                                'show_median': st.checkbox("Median", key="multi_median")
+                            })
+                    
+                        with col2:
+                            options.update({
+                                'show_std': st.checkbox("Standardabweichung (σ)", key="multi_std"),
+                                'show_percentiles': st.checkbox("Perzentile", key="multi_percentiles"),
+                                'percentile_range': st.slider(
+                                    "Perzentil-Bereich",
+                                    1, 49, 25,
+                                    key="multi_percentile_range",
+                                    help="Wählen Sie den Perzentilbereich (z.B. 25 = 25. und 75. Perzentil)"
+                                ) if options.get('show_percentiles') else 25
+                            })
+
+                    # Tab 3: Erweiterte Analysen
+                    with viz_tab3:
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            options.update({
+                                'show_trend': st.checkbox(
+                                    "Trendlinie", 
+                                    key="multi_trend",
+                                    help="Zeigt die lineare Trendlinie an"
+                                ),
+                                'moving_average': st.checkbox(
+                                    "Gleitender Durchschnitt", 
+                                    key="multi_ma",
+                                    help="Glättung der Daten durch gleitenden Durchschnitt"
+                                ),
+                                'lag_analysis': st.checkbox(
+                                    "Kreuzkorrelation / Versatz",
+                                    key="multi_lag_analysis",
+                                    help="Korrelationsmatrix und bester zeitlicher Versatz je Tabellenpaar (FFT)"
+                                )
+                            })
+                    
+                        with col2:
+                            if options.get('moving_average'):
+                                options.update({
+                                    'ma_window': st.slider(
+                                        "Fensterbreite",
+                                        3, 21, 5, 2,
+                                        key="multi_ma_window",
+                                        help="Anzahl der Datenpunkte für gleitenden Durchschnitt"
+                                    )
+                                })
+                            if options.get('lag_analysis'):
+                                options.update({
+                                    'max_lag_seconds': st.number_input(
+                                        "Max. Versatz (s)",
+                                        min_value=1, value=3600,
+                                        key="multi_max_lag",
+                                        help="Gesuchter Versatzbereich in beide Richtungen"
+                                    ),
+                                    'lag_resolution': st.number_input(
+                                        "Rasterauflösung (s)",
+                                        min_value=0.0, value=0.0,
+                                        key="multi_lag_resolution",
+                                        help="0 = automatisch (größtes Messintervall der Tabellen)"
+                                    )
+                                })
+
+                # Aktualisierte Visualisierung im Container
+                with chart_container:
+                    # Info über die verglichenen Tabellen
+                    st.markdown(f"**Vergleiche {len(dfs_dict)} Tabellen:**")
+                    for table in dfs_dict.keys():
+                        st.markdown(f"- `{table}`")
+                
+                    options['gap_intervals'] = gap_intervals
+                    options['anomalies'] = anomaly_flags
+                    fig = create_multi_table_visualization(dfs_dict, options)
+                    if fig:
+                        with perf.span("render:plotly_chart_multi"):
+                            st.plotly_chart(fig, use_container_width=True)
+
+                    if options.get('lag_analysis'):
+                        render_lag_analysis(dfs_dict, versions, start_date_str, end_date_str, options)
+            else:
+                st.warning("Keine Daten für den ausgewählten Zeitraum gefunden.")
+    
+        except Exception as e:
+            st.error(f"Fehler beim Laden der Daten: {str(e)}")
+    else:
+        st.info("Bitte wählen Sie mindestens eine Tabelle für den Vergleich aus.")
+
+@perf.timed('db:value_distributions')
+@st.cache_data(ttl=300, max_entries=32)
+def get_value_distributions(_storage, tables, start_date, end_date, bins, exclude_anomalies=False, versions=()):
+    """Kennzahlen und Histogramme mehrerer Tabellen, in der Datenbank berechnet (pro Tabellenversion)"""
+    return distribution.compare_distributions(_storage, list(tables), start_date, end_date, bins, exclude_anomalies)
+
+def create_distribution_figure(distributions, chart_type, normalize=True):
+    """Histogramm, Verteilungsfunktion oder Boxplot aus vorberechneten Klassen und Quartilen"""
+    fig = go.Figure()
+    for table, result in distributions.items():
+        summary = result['summary']
+        if not summary['count']:
+            continue
+        histogram = result['histogram']
+        if chart_type == "Histogramm":
+            counts = histogram['count'] / summary['count'] if normalize else histogram['count']
+            fig.add_trace(go.Bar(
+                x=(histogram['lower'] + histogram['upper']) / 2,
+                y=counts,
+                width=histogram['upper'] - histogram['lower'],
+                name=table,
+                opacity=0.6 if len(distributions) > 1 else 1.0
+            ))
+        elif chart_type == "Verteilungsfunktion":
+            cdf = distribution.cdf_frame(result)
+            fig.add_trace(go.Scatter(x=cdf['value'], y=cdf['fraction'], mode='lines', line_shape='hv', name=table))
+        else:
+            box = distribution.box_statistics(summary)
+            fig.add_trace(go.Box(
+                name=table,
+                q1=[box['q1']], median=[box['median']], q3=[box['q3']],
+                lowerfence=[box['lowerfence']], upperfence=[box['upperfence']],
+                mean=[box['mean']], sd=[box['sd']], boxmean='sd'
+            ))
+
+    if chart_type == "Histogramm":
+        fig.update_layout(barmode='overlay', xaxis_title="Wert", yaxis_title="Anteil" if normalize else "Anzahl")
+    elif chart_type == "Verteilungsfunktion":
+        fig.update_layout(xaxis_title="Wert", yaxis_title="Anteil ≤ Wert", yaxis_range=[0, 1])
+    else:
+        fig.update_layout(yaxis_title="Wert", showlegend=False)
+    fig.update_layout(title=chart_type, height=500, legend_title="Tabelle")
+    return fig
+
+@st.fragment
+def render_distribution_tab(storage, selected_table):
+    """Verteilungs-Tab: Histogramm, Verteilungsfunktion und Boxplot mehrerer Tabellen"""
+    st.header("Werteverteilung")
+    search = st.text_input("Tabellen suchen", key="distribution_search", placeholder="Präfix oder Teil des Namens")
+    results, total = search_table_catalog(
+        storage, search, page_size=100, version=catalog_version(storage.read_engine)
+    )
+    chosen = [
+        table for table in st.session_state.get("distribution_tables", [selected_table])
+        if table != "Keine Tabellen verfügbar"
+    ]
+    tables = st.multiselect(
+        "Tabellen",
+        options=list(dict.fromkeys([*chosen, *results['table_name']])),
+        default=[selected_table] if selected_table != "Keine Tabellen verfügbar" else None,
+        max_selections=distribution.MAX_COMPARE_TABLES,
+        key="distribution_tables",
+        help=f"Bis zu {distribution.MAX_COMPARE_TABLES} Tabellen; Klassen und Quartile werden in der Datenbank berechnet"
+    )
+    if not tables:
+        st.info("Bitte mindestens eine Tabelle auswählen.")
+        return
+
+    try:
+        versions = {table: get_table_version(storage.read_engine, table) for table in tables}
+        coverage = pd.concat([get_table_coverage(storage, table, versions[table]) for table in tables])
+    except Exception as e:
+        st.error(f"Fehler beim Laden der Daten: {str(e)}")
+        return
+
+    # Standardzeitraum: alle belegten Tage der gewählten Tabellen
+    if "distribution_start_date" not in st.session_state:
+        init_date_range("distribution", coverage)
+        if not coverage.empty:
+            st.session_state.distribution_start_date = pd.to_datetime(coverage['date'].min()).date()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Startdatum", key="distribution_start_date")
+    with col2:
+        end_date = st.date_input("Enddatum", key="distribution_end_date")
+
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        chart_type = st.radio(
+            "Darstellung", ["Histogramm", "Verteilungsfunktion", "Boxplot"], horizontal=True,
+            key="distribution_chart"
+        )
+    with col2:
+        bins = st.slider("Klassen", 10, 200, distribution.DEFAULT_BINS, step=10, key="distribution_bins")
+    with col3:
+        normalize = st.checkbox("Anteile", value=len(tables) > 1, key="distribution_normalize",
+                                help="Anteil statt Anzahl, damit Tabellen unterschiedlicher Größe vergleichbar sind")
+        exclude_anomalies = st.checkbox("Ohne Anomalien", key="distribution_exclude_anomalies")
+
+    try:
+        with st.spinner("Berechne Verteilungen in der Datenbank..."):
+            distributions = get_value_distributions(
+                storage, tuple(tables), start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'),
+                bins, exclude_anomalies, tuple(sorted(versions.items()))
+            )
+        empty = [table for table, result in distributions.items() if not result['summary']['count']]
+        if empty:
+            st.warning(f"Keine Messwerte im Zeitraum: {', '.join(empty)}")
+        with perf.span("render:distribution_chart"):
+            st.plotly_chart(create_distribution_figure(distributions, chart_type, normalize), use_container_width=True)
+
+        summaries = distribution.summary_frame(distributions)
+        st.dataframe(
+            summaries,
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                column: st.column_config.NumberColumn(format="%.4g")
+                for column in ['Min', 'P5', 'Q1', 'Median', 'Q3', 'P95', 'Max', 'Mittelwert', 'Std.-Abw.']
+            }
+        )
+        if summaries['geschätzt'].any():
+            st.caption("Mit archivierten Monaten im Zeitraum sind die Perzentile aus dem Histogramm interpoliert.")
+    except Exception as e:
+        st.error(f"Fehler bei der Berechnung der Verteilung: {str(e)}")
+
+# Ansichten des Hauptbereichs (Reihenfolge wie in der Navigation)
+VIEWS = {
+    "Preview": render_preview_tab,
+    "View Data": render_view_data_tab,
+    "Upload": render_upload_tab,
+    "Diagram - Single": render_single_diagram_tab,
+    "Diagram - Multi": render_multi_diagram_tab,
+    "Distribution": render_distribution_tab
+}
+
 # Hauptanwendung
 def main():
     st.title("CSV zu PostgreSQL Uploader")
+    perf.start_run()
+    memprof.begin_run()
+    # Reservierungen gelten für die Frames des aktuellen Durchlaufs
+    get_memory_budget().clear()
     
-    engine = get_database_connection()
-    if not engine:
+    storage = get_storage()
+    if not storage:
         st.stop()
         
-    existing_tables = get_sorted_tables(engine)
-    
+    sync_table_catalog(storage)
+    get_job_workers(storage)
+    if figcache.FIGURE_CACHE:
+        get_figure_warmer(storage)
+
     # Sidebar
     with st.sidebar:
         st.header("Tabellenverwaltung")
@@ -857,32 +2422,57 @@ def main():
             # Neue Tabelle erstellen
             new_table_name = st.text_input("Name der neuen Tabelle")
             if st.button("Tabelle erstellen") and new_table_name:
-                if new_table_name in existing_tables:
+                if table_exists(storage.read_engine, new_table_name):
                     st.error(f"Tabelle '{new_table_name}' existiert bereits!")
                 else:
                     try:
-                        create_table_query = text(f"""
-                            CREATE TABLE {new_table_name} (
-                                index TEXT,
-                                date TEXT,
-                                time TEXT,
-                                value TEXT
-                            )
-                        """)
-                        with engine.connect() as conn:
-                            conn.execute(create_table_query)
-                            conn.commit()
+                        storage.create_table(new_table_name)
                         st.success(f"Tabelle '{new_table_name}' wurde erstellt!")
-                        # Cache leeren statt rerun
-                        get_sorted_tables.clear()
-                        existing_tables = get_sorted_tables(engine)
                     except Exception as e:
                         st.error(f"Fehler beim Erstellen der Tabelle: {str(e)}")
+            
+            # Lokale Parquet-Dateien direkt einbinden (nur eingebettetes Backend)
+            if isinstance(storage, DuckDBStorage):
+                parquet_path = st.text_input(
+                    "Parquet-Datei(en) einbinden",
+                    help="Pfad oder Glob-Muster, z.B. data/*.parquet (Spalten: index, date, time, value)"
+                )
+                if st.button("Parquet einbinden") and new_table_name and parquet_path:
+                    try:
+                        storage.attach_parquet(new_table_name, parquet_path)
+                        st.success(f"'{parquet_path}' ist als Tabelle '{new_table_name}' verfügbar!")
+                    except Exception as e:
+                        st.error(f"Fehler beim Einbinden der Parquet-Datei: {str(e)}")
         
+        with st.expander("Watch-Ordner Import"):
+            try:
+                ingest_state = load_ingest_state(storage.read_engine)
+                if ingest_state.empty:
+                    st.info("Noch keine Dateien importiert. Start: `python ingest.py --watch verzeichnis=tabelle`")
+                else:
+                    st.dataframe(
+                        ingest_state[[
+                            'file_path', 'table_name', 'last_index', 'rows_ingested', 'rows_rejected', 'updated_at'
+                        ]],
+                        hide_index=True,
+                        use_container_width=True
+                    )
+            except Exception as e:
+                st.error(f"Fehler beim Laden des Importstatus: {str(e)}")
+
+        render_jobs_panel(storage)
+
+        st.subheader("Vorhandene Tabellen")
+        selected_table, page_tables = render_table_picker(storage)
+        if selected_table != "Keine Tabellen verfügbar":
+            with st.expander("Katalogeintrag"):
+                render_catalog_entry(storage, selected_table)
+
+        # Löschen bietet die Tabellen der aktuellen Suchseite an
         with tab2:
             table_to_delete = st.selectbox(
                 "Wählen Sie eine Tabelle zum Löschen",
-                existing_tables if existing_tables else ["Keine Tabellen verfügbar"],
+                page_tables if page_tables else ["Keine Tabellen verfügbar"],
                 key="delete_table_select"
             )
             
@@ -895,534 +2485,28 @@ def main():
                 if st.session_state.get('delete_confirmation', False):
                     with col2:
                         if st.button("Bestätigen", type="secondary", use_container_width=True):
-                            if delete_table(engine, table_to_delete):
+                            if delete_table(storage, table_to_delete):
                                 st.success(f"Tabelle '{table_to_delete}' wurde gelöscht!")
                                 st.session_state.delete_confirmation = False
-                                # Cache leeren statt rerun
-                                get_sorted_tables.clear()
-                                existing_tables = get_sorted_tables(engine)
-
-        st.subheader("Vorhandene Tabellen")
-        selected_table = st.selectbox(
-            "Wählen Sie eine Tabelle aus",
-            existing_tables if existing_tables else ["Keine Tabellen verfügbar"]
-        )
 
     if selected_table and selected_table != "Keine Tabellen verfügbar":
-        tab1, tab2, tab3, tab4, tab5 = st.tabs([
-            "Preview",
-            "View Data",
-            "Upload",
-            "Diagram - Single",
-            "Diagram - Multi"
-        ])
-
-        # Preview Tab
-        with tab1:
-            show_current_table(selected_table)
-            preview_df, stats, date_range = load_preview_data(engine, selected_table)
-            format_preview_data(preview_df, stats, date_range)
-        
-        # View Data Tab
-        with tab2:
-            show_current_table(selected_table)
-            st.header("Gesamte Daten")
-            
-            # Automatisches Laden der Daten ohne Button
-            try:
-                query = text(f"""
-                    SELECT * FROM {selected_table}
-                    ORDER BY date, time, index
-                """)
-                df = pd.read_sql(query, engine)
-                
-                if df.empty:
-                    st.info(f"Die Tabelle '{selected_table}' enthält keine Daten.")
-                else:
-                    # Zeige Anzahl der Datensätze
-                    st.success(f"{len(df):,} Datensätze geladen")
-                    
-                    # Container für die Tabelle mit voller Breite
-                    with st.container():
-                        # Responsives Layout für die Tabelle
-                        st.dataframe(
-                            df,
-                            use_container_width=True,
-                            height=800,  # Noch größere Höhe
-                            column_config={
-                                "index": st.column_config.TextColumn(
-                                    "Index",
-                                    width="small",
-                                    help="Messreihen-Index"
-                                ),
-                                "date": st.column_config.TextColumn(
-                                    "Datum",
-                                    width="small",
-                                    help="Messdatum"
-                                ),
-                                "time": st.column_config.TextColumn(
-                                    "Zeit",
-                                    width="small",
-                                    help="Messzeitpunkt"
-                                ),
-                                "value": st.column_config.NumberColumn(
-                                    "Messwert",
-                                    format="%.20f",
-                                    help="Gemessener Wert"
-                                )
-                            },
-                            hide_index=True
-                        )
-                    
-                    # Export-Optionen und Statistiken
-                    col1, col2 = st.columns([1, 3])
-                    with col1:
-                        st.download_button(
-                            "💾 Als CSV speichern",
-                            df.to_csv(index=False),
-                            f"{selected_table}_export.csv",
-                            "text/csv",
-                            key='download-csv',
-                            use_container_width=True
-                        )
-                    
-                    with col2:
-                        with st.expander("📊 Statistiken anzeigen"):
-                            stats_col1, stats_col2, stats_col3 = st.columns(3)
-                            with stats_col1:
-                                st.metric("Datensätze", f"{len(df):,}")
-                            with stats_col2:
-                                st.metric("Zeitraum", f"{df['date'].min()} bis {df['date'].max()}")
-                            with stats_col3:
-                                st.metric("Unique Indizes", f"{df['index'].nunique():,}")
-                                
-                            if pd.to_numeric(df['value'], errors='coerce').notna().any():
-                                st.write("Messwert-Statistiken:")
-                                st.dataframe(
-                                    pd.to_numeric(df['value'], errors='coerce').describe().round(3),
-                                    use_container_width=True
-                                )
-                                
-            except Exception as e:
-                st.error(f"Fehler beim Laden der Daten: {str(e)}")
-                st.error(f"Details: {type(e).__name__}: {str(e)}")
-        
-        # Upload Tab
-        with tab3:
-            show_current_table(selected_table)
-            st.header("CSV-Daten hochladen")
-            uploaded_files = st.file_uploader(
-                "Wählen Sie CSV Dateien aus",
-                type=['csv'],
-                accept_multiple_files=True
-            )
-            
-            if uploaded_files:
-                for uploaded_file in uploaded_files:
-                    st.subheader(f"Verarbeite: {uploaded_file.name}")
-                    df = process_csv_data(uploaded_file)
-                    
-                    if df is not None:
-                        st.write("Vorschau der verarbeiteten Daten:")
-                        st.dataframe(df.head())
-                        
-                        upload_key = f"upload_{uploaded_file.name}"
-                        if st.button(f"'{uploaded_file.name}' übertragen", key=upload_key):
-                            try:
-                                with engine.connect() as conn:
-                                    insert_query = text(f"""
-                                        INSERT INTO {selected_table} (index, date, time, value)
-                                        VALUES (:index, :date, :time, :value)
-                                    """)
-                                    
-                                    # Batch-Insert für bessere Performance
-                                    data_to_insert = df.to_dict('records')
-                                    conn.execute(insert_query, data_to_insert)
-                                    conn.commit()
-                                
-                                st.success(f"Daten erfolgreich übertragen!")
-                                # Cache für die Vorschau leeren
-                                load_preview_data.clear()
-                            except Exception as e:
-                                st.error(f"Fehler beim Übertragen: {str(e)}")
-        
-        # Diagram Tab
-        with tab4:
-            show_current_table(selected_table)
-            st.header("Datenvisualisierung")
-            
-            default_date = datetime.strptime(DEFAULT_DATE, '%Y-%m-%d')
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input("Startdatum", value=default_date)
-            with col2:
-                end_date = st.date_input("Enddatum", value=default_date)
-            
-            try:
-                # Konvertiere Datum in String-Format für PostgreSQL
-                start_date_str = start_date.strftime('%Y-%m-%d')
-                end_date_str = end_date.strftime('%Y-%m-%d')
-                
-                # Verbesserte Caching-Funktion mit stabilem Hash-Key
-                @st.cache_data(ttl=300)
-                def get_chart_data(table_name: str, start_date: str, end_date: str) -> pd.DataFrame:
-                    query = f"""
-                    SELECT 
-                            date::date as date,
-                            time::time as time,
-                        value::float as value
-                        FROM {table_name}
-                    WHERE date::date BETWEEN :start_date AND :end_date
-                        ORDER BY date, time
-                    """
-                    with engine.connect() as conn:
-                        df = pd.read_sql_query(
-                            text(query),
-                            conn,
-                    params={
-                                'start_date': start_date,
-                                'end_date': end_date
-                    }
-                )
-                    return df
-
-                # Daten abrufen
-                df = get_chart_data(selected_table, start_date_str, end_date_str)
-                
-                if not df.empty:
-                    # Visualisierungsoptionen
-                    with st.expander("Visualisierungsoptionen"):
-                        options = {
-                            'line_type': st.selectbox(
-                                "Darstellungsart",
-                                options=['lines+markers', 'lines', 'markers'],
-                                format_func=lambda x: {
-                                    'lines+markers': 'Linien + Punkte',
-                                    'lines': 'Nur Linien',
-                                    'markers': 'Nur Punkte'
-                                }[x]
-                            ),
-                            'point_size': st.slider("Punktgröße", 2, 15, 6),
-                            'line_width': st.slider("Linienbreite", 1, 5, 2)
-                        }
-
-                    # Initialisiere search_results
-                    search_results = None
-
-                    # Suchbereich
-                    with st.expander("🔍 Datenpunkte suchen"):
-                        search_col1, search_col2 = st.columns(2)
-                        
-                        with search_col1:
-                            search_index = st.text_input(
-                                "Index suchen",
-                                value="",
-                                key="search_index",
-                                help="Geben Sie den Index ein"
-                            )
-                        
-                        search_col3, search_col4, search_col5 = st.columns(3)
-                        
-                        with search_col3:
-                            search_date = st.date_input(
-                                "Datum suchen",
-                                value=None,
-                                key="search_date",
-                                help="Format: YYYY-MM-DD"
-                            )
-                        
-                        with search_col4:
-                            search_time = st.text_input(
-                                "Zeit suchen (HH:MM:SS)",
-                                value="",
-                                key="search_time",
-                                help="Format: HH:MM:SS oder HH:MM"
-                            )
-                            
-                            if search_time and not re.match(r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9](:[0-5][0-9])?$', search_time):
-                                st.error("Ungültiges Zeitformat. Bitte verwenden Sie HH:MM:SS oder HH:MM")
-                                search_time = None
-                        
-                        with search_col5:
-                            search_value = st.number_input(
-                                "Wert suchen",
-                                value=None,
-                                format="%.6f",
-                                step=0.000001,
-                                key="search_value",
-                                help="Dezimalzahl mit bis zu 6 Nachkommastellen"
-                            )
-                    
-                    # Suchparameter sammeln
-                    search_params = {}
-                    if search_index:
-                        search_params['index'] = search_index
-                    if search_date:
-                        search_params['date'] = search_date.strftime('%Y-%m-%d')
-                    if search_time:
-                        search_params['time'] = search_time
-                    if search_value is not None:
-                        search_params['value'] = search_value
-
-                    # Suchergebnisse abrufen
-                    if search_params:
-                        search_results = search_data_points(engine, selected_table, search_params)
-                        if not search_results.empty:
-                            st.success(f"{len(search_results)} Datenpunkte gefunden")
-                            with st.expander("Gefundene Datenpunkte"):
-                                st.dataframe(
-                                    search_results,
-                                    column_config={
-                                        "date": st.column_config.TextColumn("Datum", width="medium"),
-                                        "time": st.column_config.TextColumn("Zeit", width="medium"),
-                                        "value": st.column_config.NumberColumn(
-                                            "Wert",
-                                            format="%.6f",
-                                            width="medium"
-                                        )
-                                    }
-                                )
+        # Nur die aktive Ansicht wird ausgeführt; jede Ansicht ist ein Fragment und
+        # wird bei Interaktionen mit ihren eigenen Widgets isoliert neu ausgeführt
+        active_view = st.radio(
+            "Ansicht",
+            list(VIEWS.keys()),
+            horizontal=True,
+            key="active_view",
+            label_visibility="collapsed"
+        )
+        VIEWS[active_view](storage, selected_table)
 
-                    # Visualisierung erstellen
-                    fig = create_visualization(df, selected_table, options, search_results)
-                    if fig:
-                        st.plotly_chart(fig, use_container_width=True)
-                        
-                        with st.expander("Statistiken"):
-                            st.dataframe(df['value'].describe())
-                else:
-                    st.warning("Keine Daten für den ausgewählten Zeitraum gefunden.")
-                        
-            except Exception as e:
-                st.error(f"Fehler beim Laden der Daten: {str(e)}")
-                    
-        # Diagram2 Tab
-        with tab5:
-            # Zeige die aktuelle Tabelle und den Vergleichsbereich
-            st.header("Vergleich mehrerer Tabellen")
-            
-            # Mehrfachauswahl von Tabellen
-            selected_tables_for_comparison = st.multiselect(
-                "Wählen Sie die zu vergleichenden Tabellen",
-                options=existing_tables,
-                default=[selected_table] if selected_table != "Keine Tabellen verfügbar" else None,
-                key="comparison_table_selector"
-            )
-            
-            # Datumsauswahl
-            col1, col2 = st.columns(2)
-            with col1:
-                start_date = st.date_input(
-                    "Startdatum",
-                    value=datetime.strptime(DEFAULT_DATE, '%Y-%m-%d'),
-                    key="multi_start_date"
-                )
-            with col2:
-                end_date = st.date_input(
-                    "Enddatum",
-                    value=datetime.strptime(DEFAULT_DATE, '%Y-%m-%d'),
-                    key="multi_end_date"
-                )
-            
-            # Datenverarbeitung und Visualisierung
-            if selected_tables_for_comparison:
-                try:
-                    # Daten für alle ausgewählten Tabellen laden
-                    dfs_dict = {}
-                    start_date_str = start_date.strftime('%Y-%m-%d')
-                    end_date_str = end_date.strftime('%Y-%m-%d')
-                    
-                    # Fortschrittsbalken für das Laden der Daten
-                    progress_text = "Lade Daten..."
-                    progress_bar = st.progress(0)
-                    
-                    for idx, table in enumerate(selected_tables_for_comparison):
-                        query = f"""
-                        SELECT 
-                            date::date as date,
-                            time::time as time,
-                            value::float as value
-                            FROM {table}
-                            WHERE date::date BETWEEN :start_date AND :end_date
-                        ORDER BY date, time
-                        """
-                        with engine.connect() as conn:
-                            df = pd.read_sql_query(
-                                text(query),
-                                conn,
-                            params={
-                                'start_date': start_date_str,
-                                'end_date': end_date_str
-                            }
-                        )
-                        if not df.empty:
-                            dfs_dict[table] = df
-                        
-                        # Update Fortschrittsbalken
-                        progress = (idx + 1) / len(selected_tables_for_comparison)
-                        progress_bar.progress(progress)
-                    
-                    # Entferne Fortschrittsbalken nach dem Laden
-                    progress_bar.empty()
-                    
-                    if dfs_dict:
-                        # Container für das Diagramm
-                        chart_container = st.container()
-                        
-                        # Visualisierungsoptionen unter dem Diagramm
-                        with st.expander("📊 Visualisierungsoptionen"):
-                            # Tabs für verschiedene Optionskategorien
-                            viz_tab1, viz_tab2, viz_tab3 = st.tabs([
-                                "⚙️ Grundeinstellungen", 
-                                "📊 Statistische Anzeigen", 
-                                "📈 Erweiterte Analysen"
-                            ])
-                            
-                            # Tab 1: Grundeinstellungen
-                            with viz_tab1:
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    options = {
-                                        'line_type': st.selectbox(
-                                            "Linientyp",
-                                            options=['lines+markers', 'lines', 'markers'],
-                                            format_func=lambda x: {
-                                                'lines+markers': 'Linien + Punkte',
-                                                'lines': 'Nur Linien',
-                                                'markers': 'Nur Punkte'
-                                            }[x],
-                                            key="multi_line_type"
-                                        ),
-                                        'point_size': st.slider(
-                                            "Punktgröße", 
-                                            2, 20, 8, 
-                                            key="multi_point_size"
-                                        ),
-                                        'line_width': st.slider(
-                                            "Linienbreite", 
-                                            1, 10, 2, 
-                                            key="multi_line_width"
-                                        ),
-                                        'color_scheme': st.selectbox(
-                                            "Farbschema",
-                                            options=[
-                                                'Set1', 'Set2', 'Set3', 'Paired', 'Dark2',
-                                                'Pastel1', 'Pastel2', 'Bold', 'Safe'
-                                            ],
-                                            format_func=lambda x: {
-                                                'Set1': 'Standard',
-                                                'Set2': 'Gedämpft',
-                                                'Set3': 'Pastelltöne',
-                                                'Paired': 'Paarweise',
-                                                'Dark2': 'Dunkel',
-                                                'Pastel1': 'Pastell Hell',
-                                                'Pastel2': 'Pastell Dunkel',
-                                                'Bold': 'Kräftig',
-                                                'Safe': 'Farbenblind-freundlich'
-                                            }[x],
-                                            key="multi_color_scheme"
-                                        ),
-                                        'custom_colors': {},
-                                        'default_colors': {}
-                                    }
-                                
-                                with col2:
-                                    options.update({
-                                        'remove_outliers': st.checkbox(
-                                            "Ausreißer entfernen", 
-                                            key="multi_outliers"
-                                        ),
-                                        'outlier_threshold': st.slider(
-                                            "Ausreißer-Schwellwert", 
-                                            1.0, 5.0, 3.0, 
-                                            0.1,
-                                            key="multi_threshold",
-                                            help="IQR-Faktor für Ausreißererkennung"
-                                        )
-                                    })
-                                    
-                                    # Individuelle Farben für jede ausgewählte Tabelle
-                                    if selected_tables_for_comparison:
-                                        st.markdown("##### 🎨 Individuelle Farben")
-                                        st.markdown("(Standardmäßig wird für jeden Graph eine zufällige Farbe gewählt)")
-                                        for table in selected_tables_for_comparison:
-                                            color = st.color_picker(
-                                                f"Farbe für {table}",
-                                                key=f"color_{table}",
-                                                help=f"Wählen Sie eine individuelle Farbe für {table}"
-                                            )
-                                            if color != '#000000':  # Nur wenn eine Farbe ausgewählt wurde
-                                                options['custom_colors'][table] = color
-
-                            # Tab 2: Statistische Anzeigen
-                            with viz_tab2:
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    options.update({
-                                        'show_min': st.checkbox("Minimum", key="multi_min"),
-                                        'show_max': st.checkbox("Maximum", key="multi_max"),
-                                        'show_mean': st.checkbox("Mittelwert", key="multi_mean"),
-                                        'show_median': st.checkbox("Median", key="multi_median")
-                                    })
-                                
-                                with col2:
-                                    options.update({
-                                        'show_std': st.checkbox("Standardabweichung (σ)", key="multi_std"),
-                                        'show_percentiles': st.checkbox("Perzentile", key="multi_percentiles"),
-                                        'percentile_range': st.slider(
-                                            "Perzentil-Bereich",
-                                            1, 49, 25,
-                                            key="multi_percentile_range",
-                                            help="Wählen Sie den Perzentilbereich (z.B. 25 = 25. und 75. Perzentil)"
-                                        ) if options.get('show_percentiles') else 25
-                                    })
-
-                            # Tab 3: Erweiterte Analysen
-                            with viz_tab3:
-                                col1, col2 = st.columns(2)
-                                with col1:
-                                    options.update({
-                                        'show_trend': st.checkbox(
-                                            "Trendlinie", 
-                                            key="multi_trend",
-                                            help="Zeigt die lineare Trendlinie an"
-                                        ),
-                                        'moving_average': st.checkbox(
-                                            "Gleitender Durchschnitt", 
-                                            key="multi_ma",
-                                            help="Glättung der Daten durch gleitenden Durchschnitt"
-                                        )
-                                    })
-                                
-                                with col2:
-                                    if options.get('moving_average'):
-                                        options.update({
-                                            'ma_window': st.slider(
-                                                "Fensterbreite",
-                                                3, 21, 5, 2,
-                                                key="multi_ma_window",
-                                                help="Anzahl der Datenpunkte für gleitenden Durchschnitt"
-                                            )
-                                        })
-
-                        # Aktualisierte Visualisierung im Container
-                        with chart_container:
-                            # Info über die verglichenen Tabellen
-                            st.markdown(f"**Vergleiche {len(dfs_dict)} Tabellen:**")
-                            for table in dfs_dict.keys():
-                                st.markdown(f"- `{table}`")
-                            
-                            fig = create_multi_table_visualization(dfs_dict, options)
-                            if fig:
-                                st.plotly_chart(fig, use_container_width=True)
-                    else:
-                        st.warning("Keine Daten für den ausgewählten Zeitraum gefunden.")
-                
-                except Exception as e:
-                    st.error(f"Fehler beim Laden der Daten: {str(e)}")
-            else:
-                st.info("Bitte wählen Sie mindestens eine Tabelle für den Vergleich aus.")
+    show_performance_panel()
+    show_slow_query_log(storage)
+    show_pool_metrics(storage)
+    if memprof.MEMORY_PROFILE:
+        memprof.finish_run(perf.current_run_id(), perf.current_spans())
+        show_memory_profile()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,39 @@
+"""Gemeinsame Fixtures: DuckDB-Storage auf einer temporären Datei mit Archiv"""
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from archive import ColdTier
+from storage import DuckDBStorage, create_duckdb_engine
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = DuckDBStorage(create_duckdb_engine(str(tmp_path / 'test.duckdb')))
+    storage.cold = ColdTier(storage.engine, str(tmp_path / 'archive'))
+    yield storage
+    storage.engine.dispose()
+
+
+def measurements(start, periods, freq='1min', values=None, first_index=0):
+    """Messwerte im Importformat (index, date, time, value als Text)"""
+    timestamps = pd.date_range(start, periods=periods, freq=freq)
+    values = np.arange(periods, dtype=float) if values is None else np.asarray(values, dtype=float)
+    return pd.DataFrame({
+        'index': [str(first_index + i) for i in range(periods)],
+        'date': timestamps.strftime('%Y-%m-%d'),
+        'time': timestamps.strftime('%H:%M:%S'),
+        'value': [repr(float(value)) for value in values]
+    })
+
+
+def load(storage, table_name, df, replace=False):
+    """Importiert df über eine Staging-Tabelle"""
+    with storage.staged_load(table_name, replace=replace) as staged:
+        staged.insert(df)
+
+
+def scalar(storage, query, **params):
+    with storage.engine.connect() as conn:
+        return conn.execute(text(query), params).scalar()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from anomalies import load_anomalies, load_settings, rescan, save_settings
+from conftest import load, measurements
+
+
+def spiky(periods, spikes):
+    values = np.sin(np.arange(periods) / 10.0)
+    values[spikes] = 50.0
+    return values
+
+
+def flagged_times(storage, table_name):
+    with storage.engine.connect() as conn:
+        flags = load_anomalies(conn, table_name)
+    return list(flags['date'] + ' ' + flags['time'])
+
+
+def test_rescan_matches_import_detection(storage):
+    storage.create_table('csv1')
+    load(storage, 'csv1', measurements('2024-01-01', 300, values=spiky(300, [100, 250])))
+    load(storage, 'csv1', measurements('2024-01-01 05:00', 300, values=spiky(300, [40]), first_index=300))
+    imported = flagged_times(storage, 'csv1')
+    assert imported == ['2024-01-01 01:40:00', '2024-01-01 04:10:00', '2024-01-01 05:40:00']
+
+    assert rescan(storage, 'csv1') == 3
+    assert flagged_times(storage, 'csv1') == imported
+
+
+def test_rescan_applies_new_settings(storage):
+    storage.create_table('csv1')
+    load(storage, 'csv1', measurements('2024-01-01', 300, values=spiky(300, [100])))
+    save_settings(storage.engine, 'csv1', 'zscore', 30, 1000.0)
+
+    assert rescan(storage, 'csv1') == 0
+    assert flagged_times(storage, 'csv1') == []
+    with storage.engine.connect() as conn:
+        assert load_settings(conn, 'csv1')['method'] == 'zscore'
+
+
+def test_rescan_keeps_rows_appended_during_scan(storage):
+    storage.create_table('csv1')
+    load(storage, 'csv1', measurements('2024-01-01', 500, values=spiky(500, [100, 300])))
+    newer = measurements('2024-01-02', 200, values=spiky(200, [150]), first_index=500)
+    scan = storage.iter_range
+
+    def iter_range_with_import(*args, **kwargs):
+        for number, chunk in enumerate(scan(*args, **kwargs)):
+            if number == 0:
+                load(storage, 'csv1', newer)
+            yield chunk
+
+    storage.iter_range = iter_range_with_import
+    assert rescan(storage, 'csv1') == 2
+    assert flagged_times(storage, 'csv1') == [
+        '2024-01-01 01:40:00', '2024-01-01 05:00:00', '2024-01-02 02:30:00'
+    ]
+    with storage.engine.connect() as conn:
+        tail = load_settings(conn, 'csv1')['tail']
+    # Das Fenster stammt vom Import der neueren Zeilen, nicht vom Ende des Scans
+    assert tail[-1] == float(newer['value'].iloc[-1])
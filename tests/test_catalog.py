@@ -0,0 +1,43 @@
+import pytest
+
+from catalog import search_tables, set_tags
+
+
+@pytest.fixture
+def catalogued(storage):
+    for name in ['sensor_temp', 'sensor_temperature', 'lab_sensor', 'site_e_n_s_o_r', 'sensorless_x', 'pump_flow']:
+        storage.create_table(name)
+    set_tags(storage.engine, 'lab_sensor', ['labor', 'Kalibriert'])
+    return storage
+
+
+def test_prefix_before_substring_before_fuzzy(catalogued):
+    page, total = search_tables(catalogued.engine, 'sensor')
+
+    # Präfix (kürzere Namen zuerst), dann Teilstring, dann unscharf
+    assert list(page['table_name']) == [
+        'sensor_temp', 'sensorless_x', 'sensor_temperature', 'lab_sensor', 'site_e_n_s_o_r'
+    ]
+    assert total == 5
+
+
+def test_underscore_is_literal(catalogued):
+    # '_' ist kein LIKE-Platzhalter: 'sensorless_x' passt nicht
+    page, _ = search_tables(catalogued.engine, 'r_t')
+    assert list(page['table_name']) == ['sensor_temp', 'sensor_temperature']
+
+
+def test_paging_namespace_and_tags(catalogued):
+    first, total = search_tables(catalogued.engine, 'sensor', limit=2)
+    second, _ = search_tables(catalogued.engine, 'sensor', limit=2, offset=2)
+    assert total == 5
+    assert list(first['table_name']) + list(second['table_name']) == [
+        'sensor_temp', 'sensorless_x', 'sensor_temperature', 'lab_sensor'
+    ]
+
+    page, total = search_tables(catalogued.engine, namespace='sensor')
+    assert set(page['table_name']) == {'sensor_temp', 'sensor_temperature'} and total == 2
+
+    page, _ = search_tables(catalogued.engine, tag='KALIBRIERT')
+    assert list(page['table_name']) == ['lab_sensor']
+    assert page['tags'].iloc[0] == 'kalibriert, labor'
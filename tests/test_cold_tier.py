@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load, measurements, scalar
+
+
+@pytest.fixture
+def split_table(storage):
+    """Tabelle mit einem archivierten alten Tag und einem jungen Tag in der Datenbank"""
+    old = (date.today() - timedelta(days=400)).isoformat()
+    recent = (date.today() - timedelta(days=1)).isoformat()
+    rng = np.random.default_rng(7)
+    df = pd.concat([
+        measurements(old, 200, values=rng.normal(10, 2, 200)),
+        measurements(recent, 300, values=rng.normal(20, 5, 300), first_index=200)
+    ], ignore_index=True)
+    storage.create_table('csv1')
+    load(storage, 'csv1', df)
+    summary = storage.cold.archive_table(storage, 'csv1', older_than_days=30)
+    assert summary['rows'] == 200
+    assert scalar(storage, "SELECT COUNT(*) FROM csv1") == 300
+    return df.assign(value=df['value'].astype(float)), old, recent
+
+
+def test_iter_range_merges_archive_and_database(storage, split_table):
+    df, old, recent = split_table
+    chunks = list(storage.iter_range('csv1', chunk_size=64, include_index=True))
+    merged = pd.concat(chunks, ignore_index=True)
+
+    assert len(merged) == len(df)
+    assert list(merged['date'].astype(str) + merged['time'].astype(str)) == list(df['date'] + df['time'])
+    np.testing.assert_allclose(merged['value'].astype(float), df['value'])
+
+    only_old = pd.concat(storage.iter_range('csv1', old, old), ignore_index=True)
+    assert len(only_old) == 200 and set(only_old['date']) == {old}
+    only_recent = pd.concat(storage.iter_range('csv1', recent, recent), ignore_index=True)
+    assert len(only_recent) == 300 and set(only_recent['date']) == {recent}
+
+
+def test_value_summary_merges_archive_and_database(storage, split_table):
+    df, old, recent = split_table
+    summary = storage.value_summary('csv1')
+
+    assert summary['count'] == len(df)
+    assert summary['min'] == pytest.approx(df['value'].min())
+    assert summary['max'] == pytest.approx(df['value'].max())
+    assert summary['mean'] == pytest.approx(df['value'].mean())
+    assert summary['std'] == pytest.approx(df['value'].std())
+
+    hot = storage.value_summary('csv1', recent, recent)
+    assert hot['count'] == 300
+    assert hot['mean'] == pytest.approx(df.loc[df['date'] == recent, 'value'].mean())
+
+
+def test_preview_and_search_include_archive(storage, split_table):
+    df, old, recent = split_table
+    row_count, head, stats, date_range = storage.preview('csv1', 5)
+
+    assert row_count == len(df)
+    assert list(head['date']) == [old] * 5
+    assert date_range['min_date'].iloc[0] == old and date_range['max_date'].iloc[0] == recent
+
+    assert list(storage.search('csv1', {'index': 3})['date']) == [old]
+    assert list(storage.search('csv1', {'index': 203})['date']) == [recent]
+    assert len(storage.search('csv1', {'time': '00:01:00'})) == 2
@@ -0,0 +1,86 @@
+import gzip
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pyarrow as pa
+import pytest
+
+from conftest import load, measurements
+from data_api import ARROW_MIME_TYPE, DataApiHandler
+
+
+@pytest.fixture
+def api(storage, monkeypatch):
+    storage.create_table('csv1')
+    load(storage, 'csv1', measurements('2024-03-01', 500))
+    monkeypatch.setattr(DataApiHandler, 'storage', storage)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DataApiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def get(path, headers=None):
+        conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=10)
+        conn.request('GET', path, headers=headers or {})
+        response = conn.getresponse()
+        body = response.read()
+        conn.close()
+        return response, body
+
+    yield get
+    server.shutdown()
+    server.server_close()
+
+
+RANGE = '/api/range?table=csv1&start=2024-03-01&end=2024-03-01'
+
+
+def test_range_json(api):
+    response, body = api(RANGE)
+    assert response.status == 200
+    payload = json.loads(body)
+    assert payload['rows'] == 500 and len(payload['data']) == 500
+    assert payload['data'][0] == {'date': '2024-03-01', 'time': '00:00:00', 'value': 0.0}
+
+
+def test_etag_not_modified_until_new_data(api, storage):
+    response, _ = api(RANGE)
+    etag = response.getheader('ETag')
+    assert etag
+
+    response, body = api(RANGE, {'If-None-Match': etag})
+    assert response.status == 304 and body == b''
+
+    load(storage, 'csv1', measurements('2024-03-01 12:00', 10, first_index=500))
+    response, body = api(RANGE, {'If-None-Match': etag})
+    assert response.status == 200
+    assert response.getheader('ETag') != etag
+    assert json.loads(body)['rows'] == 510
+
+
+def test_range_arrow(api):
+    response, body = api(RANGE + '&format=arrow')
+    assert response.status == 200
+    assert response.getheader('Content-Type') == ARROW_MIME_TYPE
+    table = pa.ipc.open_stream(body).read_all()
+    assert table.schema.names == ['date', 'time', 'value']
+    assert table.num_rows == 500
+    assert table.column('value').to_pylist()[:3] == [0.0, 1.0, 2.0]
+
+
+def test_gzip(api):
+    plain = json.loads(api(RANGE)[1])
+    response, body = api(RANGE, {'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert json.loads(gzip.decompress(body)) == plain
+
+    response, body = api(RANGE + '&format=arrow', {'Accept-Encoding': 'gzip'})
+    assert pa.ipc.open_stream(gzip.decompress(body)).read_all().num_rows == 500
+
+
+def test_errors(api):
+    response, body = api('/api/range?table=missing&start=2024-03-01')
+    assert response.status == 404 and json.loads(body)['status'] == 'error'
+    response, _ = api('/api/range?table=csv1&start=03.01.2024')
+    assert response.status == 400
@@ -0,0 +1,45 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from availability import load_coverage
+from conftest import load, measurements
+from retention import apply_policy
+
+
+def table_rows(storage, table_name):
+    return pd.concat(storage.iter_range(table_name, include_index=True), ignore_index=True)
+
+
+@pytest.fixture
+def aged_table(storage):
+    """Drei Tage Sekundenwerte: 40 Tage (Stundenstufe), 10 Tage (Minutenstufe) und 1 Tag alt"""
+    storage.create_table('csv1')
+    for age in (40, 10, 1):
+        day = (date.today() - timedelta(days=age)).isoformat()
+        load(storage, 'csv1', measurements(day, 3 * 3600, freq='1s', first_index=age * 100000))
+    return storage
+
+
+def test_compaction_reaches_target_resolution(aged_table):
+    summary = apply_policy(aged_table, 'csv1', raw_days=7, minute_days=30)
+
+    assert summary['days'] == 2
+    assert summary['rows_before'] == 2 * 3 * 3600
+    assert summary['rows_after'] == 3 + 3 * 60
+    rows = table_rows(aged_table, 'csv1')
+    assert rows.groupby('date').size().tolist() == [3, 180, 3 * 3600]
+    coverage = load_coverage(aged_table, 'csv1')
+    assert coverage.groupby('date')['samples'].sum().tolist() == [3, 180, 3 * 3600]
+
+
+def test_compaction_is_idempotent(aged_table):
+    apply_policy(aged_table, 'csv1', raw_days=7, minute_days=30)
+    before = table_rows(aged_table, 'csv1')
+
+    summary = apply_policy(aged_table, 'csv1', raw_days=7, minute_days=30)
+
+    assert summary['days'] == 0
+    after = table_rows(aged_table, 'csv1')
+    pd.testing.assert_frame_equal(after, before)
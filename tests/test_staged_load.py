@@ -0,0 +1,47 @@
+import pytest
+
+from availability import load_coverage
+from conftest import load, measurements, scalar
+from database import get_table_version
+
+
+def test_append_adds_rows_and_coverage(storage):
+    storage.create_table('csv1')
+    load_coverage(storage, 'csv1')  # Index aufgebaut: die Importe schreiben ihn fort
+    load(storage, 'csv1', measurements('2024-03-01 00:00', 90))
+    load(storage, 'csv1', measurements('2024-03-01 01:30', 90, first_index=90))
+
+    assert storage.count_rows('csv1') == 180
+    coverage = load_coverage(storage, 'csv1')
+    assert coverage['samples'].sum() == 180
+    # Stunde 1 kommt aus beiden Importen: Anzahl addiert, früheste und späteste Uhrzeit zusammengeführt
+    hour = coverage[coverage['hour'] == 1].iloc[0]
+    assert (hour['samples'], hour['first_time'], hour['last_time']) == (60, '01:00:00', '01:59:00')
+
+
+def test_replace_swaps_table_and_resets_coverage(storage):
+    storage.create_table('csv1')
+    load(storage, 'csv1', measurements('2024-03-01', 120))
+    version = get_table_version(storage.engine, 'csv1')
+
+    load(storage, 'csv1', measurements('2024-04-01', 30), replace=True)
+
+    assert storage.count_rows('csv1') == 30
+    assert scalar(storage, "SELECT MIN(date) FROM csv1") == '2024-04-01'
+    coverage = load_coverage(storage, 'csv1')
+    assert list(coverage['date'].unique()) == ['2024-04-01']
+    assert coverage['samples'].sum() == 30
+    assert get_table_version(storage.engine, 'csv1') > version
+    assert not scalar(storage, "SELECT COUNT(*) FROM information_schema.tables WHERE table_name LIKE '!_stage!_%' ESCAPE '!'")
+
+
+def test_failed_load_leaves_table_unchanged(storage):
+    storage.create_table('csv1')
+    load(storage, 'csv1', measurements('2024-03-01', 10))
+
+    with pytest.raises(RuntimeError):
+        with storage.staged_load('csv1') as staged:
+            staged.insert(measurements('2024-03-02', 10))
+            raise RuntimeError("Abbruch")
+
+    assert storage.count_rows('csv1') == 10